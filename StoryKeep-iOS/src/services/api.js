@@ -87,6 +87,12 @@ export const photoAPI = {
     return response.data;
   },
   
+  syncChanges: async (since = null) => {
+    const params = since ? { since } : {};
+    const response = await api.get('/api/sync', { params });
+    return response.data;
+  },
+  
   getPhotoDetail: async (photoId) => {
     const response = await api.get(`/api/photos/${photoId}`);
     return response.data;
@@ -110,6 +116,15 @@ export const photoAPI = {
     return response.data;
   },
   
+  extractFromDetection: async (detectionToken, corners = null) => {
+    const payload = { detection_token: detectionToken };
+    if (corners) {
+      payload.corners = corners;
+    }
+    const response = await api.post('/api/detect-and-extract', payload);
+    return response.data;
+  },
+  
   previewDetection: async (formData) => {
     const response = await api.post('/api/preview-detection', formData, {
       headers: {
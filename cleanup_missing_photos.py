@@ -7,6 +7,7 @@ import os
 import sys
 from photovault import create_app, db
 from photovault.models import Photo
+from photovault.utils.storage_paths import location_of, exists as storage_exists
 
 def cleanup_missing_photos(dry_run=True):
     """
@@ -45,10 +46,10 @@ def cleanup_missing_photos(dry_run=True):
         existing_photos = []
         
         for photo in all_photos:
-            file_path = photo.file_path
+            location = location_of(photo)
             
-            # Check if file exists
-            if os.path.exists(file_path):
+            # Check if file exists at its stored location (local disk or App Storage)
+            if location is not None and storage_exists(location):
                 existing_photos.append(photo)
             else:
                 missing_photos.append(photo)
@@ -12,6 +12,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from photovault import create_app, db
 from photovault.models import Photo
+from photovault.utils.storage_paths import location_of, exists as storage_exists
 
 def cleanup_orphaned_photos():
     """Remove photo records from database where files don't exist"""
@@ -27,20 +28,9 @@ def cleanup_orphaned_photos():
         print()
         
         for photo in all_photos:
-            file_exists = False
-            
-            # Check if file exists on disk
-            if os.path.exists(photo.file_path):
-                file_exists = True
-            
-            # Check if file exists in App Storage (if available)
-            try:
-                from photovault.services.app_storage_service import app_storage
-                app_storage_path = f"users/{photo.user_id}/{photo.filename}"
-                if app_storage.file_exists(app_storage_path):
-                    file_exists = True
-            except:
-                pass
+            # One check at the photo's stored location (local disk or App Storage)
+            location = location_of(photo)
+            file_exists = location is not None and storage_exists(location)
             
             if not file_exists:
                 orphaned.append(photo)
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from photovault import create_app, db
 from photovault.models import Photo
+from photovault.utils.storage_paths import location_of, local_path, BACKEND_LOCAL
 
 def cleanup_orphaned_thumbnails(dry_run=True):
     """Remove thumbnail files that don't have corresponding database records"""
@@ -42,6 +43,18 @@ def cleanup_orphaned_thumbnails(dry_run=True):
         print(f"📁 Scanning upload folder: {upload_folder}")
         print()
         
+        # Every recorded thumbnail and original name, loaded once instead of a query per file
+        photos = Photo.query.with_entities(
+            Photo.user_id, Photo.filename, Photo.thumbnail_path, Photo.thumbnail_backend, Photo.thumbnail_key
+        ).all()
+        known_thumbnails = set()
+        known_stems = set()
+        for photo in photos:
+            location = location_of(photo, 'thumbnail')
+            if location is not None and location.backend == BACKEND_LOCAL:
+                known_thumbnails.add(os.path.normpath(local_path(location)))
+            known_stems.add(os.path.splitext(photo.filename)[0])
+        
         # Find all thumbnail files
         orphaned_thumbnails = []
         total_thumbnails = 0
@@ -52,20 +65,14 @@ def cleanup_orphaned_thumbnails(dry_run=True):
                     total_thumbnails += 1
                     filepath = os.path.join(root, filename)
                     
-                    # Extract original filename from thumbnail
                     # Format: original_name_thumb.ext or enhanced.date.id_thumb.ext
-                    original_filename = filename.replace('_thumb.', '.')
-                    
-                    # Also check for the pattern without _thumb
                     base_filename = filename.split('_thumb.')[0]
                     
-                    # Check if photo record exists in database
-                    photo = Photo.query.filter(
-                        (Photo.filename == original_filename) |
-                        (Photo.filename.like(f"{base_filename}%"))
-                    ).first()
+                    # Check if a photo record owns this thumbnail
+                    owned = (os.path.normpath(os.path.abspath(filepath)) in known_thumbnails
+                             or base_filename in known_stems)
                     
-                    if not photo:
+                    if not owned:
                         orphaned_thumbnails.append(filepath)
                         print(f"❌ Orphaned thumbnail: {filename}")
                         print(f"   Path: {filepath}")
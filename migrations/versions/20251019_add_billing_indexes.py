@@ -0,0 +1,35 @@
+"""index invoice (status, paid_date) and created_at columns for billing admin pages
+
+Revision ID: 20251019_billing_indexes
+Revises: 20251019_user_photo_stats
+Create Date: 2025-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_billing_indexes'
+down_revision = '20251019_user_photo_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Monthly revenue is a paid_date range over paid invoices; admin lists page by created_at
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.create_index('ix_invoice_status_paid_date', ['status', 'paid_date'], unique=False)
+        batch_op.create_index('ix_invoice_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('user_subscription', schema=None) as batch_op:
+        batch_op.create_index('ix_user_subscription_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_subscription', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_subscription_created_at')
+
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.drop_index('ix_invoice_created_at')
+        batch_op.drop_index('ix_invoice_status_paid_date')
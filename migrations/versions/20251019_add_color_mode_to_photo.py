@@ -0,0 +1,29 @@
+"""add color_mode to photo table
+
+Revision ID: 20251019_color_mode
+Revises: merge_heads_20251018
+Create Date: 2025-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_color_mode'
+down_revision = 'merge_heads_20251018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Grayscale/sepia/color classification computed at ingest (NULL = not yet classified)
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('color_mode', sa.String(length=20), nullable=True))
+        batch_op.create_index('ix_photo_color_mode', ['color_mode'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.drop_index('ix_photo_color_mode')
+        batch_op.drop_column('color_mode')
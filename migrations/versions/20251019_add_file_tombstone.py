@@ -0,0 +1,40 @@
+"""add file_tombstone table for deferred file deletion
+
+Revision ID: 20251019_file_tombstone
+Revises: 20251019_color_mode
+Create Date: 2025-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_file_tombstone'
+down_revision = '20251019_color_mode'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Paths of files whose rows were bulk-deleted; drained by the background reaper
+    op.create_table('file_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=50), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('file_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_file_tombstone_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_file_tombstone_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('file_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_file_tombstone_created_at')
+        batch_op.drop_index('ix_file_tombstone_user_id')
+    op.drop_table('file_tombstone')
@@ -0,0 +1,45 @@
+"""add canonical storage location columns to photo
+
+Revision ID: 20251019_photo_location
+Revises: 20251019_memo_waveform
+Create Date: 2025-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_photo_location'
+down_revision = '20251019_memo_waveform'
+branch_labels = None
+depends_on = None
+
+LOCATION_COLUMNS = (
+    ('storage_backend', 'storage_key'),
+    ('thumbnail_backend', 'thumbnail_key'),
+    ('edited_backend', 'edited_key'),
+)
+
+
+def upgrade():
+    # (backend, key) per file so serving, export and deletion never probe for files
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        for backend_column, key_column in LOCATION_COLUMNS:
+            batch_op.add_column(sa.Column(backend_column, sa.String(length=16), nullable=True))
+            batch_op.add_column(sa.Column(key_column, sa.String(length=500), nullable=True))
+            batch_op.create_index(f'ix_photo_{key_column}', [key_column], unique=False)
+
+    # Schema only: resolving legacy paths probes local storage and App Storage,
+    # far too slow to run while this transaction holds the ALTER lock. Until
+    # scripts/backfill_storage_locations.py has run, location_of() falls back
+    # to classifying the stored path
+    print("Run scripts/backfill_storage_locations.py to resolve existing photo paths")
+
+
+def downgrade():
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        for backend_column, key_column in reversed(LOCATION_COLUMNS):
+            batch_op.drop_index(f'ix_photo_{key_column}')
+            batch_op.drop_column(key_column)
+            batch_op.drop_column(backend_column)
@@ -0,0 +1,43 @@
+"""add sync_tombstone table and photo (user_id, updated_at) index for delta sync
+
+Revision ID: 20251019_sync_tombstone
+Revises: 20251019_file_tombstone
+Create Date: 2025-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_sync_tombstone'
+down_revision = '20251019_file_tombstone'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deletions visible to /api/sync; pruned after the retention window
+    op.create_table('sync_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=30), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sync_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_sync_tombstone_user_deleted', ['user_id', 'deleted_at'], unique=False)
+
+    # Keyset scans for "photos changed since cursor"
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.create_index('ix_photo_user_updated', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.drop_index('ix_photo_user_updated')
+
+    with op.batch_alter_table('sync_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_sync_tombstone_user_deleted')
+    op.drop_table('sync_tombstone')
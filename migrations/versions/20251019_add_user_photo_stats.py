@@ -0,0 +1,48 @@
+"""add user_photo_stats rollup for the admin pages and index photo.created_at
+
+Revision ID: 20251019_user_photo_stats
+Revises: 20251019_photo_location
+Create Date: 2025-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_user_photo_stats'
+down_revision = '20251019_photo_location'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-user counters refreshed after each commit that touches a user's photos
+    op.create_table('user_photo_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_photos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('edited_photos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_size_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('user_photo_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_user_photo_stats_total_photos', ['total_photos'], unique=False)
+
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.create_index('ix_photo_created_at', ['created_at'], unique=False)
+
+    # Seed from the photo table in one pass
+    op.execute(
+        "INSERT INTO user_photo_stats (user_id, total_photos, edited_photos, total_size_bytes, refreshed_at) "
+        "SELECT user_id, COUNT(id), COUNT(edited_filename), COALESCE(SUM(file_size), 0), CURRENT_TIMESTAMP "
+        "FROM photo GROUP BY user_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.drop_index('ix_photo_created_at')
+    with op.batch_alter_table('user_photo_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_photo_stats_total_photos')
+    op.drop_table('user_photo_stats')
@@ -0,0 +1,29 @@
+"""add voice_memo waveform and analyzed_at for server-side audio analysis
+
+Revision ID: 20251019_memo_waveform
+Revises: 20251019_sync_tombstone
+Create Date: 2025-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_memo_waveform'
+down_revision = '20251019_sync_tombstone'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Downsampled peak levels (a few hundred bytes) so lists draw waveforms without the audio
+    with op.batch_alter_table('voice_memo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('waveform', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('analyzed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('voice_memo', schema=None) as batch_op:
+        batch_op.drop_column('analyzed_at')
+        batch_op.drop_column('waveform')
@@ -0,0 +1,26 @@
+"""rewrite JSON 'null' photo.enhancement_metadata values to SQL NULL
+
+Revision ID: 20251019_metadata_json_null
+Revises: 20251019_photo_updated_not_null
+Create Date: 2025-10-19 23:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_metadata_json_null'
+down_revision = '20251019_photo_updated_not_null'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Clearing every edit stored the JSON literal null, which IS NULL filters don't match
+    op.execute("UPDATE photo SET enhancement_metadata = NULL "
+               "WHERE CAST(enhancement_metadata AS TEXT) = 'null'")
+
+
+def downgrade():
+    # SQL NULL is what the column held before edits were recorded; nothing to restore
+    pass
@@ -0,0 +1,28 @@
+"""backfill photo.updated_at and make it NOT NULL for delta sync keyset paging
+
+Revision ID: 20251019_photo_updated_not_null
+Revises: 20251019_billing_indexes
+Create Date: 2025-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251019_photo_updated_not_null'
+down_revision = '20251019_billing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /api/sync pages on the raw (user_id, updated_at) index, which never sees NULLs
+    op.execute("UPDATE photo SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('photo', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=True)
@@ -7,6 +7,8 @@ Copyright (c) 2025 Calmic Sdn Bhd. All rights reserved.
 from flask import Flask
 from photovault.extensions import db, login_manager, migrate, csrf
 from photovault.config import config
+from photovault.utils.cache import cache
+from photovault.services.app_storage_service import app_storage
 import os
 import threading
 
@@ -216,6 +218,10 @@ def create_app(config_class=None):
     template_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
     app = Flask(__name__, static_folder=static_folder, template_folder=template_folder)
     
+    # orjson-backed JSON (falls back to the stdlib encoder when not installed)
+    from photovault.utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+    
     # Configuration
     if config_class is None:
         config_name = os.environ.get('FLASK_CONFIG') or 'development'
@@ -231,6 +237,8 @@ def create_app(config_class=None):
     
     # Initialize extensions
     db.init_app(app)
+    cache.init_app(app)
+    app_storage.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
@@ -242,8 +250,8 @@ def create_app(config_class=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        from photovault.models import User
-        return User.query.get(int(user_id))
+        from photovault.utils.jwt_auth import load_principal
+        return load_principal(user_id)
     
     # Register blueprints
     from photovault.routes.main import main_bp
@@ -285,14 +293,25 @@ def create_app(config_class=None):
     
     # Note: Upload file serving is handled securely via gallery.uploaded_file route with authentication
     
-    # Add cache control headers for Replit environment
-    @app.after_request
-    def add_cache_control_headers(response):
-        """Add cache control headers to prevent caching issues in Replit proxy"""
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+    # Delta-sync flush hooks (tombstones, memo/comment -> photo.updated_at)
+    import photovault.services.sync_service  # noqa: F401
+    # Shared-cache invalidation hooks (plan limits, photo counters)
+    import photovault.services.usage_service  # noqa: F401
+    # Admin stats rollup refresh hooks (per-user photo counters)
+    import photovault.services.admin_stats_service  # noqa: F401
+    # Photo storage location hooks (canonical backend/key on every path change)
+    import photovault.utils.storage_paths  # noqa: F401
+    
+    # 429 + Retry-After for views marked with @rate_limit
+    from photovault.utils.rate_limit import init_rate_limiting
+    init_rate_limiting(app)
+    
+    # Per-route caching policy and JSON/HTML compression. after_request hooks run
+    # in reverse registration order, so caching (ETag, 304) sees the raw body
+    from photovault.utils.compression import init_compression
+    from photovault.utils.http_caching import init_http_caching
+    init_compression(app)
+    init_http_caching(app)
     
     # Subscription enforcement middleware
     @app.before_request
@@ -338,15 +357,11 @@ def create_app(config_class=None):
         if endpoint in public_routes or (endpoint and endpoint.startswith('auth.')):
             return None
         
-        # Check if user has an active subscription
-        from photovault.models import UserSubscription
-        active_subscription = UserSubscription.query.filter_by(
-            user_id=current_user.id,
-            status='active'
-        ).first()
+        # Check if user has an active subscription (cached, see usage_service)
+        from photovault.services.usage_service import usage_service
         
         # If no active subscription, redirect to plans page
-        if not active_subscription:
+        if not usage_service.plan_limits(current_user.id)['has_active_subscription']:
             from flask import flash
             flash('Please choose a subscription plan to access PhotoVault features.', 'info')
             return redirect(url_for('billing.plans'))
@@ -401,4 +416,11 @@ def create_app(config_class=None):
                 app.logger.error("Will retry on next non-health-check request")
                 # Don't set _db_initialized - allow retry on next request
     
+    # Model-backed singletons are built lazily; optionally build them in the
+    # background right after boot so the first face-detection request is fast
+    if app.config.get('WARM_UP_MODELS'):
+        import threading
+        from photovault.utils.lazy import warm_up
+        threading.Thread(target=warm_up, name='photovault-warmup', daemon=True).start()
+    
     return app
\ No newline at end of file
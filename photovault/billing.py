@@ -8,6 +8,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from photovault.extensions import db
 from photovault.models import SubscriptionPlan, UserSubscription, Invoice, PaymentHistory
+from photovault.services.billing_analytics_service import billing_analytics_service
+from sqlalchemy.orm import joinedload
 import stripe
 import os
 
@@ -16,6 +18,9 @@ billing_bp = Blueprint('billing', __name__, url_prefix='/billing')
 # Initialize Stripe with API key
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
+# Rows per page on the admin subscription and invoice lists
+ADMIN_PAGE_SIZE = 50
+
 
 @billing_bp.route('/plans')
 def plans():
@@ -579,50 +584,23 @@ def admin_dashboard():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.index'))
     
-    from sqlalchemy import func, extract
-    
-    # Get subscription statistics
-    total_subscriptions = UserSubscription.query.filter_by(status='active').count()
-    total_users = db.session.query(func.count(UserSubscription.user_id.distinct())).filter_by(status='active').scalar()
-    
-    # Get revenue statistics
-    total_revenue = db.session.query(func.sum(Invoice.total)).filter_by(status='paid').scalar() or 0
-    this_month_revenue = db.session.query(func.sum(Invoice.total)).filter(
-        Invoice.status == 'paid',
-        extract('year', Invoice.paid_date) == datetime.utcnow().year,
-        extract('month', Invoice.paid_date) == datetime.utcnow().month
-    ).scalar() or 0
-    
-    # Get plan distribution
-    plan_stats = db.session.query(
-        SubscriptionPlan.display_name,
-        func.count(UserSubscription.id).label('count')
-    ).join(UserSubscription).filter(
-        UserSubscription.status == 'active'
-    ).group_by(SubscriptionPlan.display_name).all()
+    # Headline figures are cached until billing data changes (see billing_analytics_service)
+    summary = billing_analytics_service.summary()
     
     # Get recent subscriptions
-    recent_subscriptions = UserSubscription.query.filter_by(
-        status='active'
-    ).order_by(UserSubscription.created_at.desc()).limit(10).all()
+    recent_subscriptions = UserSubscription.query.options(
+        joinedload(UserSubscription.user), joinedload(UserSubscription.plan)
+    ).filter_by(status='active').order_by(UserSubscription.created_at.desc()).limit(10).all()
     
     # Get recent invoices
-    recent_invoices = Invoice.query.order_by(Invoice.created_at.desc()).limit(20).all()
-    
-    # Get payment statistics
-    successful_payments = PaymentHistory.query.filter_by(status='succeeded').count()
-    failed_payments = PaymentHistory.query.filter_by(status='failed').count()
+    recent_invoices = Invoice.query.options(joinedload(Invoice.user)).order_by(
+        Invoice.created_at.desc()
+    ).limit(20).all()
     
     return render_template('billing/admin_dashboard.html',
-                         total_subscriptions=total_subscriptions,
-                         total_users=total_users,
-                         total_revenue=total_revenue,
-                         this_month_revenue=this_month_revenue,
-                         plan_stats=plan_stats,
                          recent_subscriptions=recent_subscriptions,
                          recent_invoices=recent_invoices,
-                         successful_payments=successful_payments,
-                         failed_payments=failed_payments)
+                         **summary)
 
 
 @billing_bp.route('/admin/subscriptions')
@@ -646,11 +624,15 @@ def admin_subscriptions():
     if plan_filter != 'all':
         query = query.filter_by(plan_id=int(plan_filter))
     
-    subscriptions = query.order_by(UserSubscription.created_at.desc()).all()
+    page = request.args.get('page', 1, type=int)
+    pagination = query.options(
+        joinedload(UserSubscription.user), joinedload(UserSubscription.plan)
+    ).order_by(UserSubscription.created_at.desc()).paginate(page=page, per_page=ADMIN_PAGE_SIZE, error_out=False)
     plans = SubscriptionPlan.query.all()
     
     return render_template('billing/admin_subscriptions.html',
-                         subscriptions=subscriptions,
+                         subscriptions=pagination.items,
+                         pagination=pagination,
                          plans=plans,
                          status_filter=status_filter,
                          plan_filter=plan_filter)
@@ -673,10 +655,14 @@ def admin_invoices():
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    invoices = query.order_by(Invoice.created_at.desc()).all()
+    page = request.args.get('page', 1, type=int)
+    pagination = query.options(joinedload(Invoice.user)).order_by(
+        Invoice.created_at.desc()
+    ).paginate(page=page, per_page=ADMIN_PAGE_SIZE, error_out=False)
     
     return render_template('billing/admin_invoices.html',
-                         invoices=invoices,
+                         invoices=pagination.items,
+                         pagination=pagination,
                          status_filter=status_filter)
 
 
@@ -688,30 +674,9 @@ def admin_revenue():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.index'))
     
-    from sqlalchemy import func, extract
-    
-    # Get monthly revenue for the last 12 months
-    monthly_revenue = []
-    for i in range(11, -1, -1):
-        target_date = datetime.utcnow() - timedelta(days=30*i)
-        revenue = db.session.query(func.sum(Invoice.total)).filter(
-            Invoice.status == 'paid',
-            extract('year', Invoice.paid_date) == target_date.year,
-            extract('month', Invoice.paid_date) == target_date.month
-        ).scalar() or 0
-        
-        monthly_revenue.append({
-            'month': target_date.strftime('%b %Y'),
-            'revenue': float(revenue)
-        })
-    
-    # Get revenue by plan
-    revenue_by_plan = db.session.query(
-        SubscriptionPlan.display_name,
-        func.sum(Invoice.total).label('revenue')
-    ).join(UserSubscription).join(Invoice).filter(
-        Invoice.status == 'paid'
-    ).group_by(SubscriptionPlan.display_name).all()
+    # One grouped query per cache lifetime (see billing_analytics_service)
+    monthly_revenue = billing_analytics_service.monthly_revenue()
+    revenue_by_plan = billing_analytics_service.revenue_by_plan()
     
     return render_template('billing/admin_revenue.html',
                          monthly_revenue=monthly_revenue,
@@ -41,6 +41,65 @@ class Config:
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size (for photos and voice memos)
     
+    # Preview-detection cache shared by /api/preview-detection and /api/detect-and-extract
+    DETECTION_CACHE_TTL = int(os.environ.get('DETECTION_CACHE_TTL', 600))  # seconds
+    DETECTION_CACHE_MAX_BYTES = int(os.environ.get('DETECTION_CACHE_MAX_MB', 512)) * 1024 * 1024
+    
+    # HTTP caching: seconds private JSON GETs may be reused before revalidating
+    # with their ETag (0 = always revalidate, so clients never see stale listings)
+    JSON_CACHE_MAX_AGE = int(os.environ.get('JSON_CACHE_MAX_AGE', 0))
+    
+    # gzip JSON/HTML responses at least this large
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    
+    # Delta sync (/api/sync): cursor overlap and how long deletions are remembered
+    SYNC_CLOCK_SKEW_SECONDS = int(os.environ.get('SYNC_CLOCK_SKEW_SECONDS', 5))
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    
+    # Build face detection/recognition models in a background thread at boot
+    # (otherwise they are built on first use)
+    WARM_UP_MODELS = os.environ.get('WARM_UP_MODELS', 'false').lower() in ['true', 'on', '1']
+    
+    # Shared cache (principals, plan limits, dashboard counters): memory | sqlite | redis.
+    # sqlite is shared by all workers on the host (file defaults to the instance folder
+    # and must be owned by the app user); redis needs CACHE_URL
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+    CACHE_URL = os.environ.get('CACHE_URL') or os.environ.get('REDIS_URL')
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+    
+    # Voice memos: upload cap (enforced while streaming) and optional background
+    # re-encode to mono speech bitrate - 'aac' (plays on iOS) or 'opus'; needs ffmpeg
+    VOICE_MEMO_MAX_SIZE = int(os.environ.get('VOICE_MEMO_MAX_SIZE', 25 * 1024 * 1024))
+    VOICE_MEMO_TRANSCODE = os.environ.get('VOICE_MEMO_TRANSCODE', '')
+    VOICE_MEMO_BITRATE = os.environ.get('VOICE_MEMO_BITRATE', '32k')
+    
+    # Rate limiting (@rate_limit policies, state in the shared cache). RATE_LIMITS
+    # overrides policies, e.g. {'login': ((5, 60),)}; behind N proxies set
+    # RATE_LIMIT_TRUSTED_PROXIES=N so X-Forwarded-For identifies the client
+    # (production defaults to the one Railway edge proxy)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATE_LIMITS = {}
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+    
+    # Object storage: auto | replit | s3 | local. auto picks s3 when a bucket is
+    # set, Replit App Storage on Replit, else local files. STORAGE_S3_ENDPOINT
+    # points the s3 backend at MinIO or another S3-compatible stand-in
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'auto')
+    STORAGE_REPLIT_BUCKET = os.environ.get('STORAGE_REPLIT_BUCKET')
+    STORAGE_S3_BUCKET = os.environ.get('STORAGE_S3_BUCKET')
+    STORAGE_S3_ENDPOINT = os.environ.get('STORAGE_S3_ENDPOINT')
+    STORAGE_S3_REGION = os.environ.get('STORAGE_S3_REGION')
+    STORAGE_S3_ACCESS_KEY = os.environ.get('STORAGE_S3_ACCESS_KEY')
+    STORAGE_S3_SECRET_KEY = os.environ.get('STORAGE_S3_SECRET_KEY')
+    STORAGE_TRANSFER_WORKERS = int(os.environ.get('STORAGE_TRANSFER_WORKERS', 8))  # Parallel multi-file transfers
+    
+    # In-process background jobs (face detection and other post-ingest derivatives)
+    BACKGROUND_JOB_WORKERS = int(os.environ.get('BACKGROUND_JOB_WORKERS', 2))
+    
     # Camera-specific settings
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
     CAMERA_QUALITY = 0.85  # JPEG quality for camera captures
@@ -135,6 +194,10 @@ class ProductionConfig(Config):
     # Production logging
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT', '1')
     
+    # Railway's edge proxy is the remote address of every request, so without a
+    # trusted hop all anonymous clients would share one rate limit bucket
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+    
     @staticmethod
     def init_app(app):
         Config.init_app(app)
@@ -224,6 +287,8 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CACHE_BACKEND = 'memory'  # Per-process, so test databases never see each other's entries
+    STORAGE_BACKEND = 'local'
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
 
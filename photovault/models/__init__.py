@@ -99,7 +99,7 @@ class Photo(db.Model):
     mime_type = db.Column(db.String(100))
     upload_source = db.Column(db.String(50), default='file')  # 'file' or 'camera'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -125,7 +125,17 @@ class Photo(db.Model):
     processing_notes = db.Column(db.Text)
     edited_filename = db.Column(db.String(255))  # Stores the filename of the edited image
     edited_path = db.Column(db.String(500))  # Stores the path of the edited image
-    enhancement_metadata = db.Column(db.JSON)  # Stores enhancement details (method, AI guidance, etc.)
+    enhancement_metadata = db.Column(db.JSON(none_as_null=True))  # Enhancement details and edit recipe; None is SQL NULL
+    color_mode = db.Column(db.String(20), index=True)  # 'grayscale', 'sepia', 'color' or 'unknown' (no readable file) - NULL until classified
+    
+    # Canonical file locations: backend 'app' (App Storage) or 'local' plus a key,
+    # set whenever a path column changes (see photovault.utils.storage_paths)
+    storage_backend = db.Column(db.String(16))
+    storage_key = db.Column(db.String(500), index=True)
+    thumbnail_backend = db.Column(db.String(16))
+    thumbnail_key = db.Column(db.String(500), index=True)
+    edited_backend = db.Column(db.String(16))
+    edited_key = db.Column(db.String(500), index=True)
     
     # Front/back pairing for photos with writing on back
     paired_photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'))
@@ -139,6 +149,11 @@ class Photo(db.Model):
     # Back reference to association object
     photo_people_records = db.relationship('PhotoPerson', back_populates='photo', overlaps="people,photos")
     
+    __table_args__ = (
+        db.Index('ix_photo_user_updated', 'user_id', 'updated_at'),  # Delta sync keyset scans
+        db.Index('ix_photo_created_at', 'created_at'),  # Admin "recent uploads" range counts
+    )
+    
     def __repr__(self):
         return f'<Photo {self.filename}>'
     
@@ -237,6 +252,10 @@ class VoiceMemo(db.Model):
     mime_type = db.Column(db.String(100))  # audio/webm, audio/wav, etc.
     duration = db.Column(db.Float)  # Duration in seconds
     
+    # Server-side analysis (set by voice_memo_service after upload)
+    waveform = db.Column(db.LargeBinary)  # Peak levels 0..127, one byte per point
+    analyzed_at = db.Column(db.DateTime)
+    
     # User metadata
     title = db.Column(db.String(200))  # Optional title for the voice memo
     transcript = db.Column(db.Text)  # Optional transcription of the memo
@@ -265,6 +284,11 @@ class VoiceMemo(db.Model):
             return f"{minutes:02d}:{seconds:02d}"
         return "00:00"
     
+    @property
+    def waveform_peaks(self):
+        """Return waveform peak levels as a list of ints (empty until analyzed)"""
+        return list(self.waveform) if self.waveform else []
+    
     def __repr__(self):
         return f'<VoiceMemo {self.filename} for Photo {self.photo_id}>'
 
@@ -290,6 +314,51 @@ class PhotoComment(db.Model):
     def __repr__(self):
         return f'<PhotoComment {self.id} for Photo {self.photo_id}>'
 
+class FileTombstone(db.Model):
+    """File left behind by a deleted row, removed from disk/App Storage by the reaper"""
+    __tablename__ = 'file_tombstone'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)  # Absolute local path or App Storage object path
+    user_id = db.Column(db.Integer, index=True)  # Owner at deletion time (no FK - outlives the user)
+    source = db.Column(db.String(50))  # 'photo', 'thumbnail', 'edited', 'voice_memo'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<FileTombstone {self.path}>'
+
+class SyncTombstone(db.Model):
+    """Deletion record so delta sync can tell clients what disappeared"""
+    __tablename__ = 'sync_tombstone'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)  # User who should see the deletion (no FK - outlives rows)
+    entity_type = db.Column(db.String(30), nullable=False)  # 'photo', 'vault', 'vault_membership'
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_sync_tombstone_user_deleted', 'user_id', 'deleted_at'),
+    )
+    
+    def __repr__(self):
+        return f'<SyncTombstone {self.entity_type} {self.entity_id}>'
+
+class UserPhotoStats(db.Model):
+    """Per-user photo counters behind the admin pages, kept current by admin_stats_service"""
+    __tablename__ = 'user_photo_stats'
+    
+    user_id = db.Column(db.Integer, primary_key=True)  # No FK - the row is dropped on the refresh after a user is deleted
+    total_photos = db.Column(db.Integer, nullable=False, default=0, index=True)
+    edited_photos = db.Column(db.Integer, nullable=False, default=0)
+    total_size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserPhotoStats {self.user_id}: {self.total_photos} photos>'
+
 class FamilyVault(db.Model):
     """Family vault model for shared photo collections"""
     id = db.Column(db.Integer, primary_key=True)
@@ -593,6 +662,10 @@ class UserSubscription(db.Model):
     user = db.relationship('User', backref='user_subscriptions')
     invoices = db.relationship('Invoice', backref='subscription', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_user_subscription_created_at', 'created_at'),  # Admin subscription list pages
+    )
+    
     @property
     def is_active(self):
         """Check if subscription is currently active"""
@@ -670,6 +743,11 @@ class Invoice(db.Model):
     user = db.relationship('User', backref='invoices')
     payment_records = db.relationship('PaymentHistory', backref='invoice', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_invoice_status_paid_date', 'status', 'paid_date'),  # Revenue range scans
+        db.Index('ix_invoice_created_at', 'created_at'),  # Admin invoice list pages
+    )
+    
     @property
     def is_paid(self):
         """Check if invoice has been paid"""
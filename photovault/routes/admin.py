@@ -4,6 +4,7 @@ from flask_login import login_required, current_user
 from sqlalchemy import func, case, text
 from photovault import db
 from photovault.models import User, Photo
+from photovault.services.admin_stats_service import admin_stats_service
 from datetime import datetime, timedelta
 import os
 import logging
@@ -41,96 +42,36 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Enhanced admin dashboard showing user list with statistics"""
-    # Get all users
-    users = User.query.order_by(User.created_at.desc()).all()
-    
-    # Calculate statistics for each user manually (no complex SQLAlchemy)
-    users_with_stats = []
-    total_storage_all = 0
-    total_photos_all = 0
-    total_edited_all = 0
-    
-    for user in users:
-        # Get user's photos
-        user_photos = Photo.query.filter_by(user_id=user.id).all()
-        
-        # Calculate stats manually
-        total_photos = len(user_photos)
-        edited_photos = 0
-        total_size = 0
-        
-        for photo in user_photos:
-            if photo.edited_filename is not None:
-                edited_photos += 1
-            if photo.file_size:
-                total_size += photo.file_size
-        
-        # Add to totals
-        total_storage_all += total_size
-        total_photos_all += total_photos
-        total_edited_all += edited_photos
-        
-        # Create tuple matching the expected format
-        users_with_stats.append((user, total_photos, edited_photos, total_size))
-    
-    # Overall statistics
-    total_users = len(users)
-    
-    stats = {
-        'total_users': total_users,
-        'total_photos': total_photos_all,
-        'total_edited': total_edited_all,
-        'total_storage': total_storage_all,
-        'total_storage_mb': round(total_storage_all / (1024 * 1024), 2) if total_storage_all else 0
-    }
-    
-    return render_template('admin/dashboard.html', users_with_stats=users_with_stats, stats=stats)
+    # Per-user counters come from the rollup (see admin_stats_service)
+    users_with_stats = admin_stats_service.users_with_stats()
+    return render_template('admin/dashboard.html', users_with_stats=users_with_stats,
+                           stats=_dashboard_stats(admin_stats_service.totals()))
 
 @admin_bp.route('/api/statistics')
 @login_required
 @admin_required
 def api_statistics():
     """JSON API endpoint for dashboard statistics"""
-    # Get all users
-    users = User.query.order_by(User.created_at.desc()).all()
-    
-    # Calculate statistics for each user manually 
-    total_storage_all = 0
-    total_photos_all = 0
-    total_edited_all = 0
-    
-    for user in users:
-        # Get user's photos
-        user_photos = Photo.query.filter_by(user_id=user.id).all()
-        
-        # Calculate stats manually
-        total_photos = len(user_photos)
-        edited_photos = 0
-        total_size = 0
-        
-        for photo in user_photos:
-            if photo.edited_filename is not None:
-                edited_photos += 1
-            if photo.file_size:
-                total_size += photo.file_size
-        
-        # Add to totals
-        total_storage_all += total_size
-        total_photos_all += total_photos
-        total_edited_all += edited_photos
-    
-    # Overall statistics
-    total_users = len(users)
-    
-    stats = {
-        'total_users': total_users,
-        'total_photos': total_photos_all,
-        'total_edited': total_edited_all,
-        'total_storage': total_storage_all,
-        'total_storage_mb': round(total_storage_all / (1024 * 1024), 2) if total_storage_all else 0
+    return jsonify(_dashboard_stats(admin_stats_service.totals()))
+
+def _dashboard_stats(totals):
+    """Dashboard summary from admin_stats_service.totals()"""
+    total_storage = totals['total_size_bytes']
+    return {
+        'total_users': totals['users']['total'],
+        'total_photos': totals['photos']['total'],
+        'total_edited': totals['photos']['edited'],
+        'total_storage': total_storage,
+        'total_storage_mb': round(total_storage / (1024 * 1024), 2) if total_storage else 0
     }
-    
-    return jsonify(stats)
+
+@admin_bp.route('/api/cache-stats')
+@login_required
+@admin_required
+def api_cache_stats():
+    """Shared cache hit/miss counters for the worker serving this request"""
+    from photovault.utils.cache import cache
+    return jsonify(cache.stats())
 
 @admin_bp.route('/user/<int:user_id>')
 @login_required
@@ -337,66 +278,20 @@ def delete_photo(photo_id):
 def statistics():
     """View detailed system statistics with simple, reliable queries"""
     try:
-        # Simple user statistics - avoid complex aggregations
-        all_users = User.query.all()
-        total_users = len(all_users)
-        admin_users = sum(1 for user in all_users if user.is_admin)
-        superusers = sum(1 for user in all_users if user.is_superuser)
-        
-        # Recent users (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_users = 0
-        for user in all_users:
-            if user.created_at and user.created_at >= thirty_days_ago:
-                recent_users += 1
-        
-        # Simple photo statistics
-        all_photos = Photo.query.all()
-        total_photos = len(all_photos)
-        edited_photos = 0
-        total_size = 0
-        recent_uploads = 0
-        
-        for photo in all_photos:
-            if photo.edited_filename is not None:
-                edited_photos += 1
-            if photo.file_size:
-                total_size += photo.file_size
-            if photo.created_at and photo.created_at >= thirty_days_ago:
-                recent_uploads += 1
-        
-        # Most active users - simple approach
-        user_photo_counts = {}
-        for photo in all_photos:
-            user_id = photo.user_id
-            if user_id not in user_photo_counts:
-                user_photo_counts[user_id] = 0
-            user_photo_counts[user_id] += 1
-        
-        # Get top 10 most active users
-        most_active_users = []
-        for user in all_users:
-            photo_count = user_photo_counts.get(user.id, 0)
-            if photo_count > 0:
-                most_active_users.append((user.username, photo_count))
-        
-        # Sort by photo count and take top 10
-        most_active_users.sort(key=lambda x: x[1], reverse=True)
-        most_active_users = most_active_users[:10]
+        # SQL aggregates over the users table and the per-user rollup
+        totals = admin_stats_service.totals()
+        total_photos = totals['photos']['total']
+        edited_photos = totals['photos']['edited']
+        total_size = totals['total_size_bytes']
         
         # Create statistics dictionary
         statistics = {
-            'users': {
-                'total': total_users,
-                'admins': admin_users,
-                'superusers': superusers,
-                'recent': recent_users
-            },
+            'users': totals['users'],
             'photos': {
                 'total': total_photos,
                 'edited': edited_photos,
                 'original_only': total_photos - edited_photos,
-                'recent_uploads': recent_uploads
+                'recent_uploads': totals['photos']['recent_uploads']
             },
             'storage': {
                 'total_bytes': total_size,
@@ -404,11 +299,10 @@ def statistics():
                 'total_gb': round(total_size / (1024 * 1024 * 1024), 2) if total_size > 0 else 0,
                 'avg_file_size_kb': round(total_size / total_photos / 1024, 2) if total_photos > 0 else 0
             },
-            'most_active_users': most_active_users
+            'most_active_users': admin_stats_service.most_active_users()
         }
         
         logger.info(f"Statistics loaded successfully by admin {current_user.username}")
-        print(f"Statistics data: {statistics}")  # Debug output
         
         return render_template('admin/statistics.html', stats=statistics)
     
@@ -1,15 +1,15 @@
 # photovault/routes/admin_export.py
-from flask import Blueprint, request, redirect, url_for, flash, make_response, current_app
+from flask import Blueprint, request, redirect, url_for, flash, current_app, Response, send_file, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import func
 from photovault import db
 from photovault.models import User, Photo
 from datetime import datetime
 import csv
 import io
 import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 import logging
+import tempfile
 
 logger = logging.getLogger(__name__)
 
@@ -35,119 +35,137 @@ def superuser_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@admin_export_bp.route('/export/users/csv')
-@login_required
-@admin_required
-def export_users_csv():
-    """Export all users to CSV file"""
-    users = User.query.order_by(User.created_at.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
+EXPORT_HEADERS = [
+    'ID', 'Username', 'Email', 'Is Admin', 'Is Superuser', 
+    'Created At', 'Last Login', 'Total Photos', 'Edited Photos', 
+    'Storage Used (MB)', 'Account Status'
+]
+
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+# CSV text buffered before it is sent
+CSV_CHUNK_SIZE = 64 * 1024
+
+# XLSX column widths (write-only sheets can't be auto-fitted after the rows are written)
+EXCEL_COLUMN_WIDTHS = [10, 24, 36, 10, 13, 21, 21, 13, 14, 18, 16]
+
+def _export_rows():
+    """
+    Export rows for every user, newest first, from one grouped query
+
+    Photo counters are aggregated per user in a subquery joined to the users,
+    and rows are fetched in batches, so memory stays flat however many users
+    and photos there are.
+    """
+    photo_counts = db.session.query(
+        Photo.user_id.label('user_id'),
+        func.count(Photo.id).label('total_photos'),
+        func.count(Photo.edited_filename).label('edited_photos'),
+        func.coalesce(func.sum(Photo.file_size), 0).label('total_size')
+    ).group_by(Photo.user_id).subquery()
     
-    writer.writerow([
-        'ID', 'Username', 'Email', 'Is Admin', 'Is Superuser', 
-        'Created At', 'Last Login', 'Total Photos', 'Edited Photos', 
-        'Storage Used (MB)', 'Account Status'
-    ])
+    rows = db.session.query(
+        User.id, User.username, User.email, User.is_admin, User.is_superuser, User.created_at,
+        func.coalesce(photo_counts.c.total_photos, 0),
+        func.coalesce(photo_counts.c.edited_photos, 0),
+        func.coalesce(photo_counts.c.total_size, 0)
+    ).outerjoin(photo_counts, photo_counts.c.user_id == User.id).order_by(
+        User.created_at.desc(), User.id.desc()
+    ).yield_per(EXPORT_BATCH_SIZE)
     
-    for user in users:
-        user_photos = Photo.query.filter_by(user_id=user.id).all()
-        total_photos = len(user_photos)
-        edited_photos = sum(1 for photo in user_photos if photo.edited_filename)
-        total_size = sum(photo.file_size or 0 for photo in user_photos)
-        storage_mb = round(total_size / (1024 * 1024), 2) if total_size > 0 else 0
-        
-        writer.writerow([
-            user.id,
-            user.username,
-            user.email,
-            'Yes' if user.is_admin else 'No',
-            'Yes' if user.is_superuser else 'No',
-            user.created_at.strftime('%Y-%m-%d %H:%M:%S') if user.created_at else 'N/A',
-            user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
+    for user_id, username, email, is_admin, is_superuser, created_at, total_photos, edited_photos, total_size in rows:
+        yield [
+            user_id,
+            username,
+            email,
+            'Yes' if is_admin else 'No',
+            'Yes' if is_superuser else 'No',
+            created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else 'N/A',
+            'N/A',  # Logins aren't recorded on User
             total_photos,
             edited_photos,
-            storage_mb,
+            round(int(total_size) / (1024 * 1024), 2) if total_size else 0,
             'Active'
-        ])
+        ]
+
+def _export_filename(extension):
+    return f'photovault_users_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+@admin_export_bp.route('/export/users/csv')
+@login_required
+@admin_required
+def export_users_csv():
+    """Export all users to CSV file, streamed as it is generated"""
+    admin_username = current_user.username
     
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=photovault_users_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    response.headers['Content-Type'] = 'text/csv'
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADERS)
+        count = 0
+        for row in _export_rows():
+            writer.writerow(row)
+            count += 1
+            if buffer.tell() >= CSV_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        logger.info(f"CSV export of {count} users by admin {admin_username}")
     
-    logger.info(f"CSV export of {len(users)} users by admin {current_user.username}")
-    return response
+    return Response(stream_with_context(generate()), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename={_export_filename("csv")}'
+    })
 
 @admin_export_bp.route('/export/users/excel')
 @login_required
 @admin_required
 def export_users_excel():
     """Export all users to Excel file"""
-    users = User.query.order_by(User.created_at.desc()).all()
+    # openpyxl is only needed here - keep it off the boot path
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+    
+    # Write-only mode streams rows to a temporary file instead of keeping cells in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Users")
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Users"
+    for col_num, width in enumerate(EXCEL_COLUMN_WIDTHS, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
     
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(color="FFFFFF", bold=True)
     header_alignment = Alignment(horizontal="center", vertical="center")
     
-    headers = [
-        'ID', 'Username', 'Email', 'Is Admin', 'Is Superuser', 
-        'Created At', 'Last Login', 'Total Photos', 'Edited Photos', 
-        'Storage Used (MB)', 'Account Status'
-    ]
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
+    header_cells = []
+    for header in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
         cell.fill = header_fill
         cell.font = header_font
         cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
     
-    for row_num, user in enumerate(users, 2):
-        user_photos = Photo.query.filter_by(user_id=user.id).all()
-        total_photos = len(user_photos)
-        edited_photos = sum(1 for photo in user_photos if photo.edited_filename)
-        total_size = sum(photo.file_size or 0 for photo in user_photos)
-        storage_mb = round(total_size / (1024 * 1024), 2) if total_size > 0 else 0
-        
-        ws.cell(row=row_num, column=1, value=user.id)
-        ws.cell(row=row_num, column=2, value=user.username)
-        ws.cell(row=row_num, column=3, value=user.email)
-        ws.cell(row=row_num, column=4, value='Yes' if user.is_admin else 'No')
-        ws.cell(row=row_num, column=5, value='Yes' if user.is_superuser else 'No')
-        ws.cell(row=row_num, column=6, value=user.created_at.strftime('%Y-%m-%d %H:%M:%S') if user.created_at else 'N/A')
-        ws.cell(row=row_num, column=7, value=user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never')
-        ws.cell(row=row_num, column=8, value=total_photos)
-        ws.cell(row=row_num, column=9, value=edited_photos)
-        ws.cell(row=row_num, column=10, value=storage_mb)
-        ws.cell(row=row_num, column=11, value='Active')
+    count = 0
+    for row in _export_rows():
+        ws.append(row)
+        count += 1
     
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    output = io.BytesIO()
+    # Spooled to disk; send_file closes (and so deletes) it once the response is sent
+    output = tempfile.TemporaryFile()
     wb.save(output)
     output.seek(0)
     
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=photovault_users_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    logger.info(f"Excel export of {len(users)} users by admin {current_user.username}")
-    return response
+    logger.info(f"Excel export of {count} users by admin {current_user.username}")
+    return send_file(
+        output,
+        as_attachment=True,
+        download_name=_export_filename('xlsx'),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
 
 @admin_export_bp.route('/batch/delete', methods=['POST'])
 @login_required
@@ -1,6 +1,6 @@
 """
 Animation Routes for PhotoVault
-Handles photo animation effects and animated GIF creation
+Handles photo animation effects and animated GIF/WebP/APNG/MP4 creation
 """
 import os
 import logging
@@ -8,6 +8,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from photovault.models import Photo
 from photovault.extensions import db, csrf
+from photovault.utils.rate_limit import rate_limit
+from photovault.utils.animation_output import choose_format, supported_formats
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import random
@@ -18,23 +20,33 @@ logger = logging.getLogger(__name__)
 animation_bp = Blueprint('animation', __name__, url_prefix='/api/animation')
 
 @animation_bp.route('/create-gif', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def create_animated_gif():
     """
-    Create an animated GIF from a photo with various animation effects
+    Create an animation from a photo with various animation effects
+    
+    The output format is the first of `formats` this server can encode, else a
+    type the Accept header lists explicitly (video/mp4, image/webp, image/apng),
+    else GIF.
     
     Request JSON:
         {
             "photo_id": int,
             "animation_type": str,  # kenburns, fadeinout, slideshow, parallax, vintage, living
             "duration": float,      # Duration in seconds
-            "speed": float          # Speed multiplier
+            "speed": float,         # Speed multiplier
+            "formats": [str]        # Optional: formats the client can display, preferred first
+                                    # (mp4, webp, apng, gif); "format" is accepted too
         }
     
     Returns:
         {
             "success": bool,
-            "gif_url": str,
+            "url": str,
+            "gif_url": str,         # Same as url, kept for older clients
+            "format": str,
+            "mimetype": str,
             "filename": str,
             "message": str
         }
@@ -79,11 +91,13 @@ def create_animated_gif():
                 'error': 'Original photo file not found'
             }), 404
         
-        # Generate GIF filename
+        output_format = choose_format(data.get('formats') or data.get('format'), request.accept_mimetypes)
+        
+        # Generate animation filename
         date = datetime.now().strftime('%Y%m%d')
         random_number = random.randint(100000, 999999)
         safe_username = secure_filename(current_user.username)
-        gif_filename = f"{safe_username}.{date}.anim.{animation_type}.{random_number}.gif"
+        gif_filename = f"{safe_username}.{date}.anim.{animation_type}.{random_number}{output_format.extension}"
         
         # Create user folder
         upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
@@ -92,13 +106,13 @@ def create_animated_gif():
         
         gif_path = os.path.join(user_folder, gif_filename)
         
-        logger.info(f"Creating animated GIF for photo {photo_id}: type={animation_type}, duration={duration}, speed={speed}")
+        logger.info(f"Creating {output_format.name} animation for photo {photo_id}: type={animation_type}, duration={duration}, speed={speed}")
         
         # Import animation utility
         from photovault.utils.animation import PhotoAnimator
         animator = PhotoAnimator()
         
-        # Create animated GIF
+        # Create the animation (format follows the file extension)
         try:
             result_path = animator.create_animated_gif(
                 original_path,
@@ -108,24 +122,27 @@ def create_animated_gif():
                 speed=speed
             )
             
-            # Generate URL for the GIF
+            # Generate URL for the animation
             from flask import url_for
             gif_url = url_for('gallery.uploaded_file', 
                             user_id=current_user.id, 
                             filename=gif_filename,
                             _external=False)
             
-            logger.info(f"Animated GIF created successfully: {result_path}")
+            logger.info(f"Animation created successfully: {result_path}")
             
             return jsonify({
                 'success': True,
+                'url': gif_url,
                 'gif_url': gif_url,
+                'format': output_format.name,
+                'mimetype': output_format.mimetype,
                 'filename': gif_filename,
                 'message': f'{animation_type.title()} animation created successfully!'
             }), 200
             
         except Exception as e:
-            logger.error(f"Error creating animated GIF: {str(e)}")
+            logger.error(f"Error creating animation: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': f'Animation creation failed: {str(e)}'
@@ -137,3 +154,14 @@ def create_animated_gif():
             'success': False,
             'error': str(e)
         }), 500
+
+
+@animation_bp.route('/formats', methods=['GET'])
+@login_required
+def animation_formats():
+    """Animation formats this server can encode, preferred (smallest) first"""
+    return jsonify({
+        'success': True,
+        'formats': list(supported_formats()),
+        'default': choose_format().name
+    })
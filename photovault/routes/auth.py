@@ -17,6 +17,7 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from photovault.models import User, PasswordResetToken, db
 from photovault.utils import safe_db_query, retry_db_operation, TransientDBError
 from photovault.extensions import csrf
+from photovault.utils.rate_limit import rate_limit
 import re
 import jwt
 from datetime import datetime, timedelta
@@ -41,6 +42,7 @@ def validate_password(password):
     return True, "Password is valid"
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@rate_limit('login')
 @csrf.exempt
 def login():
     """User login route - handles both web forms and mobile API requests"""
@@ -131,6 +133,7 @@ def login():
     return render_template('login.html')
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@rate_limit('login')
 @csrf.exempt
 def register():
     """User registration route - handles both web forms and mobile API requests"""
@@ -364,6 +367,7 @@ def logout():
         return redirect(url_for('auth.login'))
 
 @auth_bp.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limit('login')
 def forgot_password():
     """Request password reset"""
     if current_user.is_authenticated:
@@ -431,6 +435,7 @@ def forgot_password():
     return render_template('auth/forgot_password.html')
 
 @auth_bp.route('/reset-password/<token>', methods=['GET', 'POST'])
+@rate_limit('login')
 def reset_password(token):
     """Reset password with token"""
     if current_user.is_authenticated:
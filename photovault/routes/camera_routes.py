@@ -11,6 +11,7 @@ from datetime import datetime
 import uuid
 from PIL import Image
 import io
+from photovault.utils.rate_limit import rate_limit
 
 # Create camera blueprint with URL prefix to avoid conflicts
 camera_bp = Blueprint('camera', __name__, url_prefix='/camera')
@@ -24,6 +25,7 @@ def camera():
                          user=current_user)
 
 @camera_bp.route('/upload', methods=['POST'])
+@rate_limit('upload')
 @login_required  
 def upload_image():
     """Handle image uploads from camera capture"""
@@ -93,6 +95,9 @@ def upload_image():
                 photo.upload_source = 'camera'  # Mark as camera capture
                 # Note: quadrant info is preserved in filename and original_name
                 
+                from photovault.services.color_mode_service import color_mode_service
+                color_mode_service.classify_photo(photo)
+                
                 db.session.add(photo)
                 db.session.commit()
                 
@@ -15,7 +15,10 @@ from werkzeug.utils import secure_filename
 from photovault.models import Photo
 from photovault.extensions import db
 from photovault.services.ai_service import get_ai_service
-from photovault.utils.colorization import get_colorizer
+from photovault.services.color_mode_service import color_mode_service
+from photovault.services.edit_stack_service import edit_stack_service
+from photovault.utils.colorization import get_colorizer, COLOR_MODE_GRAYSCALE
+from photovault.utils.rate_limit import rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +26,7 @@ colorization_bp = Blueprint('colorization', __name__, url_prefix='/api/colorizat
 
 
 @colorization_bp.route('/colorize', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def colorize_photo():
     """
@@ -73,81 +77,16 @@ def colorize_photo():
                 'error': 'Original photo file not found'
             }), 404
         
-        # Generate edited filename using username.date.col.randomnumber format
-        from werkzeug.utils import secure_filename as sanitize_name
-        from datetime import datetime
-        from photovault.services.app_storage_service import app_storage
-        import random
-        import io
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)  # 6-digit random number
-        safe_username = sanitize_name(current_user.username)
-        edited_filename = f"{safe_username}.{date}.col.{random_number}.jpg"
-        
-        # Safety check: Ensure edited filename is different from original
-        # This prevents loading the same file twice in comparison view
-        attempts = 0
-        while edited_filename == photo.filename and attempts < 10:
-            random_number = random.randint(100000, 999999)
-            edited_filename = f"{safe_username}.{date}.col.{random_number}.jpg"
-            attempts += 1
-        
-        if edited_filename == photo.filename:
-            logger.error(f"Failed to generate unique edited filename for photo {photo_id}")
-            return jsonify({
-                'success': False,
-                'error': 'Failed to generate unique filename for edited version'
-            }), 500
-        
-        logger.info(f"Colorizing photo {photo_id}: original='{photo.filename}', edited='{edited_filename}'")
-        
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_upload_folder, exist_ok=True)
-        temp_edited_path = os.path.join(user_upload_folder, edited_filename)
-        
-        # Perform colorization (saves to temp local)
-        colorizer = get_colorizer()
-        result_path, method_used = colorizer.colorize_image(
-            original_path,
-            temp_edited_path,
-            method=method
-        )
-        
-        # Upload to App Storage for persistence
-        edited_path = temp_edited_path  # Default to local
-        if app_storage.is_available():
-            with open(temp_edited_path, 'rb') as f:
-                img_bytes = io.BytesIO(f.read())
-                success, storage_path = app_storage.upload_file(img_bytes, edited_filename, str(current_user.id))
-                if success:
-                    edited_path = storage_path
-                    logger.info(f"Colorized photo uploaded to App Storage: {storage_path}")
-                    # Clean up temp file
-                    try:
-                        os.remove(temp_edited_path)
-                    except:
-                        pass
-                else:
-                    logger.warning(f"App Storage upload failed, keeping local: {storage_path}")
-        
-        # Update database with edited version
-        photo.edited_filename = edited_filename
-        photo.edited_path = edited_path
-        photo.enhancement_metadata = {
-            'colorization': {
-                'method': method_used,
-                'timestamp': str(datetime.now())
-            }
-        }
-        db.session.commit()
+        # Record the edit; the colorized version is rendered from the original when first viewed
+        method_used = get_colorizer().resolve_method(method)
+        edit_stack_service.push(photo, 'colorize', {'method': method_used})
         
         logger.info(f"Photo {photo_id} colorized successfully using {method_used}")
         
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'edited_url': f'/uploads/{current_user.id}/{edited_filename}',
+            'edited_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
             'method': method_used,
             'message': f'Photo colorized successfully using {method_used} method'
         })
@@ -162,6 +101,7 @@ def colorize_photo():
 
 
 @colorization_bp.route('/colorize-ai', methods=['POST'])
+@rate_limit('ai')
 @login_required
 def colorize_photo_ai():
     """
@@ -219,83 +159,21 @@ def colorize_photo_ai():
                 'error': 'Original photo file not found'
             }), 404
         
-        # Generate edited filename using username.date.col.randomnumber format
-        from werkzeug.utils import secure_filename as sanitize_name
-        from datetime import datetime
-        from photovault.services.app_storage_service import app_storage
-        import random
-        import io
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)  # 6-digit random number
-        safe_username = sanitize_name(current_user.username)
-        edited_filename = f"{safe_username}.{date}.col.{random_number}.jpg"
-        
-        # Safety check: Ensure edited filename is different from original
-        # This prevents loading the same file twice in comparison view
-        attempts = 0
-        while edited_filename == photo.filename and attempts < 10:
-            random_number = random.randint(100000, 999999)
-            edited_filename = f"{safe_username}.{date}.col.{random_number}.jpg"
-            attempts += 1
-        
-        if edited_filename == photo.filename:
-            logger.error(f"Failed to generate unique edited filename for photo {photo_id}")
-            return jsonify({
-                'success': False,
-                'error': 'Failed to generate unique filename for edited version'
-            }), 500
-        
-        logger.info(f"Colorizing photo {photo_id}: original='{photo.filename}', edited='{edited_filename}'")
-        
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_upload_folder, exist_ok=True)
-        temp_edited_path = os.path.join(user_upload_folder, edited_filename)
-        
-        # Perform AI colorization (saves to temp local)
-        result_path, metadata = ai_service.colorize_image_ai(
-            original_path,
-            temp_edited_path
-        )
-        
-        # Upload to App Storage for persistence
-        edited_path = temp_edited_path  # Default to local
-        if app_storage.is_available():
-            with open(temp_edited_path, 'rb') as f:
-                img_bytes = io.BytesIO(f.read())
-                success, storage_path = app_storage.upload_file(img_bytes, edited_filename, str(current_user.id))
-                if success:
-                    edited_path = storage_path
-                    logger.info(f"AI colorized photo uploaded to App Storage: {storage_path}")
-                    # Clean up temp file
-                    try:
-                        os.remove(temp_edited_path)
-                    except:
-                        pass
-                else:
-                    logger.warning(f"App Storage upload failed, keeping local: {storage_path}")
-        
-        # Update database with edited version
-        photo.edited_filename = edited_filename
-        photo.edited_path = edited_path
-        photo.enhancement_metadata = {
-            'colorization': {
-                'method': metadata['method'],
-                'ai_guidance': metadata['ai_guidance'],
-                'model': metadata['model'],
-                'timestamp': str(datetime.now())
-            }
-        }
-        db.session.commit()
+        # AI guidance only; the pixels come from the same colorizer, rendered when first viewed
+        with open(original_path, 'rb') as f:
+            guidance = ai_service.colorization_guidance(f.read())
+        method_used = get_colorizer().resolve_method('auto')
+        edit_stack_service.push(photo, 'colorize', {'method': method_used},
+                                info={'method': 'ai_guided_' + method_used, **guidance})
         
         logger.info(f"Photo {photo_id} AI-colorized successfully")
         
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'edited_url': f'/uploads/{current_user.id}/{edited_filename}',
-            'ai_guidance': metadata['ai_guidance'],
-            'method': metadata['method'],
+            'edited_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
+            'ai_guidance': guidance['ai_guidance'],
+            'method': 'ai_guided_' + method_used,
             'message': 'Photo colorized successfully using AI'
         })
         
@@ -309,6 +187,7 @@ def colorize_photo_ai():
 
 
 @colorization_bp.route('/enhance', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def enhance_photo():
     """
@@ -330,7 +209,6 @@ def enhance_photo():
     """
     try:
         from photovault.utils.image_enhancement import enhancer
-        import random
         
         data = request.get_json()
         
@@ -361,44 +239,16 @@ def enhance_photo():
                 'error': 'Original photo file not found'
             }), 404
         
-        # Generate enhanced filename
-        from werkzeug.utils import secure_filename as sanitize_name
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)
-        safe_username = sanitize_name(current_user.username)
-        enhanced_filename = f"{safe_username}.{date}.enh.{random_number}.jpg"
-        
-        logger.info(f"Enhancing photo {photo_id}: original='{photo.filename}', enhanced='{enhanced_filename}'")
-        
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_upload_folder, exist_ok=True)
-        enhanced_filepath = os.path.join(user_upload_folder, enhanced_filename)
-        
-        # Apply enhancements
-        output_path, applied_settings = enhancer.auto_enhance_photo(
-            original_path,
-            enhanced_filepath,
-            settings
-        )
-        
-        # Update database with enhanced version
-        photo.edited_filename = enhanced_filename
-        photo.edited_path = enhanced_filepath
-        photo.enhancement_metadata = {
-            'enhancement': {
-                'settings': applied_settings,
-                'timestamp': str(datetime.now())
-            }
-        }
-        db.session.commit()
+        # Record the edit; the enhanced version is rendered from the original when first viewed
+        applied_settings = {**enhancer.default_settings, **settings}
+        edit_stack_service.push(photo, 'enhance', applied_settings)
         
         logger.info(f"Photo {photo_id} enhanced successfully")
         
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'enhanced_url': f'/uploads/{current_user.id}/{enhanced_filename}',
+            'enhanced_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
             'settings_applied': applied_settings,
             'message': 'Photo enhanced successfully'
         })
@@ -413,6 +263,7 @@ def enhance_photo():
 
 
 @colorization_bp.route('/sharpen', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def sharpen_photo():
     """
@@ -436,9 +287,6 @@ def sharpen_photo():
         }
     """
     try:
-        from photovault.utils.image_enhancement import enhancer
-        import random
-        
         data = request.get_json()
         
         if not data or 'photo_id' not in data:
@@ -471,55 +319,72 @@ def sharpen_photo():
                 'error': 'Original photo file not found'
             }), 404
         
-        # Generate sharpened filename
-        from werkzeug.utils import secure_filename as sanitize_name
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)
-        safe_username = sanitize_name(current_user.username)
-        sharpened_filename = f"{safe_username}.{date}.sharp.{random_number}.jpg"
-        
-        logger.info(f"Sharpening photo {photo_id}: original='{photo.filename}', sharpened='{sharpened_filename}'")
+        # Record the edit; the sharpened version is rendered from the original when first viewed
+        edit_stack_service.push(photo, 'sharpen', {
+            'radius': float(radius),
+            'amount': float(amount),
+            'threshold': int(threshold),
+            'method': method
+        })
         
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_upload_folder, exist_ok=True)
-        sharpened_filepath = os.path.join(user_upload_folder, sharpened_filename)
+        logger.info(f"Photo {photo_id} sharpened successfully")
         
-        # Apply sharpening
-        output_path = enhancer.sharpen_image(
-            original_path,
-            sharpened_filepath,
-            radius=radius,
-            amount=amount,
-            threshold=threshold,
-            method=method
-        )
+        return jsonify({
+            'success': True,
+            'photo_id': photo.id,
+            'enhanced_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
+            'message': 'Photo sharpened successfully'
+        })
         
-        # Update database with sharpened version
-        photo.edited_filename = sharpened_filename
-        photo.edited_path = sharpened_filepath
-        photo.enhancement_metadata = {
-            'sharpening': {
-                'radius': radius,
-                'amount': amount,
-                'threshold': threshold,
-                'method': method,
-                'timestamp': str(datetime.now())
-            }
+    except Exception as e:
+        logger.error(f"Sharpening failed: {e}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@colorization_bp.route('/edits/<int:photo_id>', methods=['GET', 'DELETE'])
+@colorization_bp.route('/edits/<int:photo_id>/<any(undo, redo):action>', methods=['POST'])
+@login_required
+def photo_edits(photo_id, action=None):
+    """
+    A photo's edit history; POST .../undo or .../redo steps through it and
+    DELETE drops every edit, going back to the original
+    
+    Returns:
+        {
+            "success": bool,
+            "photo_id": int,
+            "edits": {"operations": [...], "applied": int, "can_undo": bool,
+                      "can_redo": bool, "edited_url": str}
         }
-        db.session.commit()
+    """
+    try:
+        photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
         
-        logger.info(f"Photo {photo_id} sharpened successfully")
+        if not photo:
+            return jsonify({
+                'success': False,
+                'error': 'Photo not found or unauthorized'
+            }), 404
+        
+        if action == 'undo' and not edit_stack_service.undo(photo):
+            return jsonify({'success': False, 'error': 'Nothing to undo'}), 400
+        if action == 'redo' and not edit_stack_service.redo(photo):
+            return jsonify({'success': False, 'error': 'Nothing to redo'}), 400
+        if request.method == 'DELETE':
+            edit_stack_service.revert(photo)
         
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'enhanced_url': f'/uploads/{current_user.id}/{sharpened_filename}',
-            'message': 'Photo sharpened successfully'
+            'edits': edit_stack_service.describe(photo)
         })
         
     except Exception as e:
-        logger.error(f"Sharpening failed: {e}")
+        logger.error(f"Edit history request failed: {e}")
         db.session.rollback()
         return jsonify({
             'success': False,
@@ -528,6 +393,7 @@ def sharpen_photo():
 
 
 @colorization_bp.route('/enhance-analyze', methods=['POST'])
+@rate_limit('ai')
 @login_required
 def analyze_enhancement():
     """
@@ -607,6 +473,7 @@ def analyze_enhancement():
 
 
 @colorization_bp.route('/analyze', methods=['POST'])
+@rate_limit('ai')
 @login_required
 def analyze_photo():
     """
@@ -702,7 +569,8 @@ def check_grayscale():
         {
             "success": bool,
             "photo_id": int,
-            "is_grayscale": bool
+            "is_grayscale": bool,
+            "color_mode": str  # 'grayscale', 'sepia' or 'color'
         }
     """
     try:
@@ -725,23 +593,19 @@ def check_grayscale():
                 'error': 'Photo not found or unauthorized'
             }), 404
         
-        # Get file path
-        photo_path = photo.file_path
-        
-        if not os.path.exists(photo_path):
+        # Stored at ingest; legacy rows are classified once on first check
+        color_mode = color_mode_service.get_color_mode(photo)
+        if color_mode is None:
             return jsonify({
                 'success': False,
                 'error': 'Photo file not found'
             }), 404
         
-        # Check if grayscale
-        colorizer = get_colorizer()
-        is_grayscale = colorizer.is_grayscale(photo_path)
-        
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'is_grayscale': is_grayscale
+            'is_grayscale': color_mode == COLOR_MODE_GRAYSCALE,
+            'color_mode': color_mode
         })
         
     except Exception as e:
@@ -755,6 +619,7 @@ def check_grayscale():
 
 
 @colorization_bp.route('/animate', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def animate_photo():
     """
@@ -17,6 +17,7 @@ from photovault.forms import (
 )
 from photovault.services.montage_service import create_montage
 from photovault.utils.enhanced_file_handler import delete_file_enhanced
+from photovault.utils.rate_limit import rate_limit
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -629,6 +630,7 @@ def create_montage_ui(vault_id):
                          vault_photos=vault_photos)
 
 @family_bp.route('/vault/<int:vault_id>/montage', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def create_montage_process(vault_id):
     """Process montage creation"""
@@ -664,14 +666,9 @@ def create_montage_process(vault_id):
         if len(vault_photos) < 2:
             return jsonify({'success': False, 'error': 'Selected photos not found'}), 400
         
-        # Build photo paths
-        photo_paths = []
-        for vault_photo in vault_photos:
-            photo_paths.append(vault_photo.photo.file_path)
-        
-        # Create montage
+        # Create montage (from the photos' thumbnails where they are large enough)
         success, file_path, applied_settings = create_montage(
-            photo_paths, settings, current_user.id
+            [vault_photo.photo for vault_photo in vault_photos], settings, current_user.id
         )
         
         if not success:
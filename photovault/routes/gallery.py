@@ -2,19 +2,31 @@
 PhotoVault Gallery Routes
 Simple gallery blueprint for photo management
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory, send_file, abort, current_app, Response, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory, send_file, abort, current_app, Response, jsonify, g
 from flask_login import login_required, current_user
 from photovault.extensions import db
+import io
 import os
 import zipfile
 import tempfile
 import time
-from photovault.utils.enhanced_file_handler import get_file_content, file_exists_enhanced
+from photovault.utils.enhanced_file_handler import open_file_stream
+from photovault.utils.storage_paths import (
+    VARIANT_COLUMNS, IMAGE_EXTENSIONS, location_of, location_keys, open_location, fetch_locations
+)
 from photovault.utils.jwt_auth import hybrid_auth
+from photovault.services.edit_stack_service import edit_stack_service
+from photovault.utils.animation_output import ANIMATION_FORMATS, format_for_path
+from photovault.utils.http_caching import PRIVATE_IMMUTABLE
+from photovault.utils.cache import cache
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
 
 # Create the gallery blueprint
 gallery_bp = Blueprint('gallery', __name__)
 
+ANIMATION_EXTENSIONS = tuple(f.extension for f in ANIMATION_FORMATS.values())
+
 @gallery_bp.route('/gallery')
 @login_required
 def gallery():
@@ -32,32 +44,22 @@ def gallery_photos():
 def dashboard():
     """Gallery dashboard"""
     try:
-        from photovault.models import Photo, UserSubscription
-        from sqlalchemy import func
+        from photovault.models import Photo
+        from photovault.services.usage_service import usage_service
         
         photos = Photo.query.filter_by(user_id=current_user.id).order_by(Photo.created_at.desc()).limit(12).all()
-        total_photos = Photo.query.filter_by(user_id=current_user.id).count()
         
-        # Count edited photos (photos with edited_filename)
-        edited_photos = Photo.query.filter_by(user_id=current_user.id).filter(Photo.edited_filename.isnot(None)).count()
-        
-        # Count original photos (photos without edited_filename)
-        original_photos = Photo.query.filter_by(user_id=current_user.id).filter(Photo.edited_filename.is_(None)).count()
+        # Counters and plan limits come from the shared cache
+        photo_stats = usage_service.photo_stats(current_user.id)
+        total_photos = photo_stats['total_photos']
+        edited_photos = photo_stats['edited_photos']
+        original_photos = photo_stats['original_photos']
         
         # Calculate total storage used in MB
-        total_storage_bytes = db.session.query(func.sum(Photo.file_size)).filter_by(user_id=current_user.id).scalar() or 0
-        storage_used_mb = round(total_storage_bytes / (1024 * 1024), 2)
-        
-        # Get storage limit from user's active subscription
-        active_subscription = UserSubscription.query.filter_by(
-            user_id=current_user.id,
-            status='active'
-        ).first()
+        storage_used_mb = round(photo_stats['total_size_bytes'] / (1024 * 1024), 2)
         
-        if active_subscription and active_subscription.plan:
-            storage_limit_mb = active_subscription.plan.storage_gb * 1024
-        else:
-            storage_limit_mb = 100  # Default 100 MB for users without subscription
+        # Storage limit from user's active subscription (100 MB without one)
+        storage_limit_mb = usage_service.storage_limit_mb(current_user.id)
         
         storage_percent = (storage_used_mb / storage_limit_mb * 100) if storage_limit_mb > 0 else 0
         
@@ -86,6 +88,7 @@ def photos():
     """All photos page with optional colorization filter"""
     try:
         from photovault.models import Photo
+        from photovault.services.color_mode_service import color_mode_service
         page = request.args.get('page', 1, type=int)
         filter_type = request.args.get('filter', 'all')
         
@@ -95,13 +98,14 @@ def photos():
         # Apply colorization filter
         if filter_type == 'dnn':
             # Photos colorized with DNN method
-            query = query.filter(Photo.enhancement_metadata['colorization']['method'].astext == 'dnn')
+            query = query.filter(color_mode_service.colorized_filter('dnn'))
         elif filter_type == 'ai':
             # Photos colorized with AI method
-            query = query.filter(Photo.enhancement_metadata['colorization']['method'].astext == 'ai_guided_dnn')
+            query = query.filter(color_mode_service.colorized_filter('ai_guided_dnn'))
         elif filter_type == 'uncolorized':
-            # Photos without colorization
-            query = query.filter(Photo.enhancement_metadata.is_(None))
+            # Black and white / sepia photos without colorization
+            color_mode_service.backfill_user_photos(current_user.id)
+            query = query.filter(color_mode_service.uncolorized_filter())
         # else: show all photos (filter_type == 'all' or any other value)
         
         photos = query.order_by(Photo.created_at.desc())\
@@ -149,22 +153,12 @@ def view_photo(photo_id):
 def delete_photo(photo_id):
     """Delete a photo"""
     try:
-        from photovault.models import Photo
-        from photovault import db
-        
-        photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first_or_404()
+        from photovault.services.photo_deletion_service import photo_deletion_service
         
-        # Delete file from disk
-        if os.path.exists(photo.file_path):
-            os.remove(photo.file_path)
-        
-        # Delete thumbnail if exists
-        if photo.thumbnail_path and os.path.exists(photo.thumbnail_path):
-            os.remove(photo.thumbnail_path)
-        
-        # Delete from database
-        db.session.delete(photo)
-        db.session.commit()
+        # Files are reclaimed from their stored locations by the background reaper
+        result = photo_deletion_service.bulk_delete(current_user.id, [photo_id])
+        if not result['deleted_ids']:
+            abort(404)
         
         flash('Photo deleted successfully.', 'success')
     except Exception as e:
@@ -251,6 +245,167 @@ def file_diagnostics():
     
     return render_template('debug/file_diagnostics.html')
 
+# Vault-share access decisions for uploaded_file, keyed (viewer, owner, filename).
+# Cleared whenever vault sharing or membership changes
+_vault_access = cache.namespace('vault_access', ttl=300)
+
+
+def _shared_with_viewer(viewer_id, owner_id, filename):
+    """Whether owner's file is shared in a family vault where viewer is an active member"""
+    try:
+        from photovault.models import Photo, VaultPhoto, FamilyMember
+        
+        # Find the photo being requested
+        original_filename = filename
+        if filename.endswith('_thumb.jpg') or filename.endswith('_thumb.png') or filename.endswith('_thumb.jpeg'):
+            base_name = filename.rsplit('_thumb.', 1)[0]
+            for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
+                potential_original = base_name + ext
+                test_photo = Photo.query.filter_by(user_id=owner_id).filter(
+                    (Photo.filename == potential_original) | (Photo.edited_filename == potential_original)
+                ).first()
+                if test_photo:
+                    original_filename = potential_original
+                    break
+        
+        # Find the photo record
+        photo = Photo.query.filter_by(user_id=owner_id).filter(
+            (Photo.filename == original_filename) | (Photo.edited_filename == original_filename)
+        ).first()
+        
+        if not photo:
+            return False
+        
+        # Check if this photo is shared in any family vault where the viewer is a member
+        shared_in_vault = db.session.query(VaultPhoto).join(FamilyMember, VaultPhoto.vault_id == FamilyMember.vault_id).filter(
+            VaultPhoto.photo_id == photo.id,
+            FamilyMember.user_id == viewer_id,
+            FamilyMember.status == 'active'
+        ).first()
+        return shared_in_vault is not None
+    except Exception:
+        # If there's any error in the vault check, deny access for security
+        return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_vault_access_changes(session, flush_context):
+    from photovault.models import Photo, VaultPhoto, FamilyMember, FamilyVault
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (VaultPhoto, FamilyMember, FamilyVault)) or (
+                isinstance(obj, Photo) and obj in session.deleted):
+            session.info['vault_access_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_vault_access(session):
+    if session.info.pop('vault_access_changed', False):
+        _vault_access.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_vault_access_changes(session):
+    session.info.pop('vault_access_changed', None)
+
+
+def _stream_response(stream, filename, mimetype=None):
+    """Uncached inline response streaming an open file"""
+    import mimetypes
+    response = send_file(
+        stream,
+        mimetype=mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        download_name=filename
+    )
+    try:
+        response.content_length = os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass  # Remote streams without a file descriptor are sent chunked
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+    response.headers['Pragma'] = 'no-cache'
+    response.headers['Expires'] = '0'
+    return response
+
+def _stored_file_response(storage_path, filename, mimetype=None):
+    """
+    Stream a stored file with one storage request (no separate existence check)
+
+    Returns:
+        Response, or None if the file doesn't exist
+    """
+    stream = open_file_stream(storage_path)
+    if stream is None:
+        return None
+    return _stream_response(stream, filename, mimetype)
+
+def _is_animation_file(filename):
+    return '.anim.' in filename and filename.lower().endswith(ANIMATION_EXTENSIONS)
+
+def _animation_response(user_id, filename):
+    """
+    Serve a generated animation (GIF, WebP, APNG or MP4)
+    
+    Animation filenames are random and never rewritten, so browsers may keep
+    them; local files get ETag and Range support (MP4 players seek with Range).
+    """
+    mimetype = format_for_path(filename).mimetype
+    
+    # Try App Storage first, then the local upload folder
+    stream = open_file_stream(f"users/{user_id}/{filename}")
+    if stream is not None:
+        g.cache_policy = PRIVATE_IMMUTABLE
+        return _stream_response(stream, filename, mimetype)
+    
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
+    animation_path = os.path.join(upload_folder, str(user_id), filename)
+    if os.path.exists(animation_path):
+        g.cache_policy = PRIVATE_IMMUTABLE
+        return send_file(animation_path, mimetype=mimetype, conditional=True, etag=True)
+    
+    current_app.logger.error(f"Animation file not found: {animation_path}")
+    return send_file('static/img/placeholder.png', mimetype='image/png')
+
+def _photo_file_location(user_id, filename):
+    """
+    Find the photo a served file belongs to and where that file is stored
+
+    Matches the indexed location keys; rows without a stored location are
+    matched by filename. Only the database is consulted.
+
+    Returns:
+        (photo, StorageLocation), or (None, None) if no photo owns the file
+    """
+    from photovault.models import Photo
+    
+    keys = location_keys(user_id, filename)
+    photo = Photo.query.filter(
+        Photo.user_id == user_id,
+        or_(Photo.storage_key.in_(keys), Photo.edited_key.in_(keys), Photo.thumbnail_key.in_(keys))
+    ).first()
+    if photo:
+        for variant in VARIANT_COLUMNS:
+            location = location_of(photo, variant)
+            if location and location.key in keys:
+                return photo, location
+    
+    # Thumbnails are named after their original: <name>_thumb.<ext>
+    names = [filename]
+    if '_thumb.' in filename:
+        base_name = filename.rsplit('_thumb.', 1)[0]
+        names.extend(base_name + ext for ext in IMAGE_EXTENSIONS)
+    photo = Photo.query.filter(
+        Photo.user_id == user_id,
+        or_(Photo.filename.in_(names), Photo.edited_filename.in_(names))
+    ).first()
+    if not photo:
+        return None, None
+    
+    location = location_of(photo, 'edited' if photo.edited_filename in names else 'original')
+    if location and location.filename != filename:
+        # Derivatives that aren't recorded on the row sit beside the original
+        location = location.sibling(filename)
+    return photo, location
+
 @gallery_bp.route('/uploads/<int:user_id>/<path:filename>')
 @hybrid_auth
 def uploaded_file(current_user, user_id, filename):
@@ -264,122 +419,21 @@ def uploaded_file(current_user, user_id, filename):
     
     # If not the owner or admin, check if photo is shared in a family vault where user is a member
     if not access_allowed:
-        try:
-            from photovault.models import Photo, VaultPhoto, FamilyMember
-            
-            # Find the photo being requested
-            original_filename = filename
-            if filename.endswith('_thumb.jpg') or filename.endswith('_thumb.png') or filename.endswith('_thumb.jpeg'):
-                base_name = filename.rsplit('_thumb.', 1)[0]
-                for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                    potential_original = base_name + ext
-                    test_photo = Photo.query.filter_by(user_id=user_id).filter(
-                        (Photo.filename == potential_original) | (Photo.edited_filename == potential_original)
-                    ).first()
-                    if test_photo:
-                        original_filename = potential_original
-                        break
-            
-            # Find the photo record
-            photo = Photo.query.filter_by(user_id=user_id).filter(
-                (Photo.filename == original_filename) | (Photo.edited_filename == original_filename)
-            ).first()
-            
-            if photo:
-                # Check if this photo is shared in any family vault where current user is a member
-                shared_in_vault = db.session.query(VaultPhoto).join(FamilyMember, VaultPhoto.vault_id == FamilyMember.vault_id).filter(
-                    VaultPhoto.photo_id == photo.id,
-                    FamilyMember.user_id == current_user.id,
-                    FamilyMember.status == 'active'
-                ).first()
-                
-                if shared_in_vault:
-                    access_allowed = True
-        except Exception as e:
-            # If there's any error in the vault check, deny access for security
-            pass
+        access_allowed = _vault_access.get_or_set(
+            (current_user.id, user_id, filename),
+            lambda: _shared_with_viewer(current_user.id, user_id, filename)
+        )
     
     if not access_allowed:
         abort(403)
     
-    # Verify the file exists and belongs to the user
     try:
-        from photovault.models import Photo
-        
-        # Handle thumbnail files by checking for original file
-        original_filename = filename
-        is_thumbnail_request = filename.endswith('_thumb.jpg') or filename.endswith('_thumb.png') or filename.endswith('_thumb.jpeg')
-        
-        if is_thumbnail_request:
-            # Extract original filename by removing _thumb suffix
-            base_name = filename.rsplit('_thumb.', 1)[0]
-            
-            # First try to find by checking App Storage paths
-            for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                potential_original = base_name + ext
-                app_storage_original = f"users/{user_id}/{potential_original}"
-                if file_exists_enhanced(app_storage_original):
-                    original_filename = potential_original
-                    break
-            else:
-                # Fallback to checking local filesystem
-                for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                    if os.path.exists(os.path.join(current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads'), str(user_id), base_name + ext)):
-                        original_filename = base_name + ext
-                        break
-                else:
-                    # If original file not found for thumbnail, return placeholder
-                    current_app.logger.warning(f"Thumbnail requested for missing original file: {filename}")
-                    return redirect(url_for('static', filename='img/placeholder.png'))
-        
-        photo = Photo.query.filter_by(user_id=user_id).filter(
-            (Photo.filename == original_filename) | (Photo.edited_filename == original_filename)
-        ).first()
-        
-        # Check if this is a profile picture/avatar (not a photo)
-        is_avatar = filename.startswith('avatar_')
-        
-        # Check if this is an animated GIF (not stored in Photo table)
-        is_animated_gif = '.anim.' in filename and filename.endswith('.gif')
-        
-        # Handle animated GIFs separately - they're derivative files not in Photo table
-        if is_animated_gif:
-            current_app.logger.info(f"Serving animated GIF for user {user_id}: {filename}")
-            
-            # Try to serve animated GIF from App Storage first
-            app_storage_path = f"users/{user_id}/{filename}"
-            
-            if file_exists_enhanced(app_storage_path):
-                success, file_content = get_file_content(app_storage_path)
-                if success:
-                    return Response(
-                        file_content,
-                        mimetype='image/gif',
-                        headers={
-                            'Content-Disposition': f'inline; filename="{filename}"',
-                            'Cache-Control': 'no-cache, no-store, must-revalidate, max-age=0',
-                            'Pragma': 'no-cache',
-                            'Expires': '0'
-                        }
-                    )
-            
-            # Fallback to local filesystem for animated GIF
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-            gif_path = os.path.join(upload_folder, str(user_id), filename)
-            
-            if os.path.exists(gif_path):
-                current_app.logger.info(f"Serving animated GIF from local storage: {gif_path}")
-                response = send_file(gif_path, mimetype='image/gif')
-                response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-                response.headers['Pragma'] = 'no-cache'
-                response.headers['Expires'] = '0'
-                return response
-            else:
-                current_app.logger.error(f"Animated GIF file not found: {gif_path}")
-                return send_file('static/img/placeholder.png', mimetype='image/png')
+        # Animations are derivative files not in the Photo table
+        if _is_animation_file(filename):
+            return _animation_response(user_id, filename)
         
         # Handle avatars separately - they're not in Photo table, they're in User table
-        if is_avatar:
+        if filename.startswith('avatar_'):
             from photovault.models import User
             user = User.query.get(user_id)
             # Safe check for profile_picture attribute (may not exist in older database schemas)
@@ -392,21 +446,9 @@ def uploaded_file(current_user, user_id, filename):
             # Try to serve avatar from App Storage first
             app_storage_path = f"users/{user_id}/{filename}"
             
-            if file_exists_enhanced(app_storage_path):
-                success, file_content = get_file_content(app_storage_path)
-                if success:
-                    import mimetypes
-                    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-                    return Response(
-                        file_content,
-                        mimetype=content_type,
-                        headers={
-                            'Content-Disposition': f'inline; filename="{filename}"',
-                            'Cache-Control': 'no-cache, no-store, must-revalidate, max-age=0',
-                            'Pragma': 'no-cache',
-                            'Expires': '0'
-                        }
-                    )
+            response = _stored_file_response(app_storage_path, filename)
+            if response is not None:
+                return response
             
             # Fallback to local filesystem for avatar
             upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
@@ -423,212 +465,28 @@ def uploaded_file(current_user, user_id, filename):
                 current_app.logger.error(f"Avatar file not found: {avatar_path}")
                 return send_file('static/img/placeholder.png', mimetype='image/png')
         
-        # For regular photos (not avatars), photo record must exist
-        if not photo:
+        # Photos are served straight from their stored location - no probing
+        is_thumbnail_request = filename.endswith(('_thumb.jpg', '_thumb.png', '_thumb.jpeg'))
+        photo, location = _photo_file_location(user_id, filename)
+        
+        if not photo or not location:
             if is_thumbnail_request:
                 current_app.logger.warning(f"Photo record not found for thumbnail: {filename}")
                 return redirect(url_for('static', filename='img/placeholder.png'))
-            else:
-                abort(404)
-        
-        # Try to serve from App Storage first, then fallback to local filesystem
-        
-        # Check if this is likely an App Storage path (based on how we store photos)
-        app_storage_path = f"users/{user_id}/{filename}"
-        
-        if file_exists_enhanced(app_storage_path):
-            # Serve from App Storage
-            success, file_content = get_file_content(app_storage_path)
-            if success:
-                # Determine content type
-                import mimetypes
-                content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-                
-                return Response(
-                    file_content,
-                    mimetype=content_type,
-                    headers={
-                        'Content-Disposition': f'inline; filename="{filename}"',
-                        'Cache-Control': 'no-cache, no-store, must-revalidate, max-age=0',
-                        'Pragma': 'no-cache',
-                        'Expires': '0'
-                    }
-                )
-            else:
-                # App Storage exists check passed but download failed
-                current_app.logger.error(f"App Storage download failed for {app_storage_path}: {file_content}")
-                # If it's a thumbnail request, serve placeholder instead of 404
-                if is_thumbnail_request:
-                    current_app.logger.warning(f"Serving placeholder for failed thumbnail: {filename}")
-                    return redirect(url_for('static', filename='img/placeholder.png'))
-                abort(404)
-        
-        # Fallback to local filesystem
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        
-        # Handle both /data/ and /data/uploads/ configurations
-        # Check if files exist in uploads subdirectory
-        uploads_with_subdir = os.path.join(upload_folder, 'uploads', str(user_id))
-        uploads_dir = os.path.join(upload_folder, str(user_id))
-        
-        # Use the one that exists, prefer the direct path
-        if os.path.exists(uploads_with_subdir) and not os.path.exists(uploads_dir):
-            uploads_dir = uploads_with_subdir
-            current_app.logger.info(f"Using uploads subdirectory: {uploads_dir}")
-        
-        # IMPORTANT: Serve the exact filename requested
-        # Original files should always be in the canonical location: uploads_dir/filename
-        # Edited files use edited_path
-        
-        file_to_serve = None
-        
-        if photo.filename == filename:
-            # User requested the original - construct canonical path
-            file_to_serve = os.path.join(uploads_dir, filename)
-            
-            # If not found in canonical location, try fallback locations for legacy data
-            # BUT reject any fallback that points to the edited file
-            if not os.path.exists(file_to_serve) and photo.file_path:
-                file_path = photo.file_path
-                fallback_path = None
-                
-                if os.path.isabs(file_path):
-                    # Try absolute path first
-                    if os.path.exists(file_path):
-                        fallback_path = file_path
-                    else:
-                        # Remap old absolute paths (e.g., /data/uploads/1/file.jpg) to current UPLOAD_FOLDER
-                        path_parts = file_path.split('/')
-                        for i, part in enumerate(path_parts):
-                            if part.isdigit() and i + 1 < len(path_parts):
-                                extracted_user_id = part
-                                remaining_path = '/'.join(path_parts[i+1:])
-                                remapped_path = os.path.join(upload_folder, extracted_user_id, remaining_path)
-                                if os.path.exists(remapped_path):
-                                    fallback_path = remapped_path
-                                    current_app.logger.info(f"Remapped {file_path} to {remapped_path}")
-                                    break
-                elif file_path.startswith(upload_folder + '/'):
-                    fallback_path = file_path
-                elif file_path.startswith('uploads/') or file_path.startswith('users/'):
-                    path_parts = file_path.split('/', 1)
-                    if len(path_parts) > 1:
-                        fallback_path = os.path.join(upload_folder, path_parts[1])
-                elif '/' in file_path and file_path.split('/')[0].isdigit():
-                    fallback_path = os.path.join(upload_folder, file_path)
-                else:
-                    # Relative path within user directory
-                    fallback_path = os.path.join(uploads_dir, file_path)
-                
-                # Only use fallback if it exists AND doesn't match the edited filename
-                if fallback_path and os.path.exists(fallback_path):
-                    # Reject if this path points to the edited file
-                    fallback_basename = os.path.basename(fallback_path)
-                    if not (photo.edited_filename and fallback_basename == photo.edited_filename):
-                        file_to_serve = fallback_path
-                            
-        elif photo.edited_filename == filename:
-            # User requested the edited version
-            file_to_serve = os.path.join(uploads_dir, filename)
-            
-            # If not found, try edited_path if available
-            if not os.path.exists(file_to_serve) and hasattr(photo, 'edited_path') and photo.edited_path:
-                edited_path = photo.edited_path
-                if os.path.isabs(edited_path):
-                    file_to_serve = edited_path
-                elif edited_path.startswith('uploads/') or edited_path.startswith('users/'):
-                    path_parts = edited_path.split('/', 1)
-                    if len(path_parts) > 1:
-                        file_to_serve = os.path.join(upload_folder, path_parts[1])
-                    else:
-                        file_to_serve = os.path.join(uploads_dir, edited_path)
-                else:
-                    file_to_serve = os.path.join(uploads_dir, edited_path)
-        else:
-            # Unknown filename - try uploads directory
-            file_to_serve = os.path.join(uploads_dir, filename)
-        
-        # Check if file is in object storage first (profile pictures)
-        if photo.file_path and (photo.file_path.startswith('users/') or photo.file_path.startswith('uploads/')):
-            try:
-                from photovault.services.app_storage_service import app_storage
-                import io
-                
-                success, file_bytes = app_storage.download_file(photo.file_path)
-                if success:
-                    current_app.logger.info(f"Serving file from object storage: {photo.file_path}")
-                    response = send_file(
-                        io.BytesIO(file_bytes),
-                        mimetype=f'image/{filename.rsplit(".", 1)[-1] if "." in filename else "jpeg"}'
-                    )
-                    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-                    response.headers['Pragma'] = 'no-cache'
-                    response.headers['Expires'] = '0'
-                    return response
-            except Exception as storage_err:
-                current_app.logger.warning(f"Object storage download failed: {storage_err}")
-        
-        if file_to_serve and os.path.exists(file_to_serve):
-            response = send_file(file_to_serve)
-            # Add cache control headers to prevent stale image caching
-            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-            return response
-        else:
-            # Try additional fallback locations before serving placeholder
-            fallback_locations = []
-            
-            # Fallback 1: Try the exact file_path from database (absolute or relative)
-            if photo.file_path:
-                if os.path.isabs(photo.file_path):
-                    # Absolute path - try it directly first
-                    fallback_locations.append(photo.file_path)
-                    
-                    # IMPORTANT: Remap old absolute paths to current UPLOAD_FOLDER
-                    # Handle paths like /data/uploads/1/file.jpg from Railway
-                    # Extract the meaningful parts: user_id and filename
-                    path_parts = photo.file_path.split('/')
-                    if len(path_parts) >= 2:
-                        # Try to find user_id and filename in the path
-                        # Patterns: /data/uploads/1/file.jpg or /uploads/1/file.jpg
-                        for i, part in enumerate(path_parts):
-                            if part.isdigit() and i + 1 < len(path_parts):
-                                # Found user_id, reconstruct path with current UPLOAD_FOLDER
-                                extracted_user_id = part
-                                remaining_path = '/'.join(path_parts[i+1:])
-                                remapped_path = os.path.join(upload_folder, extracted_user_id, remaining_path)
-                                fallback_locations.append(remapped_path)
-                                current_app.logger.info(f"Remapped absolute path {photo.file_path} to {remapped_path}")
-                                break
-                else:
-                    # Relative path - try different interpretations
-                    fallback_locations.append(photo.file_path)
-                    fallback_locations.append(os.path.join(upload_folder, photo.file_path))
-            
-            # Fallback 2: Try base upload folder without user subdirectory
-            fallback_locations.append(os.path.join(upload_folder, filename))
-            
-            # Fallback 3: If file_path is an App Storage path, try converting it to local
-            if photo.file_path and (photo.file_path.startswith('users/') or photo.file_path.startswith('uploads/')):
-                path_parts = photo.file_path.split('/', 1)
-                if len(path_parts) > 1:
-                    fallback_locations.append(os.path.join(upload_folder, path_parts[1]))
-            
-            # Try each fallback location
-            for fallback in fallback_locations:
-                if fallback and os.path.exists(fallback):
-                    current_app.logger.info(f"File found at fallback location: {fallback}")
-                    response = send_file(fallback)
-                    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-                    response.headers['Pragma'] = 'no-cache'
-                    response.headers['Expires'] = '0'
-                    return response
-            
-            current_app.logger.error(f"File not found: {file_to_serve} (requested filename: {filename}). Tried fallbacks: {fallback_locations}")
-            # Serve placeholder for both thumbnails and regular images instead of 404
-            current_app.logger.warning(f"Serving placeholder for missing file: {file_to_serve}")
+            abort(404)
+        
+        stream = open_location(location)
+        if stream is None and location == location_of(photo, 'edited') and edit_stack_service.is_pending(photo):
+            # Edits are rendered from the original the first time they are viewed
+            location = edit_stack_service.render(photo)
+            stream = open_location(location) if location else None
+        if stream is None:
+            current_app.logger.error(f"File not found at {location} (requested filename: {filename})")
+            if is_thumbnail_request:
+                return redirect(url_for('static', filename='img/placeholder.png'))
+            # Serve placeholder instead of 404
             return send_file('static/img/placeholder.png', mimetype='image/png')
+        return _stream_response(stream, filename)
         
     except Exception as e:
         current_app.logger.error(f"Error serving file {filename} for user {user_id}: {e}")
@@ -636,6 +494,69 @@ def uploaded_file(current_user, user_id, filename):
         current_app.logger.warning(f"Serving placeholder due to exception: {filename}")
         return send_file('static/img/placeholder.png', mimetype='image/png')
 
+def _zip_entries(photos, max_total_size):
+    """
+    Stored locations of the files to export, sized from the rows
+
+    Edits that haven't been viewed yet are rendered first.
+
+    Returns:
+        list of (photo, StorageLocation), or None if the total exceeds max_total_size
+    """
+    entries, total_size = [], 0
+    for photo in photos:
+        if edit_stack_service.is_pending(photo):
+            edit_stack_service.render(photo)
+        location = location_of(photo, 'edited' if photo.edited_filename else 'original')
+        if location is None:
+            continue
+        entries.append((photo, location))
+        total_size += photo.file_size or 0
+        if total_size > max_total_size:
+            return None
+    return entries
+
+def _write_photo_zip(entries, zip_path, temp_dir):
+    """
+    Write photos to a ZIP; App Storage files are first fetched in parallel to temp_dir
+
+    Returns:
+        Number of photos added
+    """
+    sources = fetch_locations({photo.id: location for photo, location in entries}, temp_dir)
+    added_files = 0
+    file_count = {}  # Track duplicate filenames
+    
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for photo, location in entries:
+            source = sources.get(photo.id)
+            if not source:
+                current_app.logger.warning(f"Failed to fetch {location} for photo {photo.id}")
+                continue
+            
+            filename_to_use = photo.edited_filename if photo.edited_filename else photo.filename
+            original_name = photo.original_name or filename_to_use
+            
+            # Sanitize filename for ZIP (prevent path traversal)
+            original_name = os.path.basename(original_name).replace('/', '_').replace('\\', '_')
+            
+            # Handle duplicate filenames by adding counter
+            base_name, ext = os.path.splitext(original_name)
+            if original_name in file_count:
+                file_count[original_name] += 1
+                zip_filename_final = f"{base_name}_{file_count[original_name]}{ext}"
+            else:
+                file_count[original_name] = 0
+                zip_filename_final = original_name
+            
+            try:
+                zipf.write(source, zip_filename_final)
+                added_files += 1
+            except OSError as e:
+                current_app.logger.warning(f"Error adding photo {photo.id} to ZIP: {e}")
+    
+    return added_files
+
 @gallery_bp.route('/api/photos/bulk-download', methods=['POST'])
 @login_required
 def bulk_download_photos():
@@ -668,46 +589,11 @@ def bulk_download_photos():
             flash('No valid photos found for download.', 'error')
             return redirect(url_for('gallery.photos'))
         
-        # Pre-validate file sizes to avoid resource exhaustion
-        total_size = 0
-        valid_photos = []
-        
-        for photo in photos:
-            filename_to_use = photo.edited_filename if photo.edited_filename else photo.filename
-            file_size = 0
-            
-            # Check App Storage first
-            app_storage_path = f"users/{photo.user_id}/{filename_to_use}"
-            if file_exists_enhanced(app_storage_path):
-                valid_photos.append((photo, app_storage_path, None))
-                # Estimate file size (cannot get exact size from App Storage easily)
-                file_size = 5 * 1024 * 1024  # Estimate 5MB per photo for safety
-            elif photo.file_path:
-                # Check local filesystem
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-                file_path = photo.file_path
-                
-                if os.path.isabs(file_path):
-                    full_path = file_path
-                elif file_path.startswith(upload_folder + '/'):
-                    full_path = file_path
-                elif file_path.startswith('uploads/') or file_path.startswith('users/'):
-                    path_parts = file_path.split('/', 1)
-                    if len(path_parts) > 1:
-                        full_path = os.path.join(upload_folder, path_parts[1])
-                    else:
-                        full_path = os.path.join(upload_folder, str(photo.user_id), filename_to_use)
-                else:
-                    full_path = os.path.join(upload_folder, str(photo.user_id), file_path)
-                
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    valid_photos.append((photo, None, full_path))
-            
-            total_size += file_size
-            if total_size > MAX_TOTAL_SIZE:
-                flash(f'Selected photos exceed maximum download size limit ({MAX_TOTAL_SIZE // (1024*1024)}MB).', 'error')
-                return redirect(url_for('gallery.photos'))
+        # Locations and sizes come from the rows, so nothing is probed up front
+        valid_photos = _zip_entries(photos, MAX_TOTAL_SIZE)
+        if valid_photos is None:
+            flash(f'Selected photos exceed maximum download size limit ({MAX_TOTAL_SIZE // (1024*1024)}MB).', 'error')
+            return redirect(url_for('gallery.photos'))
         
         if not valid_photos:
             flash('No valid photo files found for download.', 'error')
@@ -718,46 +604,7 @@ def bulk_download_photos():
             timestamp = int(time.time())
             zip_filename = f"photovault_photos_{timestamp}.zip"
             zip_path = os.path.join(temp_dir, zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                added_files = 0
-                file_count = {}  # Track duplicate filenames
-                
-                for photo, app_storage_path, local_path in valid_photos:
-                    try:
-                        filename_to_use = photo.edited_filename if photo.edited_filename else photo.filename
-                        original_name = photo.original_name or filename_to_use
-                        
-                        # Sanitize filename for ZIP (prevent path traversal)
-                        original_name = os.path.basename(original_name).replace('/', '_').replace('\\', '_')
-                        
-                        # Handle duplicate filenames by adding counter
-                        base_name, ext = os.path.splitext(original_name)
-                        if original_name in file_count:
-                            file_count[original_name] += 1
-                            zip_filename_final = f"{base_name}_{file_count[original_name]}{ext}"
-                        else:
-                            file_count[original_name] = 0
-                            zip_filename_final = original_name
-                        
-                        # Add file to ZIP with memory-efficient approach
-                        if app_storage_path:
-                            # App Storage: Load file content
-                            success, file_content = get_file_content(app_storage_path)
-                            if success and file_content:
-                                zipf.writestr(zip_filename_final, file_content)
-                                added_files += 1
-                                current_app.logger.info(f"Added photo {photo.id} from App Storage as {zip_filename_final}")
-                            else:
-                                current_app.logger.warning(f"Failed to get App Storage content for photo {photo.id}")
-                        elif local_path:
-                            # Local filesystem: Use ZIP's built-in file reading for better memory usage
-                            zipf.write(local_path, zip_filename_final)
-                            added_files += 1
-                            current_app.logger.info(f"Added photo {photo.id} from local storage as {zip_filename_final}")
-                    except Exception as e:
-                        current_app.logger.warning(f"Error adding photo {photo.id} to ZIP: {e}")
-                        continue
+            added_files = _write_photo_zip(valid_photos, zip_path, temp_dir)
             
             if added_files == 0:
                 flash('No photo files could be found for download.', 'error')
@@ -801,45 +648,11 @@ def download_all_photos():
             flash(f'You have too many photos ({len(photos)}). Maximum {MAX_PHOTOS} photos allowed per download. Please use selective download instead.', 'error')
             return redirect(url_for('gallery.photos'))
         
-        # Pre-validate file sizes
-        total_size = 0
-        valid_photos = []
-        
-        for photo in photos:
-            filename_to_use = photo.edited_filename if photo.edited_filename else photo.filename
-            file_size = 0
-            
-            # Check App Storage first
-            app_storage_path = f"users/{photo.user_id}/{filename_to_use}"
-            if file_exists_enhanced(app_storage_path):
-                valid_photos.append((photo, app_storage_path, None))
-                file_size = 5 * 1024 * 1024  # Estimate 5MB per photo
-            elif photo.file_path:
-                # Check local filesystem
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-                file_path = photo.file_path
-                
-                if os.path.isabs(file_path):
-                    full_path = file_path
-                elif file_path.startswith(upload_folder + '/'):
-                    full_path = file_path
-                elif file_path.startswith('uploads/') or file_path.startswith('users/'):
-                    path_parts = file_path.split('/', 1)
-                    if len(path_parts) > 1:
-                        full_path = os.path.join(upload_folder, path_parts[1])
-                    else:
-                        full_path = os.path.join(upload_folder, str(photo.user_id), filename_to_use)
-                else:
-                    full_path = os.path.join(upload_folder, str(photo.user_id), file_path)
-                
-                if os.path.exists(full_path):
-                    file_size = os.path.getsize(full_path)
-                    valid_photos.append((photo, None, full_path))
-            
-            total_size += file_size
-            if total_size > MAX_TOTAL_SIZE:
-                flash(f'Your photo collection exceeds the maximum download size limit ({MAX_TOTAL_SIZE // (1024*1024)}MB). Please use selective download instead.', 'error')
-                return redirect(url_for('gallery.photos'))
+        # Locations and sizes come from the rows, so nothing is probed up front
+        valid_photos = _zip_entries(photos, MAX_TOTAL_SIZE)
+        if valid_photos is None:
+            flash(f'Your photo collection exceeds the maximum download size limit ({MAX_TOTAL_SIZE // (1024*1024)}MB). Please use selective download instead.', 'error')
+            return redirect(url_for('gallery.photos'))
         
         if not valid_photos:
             flash('No valid photo files found for download.', 'error')
@@ -850,40 +663,7 @@ def download_all_photos():
             timestamp = int(time.time())
             zip_filename = f"photovault_all_photos_{timestamp}.zip"
             zip_path = os.path.join(temp_dir, zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                added_files = 0
-                file_count = {}
-                
-                for photo, app_storage_path, local_path in valid_photos:
-                    try:
-                        filename_to_use = photo.edited_filename if photo.edited_filename else photo.filename
-                        original_name = photo.original_name or filename_to_use
-                        
-                        # Sanitize filename
-                        original_name = os.path.basename(original_name).replace('/', '_').replace('\\', '_')
-                        
-                        # Handle duplicate filenames
-                        base_name, ext = os.path.splitext(original_name)
-                        if original_name in file_count:
-                            file_count[original_name] += 1
-                            zip_filename_final = f"{base_name}_{file_count[original_name]}{ext}"
-                        else:
-                            file_count[original_name] = 0
-                            zip_filename_final = original_name
-                        
-                        # Add file to ZIP
-                        if app_storage_path:
-                            success, file_content = get_file_content(app_storage_path)
-                            if success and file_content:
-                                zipf.writestr(zip_filename_final, file_content)
-                                added_files += 1
-                        elif local_path:
-                            zipf.write(local_path, zip_filename_final)
-                            added_files += 1
-                    except Exception as e:
-                        current_app.logger.warning(f"Error adding photo {photo.id} to ZIP: {e}")
-                        continue
+            added_files = _write_photo_zip(valid_photos, zip_path, temp_dir)
             
             if added_files == 0:
                 flash('No photo files could be found for download.', 'error')
@@ -49,29 +49,19 @@ def dashboard():
         # Calculate photo statistics for the current user
         from photovault.models import Photo
         
-        total_photos = Photo.query.filter_by(user_id=current_user.id).count()
-        # Count photos with edited versions
-        edited_photos = Photo.query.filter_by(user_id=current_user.id)\
-                              .filter(Photo.edited_filename.isnot(None))\
-                              .count()
-        # Original photos are those without edited versions
-        original_photos = total_photos - edited_photos
+        # Counters and plan limits come from the shared cache (see usage_service)
+        from photovault.services.usage_service import usage_service
+        photo_stats = usage_service.photo_stats(current_user.id)
+        total_photos = photo_stats['total_photos']
+        edited_photos = photo_stats['edited_photos']
+        original_photos = photo_stats['original_photos']
         
         # Calculate total storage used (in MB)
-        photos = Photo.query.filter_by(user_id=current_user.id).all()
-        total_size_bytes = sum(photo.file_size or 0 for photo in photos)
+        total_size_bytes = photo_stats['total_size_bytes']
         total_size_mb = round(total_size_bytes / 1024 / 1024, 2) if total_size_bytes > 0 else 0
         
-        # Get user's subscription plan storage limit
-        from photovault.models import UserSubscription
-        user_subscription = UserSubscription.query.filter_by(user_id=current_user.id).first()
-        
-        if user_subscription and user_subscription.plan:
-            # Convert GB to MB (1 GB = 1024 MB)
-            storage_limit_mb = user_subscription.plan.storage_gb * 1024
-        else:
-            # Default to Free plan (0 GB, but allow 100 MB for basic usage)
-            storage_limit_mb = 100
+        # Get user's subscription plan storage limit (Free plan allows 100 MB)
+        storage_limit_mb = usage_service.storage_limit_mb(current_user.id)
         
         # Calculate storage usage percentage
         storage_usage_percent = (total_size_mb / storage_limit_mb * 100) if storage_limit_mb > 0 else 0
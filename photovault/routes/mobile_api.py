@@ -1,13 +1,18 @@
 """
 Mobile API Routes for StoryKeep iOS/Android App
 """
-from flask import Blueprint, jsonify, request, current_app, url_for
+from flask import Blueprint, Response, jsonify, request, current_app, url_for
 from photovault.models import Photo, UserSubscription, FamilyVault, FamilyMember, User, VaultPhoto, VaultInvitation, PhotoComment
 from photovault.extensions import db, csrf
 from photovault.utils.jwt_auth import token_required
+from photovault.services.color_mode_service import color_mode_service
+from photovault.services.edit_stack_service import edit_stack_service
+from photovault.utils.api_payload import requested_fields, shape_records
+from photovault.utils.rate_limit import rate_limit
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 import os
+import json
 import uuid
 from datetime import datetime, timedelta
 from PIL import Image
@@ -31,6 +36,7 @@ def validate_email(email):
     return re.match(pattern, email) is not None
 
 @mobile_api_bp.route('/auth/login', methods=['POST'])
+@rate_limit('login')
 @csrf.exempt
 def mobile_login():
     """Mobile app login endpoint"""
@@ -79,6 +85,7 @@ def mobile_login():
         return jsonify({'error': 'An error occurred during login'}), 500
 
 @mobile_api_bp.route('/auth/register', methods=['POST'])
+@rate_limit('login')
 @csrf.exempt
 def mobile_register():
     """Mobile app registration endpoint"""
@@ -181,13 +188,14 @@ def get_dashboard(current_user):
         # Union of both sets gives unique vault count
         total_vaults = len(created_vault_ids | member_vault_ids)
         
-        # Get subscription info and storage limits
-        user_subscription = UserSubscription.query.filter_by(user_id=current_user.id).first()
-        subscription_plan = user_subscription.plan.name if user_subscription and user_subscription.plan else 'Free'
+        # Get subscription info and storage limits (cached, see usage_service)
+        from photovault.services.usage_service import usage_service
+        plan_limits = usage_service.plan_limits(current_user.id)
+        subscription_plan = plan_limits['plan_name'] or 'Free'
         
         # Calculate storage limit based on subscription plan
-        if user_subscription and user_subscription.plan and user_subscription.plan.storage_gb:
-            storage_limit_gb = user_subscription.plan.storage_gb
+        if plan_limits['storage_gb']:
+            storage_limit_gb = plan_limits['storage_gb']
             # Handle unlimited storage (usually represented as -1 or very large number)
             if storage_limit_gb < 0 or storage_limit_gb >= 999:
                 storage_limit_mb = -1  # -1 indicates unlimited
@@ -271,6 +279,9 @@ def get_dashboard(current_user):
                 'auto_enhanced': getattr(photo, 'auto_enhanced', False)
             })
         
+        # Drop null fields and honour ?fields= - all_photos dominates the payload
+        all_photos = shape_records(all_photos, requested_fields())
+        
         return jsonify({
             'total_photos': total_photos,
             'enhanced_photos': enhanced_photos,
@@ -463,6 +474,41 @@ def update_avatar(current_user):
         logger.error(f"Avatar upload error: {str(e)}")
         return jsonify({'error': 'Upload failed'}), 500
 
+def _serialize_photo(photo, user_id):
+    """Gallery representation of a photo shared by /photos and /sync"""
+    # Extract thumbnail filename from thumbnail_path if it exists
+    thumbnail_filename = None
+    if photo.thumbnail_path:
+        thumbnail_filename = os.path.basename(photo.thumbnail_path)
+    
+    photo_data = {
+        'id': photo.id,
+        'filename': photo.filename,
+        'url': f'/uploads/{user_id}/{photo.filename}' if photo.filename else None,
+        'thumbnail_url': f'/uploads/{user_id}/{thumbnail_filename}' if thumbnail_filename else f'/uploads/{user_id}/{photo.filename}',
+        'created_at': photo.created_at.isoformat() if photo.created_at else None,
+        'file_size': photo.file_size,
+        'has_edited': photo.edited_filename is not None,
+        # Annotation data for iOS app display
+        'enhancement_metadata': photo.enhancement_metadata,
+        'processing_notes': photo.processing_notes,
+        'back_text': photo.back_text,
+        'date_text': photo.date_text,
+        'location_text': photo.location_text,
+        'occasion': photo.occasion,
+        'photo_date': photo.photo_date.isoformat() if photo.photo_date else None,
+        'condition': photo.condition,
+        'photo_source': photo.photo_source,
+        'needs_restoration': photo.needs_restoration,
+        'auto_enhanced': photo.auto_enhanced,
+        'color_mode': photo.color_mode
+    }
+    
+    if photo.edited_filename:
+        photo_data['edited_url'] = f'/uploads/{user_id}/{photo.edited_filename}'
+    
+    return photo_data
+
 @mobile_api_bp.route('/photos', methods=['GET'])
 @token_required
 def get_photos(current_user):
@@ -473,73 +519,38 @@ def get_photos(current_user):
         per_page = max(1, min(100, request.args.get('limit', 20, type=int)))
         filter_type = request.args.get('filter', 'all')
         
-        # Get all photos for this user - SAME AS DASHBOARD
-        all_photos = Photo.query.filter_by(user_id=current_user.id).all()
+        # Filters are applied in SQL (same criteria as gallery.photos)
+        query = Photo.query.filter_by(user_id=current_user.id)
         
-        # Apply filter if needed
         if filter_type == 'enhanced':
-            filtered_photos = [p for p in all_photos if p.edited_filename is not None]
+            query = query.filter(Photo.edited_filename.isnot(None))
         elif filter_type == 'originals':
-            filtered_photos = [p for p in all_photos if p.edited_filename is None]
+            query = query.filter(Photo.edited_filename.is_(None))
         elif filter_type == 'dnn':
             # Photos colorized with DNN method
-            filtered_photos = [p for p in all_photos if p.enhancement_metadata and p.enhancement_metadata.get('colorization', {}).get('method') == 'dnn']
+            query = query.filter(color_mode_service.colorized_filter('dnn'))
         elif filter_type == 'ai':
             # Photos colorized with AI method
-            filtered_photos = [p for p in all_photos if p.enhancement_metadata and p.enhancement_metadata.get('colorization', {}).get('method') == 'ai_guided_dnn']
+            query = query.filter(color_mode_service.colorized_filter('ai_guided_dnn'))
         elif filter_type == 'uncolorized':
-            # Photos without colorization
-            filtered_photos = [p for p in all_photos if not p.enhancement_metadata]
-        else:
-            filtered_photos = all_photos
+            # Black and white / sepia photos without colorization
+            color_mode_service.backfill_user_photos(current_user.id)
+            query = query.filter(color_mode_service.uncolorized_filter())
         
         # Sort by creation date (newest first) - SAME AS DASHBOARD
-        filtered_photos.sort(key=lambda x: x.created_at if x.created_at else datetime.min, reverse=True)
+        pagination = query.order_by(Photo.created_at.desc().nullslast())\
+                          .paginate(page=page, per_page=per_page, error_out=False)
         
-        # Manual pagination
-        total = len(filtered_photos)
-        offset = (page - 1) * per_page
-        paginated_photos = filtered_photos[offset:offset + per_page]
-        has_more = (offset + len(paginated_photos)) < total
+        total = pagination.total
+        paginated_photos = pagination.items
+        has_more = pagination.has_next
         
         # Build photo list - EXACT SAME URL PATTERN AS DASHBOARD
-        photos_list = []
-        for photo in paginated_photos:
-            # Extract thumbnail filename from thumbnail_path if it exists
-            thumbnail_filename = None
-            if photo.thumbnail_path:
-                thumbnail_filename = os.path.basename(photo.thumbnail_path)
-            
-            photo_data = {
-                'id': photo.id,
-                'filename': photo.filename,
-                'url': f'/uploads/{current_user.id}/{photo.filename}' if photo.filename else None,
-                'thumbnail_url': f'/uploads/{current_user.id}/{thumbnail_filename}' if thumbnail_filename else f'/uploads/{current_user.id}/{photo.filename}',
-                'created_at': photo.created_at.isoformat() if photo.created_at else None,
-                'file_size': photo.file_size,
-                'has_edited': photo.edited_filename is not None,
-                # Annotation data for iOS app display
-                'enhancement_metadata': photo.enhancement_metadata,
-                'processing_notes': photo.processing_notes,
-                'back_text': photo.back_text,
-                'date_text': photo.date_text,
-                'location_text': photo.location_text,
-                'occasion': photo.occasion,
-                'photo_date': photo.photo_date.isoformat() if photo.photo_date else None,
-                'condition': photo.condition,
-                'photo_source': photo.photo_source,
-                'needs_restoration': photo.needs_restoration,
-                'auto_enhanced': photo.auto_enhanced
-            }
-            
-            if photo.edited_filename:
-                photo_data['edited_url'] = f'/uploads/{current_user.id}/{photo.edited_filename}'
-            
-            photos_list.append(photo_data)
+        photos_list = [_serialize_photo(photo, current_user.id) for photo in paginated_photos]
         
         return jsonify({
             'success': True,
-            'photos': photos_list,
+            'photos': shape_records(photos_list, requested_fields()),
             'page': page,
             'per_page': per_page,
             'total': total,
@@ -550,6 +561,88 @@ def get_photos(current_user):
         logger.error(f"Gallery error: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@mobile_api_bp.route('/sync', methods=['GET'])
+@token_required
+def sync_changes(current_user):
+    """
+    Delta sync for the gallery
+    
+    Query params:
+        since: Cursor from the previous response (omit for a full sync)
+        limit: Photos per page (default 500, max 1000)
+    
+    Clients apply 'photos' as upserts and the removal lists as deletes, then
+    store 'cursor'. While 'has_more' is true they call again immediately with
+    the new cursor. 'full_sync' means the client must replace its local copy;
+    it is only ever set on the first page, later pages of the same sync add to it.
+    """
+    try:
+        from sqlalchemy import func
+        from photovault.models import VoiceMemo
+        from photovault.services.sync_service import sync_service
+        
+        limit = request.args.get('limit', 500, type=int)
+        changes = sync_service.changes_since(current_user.id, request.args.get('since'), limit)
+        
+        # Counts for the changed photos only (memo/comment edits bump photo.updated_at)
+        photo_ids = [photo.id for photo in changes['photos']]
+        memo_counts, comment_counts = {}, {}
+        if photo_ids:
+            memo_counts = dict(db.session.query(VoiceMemo.photo_id, func.count(VoiceMemo.id))
+                               .filter(VoiceMemo.photo_id.in_(photo_ids))
+                               .group_by(VoiceMemo.photo_id).all())
+            comment_counts = dict(db.session.query(PhotoComment.photo_id, func.count(PhotoComment.id))
+                                  .filter(PhotoComment.photo_id.in_(photo_ids))
+                                  .group_by(PhotoComment.photo_id).all())
+        
+        photos = []
+        for photo in changes['photos']:
+            photo_data = _serialize_photo(photo, current_user.id)
+            photo_data['voice_memo_count'] = memo_counts.get(photo.id, 0)
+            photo_data['comment_count'] = comment_counts.get(photo.id, 0)
+            photo_data['updated_at'] = photo.updated_at.isoformat() if photo.updated_at else None
+            photos.append(photo_data)
+        
+        # Vault changes: memberships plus vaults the user created
+        memberships = changes['vault_memberships']
+        vault_ids = {m.vault_id for m in memberships} | {v.id for v in changes['created_vaults']}
+        vaults_by_id = {v.id: v for v in FamilyVault.query.filter(FamilyVault.id.in_(vault_ids)).all()} if vault_ids else {}
+        
+        vaults = {}
+        for membership in memberships:
+            vault = vaults_by_id.get(membership.vault_id)
+            if vault:
+                vaults[vault.id] = {
+                    'id': vault.id,
+                    'name': vault.name,
+                    'role': 'owner' if vault.created_by == current_user.id else membership.role,
+                    'status': membership.status,
+                    'is_creator': vault.created_by == current_user.id
+                }
+        for vault in changes['created_vaults']:
+            vaults.setdefault(vault.id, {
+                'id': vault.id,
+                'name': vault.name,
+                'role': 'owner',
+                'status': 'active',
+                'is_creator': True
+            })
+        
+        return jsonify({
+            'success': True,
+            'full_sync': changes['full_sync'],
+            'cursor': changes['cursor'],
+            'has_more': changes['has_more'],
+            'photos': shape_records(photos, requested_fields()),
+            'deleted_photo_ids': changes['deleted_photo_ids'],
+            'vaults': list(vaults.values()),
+            'removed_vault_ids': changes['removed_vault_ids']
+        })
+        
+    except Exception as e:
+        logger.error(f"Sync error: {str(e)}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
 @mobile_api_bp.route('/photos/<int:photo_id>', methods=['GET'])
 @token_required
 def get_photo_detail(current_user, photo_id):
@@ -587,7 +680,8 @@ def get_photo_detail(current_user, photo_id):
             'condition': photo.condition,
             'photo_source': photo.photo_source,
             'needs_restoration': photo.needs_restoration,
-            'auto_enhanced': photo.auto_enhanced
+            'auto_enhanced': photo.auto_enhanced,
+            'color_mode': photo.color_mode
         }
         
         if photo.edited_filename:
@@ -602,6 +696,7 @@ def get_photo_detail(current_user, photo_id):
         return jsonify({'error': str(e)}), 500
 
 @mobile_api_bp.route('/upload', methods=['POST'])
+@rate_limit('upload')
 @csrf.exempt
 @token_required
 def upload_photo(current_user):
@@ -664,6 +759,7 @@ def upload_photo(current_user):
         photo.thumbnail_path = thumbnail_path
         photo.file_size = file_size
         photo.upload_source = 'mobile_camera'
+        color_mode_service.classify_photo(photo)
         
         db.session.add(photo)
         db.session.commit()
@@ -709,57 +805,102 @@ def upload_photo(current_user):
         return jsonify({'error': 'Upload failed'}), 500
 
 @mobile_api_bp.route('/detect-and-extract', methods=['POST'])
+@rate_limit('processing')
 @csrf.exempt
 @token_required
 def detect_and_extract_photos(current_user):
-    """Detect and extract photos from uploaded image (digitizer functionality)"""
+    """
+    Detect and extract photos from uploaded image (digitizer functionality)
+    
+    Either upload the image again as 'image', or pass the 'detection_token'
+    returned by /preview-detection to reuse the cached upload and detections.
+    With a token, 'corners' may carry user-adjusted quads
+    ([[[x, y] x4], ...] in image pixels) that replace the detected ones.
+    """
     try:
         from photovault.utils.photo_detection import PhotoDetector
         from photovault.utils.file_handler import validate_image_file, generate_unique_filename
+        from photovault.utils.detection_cache import detection_cache
         
         logger.info(f"🎯 Photo detection request from user: {current_user.id}")
         
-        # Check if file was uploaded
-        if 'image' not in request.files:
-            logger.error("❌ No image file in request")
-            return jsonify({'error': 'No image file provided'}), 400
-        
-        file = request.files['image']
-        
-        if not file or not file.filename:
-            logger.error("❌ Empty file")
-            return jsonify({'error': 'No file selected'}), 400
-        
-        logger.info(f"📁 Processing uploaded file: {file.filename}")
-        
-        # Validate file
-        is_valid, validation_msg = validate_image_file(file)
-        if not is_valid:
-            logger.error(f"❌ Invalid file: {validation_msg}")
-            return jsonify({'error': f'Invalid file: {validation_msg}'}), 400
-        
-        # Generate unique filename
-        unique_filename = generate_unique_filename(
-            file.filename,
-            prefix='digitizer',
-            username=current_user.username
-        )
+        params = request.get_json(silent=True) or request.form
+        detection_token = params.get('detection_token')
         
-        # Save uploaded file
         upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
         user_folder = os.path.join(upload_folder, str(current_user.id))
         os.makedirs(user_folder, exist_ok=True)
         
-        source_path = os.path.join(user_folder, unique_filename)
-        file.save(source_path)
-        
-        logger.info(f"💾 Saved source image to: {source_path}")
-        
         # Initialize detector
         detector = PhotoDetector()
         
-        # Detect photos in the image
-        detected = detector.detect_photos(source_path)
+        if detection_token:
+            cached = detection_cache.get(detection_token, current_user.id)
+            if not cached:
+                return jsonify({'error': 'Detection expired, please upload the image again'}), 410
+            
+            original_filename = cached['original_filename'] or 'capture.jpg'
+            unique_filename = generate_unique_filename(
+                original_filename,
+                prefix='digitizer',
+                username=current_user.username
+            )
+            
+            # Same filesystem as the cache, so this is a rename rather than a copy
+            source_path = os.path.join(user_folder, unique_filename)
+            os.replace(cached['image_path'], source_path)
+            detection_cache.discard(detection_token)
+            
+            adjusted_corners = params.get('corners')
+            if adjusted_corners:
+                try:
+                    if isinstance(adjusted_corners, str):
+                        adjusted_corners = json.loads(adjusted_corners)
+                    detected = detector.detections_from_corners(adjusted_corners)
+                except (ValueError, TypeError) as e:
+                    os.remove(source_path)
+                    return jsonify({'error': f'Invalid corners: {e}'}), 400
+            else:
+                detected = cached['detections']
+            
+            logger.info(f"♻️ Reusing cached detection {detection_token[:8]}... ({len(detected)} photos)")
+        else:
+            # Check if file was uploaded
+            if 'image' not in request.files:
+                logger.error("❌ No image file in request")
+                return jsonify({'error': 'No image file provided'}), 400
+            
+            file = request.files['image']
+            
+            if not file or not file.filename:
+                logger.error("❌ Empty file")
+                return jsonify({'error': 'No file selected'}), 400
+            
+            original_filename = file.filename
+            logger.info(f"📁 Processing uploaded file: {original_filename}")
+            
+            # Validate file
+            # Album page scans may exceed the regular upload dimension limit
+            is_valid, validation_msg = validate_image_file(file, max_dimension=None)
+            if not is_valid:
+                logger.error(f"❌ Invalid file: {validation_msg}")
+                return jsonify({'error': f'Invalid file: {validation_msg}'}), 400
+            
+            # Generate unique filename
+            unique_filename = generate_unique_filename(
+                original_filename,
+                prefix='digitizer',
+                username=current_user.username
+            )
+            
+            # Save uploaded file
+            source_path = os.path.join(user_folder, unique_filename)
+            file.save(source_path)
+            
+            logger.info(f"💾 Saved source image to: {source_path}")
+            
+            # Detect photos in the image
+            detected = detector.detect_photos(source_path)
         
         if not detected or len(detected) == 0:
             logger.info("ℹ️ No photos detected in image")
@@ -781,11 +922,12 @@ def detect_and_extract_photos(current_user):
             photo = Photo()
             photo.user_id = current_user.id
             photo.filename = unique_filename
-            photo.original_name = file.filename
+            photo.original_name = original_filename
             photo.file_path = source_path
             photo.thumbnail_path = thumbnail_path
             photo.file_size = file_size
             photo.upload_source = 'digitizer'
+            color_mode_service.classify_photo(photo)
             
             db.session.add(photo)
             db.session.commit()
@@ -802,53 +944,42 @@ def detect_and_extract_photos(current_user):
         
         logger.info(f"✅ Detected {len(detected)} photos in image")
         
-        # Extract detected photos
-        extracted_files = detector.extract_photos(source_path, user_folder, detected)
-        
-        extracted_photos = []
+        # Extract detected photos (warp, encode and thumbnail run in parallel)
+        extracted_files = detector.extract_photos(source_path, user_folder, detected,
+                                                  thumbnail_size=(300, 300))
         
+        new_photos = []
         for i, extracted_file in enumerate(extracted_files):
-            try:
-                extracted_path = extracted_file['file_path']
-                
-                # Create thumbnail
-                thumbnail_filename = f"thumb_{os.path.basename(extracted_path)}"
-                thumbnail_path = os.path.join(user_folder, thumbnail_filename)
-                try:
-                    img = Image.open(extracted_path)
-                    img.thumbnail((300, 300))
-                    img.save(thumbnail_path)
-                except Exception as e:
-                    logger.error(f"Thumbnail creation failed: {e}")
-                    thumbnail_path = extracted_path
-                
-                # Get file size
-                extracted_size = os.path.getsize(extracted_path)
-                
-                # Create new photo record
-                extracted_photo = Photo()
-                extracted_photo.user_id = current_user.id
-                extracted_photo.filename = os.path.basename(extracted_path)
-                extracted_photo.original_name = f"extracted_{i+1}_from_{file.filename}"
-                extracted_photo.file_path = extracted_path
-                extracted_photo.thumbnail_path = thumbnail_path
-                extracted_photo.file_size = extracted_size
-                extracted_photo.upload_source = 'digitizer'
-                
-                db.session.add(extracted_photo)
-                db.session.commit()
-                
-                extracted_photos.append({
-                    'id': extracted_photo.id,
-                    'filename': extracted_photo.filename,
-                    'confidence': extracted_file.get('confidence', 0)
-                })
-                
-                logger.info(f"✅ Extracted photo {i+1}: {extracted_photo.filename}")
-                
-            except Exception as extract_error:
-                logger.error(f"❌ Error processing extracted photo {i}: {extract_error}")
-                continue
+            extracted_path = extracted_file['file_path']
+            
+            extracted_photo = Photo()
+            extracted_photo.user_id = current_user.id
+            extracted_photo.filename = os.path.basename(extracted_path)
+            extracted_photo.original_name = f"extracted_{i+1}_from_{original_filename}"
+            extracted_photo.file_path = extracted_path
+            extracted_photo.thumbnail_path = extracted_file.get('thumbnail_path') or extracted_path
+            extracted_photo.file_size = extracted_file['file_size']
+            extracted_photo.width = extracted_file['extracted_width']
+            extracted_photo.height = extracted_file['extracted_height']
+            extracted_photo.upload_source = 'digitizer'
+            color_mode_service.classify_photo(extracted_photo)
+            new_photos.append(extracted_photo)
+        
+        # Single round trip for the whole page
+        db.session.add_all(new_photos)
+        db.session.commit()
+        
+        # Face detection is slow and not needed for the response
+        from photovault.utils.background_jobs import background_jobs
+        from photovault.services.face_detection_service import face_detection_service
+        for extracted_photo in new_photos:
+            background_jobs.submit(face_detection_service.process_photo_by_id, extracted_photo.id)
+        
+        extracted_photos = [{
+            'id': extracted_photo.id,
+            'filename': extracted_photo.filename,
+            'confidence': extracted_file.get('confidence', 0)
+        } for extracted_photo, extracted_file in zip(new_photos, extracted_files)]
         
         # Clean up source file after successful extraction
         try:
@@ -876,14 +1007,21 @@ def detect_and_extract_photos(current_user):
         return jsonify({'error': f'Photo detection failed: {str(e)}'}), 500
 
 @mobile_api_bp.route('/preview-detection', methods=['POST'])
+@rate_limit('processing')
 @csrf.exempt
 @token_required
 def preview_detection(current_user):
-    """Preview photo detection without saving - for real-time camera overlay"""
+    """
+    Preview photo detection for the camera overlay
+    
+    The upload and its detections are cached briefly; the returned
+    detection_token lets /detect-and-extract reuse both instead of
+    receiving the image again and re-running detection.
+    """
     try:
         from photovault.utils.photo_detection import PhotoDetector
         from photovault.utils.file_handler import validate_image_file
-        import tempfile
+        from photovault.utils.detection_cache import detection_cache
         
         logger.info(f"📸 Preview detection request from user: {current_user.id}")
         
@@ -897,21 +1035,20 @@ def preview_detection(current_user):
             return jsonify({'error': 'No file selected'}), 400
         
         # Validate file
-        is_valid, validation_msg = validate_image_file(file)
+        is_valid, validation_msg = validate_image_file(file, max_dimension=None)
         if not is_valid:
             return jsonify({'error': f'Invalid file: {validation_msg}'}), 400
         
-        # Save to temporary file for processing
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-            temp_path = temp_file.name
-            file.save(temp_path)
+        # Save into the detection cache for reuse by /detect-and-extract
+        cached = detection_cache.create(current_user.id, file, file.filename)
         
         try:
             # Initialize detector
             detector = PhotoDetector()
             
             # Detect photos
-            detected = detector.detect_photos(temp_path)
+            detected = detector.detect_photos(cached['image_path'])
+            detection_cache.save_detections(cached, detected)
             
             # Return detection results with corner points for overlay
             detection_results = []
@@ -929,16 +1066,14 @@ def preview_detection(current_user):
                 'success': True,
                 'detected_count': len(detected),
                 'detections': detection_results,
+                'detection_token': cached['token'],
+                'expires_in': current_app.config.get('DETECTION_CACHE_TTL'),
                 'message': f'Detected {len(detected)} photo(s)' if detected else 'No photos detected'
             }), 200
             
-        finally:
-            # Clean up temp file
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception as e:
-                logger.error(f"Failed to clean up temp file: {e}")
+        except Exception:
+            detection_cache.discard(cached['token'])
+            raise
         
     except Exception as e:
         logger.error(f"❌ Preview detection error: {str(e)}")
@@ -1164,6 +1299,9 @@ def get_vault_detail(current_user, vault_id):
         elif membership and hasattr(membership, 'role'):
             member_role = membership.role
         
+        # Drop null fields and honour ?fields= for the photo list
+        photos_list = shape_records(photos_list, requested_fields())
+        
         # Step 6: Build success response
         response_data = {
             'success': True,
@@ -1690,7 +1828,10 @@ def delete_vault(current_user, vault_id):
         # Delete vault photos
         VaultPhoto.query.filter_by(vault_id=vault_id).delete()
         
-        # Delete vault members
+        # Delete vault members (query-level delete, so record sync tombstones first)
+        from photovault.services.sync_service import sync_service
+        member_user_ids = [m.user_id for m in FamilyMember.query.filter_by(vault_id=vault_id).all()]
+        sync_service.record_tombstones('vault', [vault_id] * len(member_user_ids), member_user_ids)
         FamilyMember.query.filter_by(vault_id=vault_id).delete()
         
         # Delete pending invitations
@@ -1848,6 +1989,7 @@ def change_member_role(current_user, vault_id, user_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @mobile_api_bp.route('/photos/<int:photo_id>/enhance', methods=['POST'])
+@rate_limit('processing')
 @csrf.exempt
 @token_required
 def enhance_photo_mobile(current_user, photo_id):
@@ -1858,8 +2000,6 @@ def enhance_photo_mobile(current_user, photo_id):
         logger.info(f"✨ ENHANCE REQUEST: photo_id={photo_id}, user={current_user.username}")
         
         from photovault.utils.image_enhancement import enhancer
-        import random
-        from datetime import datetime
         
         # Get the photo and verify ownership
         photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
@@ -1900,35 +2040,9 @@ def enhance_photo_mobile(current_user, photo_id):
         enhancement_settings = data.get('settings', {})
         logger.info(f"⚙️ Enhancement settings: {enhancement_settings}")
         
-        # Generate filename for enhanced version
-        from werkzeug.utils import secure_filename as sanitize_name
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)
-        safe_username = sanitize_name(current_user.username)
-        enhanced_filename = f"{safe_username}.enhanced.{date}.{random_number}.jpg"
-        
-        logger.info(f"🎯 Enhanced filename: {enhanced_filename}")
-        
-        # Create user upload directory
-        os.makedirs(user_upload_dir, exist_ok=True)
-        
-        # Enhanced image path
-        enhanced_filepath = os.path.join(user_upload_dir, enhanced_filename)
-        
-        # Apply enhancements
-        logger.info(f"🔧 Applying enhancements...")
-        output_path, applied_settings = enhancer.auto_enhance_photo(
-            full_file_path, 
-            enhanced_filepath, 
-            enhancement_settings
-        )
-        
-        logger.info(f"✅ Enhancement complete: {output_path}, settings: {applied_settings}")
-        
-        # Update photo record with enhanced version
-        photo.edited_filename = enhanced_filename
-        photo.updated_at = datetime.utcnow()
-        db.session.commit()
+        # Record the edit; the enhanced version is rendered from the original when first viewed
+        applied_settings = {**enhancer.default_settings, **enhancement_settings}
+        edit_stack_service.push(photo, 'enhance', applied_settings)
         
         logger.info(f"💾 Database updated: photo {photo_id} enhanced successfully")
         
@@ -1938,8 +2052,8 @@ def enhance_photo_mobile(current_user, photo_id):
             'photo': {
                 'id': photo.id,
                 'filename': photo.filename,
-                'enhanced_filename': enhanced_filename,
-                'enhanced_url': f'/uploads/{current_user.id}/{enhanced_filename}',
+                'enhanced_filename': photo.edited_filename,
+                'enhanced_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
                 'settings_applied': applied_settings
             }
         }), 200
@@ -1953,6 +2067,7 @@ def enhance_photo_mobile(current_user, photo_id):
         return jsonify({'success': False, 'error': f'Enhancement failed: {str(e)}'}), 500
 
 @mobile_api_bp.route('/photos/<int:photo_id>/colorize', methods=['POST'])
+@rate_limit('processing')
 @csrf.exempt
 @token_required
 def colorize_photo_mobile(current_user, photo_id):
@@ -1998,24 +2113,9 @@ def colorize_photo_mobile(current_user, photo_id):
                 'is_grayscale': False
             }), 400
         
-        # Generate unique filename for colorized version
-        unique_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_extension = os.path.splitext(photo.filename)[1] or '.jpg'
-        colorized_filename = f"{current_user.id}_{unique_id}_colorized_{timestamp}{file_extension}"
-        
-        # Create user folder
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_folder, exist_ok=True)
-        
-        colorized_path = os.path.join(user_folder, colorized_filename)
-        
-        logger.info(f"Colorizing photo {photo_id} for user {current_user.id} using method: {method}")
-        
-        # Perform colorization
+        # Record the edit; the colorized version is rendered from the original when first viewed
         try:
-            colorized_path, actual_method = colorizer.colorize_image(photo.file_path, colorized_path, method=method)
+            actual_method = colorizer.resolve_method(method)
         except RuntimeError as e:
             if 'DNN model not available' in str(e):
                 return jsonify({
@@ -2024,11 +2124,7 @@ def colorize_photo_mobile(current_user, photo_id):
                 }), 400
             else:
                 raise
-        
-        # Update photo record with colorized version
-        photo.edited_filename = colorized_filename
-        photo.updated_at = datetime.utcnow()
-        db.session.commit()
+        edit_stack_service.push(photo, 'colorize', {'method': actual_method})
         
         logger.info(f"Photo {photo_id} colorized successfully using {actual_method}")
         
@@ -2038,8 +2134,8 @@ def colorize_photo_mobile(current_user, photo_id):
             'photo': {
                 'id': photo.id,
                 'filename': photo.filename,
-                'colorized_filename': colorized_filename,
-                'colorized_url': f'/uploads/{current_user.id}/{colorized_filename}',
+                'colorized_filename': photo.edited_filename,
+                'colorized_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
                 'method_used': actual_method
             }
         }), 200
@@ -2051,6 +2147,7 @@ def colorize_photo_mobile(current_user, photo_id):
 
 
 @mobile_api_bp.route('/photos/<int:photo_id>/colorize-ai', methods=['POST'])
+@rate_limit('ai')
 @csrf.exempt
 @token_required
 def colorize_photo_ai_mobile(current_user, photo_id):
@@ -2059,8 +2156,7 @@ def colorize_photo_ai_mobile(current_user, photo_id):
     """
     try:
         from photovault.services.ai_service import get_ai_service
-        from photovault.services.app_storage_service import app_storage
-        import io
+        from photovault.utils.colorization import get_colorizer
         
         # Check if AI service is available
         ai_service = get_ai_service()
@@ -2079,24 +2175,12 @@ def colorize_photo_ai_mobile(current_user, photo_id):
         if not os.path.exists(photo.file_path):
             return jsonify({'success': False, 'error': 'Photo file not found'}), 404
         
-        # Generate unique filename for colorized version
-        unique_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_extension = os.path.splitext(photo.filename)[1] or '.jpg'
-        colorized_filename = f"{current_user.id}_{unique_id}_colorized_ai_{timestamp}{file_extension}"
-        
-        # Create user folder
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_folder, exist_ok=True)
-        
-        colorized_path = os.path.join(user_folder, colorized_filename)
-        
         logger.info(f"🎨 AI Colorizing photo {photo_id} for user {current_user.id}")
         
-        # Perform AI colorization
+        # AI guidance only; the pixels come from the same colorizer, rendered when first viewed
         try:
-            result_path, metadata = ai_service.colorize_image_ai(photo.file_path, colorized_path)
+            with open(photo.file_path, 'rb') as f:
+                guidance = ai_service.colorization_guidance(f.read())
         except Exception as e:
             logger.error(f"AI colorization failed: {str(e)}")
             return jsonify({
@@ -2104,37 +2188,9 @@ def colorize_photo_ai_mobile(current_user, photo_id):
                 'error': f'AI colorization failed: {str(e)}'
             }), 500
         
-        # Upload to App Storage if available
-        edited_path = colorized_path
-        if app_storage.is_available():
-            try:
-                with open(colorized_path, 'rb') as f:
-                    img_bytes = io.BytesIO(f.read())
-                    success, storage_path = app_storage.upload_file(img_bytes, colorized_filename, str(current_user.id))
-                    if success:
-                        edited_path = storage_path
-                        logger.info(f"AI colorized photo uploaded to App Storage: {storage_path}")
-                        # Clean up temp file
-                        try:
-                            os.remove(colorized_path)
-                        except:
-                            pass
-            except Exception as e:
-                logger.warning(f"App Storage upload failed, keeping local: {str(e)}")
-        
-        # Update photo record with colorized version
-        photo.edited_filename = colorized_filename
-        photo.edited_path = edited_path
-        photo.enhancement_metadata = {
-            'colorization': {
-                'method': metadata['method'],
-                'ai_guidance': metadata.get('ai_guidance', ''),
-                'model': metadata.get('model', 'gemini-2.0-flash-exp'),
-                'timestamp': str(datetime.now())
-            }
-        }
-        photo.updated_at = datetime.utcnow()
-        db.session.commit()
+        method_used = get_colorizer().resolve_method('auto')
+        metadata = {'method': 'ai_guided_' + method_used, **guidance}
+        edit_stack_service.push(photo, 'colorize', {'method': method_used}, info=metadata)
         
         logger.info(f"✅ Photo {photo_id} AI-colorized successfully using {metadata['method']}")
         
@@ -2144,8 +2200,8 @@ def colorize_photo_ai_mobile(current_user, photo_id):
             'photo': {
                 'id': photo.id,
                 'filename': photo.filename,
-                'colorized_filename': colorized_filename,
-                'colorized_url': f'/uploads/{current_user.id}/{colorized_filename}',
+                'colorized_filename': photo.edited_filename,
+                'colorized_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
                 'method_used': metadata['method'],
                 'ai_guidance': metadata.get('ai_guidance', '')
             }
@@ -2166,7 +2222,8 @@ def check_grayscale_mobile(current_user, photo_id):
     Returns True if photo is grayscale, False if it's already in color
     """
     try:
-        from photovault.utils.colorization import get_colorizer
+        from photovault.services.color_mode_service import color_mode_service
+        from photovault.utils.colorization import COLOR_MODE_GRAYSCALE
         
         # Get the photo and verify ownership
         photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
@@ -2176,23 +2233,19 @@ def check_grayscale_mobile(current_user, photo_id):
                 'error': 'Photo not found or access denied'
             }), 404
         
-        # Check if file exists
-        if not os.path.exists(photo.file_path):
+        # Column read - classified at ingest, legacy rows classified once here
+        color_mode = color_mode_service.get_color_mode(photo)
+        if color_mode is None:
             return jsonify({
                 'success': False,
                 'error': 'Photo file not found'
             }), 404
         
-        # Check if photo is grayscale using OpenCV
-        colorizer = get_colorizer()
-        is_grayscale = colorizer.is_grayscale(photo.file_path)
-        
-        logger.info(f"🔍 Grayscale check for photo {photo_id}: {is_grayscale}")
-        
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'is_grayscale': is_grayscale
+            'is_grayscale': color_mode == COLOR_MODE_GRAYSCALE,
+            'color_mode': color_mode
         }), 200
         
     except Exception as e:
@@ -2203,7 +2256,70 @@ def check_grayscale_mobile(current_user, photo_id):
         }), 500
 
 
+def _sharpen_params(data):
+    """Sharpen parameters from a request body - iOS sends 'intensity', web sends 'amount'"""
+    return {
+        'amount': data.get('amount', data.get('intensity', 1.5)),
+        'radius': data.get('radius', 2.0),
+        'threshold': data.get('threshold', 3),
+        'method': data.get('method', 'unsharp'),
+    }
+
+
+def _edit_preview_response(current_user, photo_id, operation, params):
+    """Render an edit preview on the photo's proxy and return it as a JPEG"""
+    from photovault.services.edit_preview_service import edit_preview_service
+    
+    try:
+        photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
+        if not photo:
+            return jsonify({'success': False, 'error': 'Photo not found or access denied'}), 404
+        
+        preview = edit_preview_service.render_preview(photo, operation, params)
+        if preview is None:
+            return jsonify({'success': False, 'error': 'Photo file not found'}), 404
+        
+        return Response(preview, mimetype='image/jpeg')
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid {operation} parameters: {e}'}), 400
+    except Exception as e:
+        logger.error(f"{operation.capitalize()} preview failed for photo {photo_id}: {e}")
+        return jsonify({'success': False, 'error': 'Preview failed'}), 500
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/enhance/preview', methods=['POST'])
+@rate_limit('preview')
+@csrf.exempt
+@token_required
+def preview_enhance_mobile(current_user, photo_id):
+    """
+    Preview an enhancement while the user adjusts it
+
+    Takes the same {"settings": {...}} body as /enhance, renders it on a
+    downscaled proxy of the original and returns the JPEG directly. Nothing
+    is saved; POST to /enhance to render and keep the full-resolution result.
+    """
+    data = request.get_json() or {}
+    return _edit_preview_response(current_user, photo_id, 'enhance', data.get('settings', {}))
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/sharpen/preview', methods=['POST'])
+@rate_limit('preview')
+@csrf.exempt
+@token_required
+def preview_sharpen_mobile(current_user, photo_id):
+    """
+    Preview sharpening while the user adjusts it
+
+    Takes the same body as /sharpen and returns a JPEG rendered on a
+    downscaled proxy. Nothing is saved; POST to /sharpen to keep the result.
+    """
+    return _edit_preview_response(current_user, photo_id, 'sharpen', _sharpen_params(request.get_json() or {}))
+
+
 @mobile_api_bp.route('/photos/<int:photo_id>/sharpen', methods=['POST'])
+@rate_limit('processing')
 @csrf.exempt
 @token_required
 def sharpen_photo_mobile(current_user, photo_id):
@@ -2227,13 +2343,6 @@ def sharpen_photo_mobile(current_user, photo_id):
         }
     """
     try:
-        from photovault.utils.image_enhancement import enhancer
-        from photovault.services.app_storage_service import app_storage
-        from werkzeug.utils import secure_filename as sanitize_name
-        import random
-        from datetime import datetime
-        import io
-        
         # Get photo - match web version
         photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
         
@@ -2252,70 +2361,24 @@ def sharpen_photo_mobile(current_user, photo_id):
                 'error': 'Original photo file not found'
             }), 404
         
-        # Parameters - iOS sends 'intensity', web sends 'amount'
-        # Support both for compatibility
-        data = request.get_json() or {}
-        amount = data.get('amount', data.get('intensity', 1.5))
-        radius = data.get('radius', 2.0)
-        threshold = data.get('threshold', 3)
-        method = data.get('method', 'unsharp')
-        
-        # Generate sharpened filename - match web version format
-        date = datetime.now().strftime('%Y%m%d')
-        random_number = random.randint(100000, 999999)
-        safe_username = sanitize_name(current_user.username)
-        sharpened_filename = f"{safe_username}.{date}.sharp.{random_number}.jpg"
-        
-        logger.info(f"Sharpening photo {photo_id}: original='{photo.filename}', sharpened='{sharpened_filename}'")
-        
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_folder = os.path.join(upload_folder, str(current_user.id))
-        os.makedirs(user_upload_folder, exist_ok=True)
-        temp_sharpened_filepath = os.path.join(user_upload_folder, sharpened_filename)
-        
-        # Apply sharpening - match web version using enhancer
-        output_path = enhancer.sharpen_image(
-            original_path,
-            temp_sharpened_filepath,
-            radius=radius,
-            amount=amount,
-            threshold=threshold,
-            method=method
-        )
+        params = _sharpen_params(request.get_json() or {})
+        amount, radius = params['amount'], params['radius']
+        threshold, method = params['threshold'], params['method']
         
-        # Upload to app storage if available (Railway persistence)
-        sharpened_filepath = temp_sharpened_filepath
-        if app_storage.is_available():
-            with open(temp_sharpened_filepath, 'rb') as f:
-                img_bytes = io.BytesIO(f.read())
-                success, storage_path = app_storage.upload_file(img_bytes, sharpened_filename, str(current_user.id))
-                if success:
-                    sharpened_filepath = storage_path
-                    try:
-                        os.remove(temp_sharpened_filepath)
-                    except:
-                        pass
-        
-        # Update database with sharpened version - match web version with metadata
-        photo.edited_filename = sharpened_filename
-        photo.edited_path = sharpened_filepath
-        photo.enhancement_metadata = {
-            'sharpening': {
-                'radius': radius,
-                'amount': amount,
-                'threshold': threshold,
-                'method': method,
-                'timestamp': str(datetime.now())
-            }
-        }
-        db.session.commit()
+        # Record the edit; the sharpened version is rendered from the original when first viewed
+        edit_stack_service.push(photo, 'sharpen', {
+            'radius': float(radius),
+            'amount': float(amount),
+            'threshold': int(threshold),
+            'method': method
+        })
         
         logger.info(f"Photo {photo_id} sharpened successfully")
         
         return jsonify({
             'success': True,
             'photo_id': photo.id,
-            'enhanced_url': f'/uploads/{current_user.id}/{sharpened_filename}',
+            'enhanced_url': f'/uploads/{current_user.id}/{photo.edited_filename}',
             'message': 'Photo sharpened successfully'
         })
         
@@ -2328,6 +2391,75 @@ def sharpen_photo_mobile(current_user, photo_id):
         }), 500
 
 
+def _edit_history_response(current_user, photo_id, action=None):
+    """Apply an undo/redo/revert to a photo's edits and return the resulting history"""
+    try:
+        photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
+        if not photo:
+            return jsonify({'success': False, 'error': 'Photo not found or access denied'}), 404
+        
+        if action == 'undo' and not edit_stack_service.undo(photo):
+            return jsonify({'success': False, 'error': 'Nothing to undo'}), 400
+        if action == 'redo' and not edit_stack_service.redo(photo):
+            return jsonify({'success': False, 'error': 'Nothing to redo'}), 400
+        if action == 'revert':
+            edit_stack_service.revert(photo)
+        
+        return jsonify({'success': True, 'photo_id': photo.id, 'edits': edit_stack_service.describe(photo)})
+        
+    except Exception as e:
+        logger.error(f"Edit history {action or 'lookup'} failed for photo {photo_id}: {e}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/edits', methods=['GET'])
+@csrf.exempt
+@token_required
+def get_photo_edits_mobile(current_user, photo_id):
+    """
+    A photo's edit history
+    
+    Returns:
+        {
+            "success": bool,
+            "photo_id": int,
+            "edits": {
+                "operations": [{"op": str, "params": {}, "at": str}],  # oldest first
+                "applied": int,      # operations past this index were undone
+                "can_undo": bool,
+                "can_redo": bool,
+                "edited_url": str    # null when no edits are applied
+            }
+        }
+    """
+    return _edit_history_response(current_user, photo_id)
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/edits/undo', methods=['POST'])
+@csrf.exempt
+@token_required
+def undo_photo_edit_mobile(current_user, photo_id):
+    """Undo the last applied edit (same response as GET /edits)"""
+    return _edit_history_response(current_user, photo_id, 'undo')
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/edits/redo', methods=['POST'])
+@csrf.exempt
+@token_required
+def redo_photo_edit_mobile(current_user, photo_id):
+    """Re-apply the last undone edit (same response as GET /edits)"""
+    return _edit_history_response(current_user, photo_id, 'redo')
+
+
+@mobile_api_bp.route('/photos/<int:photo_id>/edits', methods=['DELETE'])
+@csrf.exempt
+@token_required
+def revert_photo_edits_mobile(current_user, photo_id):
+    """Drop all edits and go back to the original (same response as GET /edits)"""
+    return _edit_history_response(current_user, photo_id, 'revert')
+
+
 # ============================================================================
 # VOICE MEMO API - Rewritten for Mobile App with Duration Support
 # ============================================================================
@@ -2357,9 +2489,18 @@ def get_voice_memos(current_user, photo_id):
             'duration': memo.duration or 0,
             'duration_formatted': memo.duration_formatted,
             'file_size_mb': memo.file_size_mb,
+            'waveform': memo.waveform_peaks,  # Peak levels 0..127; empty until analyzed
             'created_at': memo.created_at.isoformat() if memo.created_at else None,
         } for memo in voice_memos]
         
+        # Memos recorded before server-side analysis existed are analyzed on first view
+        pending = [memo.id for memo in voice_memos if memo.analyzed_at is None]
+        if pending:
+            from photovault.services.voice_memo_service import voice_memo_service
+            from photovault.utils.background_jobs import background_jobs
+            for memo_id in pending:
+                background_jobs.submit(voice_memo_service.analyze, memo_id)
+        
         logger.info(f"✅ Found {len(memos_data)} voice memos for photo {photo_id}")
         return jsonify({
             'success': True,
@@ -2375,50 +2516,44 @@ def get_voice_memos(current_user, photo_id):
 
 
 @mobile_api_bp.route('/photos/<int:photo_id>/voice-memos', methods=['POST'])
+@rate_limit('upload')
 @csrf.exempt
 @token_required
 def upload_voice_memo(current_user, photo_id):
-    """Upload a new voice memo with duration"""
+    """Upload a new voice memo with duration (streamed straight to disk)"""
     from photovault.models import VoiceMemo
+    from photovault.services.voice_memo_service import voice_memo_service
+    from werkzeug.exceptions import RequestEntityTooLarge
     
+    upload = None
     try:
-        logger.info(f"🎤 === VOICE MEMO UPLOAD START ===")
-        logger.info(f"📱 User ID: {current_user.id}, Photo ID: {photo_id}")
-        logger.info(f"📦 Request files: {list(request.files.keys())}")
-        logger.info(f"📦 Request form: {dict(request.form)}")
-        logger.info(f"📦 Request headers: {dict(request.headers)}")
-        logger.info(f"📦 Content-Length: {request.content_length}")
-        logger.info(f"📦 Content-Type: {request.content_type}")
-        
-        # Check file size limit
-        max_size = current_app.config.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)
-        logger.info(f"⚙️ Max upload size: {max_size / 1024 / 1024:.2f} MB")
+        logger.info(f"🎤 Voice memo upload: user {current_user.id}, photo {photo_id}, "
+                    f"{request.content_length} bytes ({request.content_type})")
         
-        # Verify photo ownership
+        # Verify photo ownership before reading the body
         photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
         if not photo:
             logger.warning(f"❌ Photo {photo_id} not found for user {current_user.id}")
             return jsonify({'success': False, 'error': 'Photo not found'}), 404
         
+        voice_folder = os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'voice_memos', str(current_user.id))
+        try:
+            upload = voice_memo_service.receive_upload(voice_folder)
+        except RequestEntityTooLarge as e:
+            logger.warning(f"❌ Voice memo too large for user {current_user.id}: {e.description}")
+            return jsonify({'success': False, 'error': e.description}), 413
+        
         # Validate audio file
-        if 'audio' not in request.files:
-            logger.error(f"❌ No audio file in request. Available keys: {list(request.files.keys())}")
+        if upload.file is None:
+            logger.error(f"❌ No audio file in request")
             return jsonify({'success': False, 'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
-        if not audio_file or not audio_file.filename:
-            logger.error(f"❌ Empty audio file")
-            return jsonify({'success': False, 'error': 'Empty audio file'}), 400
-        
-        # Log file details before saving
-        logger.info(f"📄 Audio file: {audio_file.filename}")
-        logger.info(f"📄 Content-Type: {audio_file.content_type}")
+        audio_file = upload.file
         
         # Get duration from form data (sent by iOS app)
-        duration_str = request.form.get('duration', '0')
+        duration_str = upload.form.get('duration', '0')
         try:
             duration = float(duration_str)
-            logger.info(f"⏱️ Recording duration: {duration} seconds")
         except (ValueError, TypeError):
             duration = 0
             logger.warning(f"⚠️ Invalid duration value: {duration_str}, using 0")
@@ -2429,17 +2564,10 @@ def upload_voice_memo(current_user, photo_id):
         file_ext = os.path.splitext(audio_file.filename)[1] or '.m4a'
         filename = f"voice_{current_user.id}_{timestamp}_{unique_id}{file_ext}"
         
-        # Create directory and save file
-        voice_folder = os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'voice_memos', str(current_user.id))
-        os.makedirs(voice_folder, exist_ok=True)
-        logger.info(f"📁 Save directory: {voice_folder}")
-        
         filepath = os.path.join(voice_folder, filename)
-        logger.info(f"💾 Saving to: {filepath}")
-        audio_file.save(filepath)
-        
-        file_size = os.path.getsize(filepath)
-        logger.info(f"💾 Saved successfully: {filename} ({file_size} bytes / {file_size/1024/1024:.2f} MB, duration: {duration}s)")
+        upload.save(filepath)
+        file_size = upload.size
+        logger.info(f"💾 Saved {filename} ({file_size/1024/1024:.2f} MB, duration: {duration}s)")
         
         # Create database record
         memo = VoiceMemo()
@@ -2455,8 +2583,8 @@ def upload_voice_memo(current_user, photo_id):
         db.session.add(memo)
         db.session.commit()
         
+        voice_memo_service.schedule_processing(memo.id)
         logger.info(f"✅ Voice memo {memo.id} uploaded successfully")
-        logger.info(f"🎤 === VOICE MEMO UPLOAD COMPLETE ===")
         
         return jsonify({
             'success': True,
@@ -2472,11 +2600,11 @@ def upload_voice_memo(current_user, photo_id):
         }), 201
         
     except Exception as e:
-        logger.error(f"❌ === VOICE MEMO UPLOAD FAILED ===")
-        logger.error(f"❌ Error type: {type(e).__name__}")
-        logger.error(f"❌ Error message: {str(e)}")
+        logger.error(f"❌ Voice memo upload failed ({type(e).__name__}): {str(e)}")
         import traceback
         logger.error(f"❌ Traceback: {traceback.format_exc()}")
+        if upload is not None:
+            upload.discard()
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e), 'error_type': type(e).__name__}), 500
 
@@ -2530,13 +2658,11 @@ def voice_memo_test(current_user):
 @csrf.exempt
 @token_required
 def download_voice_memo(current_user, memo_id):
-    """Download voice memo audio file"""
+    """Stream voice memo audio (supports Range requests and ETag revalidation)"""
     from photovault.models import VoiceMemo
-    from flask import send_file
+    from photovault.services.voice_memo_service import voice_memo_service
     
     try:
-        logger.info(f"🔊 Downloading voice memo {memo_id} for user {current_user.id}")
-        
         # Verify ownership
         memo = VoiceMemo.query.filter_by(id=memo_id, user_id=current_user.id).first()
         if not memo:
@@ -2548,24 +2674,7 @@ def download_voice_memo(current_user, memo_id):
             logger.error(f"❌ Audio file not found: {memo.file_path}")
             return jsonify({'success': False, 'error': 'Audio file not found'}), 404
         
-        # Determine MIME type
-        mimetype_map = {
-            '.m4a': 'audio/m4a',
-            '.mp3': 'audio/mpeg',
-            '.wav': 'audio/wav',
-            '.aac': 'audio/aac'
-        }
-        file_ext = os.path.splitext(memo.filename)[1].lower()
-        mimetype = mimetype_map.get(file_ext, 'audio/mpeg')
-        
-        logger.info(f"✅ Sending audio file: {memo.filename} ({mimetype})")
-        
-        return send_file(
-            memo.file_path,
-            mimetype=mimetype,
-            as_attachment=False,
-            download_name=memo.original_name
-        )
+        return voice_memo_service.send_audio(memo)
         
     except Exception as e:
         logger.error(f"❌ Download error: {str(e)}")
@@ -2859,96 +2968,28 @@ def bulk_delete_photos_mobile(current_user):
         logger.info(f"🗑️ BULK DELETE REQUEST: {len(photo_ids)} photos, user={current_user.username}")
         logger.info(f"📋 Photo IDs: {photo_ids}")
         
-        deleted_count = 0
-        failed_count = 0
-        errors = []
-        
-        user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id))
-        
-        for photo_id in photo_ids:
-            try:
-                # Get the photo and verify ownership
-                photo = Photo.query.filter_by(id=photo_id, user_id=current_user.id).first()
-                if not photo:
-                    logger.warning(f"❌ Photo {photo_id} not found or access denied")
-                    failed_count += 1
-                    errors.append(f"Photo {photo_id} not found")
-                    continue
-                
-                # Delete associated files
-                files_to_delete = []
-                
-                # Delete original file
-                if photo.file_path:
-                    if os.path.isabs(photo.file_path):
-                        full_path = photo.file_path
-                    else:
-                        full_path = os.path.join(user_upload_dir, photo.file_path)
-                    
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                        files_to_delete.append('original')
-                
-                # Delete thumbnail
-                if photo.thumbnail_path and os.path.exists(photo.thumbnail_path):
-                    os.remove(photo.thumbnail_path)
-                    files_to_delete.append('thumbnail')
-                
-                # Delete edited version if exists
-                if photo.edited_filename:
-                    edited_path = os.path.join(user_upload_dir, photo.edited_filename)
-                    if os.path.exists(edited_path):
-                        os.remove(edited_path)
-                        files_to_delete.append('edited')
-                
-                # Delete associated data
-                from photovault.models import VoiceMemo, VaultPhoto, PhotoPerson, PhotoComment
-                
-                # Delete voice memos
-                voice_memos = VoiceMemo.query.filter_by(photo_id=photo.id).all()
-                for memo in voice_memos:
-                    if memo.file_path and os.path.exists(memo.file_path):
-                        os.remove(memo.file_path)
-                    db.session.delete(memo)
-                
-                # Delete vault photo associations
-                vault_photos = VaultPhoto.query.filter_by(photo_id=photo.id).all()
-                for vault_photo in vault_photos:
-                    db.session.delete(vault_photo)
-                
-                # Delete photo-person tags
-                photo_people = PhotoPerson.query.filter_by(photo_id=photo.id).all()
-                for photo_person in photo_people:
-                    db.session.delete(photo_person)
-                
-                # Delete comments
-                comments = PhotoComment.query.filter_by(photo_id=photo.id).all()
-                for comment in comments:
-                    db.session.delete(comment)
-                
-                # Delete photo record
-                db.session.delete(photo)
-                deleted_count += 1
-                
-                logger.info(f"✅ Photo {photo_id} deleted (files: {files_to_delete})")
-                
-            except Exception as e:
-                logger.error(f"❌ Error deleting photo {photo_id}: {str(e)}")
-                failed_count += 1
-                errors.append(f"Photo {photo_id}: {str(e)}")
-                continue
+        try:
+            photo_ids = [int(pid) for pid in photo_ids]
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'error': 'photo_ids must be integers'}), 400
         
-        # Commit all deletions
-        db.session.commit()
+        # Set-based delete; files are reclaimed by the background reaper
+        from photovault.services.photo_deletion_service import photo_deletion_service
+        result = photo_deletion_service.bulk_delete(current_user.id, photo_ids)
+        deleted_count = len(result['deleted_ids'])
+        missing_ids = result['missing_ids']
         
-        logger.info(f"🎯 BULK DELETE COMPLETE: deleted={deleted_count}, failed={failed_count}")
+        logger.info(f"🎯 BULK DELETE COMPLETE: deleted={deleted_count}, missing={len(missing_ids)}")
         
+        # Ids that are already gone are reported, not failed, so retries are safe
         return jsonify({
             'success': True,
             'message': f'Deleted {deleted_count} photos',
             'deleted_count': deleted_count,
-            'failed_count': failed_count,
-            'errors': errors if errors else None
+            'failed_count': 0,
+            'deleted_ids': result['deleted_ids'],
+            'missing_ids': missing_ids,
+            'errors': None
         }), 200
         
     except Exception as e:
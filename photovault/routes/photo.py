@@ -26,9 +26,11 @@ from photovault.utils.face_recognition import face_recognizer
 
 # Import file handling utilities
 from photovault.utils.file_handler import create_thumbnail
+from photovault.services.edit_stack_service import edit_stack_service
 
 # Import photo detection utilities
 from photovault.utils.photo_detection import detect_photos_in_image, extract_detected_photos
+from photovault.utils.rate_limit import rate_limit
 
 # Import JWT authentication utilities
 from photovault.utils.jwt_auth import hybrid_auth
@@ -178,6 +180,10 @@ def process_uploaded_file(file, upload_source='file'):
         photo.height = image_info['height']
         photo.mime_type = mimetypes.guess_type(file_path)[0]
         photo.upload_source = upload_source
+        
+        from photovault.services.color_mode_service import color_mode_service
+        color_mode_service.classify_photo(photo)
+        
         db.session.add(photo)
         db.session.commit()
         
@@ -219,6 +225,7 @@ def process_uploaded_file(file, upload_source='file'):
         raise
 
 @photo_bp.route('/api/upload', methods=['POST'])
+@rate_limit('upload')
 @csrf.exempt
 @login_required
 def upload_photo():
@@ -672,6 +679,7 @@ def delete_photo(photo_id):
             # Keep original, remove edited version info from database
             photo.edited_filename = None
             photo.edited_path = None
+            edit_stack_service.forget(photo)
             # Reset thumbnail_path to ensure it points to original thumbnail
             if photo.thumbnail_path:
                 # Check if thumbnail exists, if not regenerate from original
@@ -693,7 +701,9 @@ def delete_photo(photo_id):
             photo.updated_at = datetime.utcnow()
             
         elif deletion_type == 'original':
-            # Promote edited version to be the new original
+            # Promote edited version to be the new original (rendering edits not yet viewed)
+            if edit_stack_service.is_pending(photo):
+                edit_stack_service.render(photo)
             if photo.edited_filename and photo.edited_path:
                 # Log this action for troubleshooting gallery issues
                 logger.info(f"Promoting edited version to original for photo {photo.id}: {photo.edited_filename} -> {photo.filename}")
@@ -729,6 +739,7 @@ def delete_photo(photo_id):
                 # NOTE: This will move the photo from edited gallery back to originals gallery
                 photo.edited_filename = None
                 photo.edited_path = None
+                edit_stack_service.forget(photo)
                 photo.updated_at = datetime.utcnow()
                 
                 logger.info(f"Photo {photo.id} promoted: edited version is now the original, will appear in originals gallery")
@@ -786,101 +797,21 @@ def bulk_delete_photos():
                 'error': 'No valid photo IDs provided'
             }), 400
         
-        # Get photos that belong to current user
-        photos_to_delete = Photo.query.filter(
-            Photo.id.in_(photo_ids),
-            Photo.user_id == current_user.id
-        ).all()
-        
-        if not photos_to_delete:
-            return jsonify({
-                'success': False,
-                'error': 'No photos found or access denied'
-            }), 404
-        
-        deleted_count = 0
-        errors = []
-        
-        # Get upload folder for security validation
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-        user_upload_dir = os.path.realpath(os.path.join(upload_folder, str(current_user.id)))
-        
-        def is_safe_path(filepath, base_dir):
-            """Validate that filepath is within base_dir to prevent path traversal"""
-            try:
-                real_path = os.path.realpath(filepath)
-                return real_path.startswith(base_dir + os.sep) or real_path == base_dir
-            except (OSError, ValueError):
-                return False
-        
-        for photo in photos_to_delete:
-            try:
-                # Validate and delete physical files with path security
-                if photo.file_path and os.path.exists(photo.file_path):
-                    if is_safe_path(photo.file_path, user_upload_dir):
-                        os.remove(photo.file_path)
-                
-                if photo.thumbnail_path and os.path.exists(photo.thumbnail_path):
-                    if is_safe_path(photo.thumbnail_path, user_upload_dir):
-                        os.remove(photo.thumbnail_path)
-                    
-                # Delete edited version if it exists
-                if photo.edited_filename:
-                    edited_path = os.path.join(user_upload_dir, photo.edited_filename)
-                    if os.path.exists(edited_path):
-                        os.remove(edited_path)
-                
-                # Delete all associated records that reference this photo
-                from photovault.models import VoiceMemo, VaultPhoto, PhotoPerson, StoryPhoto
-                
-                # Delete associated voice memos
-                voice_memos = VoiceMemo.query.filter_by(photo_id=photo.id).all()
-                for memo in voice_memos:
-                    if memo.file_path and os.path.exists(memo.file_path):
-                        if is_safe_path(memo.file_path, user_upload_dir):
-                            os.remove(memo.file_path)
-                    db.session.delete(memo)
-                
-                # Delete associated vault photo shares
-                vault_photos = VaultPhoto.query.filter_by(photo_id=photo.id).all()
-                for vault_photo in vault_photos:
-                    db.session.delete(vault_photo)
-                
-                # Delete associated photo-person tags
-                photo_people = PhotoPerson.query.filter_by(photo_id=photo.id).all()
-                for photo_person in photo_people:
-                    db.session.delete(photo_person)
-                
-                # Delete associated story photo attachments
-                story_photos = StoryPhoto.query.filter_by(photo_id=photo.id).all()
-                for story_photo in story_photos:
-                    db.session.delete(story_photo)
-                
-                # Delete the photo record
-                db.session.delete(photo)
-                deleted_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error deleting photo {photo.id}: {str(e)}")
-                errors.append(f"Photo {photo.id}: {str(e)}")
-                continue
-        
-        # Commit all deletions
-        db.session.commit()
+        # Set-based delete; files are reclaimed by the background reaper
+        from photovault.services.photo_deletion_service import photo_deletion_service
+        result = photo_deletion_service.bulk_delete(current_user.id, photo_ids)
+        deleted_count = len(result['deleted_ids'])
         
         logger.info(f"Successfully bulk deleted {deleted_count} photos for user {current_user.id}")
         
-        response_data = {
+        # Ids that are already gone are not errors, so retries are safe
+        return jsonify({
             'success': True,
             'deleted_count': deleted_count,
+            'deleted_ids': result['deleted_ids'],
+            'missing_ids': result['missing_ids'],
             'message': f'Successfully deleted {deleted_count} photo{"s" if deleted_count != 1 else ""}'
-        }
-        
-        if errors:
-            response_data['warnings'] = errors
-            response_data['message'] += f' ({len(errors)} photos had errors)'
-        
-        return jsonify(response_data)
+        })
         
     except Exception as e:
         logger.error(f"Error in bulk delete photos: {str(e)}")
@@ -893,12 +824,16 @@ def bulk_delete_photos():
 # Voice Memo API Endpoints
 
 @photo_bp.route('/api/photos/<int:photo_id>/voice-memos', methods=['POST'])
+@rate_limit('upload')
 @csrf.exempt
 @hybrid_auth
 def upload_voice_memo(current_user, photo_id):
     """Upload a voice memo for a photo"""
+    upload = None
     try:
         from photovault.models import VoiceMemo
+        from photovault.services.voice_memo_service import voice_memo_service
+        from werkzeug.exceptions import RequestEntityTooLarge
         import uuid
         import os
         from werkzeug.utils import secure_filename
@@ -908,20 +843,26 @@ def upload_voice_memo(current_user, photo_id):
         if photo.user_id != current_user.id:
             return jsonify({'success': False, 'error': 'Access denied'}), 403
         
+        # Stream the body straight into the user's voice memos directory
+        voice_memo_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id), 'voice_memos')
+        try:
+            upload = voice_memo_service.receive_upload(voice_memo_dir)
+        except RequestEntityTooLarge as e:
+            return jsonify({'success': False, 'error': e.description}), 413
+        
         # Check if audio file was provided
-        if 'audio' not in request.files:
+        if upload.file is None:
             return jsonify({'success': False, 'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
-        if not audio_file.filename:
-            return jsonify({'success': False, 'error': 'No audio file selected'}), 400
+        audio_file = upload.file
         
         # Validate audio file type (handle codec variations)
-        content_type = audio_file.content_type.lower()
+        content_type = (audio_file.content_type or '').lower()
         base_type = content_type.split(';')[0].strip()  # Remove codec specifications
         
         allowed_audio_types = {'audio/webm', 'audio/wav', 'audio/mp3', 'audio/ogg', 'audio/mp4', 'audio/mpeg', 'audio/m4a', 'audio/x-m4a'}
         if base_type not in allowed_audio_types:
+            upload.discard()
             return jsonify({'success': False, 'error': f'Invalid audio file type: {content_type}'}), 400
         
         # Generate unique filename
@@ -930,21 +871,15 @@ def upload_voice_memo(current_user, photo_id):
         file_extension = audio_file.filename.rsplit('.', 1)[1].lower() if '.' in audio_file.filename else 'webm'
         filename = f"voice_memo_{photo_id}_{timestamp}_{unique_id}.{file_extension}"
         
-        # Create voice memos directory
-        voice_memo_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id), 'voice_memos')
-        os.makedirs(voice_memo_dir, exist_ok=True)
-        
-        # Save audio file
+        # Move the streamed file into place
         file_path = os.path.join(voice_memo_dir, filename)
-        audio_file.save(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        upload.save(file_path)
+        file_size = upload.size
         
         # Get optional metadata from request
-        title = request.form.get('title', '').strip()
-        transcript = request.form.get('transcript', '').strip()
-        duration = request.form.get('duration')  # Duration in seconds from frontend
+        title = upload.form.get('title', '').strip()
+        transcript = upload.form.get('transcript', '').strip()
+        duration = upload.form.get('duration')  # Duration in seconds from frontend
         
         # Convert duration to float if provided
         try:
@@ -980,6 +915,7 @@ def upload_voice_memo(current_user, photo_id):
         db.session.add(voice_memo)
         db.session.commit()
         
+        voice_memo_service.schedule_processing(voice_memo.id)
         logger.info(f"Voice memo uploaded for photo {photo_id} by user {current_user.id}")
         
         return jsonify({
@@ -999,6 +935,8 @@ def upload_voice_memo(current_user, photo_id):
         
     except Exception as e:
         logger.error(f"Error uploading voice memo for photo {photo_id}: {str(e)}")
+        if upload is not None:
+            upload.discard()
         db.session.rollback()
         return jsonify({'success': False, 'error': 'Failed to upload voice memo'}), 500
 
@@ -1026,6 +964,7 @@ def get_voice_memos(current_user, photo_id):
                 'duration': memo.duration,
                 'duration_formatted': memo.duration_formatted,
                 'file_size_mb': memo.file_size_mb,
+                'waveform': memo.waveform_peaks,
                 'title': memo.title,
                 'transcript': memo.transcript,
                 'created_at': memo.created_at.isoformat(),
@@ -1048,7 +987,7 @@ def serve_voice_memo(current_user, memo_id):
     """Serve/download a voice memo file"""
     try:
         from photovault.models import VoiceMemo
-        from flask import send_file
+        from photovault.services.voice_memo_service import voice_memo_service
         
         # Get the voice memo and verify ownership
         voice_memo = VoiceMemo.query.get_or_404(memo_id)
@@ -1059,13 +998,8 @@ def serve_voice_memo(current_user, memo_id):
         if not os.path.exists(voice_memo.file_path):
             return jsonify({'success': False, 'error': 'Voice memo file not found'}), 404
         
-        # Serve the file
-        return send_file(
-            voice_memo.file_path,
-            mimetype=voice_memo.mime_type,
-            as_attachment=False,
-            download_name=voice_memo.original_name
-        )
+        # Serve the file (Range/206 and ETag revalidation)
+        return voice_memo_service.send_audio(voice_memo)
         
     except Exception as e:
         logger.error(f"Error serving voice memo {memo_id}: {str(e)}")
@@ -1173,6 +1107,7 @@ def internal_error(e):
 # Face Detection API Endpoints
 
 @photo_bp.route('/api/photos/<int:photo_id>/detect-faces', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def detect_faces_in_photo_api(photo_id):
     """
@@ -1370,6 +1305,7 @@ def assign_face_to_person(face_id):
 
 
 @photo_bp.route('/api/photos/batch-detect-faces', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def batch_detect_faces():
     """
@@ -1784,6 +1720,7 @@ def get_ai_metadata(photo_id):
         }), 500
 
 @photo_bp.route('/api/photos/<int:photo_id>/auto-detect', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def auto_detect_photos(photo_id):
     """Automatically detect and extract photos from a larger image"""
@@ -1815,10 +1752,13 @@ def auto_detect_photos(photo_id):
         extract_dir = os.path.join(user_upload_dir, 'auto_extracted')
         os.makedirs(extract_dir, exist_ok=True)
         
-        # Extract detected photos
-        extracted_photos = extract_detected_photos(photo.file_path, extract_dir, detected_photos)
+        # Extract detected photos (warp, encode and thumbnail run in parallel)
+        extracted_photos = extract_detected_photos(photo.file_path, extract_dir, detected_photos,
+                                                   thumbnail_size=(400, 400))
         
-        # Save extracted photos to database
+        # Build all Photo records, then save them in one round trip
+        from photovault.services.color_mode_service import color_mode_service
+        new_photos = []
         saved_photos = []
         
         for extracted in extracted_photos:
@@ -1829,20 +1769,18 @@ def auto_detect_photos(photo_id):
                 base_name = f"{current_user.username}_auto_extract_{timestamp}_{unique_id}"
                 final_filename = f"{base_name}.jpg"
                 
-                # Move file to main upload directory
+                # Move file (and its thumbnail) to main upload directory
                 final_path = os.path.join(user_upload_dir, final_filename)
                 os.rename(extracted['file_path'], final_path)
                 
-                # Get image dimensions
-                with Image.open(final_path) as img:
-                    width, height = img.size
+                thumbnail_path = None
+                if extracted.get('thumbnail_path'):
+                    thumbnail_path = os.path.join(user_upload_dir, f"{base_name}_thumb.jpg")
+                    os.rename(extracted['thumbnail_path'], thumbnail_path)
                 
-                # Create thumbnail using the imported utility function
-                from photovault.utils.file_handler import create_thumbnail as create_thumb_util
-                success, thumbnail_result = create_thumb_util(final_path)
-                thumbnail_path = thumbnail_result if success else None
+                width = extracted['extracted_width']
+                height = extracted['extracted_height']
                 
-                # Create Photo record
                 new_photo = Photo(
                     filename=final_filename,
                     file_path=final_path,
@@ -1850,15 +1788,13 @@ def auto_detect_photos(photo_id):
                     user_id=current_user.id,
                     width=width,
                     height=height,
-                    file_size=os.path.getsize(final_path),
+                    file_size=extracted['file_size'],
                     upload_source='auto_extract'
                 )
-                
-                db.session.add(new_photo)
-                db.session.flush()  # Get the ID
+                color_mode_service.classify_photo(new_photo)
+                new_photos.append(new_photo)
                 
                 saved_photos.append({
-                    'id': new_photo.id,
                     'filename': final_filename,
                     'confidence': extracted['confidence'],
                     'width': width,
@@ -1871,8 +1807,18 @@ def auto_detect_photos(photo_id):
                 logger.error(f"Failed to save extracted photo: {e}")
                 continue
         
+        db.session.add_all(new_photos)
         db.session.commit()
         
+        for new_photo, saved in zip(new_photos, saved_photos):
+            saved['id'] = new_photo.id
+        
+        # Face detection is slow and not needed for the response
+        from photovault.utils.background_jobs import background_jobs
+        from photovault.services.face_detection_service import face_detection_service
+        for new_photo in new_photos:
+            background_jobs.submit(face_detection_service.process_photo_by_id, new_photo.id)
+        
         # Clean up temporary extraction directory
         try:
             import shutil
@@ -2213,6 +2159,7 @@ def recover_corrupted_photo(photo_id):
 
 
 @photo_bp.route('/api/photo/<int:photo_id>/colorize', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def colorize_photo_route(photo_id):
     """
@@ -2380,7 +2327,8 @@ def check_grayscale_route(photo_id):
         JSON with is_grayscale boolean
     """
     try:
-        from photovault.utils.colorization import get_colorizer
+        from photovault.services.color_mode_service import color_mode_service
+        from photovault.utils.colorization import COLOR_MODE_GRAYSCALE, MONOCHROME_COLOR_MODES
         
         photo = Photo.query.get_or_404(photo_id)
         
@@ -2390,28 +2338,21 @@ def check_grayscale_route(photo_id):
                 'error': 'Unauthorized access to this photo'
             }), 403
         
-        colorizer = get_colorizer()
-        
-        try:
-            is_grayscale = colorizer.is_grayscale(photo.file_path)
-        except FileNotFoundError as e:
-            logger.error(f"Photo file not found: {str(e)}")
+        # Stored at ingest; legacy rows are classified once on first check
+        color_mode = color_mode_service.get_color_mode(photo)
+        if color_mode is None:
+            logger.error(f"Photo file missing or unreadable for grayscale check: {photo.file_path}")
             return jsonify({
                 'success': False,
                 'error': 'Photo file not found or has been deleted'
             }), 404
-        except RuntimeError as e:
-            logger.error(f"Photo file corrupted: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': 'Photo file is corrupted or invalid'
-            }), 500
         
         return jsonify({
             'success': True,
             'photo_id': photo_id,
-            'is_grayscale': is_grayscale,
-            'can_colorize': is_grayscale
+            'is_grayscale': color_mode == COLOR_MODE_GRAYSCALE,
+            'color_mode': color_mode,
+            'can_colorize': color_mode in MONOCHROME_COLOR_MODES
         })
         
     except Exception as e:
@@ -9,7 +9,8 @@ from flask_login import login_required, current_user
 from werkzeug.exceptions import RequestEntityTooLarge
 from photovault.utils.file_handler import validate_image_file, generate_unique_filename
 from photovault.utils.enhanced_file_handler import save_uploaded_file_enhanced, delete_file_enhanced
-from photovault.utils.photo_detection import detect_photos_in_image, extract_detected_photos
+from photovault.utils.photo_detection import detect_photos_in_image, extract_detected_photos, MAX_DETECTION_PIXELS
+from photovault.utils.rate_limit import rate_limit
 import logging
 
 # Configure logging
@@ -29,6 +30,7 @@ def photo_detection_page():
     return render_template('photo_detection.html', title='Photo Detection & Cropping')
 
 @photo_detection_bp.route('/api/photo-detection/upload', methods=['POST'])
+@rate_limit('upload')
 @login_required
 def upload_for_detection():
     """
@@ -55,7 +57,8 @@ def upload_for_detection():
         logger.info(f"Processing file: {file.filename}")
         
         # Validate file
-        is_valid, validation_msg = validate_image_file(file)
+        # Flatbed album scans routinely exceed the regular upload dimension limit
+        is_valid, validation_msg = validate_image_file(file, max_dimension=None)
         if not is_valid:
             return jsonify({
                 'success': False,
@@ -87,13 +90,13 @@ def upload_for_detection():
             from PIL import Image as PILImage
             with PILImage.open(file_path) as img:
                 width, height = img.size
-                # Limit image size to prevent memory exhaustion
-                max_pixels = 25000000  # ~25MP limit to match detection logic
-                if width * height > max_pixels:
+                # Large scans are detected on a reduced pyramid level; only
+                # reject images beyond the decompression-bomb ceiling
+                if width * height > MAX_DETECTION_PIXELS:
                     delete_file_enhanced(file_path)
                     return jsonify({
                         'success': False,
-                        'error': f'Image too large ({width}x{height} pixels). Maximum supported size is 25 megapixels.'
+                        'error': f'Image too large ({width}x{height} pixels). Maximum supported size is {MAX_DETECTION_PIXELS // 1000000} megapixels.'
                     }), 400
         except Exception as e:
             delete_file_enhanced(file_path)
@@ -151,6 +154,7 @@ def upload_for_detection():
         }), 500
 
 @photo_detection_bp.route('/api/photo-detection/extract', methods=['POST'])
+@rate_limit('processing')
 @login_required
 def extract_detected_photos_api():
     """
@@ -221,18 +225,19 @@ def extract_detected_photos_api():
         saved_photos = []
         from photovault.models import Photo
         from photovault.extensions import db
-        from photovault.utils.file_handler import get_image_dimensions
+        from photovault.utils.colorization import classify_color_mode
         from PIL import Image
         
         try:
-            
+            new_photos = []
             for extracted_photo in extracted_photos:
                 file_path_full = extracted_photo['file_path']
                 filename = extracted_photo['filename']
                 
-                # Get image metadata
-                width, height = get_image_dimensions(file_path_full)
-                file_size = os.path.getsize(file_path_full)
+                # Dimensions and size are reported by the extractor
+                width = extracted_photo['extracted_width']
+                height = extracted_photo['extracted_height']
+                file_size = extracted_photo['file_size']
                 
                 # Create relative path for database storage
                 user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id))
@@ -251,7 +256,13 @@ def extract_detected_photos_api():
                 new_photo.user_id = current_user.id
                 new_photo.processing_notes = f"Extracted via photo detection with {extracted_photo['confidence']:.2f} confidence"
                 
-                db.session.add(new_photo)
+                # file_path is stored relative, so classify from the absolute path
+                try:
+                    new_photo.color_mode = classify_color_mode(file_path_full)
+                except (FileNotFoundError, RuntimeError) as e:
+                    logger.warning(f"Color mode classification failed for {filename}: {e}")
+                
+                new_photos.append(new_photo)
                 saved_photos.append({
                     'filename': filename,
                     'width': width,
@@ -259,6 +270,7 @@ def extract_detected_photos_api():
                     'confidence': extracted_photo['confidence']
                 })
             
+            db.session.add_all(new_photos)
             db.session.commit()
             logger.info(f"Successfully saved {len(saved_photos)} extracted photos to database for user {current_user.id}")
             
@@ -4,10 +4,14 @@ Combines automatic face detection with manual tagging capabilities
 """
 
 import logging
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, Response
 from flask_login import login_required, current_user
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import lazyload, selectinload
 from photovault.models import Photo, Person, PhotoPerson, db
 from photovault.services.face_detection_service import face_detection_service
+from photovault.services.face_chip_service import face_chip_service
+from photovault.utils.http_caching import cache_policy, PRIVATE_IMMUTABLE
 from photovault.extensions import csrf
 
 logger = logging.getLogger(__name__)
@@ -23,10 +27,10 @@ def smart_tagging_page():
     stats = face_detection_service.get_face_detection_stats(current_user.id)
     
     # Get photos with detected faces (unverified tags)
-    photos_with_faces = db.session.query(Photo).join(PhotoPerson).filter(
+    photos_with_faces = Photo.query.filter(
         Photo.user_id == current_user.id,
-        PhotoPerson.verified.is_(False)
-    ).distinct().limit(50).all()
+        exists().where(and_(PhotoPerson.photo_id == Photo.id, PhotoPerson.verified.is_(False)))
+    ).limit(50).all()
     
     return render_template('smart_tagging.html',
                          title='Smart Face Tagging',
@@ -41,19 +45,28 @@ def get_photos_with_faces():
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
         
-        # Query photos with face tags
-        query = db.session.query(Photo).join(PhotoPerson).filter(
-            Photo.user_id == current_user.id
-        ).distinct()
+        # Photos with at least one (matching) face tag - EXISTS rather than a
+        # join, so no DISTINCT is needed and each photo appears once
+        tag_filter = PhotoPerson.photo_id == Photo.id
         
         # Apply filters
         verified_only = request.args.get('verified_only', 'false').lower() == 'true'
         unverified_only = request.args.get('unverified_only', 'false').lower() == 'true'
         
         if verified_only:
-            query = query.filter(PhotoPerson.verified == True)
+            tag_filter = and_(tag_filter, PhotoPerson.verified.is_(True))
         elif unverified_only:
-            query = query.filter(PhotoPerson.verified == False)
+            tag_filter = and_(tag_filter, PhotoPerson.verified.is_(False))
+        
+        # Every tag of the page's photos (and their people) arrives in one
+        # selectin round trip instead of a query per photo and per tag
+        query = Photo.query.options(
+            lazyload(Photo.people),
+            selectinload(Photo.photo_people_records).joinedload(PhotoPerson.person)
+        ).filter(
+            Photo.user_id == current_user.id,
+            exists().where(tag_filter)
+        ).order_by(Photo.created_at.desc(), Photo.id.desc())
         
         # Paginate
         photos = query.paginate(
@@ -64,11 +77,8 @@ def get_photos_with_faces():
         
         result = []
         for photo in photos.items:
-            # Get face tags for this photo
-            face_tags = PhotoPerson.query.filter_by(photo_id=photo.id).all()
-            
             faces_info = []
-            for tag in face_tags:
+            for tag in sorted(photo.photo_people_records, key=lambda record: record.id):
                 face_info = {
                     'tag_id': tag.id,
                     'person_id': tag.person_id,
@@ -89,6 +99,11 @@ def get_photos_with_faces():
                         'height': tag.face_box_height
                     }
                 
+                # Cropped face, versioned by its box so clients can cache it for good
+                chip_version = face_chip_service.chip_version(tag)
+                if chip_version:
+                    face_info['chip_url'] = f"/api/face-chip/{tag.id}?v={chip_version}"
+                
                 faces_info.append(face_info)
             
             result.append({
@@ -117,6 +132,24 @@ def get_photos_with_faces():
         logger.error(f"Error getting photos with faces: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@smart_tagging_bp.route('/api/face-chip/<int:tag_id>')
+@login_required
+@cache_policy(PRIVATE_IMMUTABLE)  # chip_url carries the face box, so a moved box gets a new URL
+def get_face_chip(tag_id):
+    """Cropped face for a tag, cut once and served from the shared cache"""
+    row = db.session.query(PhotoPerson, Photo).join(Photo, PhotoPerson.photo_id == Photo.id).filter(
+        PhotoPerson.id == tag_id,
+        Photo.user_id == current_user.id
+    ).first()
+    if row is None:
+        return jsonify({'success': False, 'error': 'Tag not found'}), 404
+    
+    tag, photo = row
+    chip = face_chip_service.get_chip(tag, photo)
+    if chip is None:
+        return jsonify({'success': False, 'error': 'No face chip available'}), 404
+    return Response(chip, mimetype='image/jpeg')
+
 @smart_tagging_bp.route('/api/people')
 @login_required
 def get_people():
@@ -19,6 +19,8 @@ from photovault.utils.metadata_extractor import extract_metadata_for_photo
 from photovault.utils.image_enhancement import enhance_for_old_photo
 from photovault.utils.face_detection import detect_faces_in_photo
 from photovault.utils.face_recognition import face_recognizer
+from photovault.services.color_mode_service import color_mode_service
+from photovault.utils.rate_limit import rate_limit
 import logging
 
 # Configure logging
@@ -34,6 +36,7 @@ def upload_page():
     return render_template('upload.html', title='Upload Photos')
 
 @upload_bp.route('/api/upload', methods=['POST'])
+@rate_limit('upload')
 @login_required
 def upload_photos():
     """
@@ -148,6 +151,9 @@ def upload_photos():
                         auto_enhanced=photo_metadata.get('auto_enhanced', False)
                     )
                     
+                    # Classify grayscale/sepia/color once from the thumbnail
+                    color_mode_service.classify_photo(photo)
+                    
                     db.session.add(photo)
                     db.session.commit()
                     
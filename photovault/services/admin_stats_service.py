@@ -0,0 +1,217 @@
+"""
+Admin Stats Service for PhotoVault
+System-wide counters for the admin pages, read from a per-user rollup
+
+The admin dashboard, statistics page and statistics API used to load every
+user and photo row and count in Python. They now read UserPhotoStats, one row
+per user with photos, so their cost grows with the number of users rather
+than the number of photos:
+
+    totals       SUM over the rollup
+    per user     User LEFT JOIN the rollup
+    most active  ORDER BY total_photos DESC LIMIT n on the rollup
+
+A user's row is recomputed (one GROUP BY over that user's photos) in the
+background after any commit that adds, deletes or resizes their photos.
+Query-level bulk writes bypass the hook and call schedule_refresh()
+themselves. scripts/refresh_admin_stats.py rebuilds the whole table and can
+run on a schedule to correct any drift.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from flask import has_app_context
+from sqlalchemy import event, func, case, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from photovault.models import User, Photo, UserPhotoStats
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Window for "recent" users and uploads
+RECENT_DAYS = 30
+
+MOST_ACTIVE_LIMIT = 10
+
+# Users recomputed per statement
+REFRESH_BATCH_SIZE = 500
+
+# Photo columns the counters depend on
+COUNTED_COLUMNS = ('user_id', 'edited_filename', 'file_size')
+
+
+class AdminStatsService:
+    """Service for the admin pages' system-wide counters"""
+
+    def __init__(self):
+        self._populated = False
+
+    def refresh_users(self, user_ids: Iterable[int]) -> None:
+        """
+        Recompute the rollup rows for these users and commit
+
+        Users left without photos lose their row.
+
+        Args:
+            user_ids: Users whose photos changed
+        """
+        ids = sorted({int(user_id) for user_id in user_ids if user_id})
+        for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+            batch = ids[start:start + REFRESH_BATCH_SIZE]
+            self._replace_rows(Photo.user_id.in_(batch), UserPhotoStats.user_id.in_(batch))
+
+    def rebuild(self) -> int:
+        """
+        Recompute the whole rollup in one GROUP BY and commit
+
+        Returns:
+            Number of users with photos
+        """
+        count = self._replace_rows(None, None)
+        self._populated = True
+        logger.info(f"Rebuilt admin photo stats for {count} users")
+        return count
+
+    def schedule_refresh(self, user_ids: Iterable[int]) -> None:
+        """Queue refresh_users on the background job queue"""
+        user_ids = sorted(set(user_ids))
+        if not user_ids or not has_app_context():
+            return
+        from photovault.utils.background_jobs import background_jobs
+        background_jobs.submit(self.refresh_users, user_ids)
+
+    def _replace_rows(self, photo_filter, stats_filter) -> int:
+        rows = db.session.query(
+            Photo.user_id,
+            func.count(Photo.id),
+            func.count(Photo.edited_filename),
+            func.coalesce(func.sum(Photo.file_size), 0)
+        )
+        if photo_filter is not None:
+            rows = rows.filter(photo_filter)
+        rows = rows.group_by(Photo.user_id).all()
+
+        now = datetime.utcnow()
+        mappings = [{'user_id': user_id, 'total_photos': total, 'edited_photos': edited,
+                     'total_size_bytes': int(size), 'refreshed_at': now}
+                    for user_id, total, edited, size in rows]
+
+        # Two refreshes of the same user can race to insert its row; the loser
+        # retries against the winner's committed state
+        for attempt in range(2):
+            try:
+                stale = UserPhotoStats.query
+                if stats_filter is not None:
+                    stale = stale.filter(stats_filter)
+                stale.delete(synchronize_session=False)
+                if mappings:
+                    db.session.bulk_insert_mappings(UserPhotoStats, mappings)
+                db.session.commit()
+                return len(mappings)
+            except IntegrityError:
+                db.session.rollback()
+                if attempt:
+                    raise
+        return len(mappings)
+
+    def _ensure_populated(self) -> None:
+        # First read after the table was created without the migration's seed
+        if self._populated:
+            return
+        if db.session.query(UserPhotoStats.user_id).first() is None \
+                and db.session.query(Photo.id).first() is not None:
+            self.rebuild()
+        self._populated = True
+
+    def totals(self) -> Dict:
+        """
+        System-wide counters
+
+        Returns:
+            dict with 'users' (total, admins, superusers, recent), 'photos'
+            (total, edited, recent_uploads) and 'total_size_bytes'
+        """
+        self._ensure_populated()
+        cutoff = datetime.utcnow() - timedelta(days=RECENT_DAYS)
+
+        total_users, admins, superusers, recent_users = db.session.query(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.is_admin == True, 1), else_=0)), 0),  # noqa: E712
+            func.coalesce(func.sum(case((User.is_superuser == True, 1), else_=0)), 0),  # noqa: E712
+            func.coalesce(func.sum(case((User.created_at >= cutoff, 1), else_=0)), 0)
+        ).one()
+
+        total_photos, edited_photos, total_size = db.session.query(
+            func.coalesce(func.sum(UserPhotoStats.total_photos), 0),
+            func.coalesce(func.sum(UserPhotoStats.edited_photos), 0),
+            func.coalesce(func.sum(UserPhotoStats.total_size_bytes), 0)
+        ).one()
+
+        # Range count on ix_photo_created_at - grows with recent uploads only
+        recent_uploads = db.session.query(func.count(Photo.id)).filter(Photo.created_at >= cutoff).scalar()
+
+        return {
+            'users': {'total': total_users, 'admins': int(admins), 'superusers': int(superusers),
+                      'recent': int(recent_users)},
+            'photos': {'total': int(total_photos), 'edited': int(edited_photos),
+                       'recent_uploads': recent_uploads},
+            'total_size_bytes': int(total_size),
+        }
+
+    def users_with_stats(self) -> List[Tuple]:
+        """(user, total_photos, edited_photos, total_size) for every user, newest first"""
+        self._ensure_populated()
+        rows = db.session.query(
+            User,
+            func.coalesce(UserPhotoStats.total_photos, 0),
+            func.coalesce(UserPhotoStats.edited_photos, 0),
+            func.coalesce(UserPhotoStats.total_size_bytes, 0)
+        ).outerjoin(UserPhotoStats, UserPhotoStats.user_id == User.id).order_by(User.created_at.desc()).all()
+        return [tuple(row) for row in rows]
+
+    def most_active_users(self, limit: int = MOST_ACTIVE_LIMIT) -> List[Tuple[str, int]]:
+        """(username, photo count) for the users with the most photos"""
+        self._ensure_populated()
+        rows = db.session.query(User.username, UserPhotoStats.total_photos).join(
+            User, User.id == UserPhotoStats.user_id
+        ).filter(UserPhotoStats.total_photos > 0).order_by(
+            UserPhotoStats.total_photos.desc(), User.username
+        ).limit(limit).all()
+        return [(username, count) for username, count in rows]
+
+
+# Global instance
+admin_stats_service = AdminStatsService()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stats_changes(session, flush_context):
+    """Note users whose photo counters may have changed; refreshed once committed"""
+    pending = session.info.setdefault('admin_stats_refresh', set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Photo) and obj.user_id:
+            pending.add(obj.user_id)
+    for obj in session.dirty:
+        if not isinstance(obj, Photo):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[column].history.has_changes() for column in COUNTED_COLUMNS):
+            pending.add(obj.user_id)
+            # A photo moved to another user changes the previous owner's counters too
+            pending.update(user_id for user_id in state.attrs.user_id.history.deleted if user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_stats(session):
+    pending = session.info.pop('admin_stats_refresh', None)
+    if pending:
+        admin_stats_service.schedule_refresh(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stats_changes(session):
+    session.info.pop('admin_stats_refresh', None)
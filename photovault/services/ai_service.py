@@ -12,11 +12,10 @@ from PIL import Image
 import io
 import json
 
-from google import genai
-from google.genai import types
-
 logger = logging.getLogger(__name__)
 
+COLORIZATION_MODEL = "gemini-2.0-flash-exp"
+
 class AIService:
     """Handles AI-powered image processing using Google Gemini"""
     
@@ -27,6 +26,8 @@ class AIService:
             logger.warning("GEMINI_API_KEY not found - AI features will be disabled")
             self.client = None
         else:
+            # google-genai is slow to import - only pay for it when a key is configured
+            from google import genai
             self.client = genai.Client(api_key=self.api_key)
             logger.info("AI service initialized successfully with Google Gemini")
     
@@ -34,6 +35,37 @@ class AIService:
         """Check if AI service is available"""
         return self.client is not None
     
+    def colorization_guidance(self, image_bytes: bytes) -> Dict:
+        """
+        Ask the AI for realistic colors for a black and white photo
+        
+        Args:
+            image_bytes: JPEG bytes of the photo
+            
+        Returns:
+            dict with 'ai_guidance' text and the 'model' that produced it
+        """
+        if not self.is_available():
+            raise RuntimeError("AI service not available - GEMINI_API_KEY not configured")
+        
+        from google.genai import types
+        
+        # Request AI colorization guidance using Gemini
+        response = self.client.models.generate_content(
+            model=COLORIZATION_MODEL,
+            contents=[
+                types.Part.from_bytes(
+                    data=image_bytes,
+                    mime_type="image/jpeg",
+                ),
+                "Analyze this black and white photo in detail. Provide realistic color suggestions for different elements in the image. Be specific about colors, tones, and natural appearances for the main subjects, background, clothing, objects, and any other visible elements. Describe what colors would be most natural and historically accurate."
+            ],
+        )
+        
+        color_guidance = response.text if response.text else "No guidance available"
+        logger.info(f"AI colorization guidance generated: {len(color_guidance)} chars")
+        return {'ai_guidance': color_guidance, 'model': COLORIZATION_MODEL}
+    
     def colorize_image_ai(self, image_path: str, output_path: str) -> Tuple[str, Dict]:
         """
         Colorize black and white image using AI
@@ -45,28 +77,10 @@ class AIService:
         Returns:
             Tuple of (output_path, metadata_dict)
         """
-        if not self.is_available():
-            raise RuntimeError("AI service not available - GEMINI_API_KEY not configured")
-        
         try:
             # Read image as bytes
             with open(image_path, "rb") as f:
-                image_bytes = f.read()
-            
-            # Request AI colorization guidance using Gemini
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=[
-                    types.Part.from_bytes(
-                        data=image_bytes,
-                        mime_type="image/jpeg",
-                    ),
-                    "Analyze this black and white photo in detail. Provide realistic color suggestions for different elements in the image. Be specific about colors, tones, and natural appearances for the main subjects, background, clothing, objects, and any other visible elements. Describe what colors would be most natural and historically accurate."
-                ],
-            )
-            
-            color_guidance = response.text if response.text else "No guidance available"
-            logger.info(f"AI colorization guidance generated: {len(color_guidance)} chars")
+                guidance = self.colorization_guidance(f.read())
             
             # Use the existing DNN colorization but store AI guidance
             from photovault.utils.colorization import get_colorizer
@@ -77,8 +91,7 @@ class AIService:
             
             metadata = {
                 'method': 'ai_guided_' + method,
-                'ai_guidance': color_guidance,
-                'model': 'gemini-2.0-flash-exp'
+                **guidance
             }
             
             return result_path, metadata
@@ -100,6 +113,8 @@ class AIService:
         if not self.is_available():
             raise RuntimeError("AI service not available - GEMINI_API_KEY not configured")
         
+        from google.genai import types
+        
         try:
             # Read image as bytes
             with open(image_path, "rb") as f:
@@ -151,6 +166,8 @@ class AIService:
         if not self.is_available():
             raise RuntimeError("AI service not available - GEMINI_API_KEY not configured")
         
+        from google.genai import types
+        
         try:
             # Read image as bytes
             with open(image_path, "rb") as f:
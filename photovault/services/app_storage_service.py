@@ -2,43 +2,127 @@
 
 import os
 import io
+import shutil
 import logging
-from typing import Optional, Tuple, BinaryIO
-from flask import current_app
-from replit.object_storage import Client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, BinaryIO
 from PIL import Image
+from photovault.services.storage_backends import (
+    StorageBackend, ReplitBackend, S3Backend, ObjectInfo, StorageError, COPY_CHUNK_SIZE
+)
+from photovault.utils.cache import SharedCache
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TRANSFER_WORKERS = 8
+METADATA_TTL = 60
+# Misses are cached briefly: another worker may be about to write the object
+MISSING_TTL = 5
+
+# Metadata stays in process memory whatever CACHE_BACKEND is configured: a
+# shared-cache round trip would cost about as much as the HEAD it saves
+_metadata = SharedCache().namespace('storage_metadata', ttl=METADATA_TTL)
+_UNKNOWN = object()
+
+
+def _on_replit() -> bool:
+    return bool(os.environ.get('REPLIT_DB_URL') or os.environ.get('REPL_ID'))
+
+
 class AppStorageService:
-    """Service for handling file storage using Replit App Storage"""
+    """Service for handling file storage in App Storage (Replit or S3-compatible)"""
     
     def __init__(self):
-        """Initialize the App Storage client"""
+        """Default to Replit App Storage when running on Replit; init_app() applies config"""
+        self.backend: Optional[StorageBackend] = None
+        self.transfer_workers = DEFAULT_TRANSFER_WORKERS
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        
+        if not _on_replit():
+            logger.info("Not in Replit environment, skipping App Storage initialization")
+            return
+        self._use_backend('replit', {})
+    
+    def init_app(self, app) -> None:
+        """Select the backend from STORAGE_BACKEND ('auto', 'replit', 's3' or 'local')"""
+        self.transfer_workers = max(1, int(app.config.get('STORAGE_TRANSFER_WORKERS') or DEFAULT_TRANSFER_WORKERS))
+        self._use_backend((app.config.get('STORAGE_BACKEND') or 'auto').lower(), app.config)
+    
+    def _use_backend(self, choice: str, config) -> None:
+        if choice == 'auto':
+            if config.get('STORAGE_S3_BUCKET'):
+                choice = 's3'
+            elif _on_replit():
+                choice = 'replit'
+            else:
+                choice = 'local'
+        
         try:
-            # Check if we're in Replit environment
-            import os
-            if not os.environ.get('REPLIT_DB_URL') and not os.environ.get('REPL_ID'):
-                logger.info("Not in Replit environment, skipping App Storage initialization")
-                self.client = None
-                return
-                
-            self.client = Client()
-            logger.info("App Storage client initialized successfully")
+            if choice == 'replit':
+                backend = ReplitBackend(config.get('STORAGE_REPLIT_BUCKET'))
+                backend.client  # Fail now rather than on the first upload
+            elif choice == 's3':
+                if not config.get('STORAGE_S3_BUCKET'):
+                    raise StorageError('STORAGE_S3_BUCKET is not set')
+                backend = S3Backend(
+                    bucket=config['STORAGE_S3_BUCKET'],
+                    endpoint_url=config.get('STORAGE_S3_ENDPOINT'),
+                    region=config.get('STORAGE_S3_REGION'),
+                    access_key=config.get('STORAGE_S3_ACCESS_KEY'),
+                    secret_key=config.get('STORAGE_S3_SECRET_KEY'),
+                    max_connections=self.transfer_workers + 2
+                )
+            elif choice == 'local':
+                # Files stay on the local filesystem (see enhanced_file_handler)
+                backend = None
+            else:
+                raise StorageError(f"Unknown STORAGE_BACKEND: {choice}")
         except Exception as e:
             logger.error(f"Failed to initialize App Storage client: {str(e)}")
-            self.client = None
+            backend = None
+        
+        self.backend = backend
+        _metadata.clear()
+        if backend is not None:
+            logger.info(f"App Storage client initialized successfully ({backend.name})")
     
     def is_available(self) -> bool:
         """Check if App Storage is available"""
-        return self.client is not None
+        return self.backend is not None
+    
+    def stat(self, object_path: str) -> Optional[ObjectInfo]:
+        """
+        HEAD-style metadata lookup, cached in process memory
+        
+        Args:
+            object_path: Path to the object in storage
+            
+        Returns:
+            ObjectInfo, or None if the object doesn't exist
+            
+        Raises:
+            StorageError or the backend's own error if the lookup itself failed
+        """
+        if not self.is_available():
+            return None
+        
+        info = _metadata.get(object_path, _UNKNOWN)
+        if info is not _UNKNOWN:
+            return info
+        
+        info = self.backend.stat(object_path)
+        _metadata.set(object_path, info, METADATA_TTL if info is not None else MISSING_TTL)
+        return info
     
     def upload_file(self, file_obj: BinaryIO, object_name: str, user_id: Optional[str] = None) -> Tuple[bool, str]:
         """
-        Upload a file to App Storage
+        Upload a file to App Storage, streaming it from file_obj
         
         Args:
-            file_obj: File-like object to upload
+            file_obj: File-like object (or FileStorage) to upload
             object_name: Name of the object in storage
             user_id: Optional user ID for organizing files
             
@@ -55,15 +139,11 @@ class AppStorageService:
             else:
                 storage_path = f"uploads/{object_name}"
             
-            # Upload file from bytes
-            file_obj.seek(0)
-            file_bytes = file_obj.read()
-            
-            result = self.client.upload_from_bytes(storage_path, file_bytes)
-            
-            if result.error:
-                logger.error(f"App Storage upload error: {result.error}")
-                return False, f"Upload failed: {result.error}"
+            # FileStorage wraps the real stream; its .name is the form field, not a file
+            stream = getattr(file_obj, 'stream', file_obj)
+            stream.seek(0)
+            self.backend.write(storage_path, stream, getattr(file_obj, 'mimetype', None) or None)
+            _metadata.delete(storage_path)
             
             logger.info(f"File uploaded successfully to App Storage: {storage_path}")
             return True, storage_path
@@ -72,6 +152,27 @@ class AppStorageService:
             logger.error(f"Error uploading to App Storage: {str(e)}")
             return False, f"Upload error: {str(e)}"
     
+    def open_stream(self, object_path: str) -> Optional[BinaryIO]:
+        """
+        Open an object for streaming reads; the caller closes it
+        
+        Args:
+            object_path: Path to the object in storage
+            
+        Returns:
+            Readable binary stream, or None if missing or unavailable
+        """
+        if not self.is_available():
+            return None
+        try:
+            return self.backend.open(object_path)
+        except FileNotFoundError:
+            _metadata.set(object_path, None, MISSING_TTL)
+            return None
+        except Exception as e:
+            logger.error(f"Error opening {object_path} in App Storage: {str(e)}")
+            return None
+    
     def download_file(self, object_path: str) -> Tuple[bool, bytes]:
         """
         Download a file from App Storage
@@ -86,18 +187,27 @@ class AppStorageService:
             if not self.is_available():
                 return False, b"App Storage not available"
             
-            result = self.client.download_as_bytes(object_path)
-            
-            if result.error:
-                logger.error(f"App Storage download error: {result.error}")
-                return False, str(result.error).encode()
-            
-            return True, result.value
+            return True, self.backend.read(object_path)
             
+        except FileNotFoundError:
+            return False, f"File not found: {object_path}".encode()
         except Exception as e:
             logger.error(f"Error downloading from App Storage: {str(e)}")
             return False, str(e).encode()
     
+    def download_to(self, object_path: str, local_path: str) -> bool:
+        """Stream an object to a local file without holding it in memory"""
+        stream = self.open_stream(object_path)
+        if stream is None:
+            return False
+        try:
+            with stream, open(local_path, 'wb') as out:
+                shutil.copyfileobj(stream, out, COPY_CHUNK_SIZE)
+            return True
+        except Exception as e:
+            logger.error(f"Error downloading {object_path} to {local_path}: {str(e)}")
+            return False
+    
     def delete_file(self, object_path: str) -> bool:
         """
         Delete a file from App Storage
@@ -112,14 +222,11 @@ class AppStorageService:
             if not self.is_available():
                 return False
             
-            result = self.client.delete(object_path)
-            
-            if result.error:
-                logger.error(f"App Storage delete error: {result.error}")
-                return False
-            
-            logger.info(f"File deleted successfully from App Storage: {object_path}")
-            return True
+            deleted = self.backend.delete(object_path)
+            _metadata.delete(object_path)
+            if deleted:
+                logger.info(f"File deleted successfully from App Storage: {object_path}")
+            return deleted
             
         except Exception as e:
             logger.error(f"Error deleting from App Storage: {str(e)}")
@@ -127,7 +234,7 @@ class AppStorageService:
     
     def file_exists(self, object_path: str) -> bool:
         """
-        Check if a file exists in App Storage
+        Check if a file exists in App Storage (metadata only, nothing is downloaded)
         
         Args:
             object_path: Path to the object in storage
@@ -136,17 +243,80 @@ class AppStorageService:
             bool: True if file exists, False otherwise
         """
         try:
-            if not self.is_available():
-                return False
-            
-            # Try to download just the metadata/first byte to check existence
-            result = self.client.download_as_bytes(object_path)
-            return not result.error
-            
+            return self.stat(object_path) is not None
         except Exception as e:
             logger.error(f"Error checking file existence: {str(e)}")
             return False
     
+    def stat_many(self, object_paths: Iterable[str]) -> Dict[str, Optional[ObjectInfo]]:
+        """
+        Look up metadata for many objects in parallel
+        
+        Returns:
+            dict mapping each path to its ObjectInfo, or None if missing or the lookup failed
+        """
+        def lookup(path):
+            try:
+                return self.stat(path)
+            except Exception as e:
+                logger.error(f"Error checking file existence for {path}: {str(e)}")
+                return None
+        
+        paths = list(dict.fromkeys(object_paths))
+        return dict(zip(paths, self._run_parallel(lookup, paths)))
+    
+    def download_many(self, targets: Dict[str, str]) -> Dict[str, bool]:
+        """
+        Stream many objects to local files in parallel
+        
+        Args:
+            targets: Mapping of object path to local destination path
+            
+        Returns:
+            dict mapping each object path to whether it was downloaded
+        """
+        items = list(targets.items())
+        results = self._run_parallel(lambda item: self.download_to(*item), items)
+        return {path: ok for (path, _), ok in zip(items, results)}
+    
+    def upload_many(self, files: Dict[str, str], user_id: Optional[str] = None) -> Dict[str, Tuple[bool, str]]:
+        """
+        Upload many local files in parallel
+        
+        Args:
+            files: Mapping of object name to local source path
+            user_id: Optional user ID for organizing files
+            
+        Returns:
+            dict mapping each object name to upload_file()'s (success, path_or_error)
+        """
+        def upload(item):
+            object_name, local_path = item
+            try:
+                with open(local_path, 'rb') as f:
+                    return self.upload_file(f, object_name, user_id)
+            except OSError as e:
+                return False, f"Upload error: {str(e)}"
+        
+        items = list(files.items())
+        return {name: result for (name, _), result in zip(items, self._run_parallel(upload, items))}
+    
+    def _run_parallel(self, func: Callable, items: List) -> List:
+        """Map func over items on the bounded transfer pool, preserving order"""
+        if len(items) <= 1 or self.transfer_workers <= 1:
+            return [func(item) for item in items]
+        return list(self._pool().map(func, items))
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        # One pool per process: worker threads don't survive a fork
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.transfer_workers,
+                                                        thread_name_prefix='storage-transfer')
+                    self._executor_pid = os.getpid()
+        return self._executor
+    
     def create_thumbnail(self, original_object_path: str, thumbnail_size: Tuple[int, int] = (400, 400)) -> Tuple[bool, str]:
         """
         Create and upload a thumbnail for an image
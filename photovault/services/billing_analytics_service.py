@@ -0,0 +1,168 @@
+"""
+Billing Analytics Service for PhotoVault
+Revenue and subscription metrics for the admin billing pages
+
+Monthly revenue is one grouped query over paid invoices in a paid_date range
+(served by ix_invoice_status_paid_date) instead of a SUM per month with
+EXTRACT predicates no index can use. Months are calendar months, so the
+series no longer skips or repeats a month the way 30-day steps did.
+
+Results are kept in the shared cache and cleared after any commit that
+touches an invoice, subscription or payment, so dashboards stay fast as
+invoices accumulate without ever showing stale figures for long.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event, func, extract
+from sqlalchemy.orm import Session
+
+from photovault.models import SubscriptionPlan, UserSubscription, Invoice, PaymentHistory
+from photovault.extensions import db
+from photovault.utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Months on the revenue chart, ending with the current one
+REVENUE_MONTHS = 12
+
+_billing_stats = cache.namespace('billing_stats', ttl=3600)
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    """(year, month) shifted by a number of calendar months"""
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+class BillingAnalyticsService:
+    """Service for cached billing metrics"""
+
+    def monthly_revenue(self, months: int = REVENUE_MONTHS) -> List[Dict]:
+        """
+        Paid revenue per calendar month, oldest first
+
+        Args:
+            months: Number of months, ending with the current one
+
+        Returns:
+            list of {'month': 'Jan 2025', 'revenue': float}, with zero for
+            months without paid invoices
+        """
+        now = datetime.utcnow()
+        key = f'monthly_revenue:{now.year}-{now.month:02d}:{months}'
+        return _billing_stats.get_or_set(key, lambda: self._load_monthly_revenue(now, months))
+
+    def summary(self) -> Dict:
+        """
+        Headline figures for the billing dashboard
+
+        Returns:
+            dict with 'total_subscriptions', 'total_users', 'total_revenue',
+            'this_month_revenue', 'plan_stats' [(plan name, active count)],
+            'successful_payments' and 'failed_payments'
+        """
+        summary = _billing_stats.get_or_set('summary', self._load_summary)
+        return {**summary, 'this_month_revenue': self.monthly_revenue(1)[0]['revenue']}
+
+    def revenue_by_plan(self) -> List[Tuple[str, float]]:
+        """(plan name, paid revenue) for every plan with paid invoices"""
+        return _billing_stats.get_or_set('revenue_by_plan', self._load_revenue_by_plan)
+
+    def invalidate(self) -> None:
+        _billing_stats.clear()
+
+    def _load_monthly_revenue(self, now: datetime, months: int) -> List[Dict]:
+        first_year, first_month = _add_months(now.year, now.month, -(months - 1))
+        end_year, end_month = _add_months(now.year, now.month, 1)
+
+        # Range on paid_date so the (status, paid_date) index does the filtering;
+        # grouping by year and month is date_trunc('month') on every backend
+        year = extract('year', Invoice.paid_date)
+        month = extract('month', Invoice.paid_date)
+        rows = db.session.query(year, month, func.sum(Invoice.total)).filter(
+            Invoice.status == 'paid',
+            Invoice.paid_date >= datetime(first_year, first_month, 1),
+            Invoice.paid_date < datetime(end_year, end_month, 1)
+        ).group_by(year, month).all()
+        totals = {(int(row_year), int(row_month)): total for row_year, row_month, total in rows}
+
+        series = []
+        for offset in range(months):
+            series_year, series_month = _add_months(first_year, first_month, offset)
+            series.append({
+                'month': datetime(series_year, series_month, 1).strftime('%b %Y'),
+                'revenue': float(totals.get((series_year, series_month)) or 0)
+            })
+        return series
+
+    def _load_summary(self) -> Dict:
+        total_subscriptions, total_users = db.session.query(
+            func.count(UserSubscription.id),
+            func.count(UserSubscription.user_id.distinct())
+        ).filter(UserSubscription.status == 'active').one()
+
+        total_revenue = db.session.query(func.sum(Invoice.total)).filter(Invoice.status == 'paid').scalar() or 0
+
+        plan_stats = db.session.query(
+            SubscriptionPlan.display_name,
+            func.count(UserSubscription.id)
+        ).select_from(SubscriptionPlan).join(
+            UserSubscription, UserSubscription.plan_id == SubscriptionPlan.id
+        ).filter(
+            UserSubscription.status == 'active'
+        ).group_by(SubscriptionPlan.display_name).all()
+
+        payments = dict(db.session.query(PaymentHistory.status, func.count(PaymentHistory.id)).filter(
+            PaymentHistory.status.in_(('succeeded', 'failed'))
+        ).group_by(PaymentHistory.status).all())
+
+        return {
+            'total_subscriptions': total_subscriptions,
+            'total_users': total_users,
+            'total_revenue': float(total_revenue),
+            'plan_stats': [(name, count) for name, count in plan_stats],
+            'successful_payments': payments.get('succeeded', 0),
+            'failed_payments': payments.get('failed', 0),
+        }
+
+    def _load_revenue_by_plan(self) -> List[Tuple[str, float]]:
+        # Explicit left side and ON clauses: Invoice can join to both other entities
+        rows = db.session.query(
+            SubscriptionPlan.display_name,
+            func.sum(Invoice.total)
+        ).select_from(SubscriptionPlan).join(
+            UserSubscription, UserSubscription.plan_id == SubscriptionPlan.id
+        ).join(
+            Invoice, Invoice.subscription_id == UserSubscription.id
+        ).filter(
+            Invoice.status == 'paid'
+        ).group_by(SubscriptionPlan.display_name).all()
+        return [(name, float(revenue or 0)) for name, revenue in rows]
+
+
+# Global service instance
+billing_analytics_service = BillingAnalyticsService()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_billing_changes(session, flush_context):
+    """Note billing writes; the cached figures are cleared once committed"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Invoice, UserSubscription, PaymentHistory, SubscriptionPlan)):
+            session.info['billing_invalidate'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_billing(session):
+    # After commit, so a concurrent reader can't re-cache the pre-commit state
+    if session.info.pop('billing_invalidate', None):
+        billing_analytics_service.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_billing_changes(session):
+    session.info.pop('billing_invalidate', None)
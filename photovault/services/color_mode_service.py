@@ -0,0 +1,150 @@
+"""
+Color Mode Service for PhotoVault
+Classifies photos as grayscale/sepia/color once and persists the result on Photo.color_mode
+
+Files are read through their stored locations, so photos in App Storage or
+saved with relative paths classify like local ones. Photos with no readable
+file are marked 'unknown' so the lazy backfill moves on instead of picking
+them again on every listing.
+"""
+
+import logging
+from typing import Optional
+from photovault.models import Photo
+from photovault.extensions import db
+from photovault.utils.colorization import (
+    classify_color_mode_data, MONOCHROME_COLOR_MODES, COLOR_MODE_UNKNOWN
+)
+from photovault.utils.storage_paths import location_of, open_location
+
+logger = logging.getLogger(__name__)
+
+# Legacy rows classified per lazy backfill pass (keeps request latency bounded)
+BACKFILL_BATCH_SIZE = 50
+
+
+class ColorModeService:
+    """Service for ingest-time and lazy color mode classification"""
+
+    def classify_photo(self, photo: Photo) -> Optional[str]:
+        """
+        Classify a photo and store the result on photo.color_mode (caller commits)
+
+        The thumbnail is preferred since it is already downsampled; the original
+        is only decoded (at reduced scale) when no thumbnail can be read.
+
+        Args:
+            photo: Photo model instance
+
+        Returns:
+            The color mode, or None if no image file could be read (the photo
+            is then marked 'unknown')
+        """
+        for variant in ('thumbnail', 'original'):
+            location = location_of(photo, variant)
+            stream = open_location(location) if location else None
+            if stream is None:
+                continue
+            try:
+                with stream:
+                    data = stream.read()
+                photo.color_mode = classify_color_mode_data(data)
+                return photo.color_mode
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Color mode classification failed for {location.backend}:{location.key}: {e}")
+        photo.color_mode = COLOR_MODE_UNKNOWN
+        return None
+
+    def get_color_mode(self, photo: Photo) -> Optional[str]:
+        """
+        Return the stored color mode, classifying and persisting legacy rows on first read
+
+        Photos marked 'unknown' are tried again, since a single read is cheap
+        and the file may have become readable.
+
+        Args:
+            photo: Photo model instance
+
+        Returns:
+            The color mode, or None if the photo could not be classified
+        """
+        if photo.color_mode and photo.color_mode != COLOR_MODE_UNKNOWN:
+            return photo.color_mode
+
+        previous = photo.color_mode
+        color_mode = self.classify_photo(photo)
+        if photo.color_mode != previous:
+            try:
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Failed to persist color mode for photo {photo.id}: {e}")
+                db.session.rollback()
+        return color_mode
+
+    def backfill_user_photos(self, user_id: int, limit: int = BACKFILL_BATCH_SIZE) -> int:
+        """
+        Classify up to `limit` unclassified photos belonging to a user
+
+        Called before color-mode filtered listings so legacy libraries converge
+        over a few page views without a one-off migration job. Every photo
+        examined gets a color mode or the 'unknown' marker, so each pass moves
+        on to the next unclassified photos.
+
+        Args:
+            user_id: Owner of the photos to backfill
+            limit: Maximum number of photos to classify in this pass
+
+        Returns:
+            Number of photos classified
+        """
+        pending = Photo.query.filter(
+            Photo.user_id == user_id,
+            Photo.color_mode.is_(None)
+        ).order_by(Photo.id).limit(limit).all()
+
+        classified = 0
+        for photo in pending:
+            if self.classify_photo(photo):
+                classified += 1
+
+        if pending:
+            try:
+                db.session.commit()
+                logger.info(f"Backfilled color mode for {classified} photos of user {user_id}")
+            except Exception as e:
+                logger.error(f"Color mode backfill failed for user {user_id}: {e}")
+                db.session.rollback()
+                return 0
+        return classified
+
+    @staticmethod
+    def colorized_filter(method: str):
+        """
+        SQL criterion for photos colorized with a method ('dnn' or 'ai_guided_dnn')
+
+        enhancement_metadata is a generic JSON column, so the value is extracted
+        with as_string() rather than the PostgreSQL JSONB-only astext.
+        """
+        return Photo.enhancement_metadata[('colorization', 'method')].as_string() == method
+
+    @staticmethod
+    def uncolorized_filter():
+        """
+        SQL criterion for photos that are colorization candidates
+
+        Monochrome photos without a colorization summary; other edits (enhance,
+        sharpen, the edit recipe) share enhancement_metadata and don't count.
+        Unclassified rows are kept so legacy photos still show up until the
+        backfill reaches them; 'unknown' ones have no readable file to colorize.
+        """
+        return db.and_(
+            Photo.enhancement_metadata['colorization'].as_string().is_(None),
+            db.or_(
+                Photo.color_mode.in_(MONOCHROME_COLOR_MODES),
+                Photo.color_mode.is_(None)
+            )
+        )
+
+
+# Global service instance
+color_mode_service = ColorModeService()
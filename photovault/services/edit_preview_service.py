@@ -0,0 +1,197 @@
+"""
+Edit Preview Service for PhotoVault
+Interactive enhance/sharpen previews rendered on a cached proxy image
+
+While a user drags an edit slider the app asks for a preview on every change.
+Rendering those on the full original (and writing a new file each time) took
+seconds and left a trail of orphaned edit files. Previews instead run the same
+ImageEnhancer operations on a proxy no larger than PROXY_MAX_DIMENSION and
+return JPEG bytes straight to the client - no file is written and no row is
+touched. The full-resolution render happens only when the edit is saved.
+
+Proxies are decoded once per original (JPEG DCT scaling makes that cheap) and
+kept in the shared cache, so every worker reuses them for the length of an
+editing session. Pixel-sized parameters (denoise diameter, unsharp radius) are
+scaled with the proxy so a preview looks like the saved result, downsized.
+The proxy already carries the photo's applied edits (see edit_stack_service),
+so a preview shows the new edit on top of them, as saving it would.
+
+Enhancement is split at ImageEnhancer.prepare_base: denoise, CLAHE and the
+levels LUT depend only on the on/off switches, so each worker keeps the last
+few prepared bases and a slider move only re-runs the per-value adjustments.
+"""
+
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from photovault.services.edit_stack_service import edit_stack_service, apply_operations
+from photovault.utils.cache import cache
+from photovault.utils.image_enhancement import enhancer
+from photovault.utils.storage_paths import open_location, StorageLocation
+
+logger = logging.getLogger(__name__)
+
+# Long side of the preview proxy, in pixels
+PROXY_MAX_DIMENSION = 1280
+
+# Proxies live for an editing session
+PROXY_CACHE_TTL = 600
+
+PROXY_JPEG_QUALITY = 95
+PREVIEW_JPEG_QUALITY = 85
+
+PREVIEW_OPERATIONS = ('enhance', 'sharpen')
+
+# Prepared enhancement bases kept per worker (one ~3 MB image each)
+BASE_CACHE_SIZE = 8
+
+# Settings that change the prepared base; the rest only change the adjustments
+BASE_SETTINGS = ('denoise', 'clahe_enabled', 'auto_levels')
+
+
+class EditPreviewService:
+    """Service for rendering edit previews on downscaled proxies"""
+
+    def __init__(self):
+        self._proxies = cache.namespace('edit_proxy', ttl=PROXY_CACHE_TTL)
+        self._bases = OrderedDict()
+        self._bases_lock = threading.Lock()
+
+    def render_preview(self, photo, operation: str, params: Dict) -> Optional[bytes]:
+        """
+        Render an edit on the photo's proxy
+
+        Args:
+            photo: Photo being edited
+            operation: 'enhance' or 'sharpen'
+            params: Enhancement settings, or radius/amount/threshold/method for sharpen
+
+        Returns:
+            JPEG bytes, or None if the original file can't be read
+
+        Raises:
+            ValueError: Unknown operation
+        """
+        if operation not in PREVIEW_OPERATIONS:
+            raise ValueError(f'Unknown edit operation: {operation}')
+
+        if operation == 'enhance':
+            settings = {**enhancer.default_settings, **(params or {})}
+            prepared = self._prepared_base(photo, settings)
+            if prepared is None:
+                return None
+            base, levels_lut = prepared
+            img = enhancer.apply_adjustments(base.copy(), levels_lut, settings)
+            ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_JPEG_QUALITY])
+            if not ok:
+                raise RuntimeError('Could not encode preview')
+            return encoded.tobytes()
+
+        proxy = self.get_proxy(photo)
+        if proxy is None:
+            return None
+        img, scale = proxy
+        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        sharpened = enhancer.apply_sharpening(
+            pil_img,
+            radius=float(params.get('radius', 2.0)) * scale,
+            amount=float(params.get('amount', 1.5)),
+            threshold=int(params.get('threshold', 3)),
+            method=params.get('method', 'unsharp')
+        )
+        buffer = io.BytesIO()
+        sharpened.save(buffer, 'JPEG', quality=PREVIEW_JPEG_QUALITY)
+        return buffer.getvalue()
+
+    def _prepared_base(self, photo, settings: Dict) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """Denoised/CLAHE'd proxy and levels LUT for these switches, from the worker cache"""
+        location = edit_stack_service.source_location(photo)
+        if location is None:
+            return None
+        key = (self._proxy_key(photo, location),) + tuple(bool(settings.get(name, True)) for name in BASE_SETTINGS)
+
+        with self._bases_lock:
+            prepared = self._bases.get(key)
+            if prepared is not None:
+                self._bases.move_to_end(key)
+                return prepared
+
+        proxy = self.get_proxy(photo)
+        if proxy is None:
+            return None
+        img, scale = proxy
+        prepared = enhancer.prepare_base(img, settings, scale=scale)
+
+        with self._bases_lock:
+            self._bases[key] = prepared
+            while len(self._bases) > BASE_CACHE_SIZE:
+                self._bases.popitem(last=False)
+        return prepared
+
+    @staticmethod
+    def _proxy_key(photo, location: StorageLocation) -> str:
+        # Originals and baked bases are never rewritten in place, so the source
+        # location and the applied edits identify the pixels
+        applied = edit_stack_service.applied_operations(photo)
+        edits = edit_stack_service.derivative_name(photo, applied) if applied else ''
+        return f'{photo.id}:{location.backend}:{location.key}:{edits}'
+
+    def get_proxy(self, photo) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        The photo's preview proxy, built on first use
+
+        Returns:
+            (BGR image, proxy size / original size), or None if the original is missing
+        """
+        location = edit_stack_service.source_location(photo)
+        if location is None:
+            return None
+
+        key = self._proxy_key(photo, location)
+        cached = self._proxies.get(key)
+        if cached is None:
+            cached = self._build_proxy(location, edit_stack_service.applied_operations(photo))
+            if cached is None:
+                return None
+            self._proxies.set(key, cached)
+
+        jpeg, scale = cached
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return img, scale
+
+    def _build_proxy(self, location: StorageLocation, operations) -> Optional[Tuple[bytes, float]]:
+        """Decode an original at reduced size and apply its edits; returns (JPEG bytes, scale)"""
+        stream = open_location(location)
+        if stream is None:
+            logger.warning(f"Preview proxy source missing: {location.backend}:{location.key}")
+            return None
+
+        with stream:
+            if not getattr(stream, 'seekable', lambda: False)():
+                stream = io.BytesIO(stream.read())
+            pil_img = Image.open(stream)
+            original_size = max(pil_img.size)
+            # Let the JPEG decoder skip straight to roughly the proxy size
+            pil_img.draft('RGB', (PROXY_MAX_DIMENSION, PROXY_MAX_DIMENSION))
+            pil_img = ImageOps.exif_transpose(pil_img).convert('RGB')
+            pil_img.thumbnail((PROXY_MAX_DIMENSION, PROXY_MAX_DIMENSION), Image.Resampling.LANCZOS)
+
+        scale = min(1.0, max(pil_img.size) / original_size)
+        img = apply_operations(cv2.cvtColor(np.asarray(pil_img), cv2.COLOR_RGB2BGR), operations, scale)
+        ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, PROXY_JPEG_QUALITY])
+        if not ok:
+            raise RuntimeError('Could not encode preview proxy')
+        logger.info(f"Built {img.shape[1]}x{img.shape[0]} preview proxy for {location.key} "
+                    f"with {len(operations)} edits (scale {scale:.3f})")
+        return encoded.tobytes(), scale
+
+
+# Global instance
+edit_preview_service = EditPreviewService()
@@ -0,0 +1,349 @@
+"""
+Edit Stack Service for PhotoVault
+Non-destructive photo edits: a recipe of operations rendered lazily from the original
+
+Enhance, sharpen and colorize no longer bake a new full-size JPEG per call.
+Each edit is pushed onto a recipe stored in Photo.enhancement_metadata:
+
+    {'edits': {'operations': [{'op': 'enhance', 'params': {...}, 'info': {...}, 'at': ...}, ...],
+               'applied': 2},
+     'enhancement': {...}, 'colorization': {...}}   # summaries of the applied edits
+
+Operations past 'applied' are the redo stack, so undo and redo only move the
+cursor. Photos edited before recipes existed have a baked edited file and no
+recipe; their first recipe records that file as its 'base' and renders start
+from it instead of the original, so the earlier edit and its summaries survive
+(undoing every recipe edit goes back to the baked file, revert to the original). The edited file is named after a hash of the original's location and
+the applied operations and is rendered from the original the first time it is
+requested - one JPEG encode however many edits are stacked. When the recipe
+changes the previous render is tombstoned for the reaper, so a photo keeps at
+most one edited file.
+
+The per-edit summaries ('enhancement', 'sharpening', 'colorization') keep the
+shape the gallery filters and the apps already read.
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from photovault.models import FileTombstone
+from photovault.extensions import db
+from photovault.utils.storage_paths import (
+    StorageLocation, location_of, open_location, upload_root
+)
+
+logger = logging.getLogger(__name__)
+
+RECIPE_KEY = 'edits'
+
+# Bump when a renderer's output changes, so cached renders are not reused
+RENDER_VERSION = 1
+
+RENDER_JPEG_QUALITY = 95
+
+# Operation -> enhancement_metadata summary key
+SUMMARY_KEYS = {'enhance': 'enhancement', 'sharpen': 'sharpening', 'colorize': 'colorization'}
+
+EDIT_OPERATIONS = tuple(SUMMARY_KEYS)
+
+
+def _apply_enhance(img: np.ndarray, params: Dict, scale: float) -> np.ndarray:
+    from photovault.utils.image_enhancement import enhancer
+    return enhancer.enhance_image(img, params, scale=scale)
+
+
+def _apply_sharpen(img: np.ndarray, params: Dict, scale: float) -> np.ndarray:
+    from photovault.utils.image_enhancement import enhancer
+    sharpened = enhancer.apply_sharpening(
+        Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)),
+        radius=params['radius'] * scale, amount=params['amount'],
+        threshold=params['threshold'], method=params['method']
+    )
+    return cv2.cvtColor(np.asarray(sharpened), cv2.COLOR_RGB2BGR)
+
+
+def _apply_colorize(img: np.ndarray, params: Dict, scale: float) -> np.ndarray:
+    from photovault.utils.colorization import get_colorizer
+    colorized, _ = get_colorizer().colorize_array(img, params['method'])
+    return colorized
+
+
+# Operation -> renderer taking and returning a BGR image
+RENDERERS = {
+    'enhance': _apply_enhance,
+    'sharpen': _apply_sharpen,
+    'colorize': _apply_colorize,
+}
+
+
+def apply_operations(img: np.ndarray, operations: List[Dict], scale: float = 1.0) -> np.ndarray:
+    """
+    Run recipe operations on a BGR image
+
+    Args:
+        img: BGR uint8 image (may be modified in place)
+        operations: Recipe entries, in order
+        scale: Size of img relative to the original, for previews on a proxy
+
+    Returns:
+        Edited BGR image
+    """
+    for operation in operations:
+        img = RENDERERS[operation['op']](img, operation['params'], scale)
+    return img
+
+
+class EditStackService:
+    """Service for recording, undoing and rendering photo edit recipes"""
+
+    def recipe(self, photo) -> Dict:
+        """The photo's edit recipe: {'operations': [...], 'applied': n, 'base': {...} or None}"""
+        stored = (photo.enhancement_metadata or {}).get(RECIPE_KEY)
+        if not stored:
+            return {'operations': [], 'applied': 0, 'base': self._legacy_base(photo)}
+        operations = list(stored.get('operations') or [])
+        applied = min(int(stored.get('applied', len(operations))), len(operations))
+        return {'operations': operations, 'applied': applied, 'base': stored.get('base')}
+
+    def _legacy_base(self, photo) -> Optional[Dict]:
+        """A baked edited file from before recipes, as a recipe base; None without one"""
+        location = location_of(photo, 'edited')
+        if location is None or location == location_of(photo, 'original'):
+            return None
+        metadata = photo.enhancement_metadata or {}
+        return {
+            'backend': location.backend,
+            'key': location.key,
+            'filename': photo.edited_filename,
+            'path': photo.edited_path,
+            'summaries': {key: metadata[key] for key in SUMMARY_KEYS.values() if key in metadata},
+        }
+
+    def source_location(self, photo) -> Optional[StorageLocation]:
+        """Where renders start from: the recipe's baked base, or the original"""
+        base = self.recipe(photo)['base']
+        if base:
+            return StorageLocation(base['backend'], base['key'])
+        return location_of(photo, 'original')
+
+    def applied_operations(self, photo) -> List[Dict]:
+        recipe = self.recipe(photo)
+        return recipe['operations'][:recipe['applied']]
+
+    def push(self, photo, operation: str, params: Dict, info: Optional[Dict] = None) -> None:
+        """
+        Add an edit on top of the applied ones and commit
+
+        Edits that had been undone are discarded, as in any editor.
+
+        Args:
+            photo: Photo being edited
+            operation: 'enhance', 'sharpen' or 'colorize'
+            params: Everything the renderer needs, fully resolved (no defaults
+                    left to the renderer, so the render never changes under a recipe)
+            info: Extra details for the edit's summary (e.g. AI guidance)
+        """
+        if operation not in RENDERERS:
+            raise ValueError(f'Unknown edit operation: {operation}')
+        recipe = self.recipe(photo)
+        operations = recipe['operations'][:recipe['applied']]
+        operations.append({'op': operation, 'params': params, 'info': info or {},
+                           'at': datetime.utcnow().isoformat()})
+        self._save(photo, {'operations': operations, 'applied': len(operations), 'base': recipe['base']})
+
+    def undo(self, photo) -> bool:
+        """Step back one edit; returns False if there was nothing to undo"""
+        recipe = self.recipe(photo)
+        if recipe['applied'] == 0:
+            return False
+        recipe['applied'] -= 1
+        self._save(photo, recipe)
+        return True
+
+    def redo(self, photo) -> bool:
+        """Re-apply the last undone edit; returns False if there was nothing to redo"""
+        recipe = self.recipe(photo)
+        if recipe['applied'] == len(recipe['operations']):
+            return False
+        recipe['applied'] += 1
+        self._save(photo, recipe)
+        return True
+
+    def revert(self, photo) -> None:
+        """Drop every edit, including a baked base, and go back to the original"""
+        self._save(photo, {'operations': [], 'applied': 0, 'base': None})
+
+    def forget(self, photo) -> None:
+        """
+        Drop the recipe but keep the edit summaries, once the edited file is
+        no longer derived from the original (it was promoted or deleted).
+        The caller commits.
+        """
+        metadata = dict(photo.enhancement_metadata or {})
+        if metadata.pop(RECIPE_KEY, None) is not None:
+            photo.enhancement_metadata = metadata or None
+
+    def describe(self, photo) -> Dict:
+        """The recipe as returned by the API"""
+        recipe = self.recipe(photo)
+        return {
+            'operations': [{'op': op['op'], 'params': op['params'], 'at': op.get('at')}
+                           for op in recipe['operations']],
+            'applied': recipe['applied'],
+            'can_undo': recipe['applied'] > 0,
+            'can_redo': recipe['applied'] < len(recipe['operations']),
+            'edited_url': f'/uploads/{photo.user_id}/{photo.edited_filename}' if photo.edited_filename else None,
+        }
+
+    def derivative_name(self, photo, operations: List[Dict]) -> str:
+        """Filename of the render of these operations - the render cache key"""
+        source = self.source_location(photo)
+        recipe = {
+            'source': f'{source.backend}:{source.key}' if source else None,
+            'operations': [[op['op'], op['params']] for op in operations],
+            'version': RENDER_VERSION,
+        }
+        digest = hashlib.sha256(json.dumps(recipe, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+        stem = os.path.splitext(photo.filename or str(photo.id))[0]
+        return f'{stem}.edit.{digest[:16]}.jpg'
+
+    def is_pending(self, photo) -> bool:
+        """True if the photo's edited file has been named but not rendered yet"""
+        return bool(photo.edited_filename) and not photo.edited_path and bool(self.applied_operations(photo))
+
+    def render(self, photo) -> Optional[StorageLocation]:
+        """
+        Render the applied edits from the original (or baked base) and store the result
+
+        Args:
+            photo: Photo with a pending edited file
+
+        Returns:
+            Location of the edited file, or None if there are no edits or the
+            original can't be read
+        """
+        operations = self.applied_operations(photo)
+        if not operations:
+            return None
+
+        source = self.source_location(photo)
+        stream = open_location(source) if source else None
+        if stream is None:
+            logger.error(f"Cannot render edits for photo {photo.id}: source missing")
+            return None
+        with stream:
+            img = cv2.imdecode(np.frombuffer(stream.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            logger.error(f"Cannot render edits for photo {photo.id}: source is not a readable image")
+            return None
+
+        img = apply_operations(img, operations)
+        ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, RENDER_JPEG_QUALITY])
+        if not ok:
+            raise RuntimeError(f'Could not encode edits for photo {photo.id}')
+
+        filename = self.derivative_name(photo, operations)
+        path = self._store(photo.user_id, filename, encoded.tobytes())
+        self._cancel_tombstones(photo.user_id, filename)
+        photo.edited_filename = filename
+        photo.edited_path = path
+        db.session.commit()
+
+        logger.info(f"Rendered {len(operations)} edits for photo {photo.id}: {filename}")
+        return location_of(photo, 'edited')
+
+    def _store(self, user_id, filename: str, data: bytes) -> str:
+        """Save a render to App Storage, or the user's upload folder without it"""
+        from photovault.services.app_storage_service import app_storage
+
+        if app_storage.is_available():
+            success, path = app_storage.upload_file(io.BytesIO(data), filename, str(user_id))
+            if success:
+                return path
+            logger.warning(f"App Storage upload failed, keeping render local: {path}")
+
+        user_folder = os.path.join(upload_root(), str(user_id))
+        os.makedirs(user_folder, exist_ok=True)
+        path = os.path.join(user_folder, filename)
+        # Write beside the target and rename, so a concurrent request never serves half a file
+        fd, temp_path = tempfile.mkstemp(dir=user_folder, prefix='.render-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return path
+
+    def _cancel_tombstones(self, user_id, filename: str) -> None:
+        """Redo can bring back a render the reaper hasn't removed yet - keep it"""
+        paths = [f'users/{user_id}/{filename}', os.path.join(upload_root(), str(user_id), filename)]
+        FileTombstone.query.filter(FileTombstone.path.in_(paths)).delete(synchronize_session=False)
+
+    def _save(self, photo, recipe: Dict) -> None:
+        """Store a changed recipe, retire the old render and commit"""
+        from photovault.services.photo_deletion_service import photo_deletion_service
+
+        # The baked base is kept for as long as the recipe builds on it
+        base = recipe.get('base')
+        base_location = StorageLocation(base['backend'], base['key']) if base else None
+        previous_base = self.recipe(photo)['base']
+        current = location_of(photo, 'edited')
+        retired = False
+        if current != base_location:
+            retired = photo_deletion_service.retire_edited_file(photo)
+        if previous_base and not base:
+            previous_location = StorageLocation(previous_base['backend'], previous_base['key'])
+            if previous_location != current:
+                retired = photo_deletion_service.retire_edited_file(photo, previous_location) or retired
+
+        applied = recipe['operations'][:recipe['applied']]
+        metadata = {key: value for key, value in (photo.enhancement_metadata or {}).items()
+                    if key != RECIPE_KEY and key not in SUMMARY_KEYS.values()}
+        if recipe['operations'] or base:
+            metadata[RECIPE_KEY] = {key: value for key, value in recipe.items() if value is not None}
+        if base:
+            metadata.update(base.get('summaries') or {})
+        for operation in applied:
+            summary = {'settings': operation['params']} if operation['op'] == 'enhance' else dict(operation['params'])
+            summary.update(operation.get('info') or {})
+            summary['timestamp'] = operation.get('at')
+            metadata[SUMMARY_KEYS[operation['op']]] = summary
+        photo.enhancement_metadata = metadata or None
+
+        # Named now, rendered on first request
+        if applied:
+            filename = self.derivative_name(photo, applied)
+            self._cancel_tombstones(photo.user_id, filename)
+            photo.edited_filename = filename
+            photo.edited_path = None
+        elif base:
+            photo.edited_filename = base['filename']
+            photo.edited_path = base['path']
+            photo.edited_backend, photo.edited_key = base_location.backend, base_location.key
+        else:
+            photo.edited_filename = None
+            photo.edited_path = None
+        photo.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        if retired:
+            photo_deletion_service.schedule_reap()
+
+
+# Global instance
+edit_stack_service = EditStackService()
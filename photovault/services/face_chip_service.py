@@ -0,0 +1,124 @@
+"""
+Face Chip Service for PhotoVault
+Small cached crops of tagged faces for the tagging UI
+
+Face boxes are stored in the coordinates of the EXIF-oriented original, which
+stored thumbnails don't match (they are not EXIF-transposed), so chips are
+cut from the original. JPEG draft mode decodes it at roughly the scale the
+chip needs, so even a large scan costs a fraction of a full decode. The
+encoded chips are kept in the shared cache, keyed by the face box and the
+original's location, so moving a box or replacing the file never serves a
+stale chip.
+"""
+
+import io
+import logging
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from photovault.utils.cache import cache
+from photovault.utils.storage_paths import location_of, open_location
+
+logger = logging.getLogger(__name__)
+
+# Long side of a chip, in pixels
+CHIP_SIZE = 160
+
+CHIP_JPEG_QUALITY = 85
+
+# Padding around the face box, as a fraction of its size
+CHIP_MARGIN = 0.25
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+_chips = cache.namespace('face_chip', ttl=7 * 24 * 3600)
+
+
+class FaceChipService:
+    """Service for cropping and caching face chips"""
+
+    def chip_version(self, tag) -> Optional[str]:
+        """Token that changes whenever the tag's chip would; None without a face box"""
+        box = (tag.face_box_x, tag.face_box_y, tag.face_box_width, tag.face_box_height)
+        if any(value is None for value in box) or tag.face_box_width <= 0 or tag.face_box_height <= 0:
+            return None
+        return '-'.join(str(int(value)) for value in box)
+
+    def get_chip(self, tag, photo) -> Optional[bytes]:
+        """
+        JPEG crop of a tagged face, from the cache or cut on first use
+
+        Args:
+            tag: PhotoPerson with a face box
+            photo: The tag's photo
+
+        Returns:
+            JPEG bytes, or None if the tag has no box or the original can't be read
+        """
+        version = self.chip_version(tag)
+        location = location_of(photo, 'original')
+        if version is None or location is None:
+            return None
+
+        key = f'{tag.id}:{version}:{location.backend}:{location.key}'
+        chip = _chips.get(key)
+        if chip is None:
+            chip = self._cut_chip(location, tag)
+            if chip is None:
+                return None
+            _chips.set(key, chip)
+        return chip
+
+    def _cut_chip(self, location, tag) -> Optional[bytes]:
+        stream = open_location(location)
+        if stream is None:
+            logger.warning(f"Face chip source missing: {location.backend}:{location.key}")
+            return None
+
+        try:
+            with stream:
+                if not getattr(stream, 'seekable', lambda: False)():
+                    stream = io.BytesIO(stream.read())
+                img = Image.open(stream)
+
+                # Box coordinates are in the oriented original's pixel space
+                raw_width, raw_height = img.size
+                orientation = img.getexif().get(0x0112, 1)
+                if orientation in _TRANSPOSED_ORIENTATIONS:
+                    full_width, full_height = raw_height, raw_width
+                else:
+                    full_width, full_height = raw_width, raw_height
+
+                # Decode only as large as the chip needs
+                scale = min(1.0, CHIP_SIZE / max(tag.face_box_width, tag.face_box_height))
+                img.draft('RGB', (max(1, int(raw_width * scale)), max(1, int(raw_height * scale))))
+                img = ImageOps.exif_transpose(img).convert('RGB')
+
+                factor = img.width / full_width
+                margin_x = tag.face_box_width * CHIP_MARGIN
+                margin_y = tag.face_box_height * CHIP_MARGIN
+                box = (
+                    max(0, int((tag.face_box_x - margin_x) * factor)),
+                    max(0, int((tag.face_box_y - margin_y) * factor)),
+                    min(img.width, int((tag.face_box_x + tag.face_box_width + margin_x) * factor + 0.5)),
+                    min(img.height, int((tag.face_box_y + tag.face_box_height + margin_y) * factor + 0.5)),
+                )
+                if box[2] <= box[0] or box[3] <= box[1]:
+                    logger.warning(f"Face box for tag {tag.id} lies outside its photo")
+                    return None
+
+                chip = img.crop(box)
+                chip.thumbnail((CHIP_SIZE, CHIP_SIZE), Image.Resampling.LANCZOS)
+                buffer = io.BytesIO()
+                chip.save(buffer, 'JPEG', quality=CHIP_JPEG_QUALITY)
+                return buffer.getvalue()
+
+        except Exception as e:
+            logger.error(f"Error cutting face chip for tag {tag.id}: {e}")
+            return None
+
+
+# Global instance
+face_chip_service = FaceChipService()
@@ -171,6 +171,23 @@ class FaceDetectionService:
             db.session.rollback()
             return None
     
+    def process_photo_by_id(self, photo_id: int, auto_tag: bool = True) -> Optional[Dict]:
+        """
+        Background-job entry point for process_and_tag_photo
+        
+        Args:
+            photo_id: ID of the photo to process (re-queried in the job's session)
+            auto_tag: Whether to automatically create tags for recognized faces
+            
+        Returns:
+            Summary of processing results, or None if the photo no longer exists
+        """
+        photo = Photo.query.get(photo_id)
+        if not photo:
+            logger.info(f"Skipping face processing - photo {photo_id} no longer exists")
+            return None
+        return self.process_and_tag_photo(photo, auto_tag=auto_tag)
+    
     def process_and_tag_photo(self, photo: Photo, auto_tag: bool = True) -> Dict:
         """
         Complete workflow: detect faces, recognize people, and optionally create tags
@@ -1,20 +1,55 @@
 # photovault/services/montage_service.py
+"""
+Montages are composited tile by tile: each source is decoded at roughly tile
+size (JPEG draft mode), pasted into the canvas and dropped before the next one
+is needed. Tiles are decoded in a small thread pool, so memory stays at the
+canvas plus a few reduced sources however many photos are in the montage.
+A photo's stored thumbnail is used instead of the original when it is at
+least as large as the tile.
+"""
 
 import os
 import io
 import logging
 import uuid
-from typing import List, Tuple, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple, Optional, Dict, Any, Union
 from PIL import Image, ImageDraw, ImageFont
 from flask import current_app
 from datetime import datetime
 
 from photovault.utils.enhanced_file_handler import save_uploaded_file_enhanced
-from photovault.utils.file_handler import get_image_dimensions
-from photovault.services.app_storage_service import app_storage
+from photovault.services.storage_backends import is_storage_path
+from photovault.utils.storage_paths import (
+    BACKEND_APP, BACKEND_LOCAL, StorageLocation, location_of, open_location
+)
 
 logger = logging.getLogger(__name__)
 
+# Tiles decoded concurrently; each holds one reduced source while it runs
+MONTAGE_DECODE_WORKERS = 4
+
+# Decode at up to this multiple of the tile size so the LANCZOS pass has detail
+# to work with (Pillow's thumbnail() reducing_gap)
+DRAFT_OVERSAMPLE = 2
+
+
+@dataclass(frozen=True)
+class MontageSource:
+    """One montage tile: the full image, and a thumbnail to try first"""
+    original: StorageLocation
+    thumbnail: Optional[StorageLocation] = None
+
+
+def montage_source(photo_or_path) -> MontageSource:
+    """MontageSource for a Photo (its stored locations) or a bare file/App Storage path"""
+    if isinstance(photo_or_path, str):
+        if is_storage_path(photo_or_path):
+            return MontageSource(StorageLocation(BACKEND_APP, photo_or_path))
+        return MontageSource(StorageLocation(BACKEND_LOCAL, os.path.abspath(photo_or_path)))
+    return MontageSource(location_of(photo_or_path, 'original'), location_of(photo_or_path, 'thumbnail'))
+
 class MontageService:
     """Service for creating photo montages/collages"""
     
@@ -33,13 +68,14 @@ class MontageService:
             'title_height': 50
         }
     
-    def create_montage(self, photo_paths: List[str], settings: Optional[Dict] = None, 
+    def create_montage(self, photo_paths: List[Union[str, Any]], settings: Optional[Dict] = None, 
                       user_id: Optional[int] = None) -> Tuple[bool, str, Dict]:
         """
-        Create a montage from multiple photo paths
+        Create a montage from multiple photos
         
         Args:
-            photo_paths: List of file paths to photos
+            photo_paths: Photos (their thumbnails are reused when large enough),
+                         or file / App Storage paths
             settings: Custom montage settings
             user_id: User ID for organizing files
             
@@ -67,20 +103,10 @@ class MontageService:
                 cols = (total_photos + rows - 1) // rows  # Ceiling division
                 montage_settings['cols'] = cols
             
-            # Load and prepare images
-            images = []
-            for photo_path in photo_paths:
-                success, image = self._load_and_prepare_image(photo_path, montage_settings)
-                if success:
-                    images.append(image)
-                else:
-                    logger.warning(f"Failed to load image: {photo_path}")
-            
-            if len(images) < 2:
-                return False, "Could not load enough valid images for montage", {}
-            
-            # Create the montage
-            success, montage_image = self._create_grid_montage(images, montage_settings)
+            # Decode tiles in parallel and paste each as soon as it is ready
+            sources = [montage_source(item) for item in photo_paths]
+            success, montage_image = self._create_grid_montage(self._load_tiles(sources, montage_settings),
+                                                               montage_settings)
             if not success:
                 return False, montage_image, {}  # montage_image contains error message
             
@@ -100,46 +126,78 @@ class MontageService:
             logger.error(f"Error creating montage: {str(e)}")
             return False, f"Failed to create montage: {str(e)}", {}
     
-    def _load_and_prepare_image(self, photo_path: str, settings: Dict) -> Tuple[bool, Optional[Image.Image]]:
-        """Load and prepare an image for the montage"""
-        try:
-            # Check if file exists for local files or handle app storage paths
-            if not photo_path.startswith('users/'):
-                # Local file path
-                if not os.path.exists(photo_path):
-                    logger.error(f"Image file not found: {photo_path}")
-                    return False, None
-                image = Image.open(photo_path)
-            else:
-                # App Storage path
-                success, image_bytes = app_storage.download_file(photo_path)
-                if not success:
-                    logger.error(f"Failed to download image from app storage: {photo_path}")
-                    return False, None
-                image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to RGB if necessary
-            if image.mode not in ('RGB', 'RGBA'):
-                image = image.convert('RGB')
-            
-            # Calculate target size for each image in grid
-            target_width = settings['target_width'] // settings['cols'] - settings['spacing']
-            target_height = settings['target_height'] // settings['rows'] - settings['spacing']
-            
-            # Resize while maintaining aspect ratio
-            if settings['maintain_aspect']:
-                image.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-            else:
-                image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
-            
-            return True, image
-            
-        except Exception as e:
-            logger.error(f"Error preparing image {photo_path}: {str(e)}")
-            return False, None
+    def _tile_box(self, settings: Dict) -> Tuple[int, int]:
+        """Size each image is fitted into"""
+        return (settings['target_width'] // settings['cols'] - settings['spacing'],
+                settings['target_height'] // settings['rows'] - settings['spacing'])
     
-    def _create_grid_montage(self, images: List[Image.Image], settings: Dict) -> Tuple[bool, Any]:
-        """Create a grid-based montage from prepared images"""
+    def _load_tiles(self, sources: List[MontageSource], settings: Dict) -> Iterable[Optional[Image.Image]]:
+        """Prepared tiles in source order (None for sources that failed), decoded in a thread pool"""
+        app = current_app._get_current_object()
+        
+        def load(source):
+            with app.app_context():
+                return self._load_and_prepare_image(source, settings)
+        
+        with ThreadPoolExecutor(max_workers=MONTAGE_DECODE_WORKERS, thread_name_prefix='montage') as pool:
+            for success, image in pool.map(load, sources):
+                yield image if success else None
+    
+    def _load_and_prepare_image(self, source: MontageSource, settings: Dict) -> Tuple[bool, Optional[Image.Image]]:
+        """Decode one source at tile size, from its thumbnail if that is large enough"""
+        target_width, target_height = self._tile_box(settings)
+        
+        for location in (source.thumbnail, source.original):
+            if location is None:
+                continue
+            try:
+                stream = open_location(location)
+                if stream is None:
+                    continue
+                with stream:
+                    if not getattr(stream, 'seekable', lambda: False)():
+                        stream = io.BytesIO(stream.read())
+                    image = Image.open(stream)
+                    
+                    if location is source.thumbnail and not self._covers(image.size, settings):
+                        continue
+                    
+                    # JPEGs decode straight to a reduced scale; other formats ignore this
+                    image.draft('RGB', (target_width * DRAFT_OVERSAMPLE, target_height * DRAFT_OVERSAMPLE))
+                    
+                    # Convert to RGB if necessary
+                    if image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGB')
+                    
+                    # Resize while maintaining aspect ratio
+                    if settings['maintain_aspect']:
+                        image.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
+                    else:
+                        image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+                    
+                    return True, image
+                    
+            except Exception as e:
+                logger.error(f"Error preparing image {location.key}: {str(e)}")
+        
+        logger.warning(f"Failed to load image: {source.original.key if source.original else source}")
+        return False, None
+    
+    def _covers(self, size: Tuple[int, int], settings: Dict) -> bool:
+        """True if an image this size needs no upscaling to fill its tile"""
+        target_width, target_height = self._tile_box(settings)
+        width, height = size
+        if settings['maintain_aspect']:
+            return width >= target_width or height >= target_height
+        return width >= target_width and height >= target_height
+    
+    def _create_grid_montage(self, images: Iterable[Optional[Image.Image]], settings: Dict) -> Tuple[bool, Any]:
+        """
+        Paste prepared images into a grid as they arrive
+        
+        The first image sets the cell size; failed sources (None) are skipped,
+        so the montage closes up around them.
+        """
         try:
             rows = settings['rows']
             cols = settings['cols']
@@ -148,49 +206,40 @@ class MontageService:
             border_width = settings['border_width']
             border_color = settings['border_color']
             
-            # Calculate cell dimensions
-            if not images:
-                return False, "No images provided"
-            
-            # Use the first image to determine cell size
-            sample_image = images[0]
-            cell_width, cell_height = sample_image.size
-            
-            # Calculate total montage dimensions
-            total_width = cols * cell_width + (cols + 1) * spacing
-            total_height = rows * cell_height + (rows + 1) * spacing
-            
-            # Add title height if needed
-            if settings.get('title'):
-                total_height += settings['title_height']
-            
-            # Create the montage canvas
-            montage = Image.new('RGB', (total_width, total_height), bg_color)
-            
             # Calculate starting Y position (account for title)
             start_y = settings['title_height'] if settings.get('title') else 0
             
-            # Place images in grid
-            for idx, image in enumerate(images):
-                if idx >= rows * cols:
+            montage = None
+            placed = 0
+            for image in images:
+                if image is None:
+                    continue
+                if placed >= rows * cols:
                     break  # Don't exceed grid capacity
                 
-                row = idx // cols
-                col = idx % cols
+                if montage is None:
+                    # Use the first image to determine cell size
+                    cell_width, cell_height = image.size
+                    total_width = cols * cell_width + (cols + 1) * spacing
+                    total_height = rows * cell_height + (rows + 1) * spacing + start_y
+                    montage = Image.new('RGB', (total_width, total_height), bg_color)
+                
+                row = placed // cols
+                col = placed % cols
                 
                 # Calculate position
                 x = spacing + col * (cell_width + spacing)
                 y = start_y + spacing + row * (cell_height + spacing)
                 
-                # Create a bordered version if border is specified
+                # Border is a filled box under the image
                 if border_width > 0:
-                    bordered_image = Image.new('RGB', 
-                                             (image.width + 2*border_width, image.height + 2*border_width), 
-                                             border_color)
-                    bordered_image.paste(image, (border_width, border_width))
-                    montage.paste(bordered_image, (x - border_width, y - border_width))
-                else:
-                    montage.paste(image, (x, y))
+                    montage.paste(border_color, (x - border_width, y - border_width,
+                                                 x + image.width + border_width, y + image.height + border_width))
+                montage.paste(image, (x, y))
+                placed += 1
+            
+            if placed < 2:
+                return False, "Could not load enough valid images for montage"
             
             return True, montage
             
@@ -256,13 +305,13 @@ class MontageService:
 # Create global instance
 montage_service = MontageService()
 
-def create_montage(photo_paths: List[str], settings: Optional[Dict] = None, 
+def create_montage(photo_paths: List[Union[str, Any]], settings: Optional[Dict] = None, 
                   user_id: Optional[int] = None) -> Tuple[bool, str, Dict]:
     """
     Convenience function to create a montage
     
     Args:
-        photo_paths: List of file paths to photos
+        photo_paths: Photos, or file / App Storage paths
         settings: Custom montage settings
         user_id: User ID for organizing files
         
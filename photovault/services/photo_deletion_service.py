@@ -0,0 +1,266 @@
+"""
+Photo Deletion Service for PhotoVault
+Set-based bulk deletion of photos with deferred, batched file reclamation
+
+Rows are removed in a handful of DELETE statements inside one transaction and
+the files they referenced are recorded as FileTombstone rows in that same
+transaction. A background reaper then removes the files from disk or App
+Storage in batches, so the request never waits on file I/O.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from flask import current_app
+from photovault.models import (
+    Photo, VoiceMemo, VaultPhoto, PhotoPerson, StoryPhoto, PhotoComment, FileTombstone
+)
+from photovault.extensions import db
+from photovault.utils.cache import cache
+from photovault.utils.storage_paths import StorageLocation, location_of, storage_path
+
+logger = logging.getLogger(__name__)
+
+# Tombstones handled per reaper transaction
+REAP_BATCH_SIZE = 200
+
+# Photo file variant -> FileTombstone.source
+PHOTO_FILE_SOURCES = {'original': 'photo', 'thumbnail': 'thumbnail', 'edited': 'edited'}
+
+# Tombstones that keep failing are left in place for inspection
+MAX_REAP_ATTEMPTS = 5
+
+
+def _is_app_storage_path(path: str) -> bool:
+    return path.startswith('users/') or path.startswith('uploads/')
+
+
+class PhotoDeletionService:
+    """Service for bulk photo deletion and tombstone reaping"""
+
+    def bulk_delete(self, user_id: int, photo_ids: Iterable[int]) -> Dict:
+        """
+        Delete a user's photos and everything attached to them in one transaction
+
+        Idempotent: ids that are already gone (or belong to someone else) are
+        reported in 'missing_ids' rather than treated as errors.
+
+        Args:
+            user_id: Owner of the photos
+            photo_ids: Photo ids to delete
+
+        Returns:
+            dict with 'deleted_ids' and 'missing_ids'
+        """
+        requested = sorted({int(pid) for pid in photo_ids})
+        if not requested:
+            return {'deleted_ids': [], 'missing_ids': []}
+
+        # One query for the owned rows and the file columns we need to reclaim
+        rows = db.session.query(
+            Photo.id, Photo.user_id, Photo.file_path, Photo.thumbnail_path, Photo.edited_filename, Photo.edited_path,
+            Photo.storage_backend, Photo.storage_key, Photo.thumbnail_backend, Photo.thumbnail_key,
+            Photo.edited_backend, Photo.edited_key
+        ).filter(Photo.id.in_(requested), Photo.user_id == user_id).all()
+
+        owned_ids = [row.id for row in rows]
+        missing_ids = sorted(set(requested) - set(owned_ids))
+        if not owned_ids:
+            return {'deleted_ids': [], 'missing_ids': missing_ids}
+
+        user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(user_id))
+
+        # Files are tombstoned at their stored locations, except ones a surviving
+        # photo still uses (annotations are saved as a new photo whose original is
+        # the source's edited file)
+        locations = [(location_of(row, variant), source)
+                     for row in rows for variant, source in PHOTO_FILE_SOURCES.items()]
+        shared = self._shared_locations([location for location, _ in locations if location], owned_ids)
+        tombstones = []
+        for location, source in locations:
+            if location and location not in shared:
+                shared.add(location)  # Once per file, even if two deleted photos share it
+                tombstones.append({'path': storage_path(location), 'user_id': user_id,
+                                   'source': source, 'attempts': 0})
+
+        memo_paths = db.session.query(VoiceMemo.file_path).filter(VoiceMemo.photo_id.in_(owned_ids)).all()
+        for (memo_path,) in memo_paths:
+            tombstones.extend(self._tombstones_for(user_id, user_upload_dir, 'voice_memo', [memo_path]))
+
+        if tombstones:
+            db.session.bulk_insert_mappings(FileTombstone, tombstones)
+
+        # Children first, then break self-references, then the photos themselves
+        for model in (VoiceMemo, VaultPhoto, PhotoPerson, StoryPhoto, PhotoComment):
+            model.query.filter(model.photo_id.in_(owned_ids)).delete(synchronize_session=False)
+
+        Photo.query.filter(Photo.paired_photo_id.in_(owned_ids)).update(
+            {Photo.paired_photo_id: None, Photo.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+        Photo.query.filter(Photo.id.in_(owned_ids)).delete(synchronize_session=False)
+        
+        # Query-level deletes bypass the ORM hooks, so record sync tombstones here...
+        from photovault.services.sync_service import sync_service
+        sync_service.record_tombstones('photo', owned_ids, [user_id])
+
+        db.session.commit()
+        
+        # ...and drop the cached counters and vault-share grants and refresh the
+        # admin rollup, as the hooks would have
+        from photovault.services.usage_service import usage_service
+        usage_service.invalidate(user_id)
+        cache.namespace('vault_access').clear()
+        from photovault.services.admin_stats_service import admin_stats_service
+        admin_stats_service.schedule_refresh([user_id])
+        
+        logger.info(f"Bulk deleted {len(owned_ids)} photos for user {user_id}, "
+                    f"{len(tombstones)} files queued for reclamation")
+
+        self.schedule_reap()
+        return {'deleted_ids': owned_ids, 'missing_ids': missing_ids}
+
+    @staticmethod
+    def _shared_locations(locations: List[StorageLocation], excluded_ids: List[int]) -> set:
+        """
+        Which of these locations another photo's original or edited file points at
+
+        Args:
+            locations: Candidate files
+            excluded_ids: Photos being deleted, whose references don't count
+
+        Returns:
+            set of StorageLocation still in use
+        """
+        keys = {location.key for location in locations}
+        if not keys:
+            return set()
+        rows = db.session.query(
+            Photo.storage_backend, Photo.storage_key, Photo.edited_backend, Photo.edited_key
+        ).filter(
+            db.or_(Photo.storage_key.in_(keys), Photo.edited_key.in_(keys)),
+            Photo.id.notin_(excluded_ids)
+        ).all()
+        referenced = set()
+        for row in rows:
+            referenced.add(StorageLocation(row.storage_backend, row.storage_key))
+            referenced.add(StorageLocation(row.edited_backend, row.edited_key))
+        return referenced & set(locations)
+
+    def retire_edited_file(self, photo, location: Optional[StorageLocation] = None) -> bool:
+        """
+        Tombstone a photo's current edited file before a new edit replaces it
+
+        The tombstone is added to the session, so it commits with the new
+        edited path; call schedule_reap() after the commit.
+
+        Args:
+            photo: Photo whose edited file is about to be replaced
+            location: Another edited file of the photo to retire instead (e.g. a
+                      baked edit a reverted recipe was built on)
+
+        Returns:
+            True if a file was tombstoned
+        """
+        location = location or location_of(photo, 'edited')
+        if location is None or location == location_of(photo, 'original'):
+            return False
+        # Annotations are saved as a new photo whose original is this edited file
+        if Photo.query.filter(Photo.storage_backend == location.backend, Photo.storage_key == location.key,
+                              Photo.id != photo.id).first() is not None:
+            return False
+        db.session.add(FileTombstone(path=storage_path(location), user_id=photo.user_id,
+                                     source=PHOTO_FILE_SOURCES['edited'], attempts=0))
+        return True
+
+    def schedule_reap(self) -> None:
+        """Queue a reaper pass on the background job queue"""
+        from photovault.utils.background_jobs import background_jobs
+        background_jobs.submit(self.reap_tombstones)
+
+    def reap_tombstones(self, batch_size: int = REAP_BATCH_SIZE) -> int:
+        """
+        Remove tombstoned files in batches until none are left
+
+        Args:
+            batch_size: Tombstones claimed per transaction
+
+        Returns:
+            Number of tombstones cleared
+        """
+        upload_root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+        cleared = 0
+
+        while True:
+            # skip_locked lets concurrent reapers (one per worker) split the backlog
+            batch = FileTombstone.query.filter(
+                FileTombstone.attempts < MAX_REAP_ATTEMPTS
+            ).order_by(FileTombstone.id).limit(batch_size).with_for_update(skip_locked=True).all()
+            if not batch:
+                break
+
+            done_ids = []
+            for tombstone in batch:
+                error = self._remove_file(tombstone.path, upload_root)
+                if error is None:
+                    done_ids.append(tombstone.id)
+                else:
+                    tombstone.attempts += 1
+                    tombstone.last_error = error
+
+            if done_ids:
+                FileTombstone.query.filter(FileTombstone.id.in_(done_ids)).delete(synchronize_session=False)
+            db.session.commit()
+            cleared += len(done_ids)
+
+            if len(batch) < batch_size:
+                break
+
+        if cleared:
+            logger.info(f"Reaped {cleared} tombstoned files")
+        return cleared
+
+    def _tombstones_for(self, user_id: int, user_upload_dir: str, source: str,
+                        candidates: List[str]) -> List[Dict]:
+        """Build tombstone mappings for the first usable path among candidates"""
+        for path in candidates:
+            if not path:
+                continue
+            # Local paths are stored both absolute and relative to the user folder
+            if not _is_app_storage_path(path) and not os.path.isabs(path):
+                path = os.path.join(user_upload_dir, path)
+            return [{'path': path, 'user_id': user_id, 'source': source, 'attempts': 0}]
+        return []
+
+    def _remove_file(self, path: str, upload_root: str):
+        """
+        Delete one tombstoned file
+
+        Returns:
+            None on success or if the file is already gone, otherwise an error message
+        """
+        if _is_app_storage_path(path):
+            from photovault.services.app_storage_service import app_storage
+            if not app_storage.is_available():
+                return 'App Storage unavailable'
+            if app_storage.delete_file(path) or not app_storage.file_exists(path):
+                return None
+            return 'App Storage delete failed'
+
+        real_path = os.path.realpath(path)
+        if not real_path.startswith(upload_root + os.sep):
+            # Never delete outside the upload folder - drop the tombstone
+            logger.warning(f"Refusing to reap file outside upload folder: {path}")
+            return None
+
+        try:
+            os.remove(real_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return str(e)
+        return None
+
+
+# Global service instance
+photo_deletion_service = PhotoDeletionService()
@@ -0,0 +1,332 @@
+"""
+Storage backends for PhotoVault
+One object-storage interface over the local filesystem, Replit App Storage
+and S3-compatible stores
+
+Object paths use the App Storage layout ('users/<id>/<name>', 'uploads/<name>').
+Every backend supports:
+
+    stat(path)        HEAD-style metadata, or None if the object is missing
+    open(path)        readable binary stream (FileNotFoundError if missing)
+    write(path, f)    stream a file object in without reading it into memory
+    delete(path)
+
+Clients are created once per process and reused, so the underlying HTTP
+connection pools survive between requests. The S3 backend works against any
+S3-compatible endpoint (AWS, MinIO, or a local stand-in via STORAGE_S3_ENDPOINT).
+"""
+
+import io
+import os
+import shutil
+import logging
+import tempfile
+import threading
+import mimetypes
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+STORAGE_NAMESPACES = ('users/', 'uploads/')
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageError(Exception):
+    """Raised when a storage backend fails for a reason other than a missing object"""
+    pass
+
+
+@dataclass
+class ObjectInfo:
+    """Metadata from a HEAD-style lookup; size is None when the backend can't report it"""
+    path: str
+    size: Optional[int] = None
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    modified: Optional[datetime] = None
+
+
+def is_storage_path(path: str) -> bool:
+    """True for App Storage object paths, False for local filesystem paths"""
+    return bool(path) and path.startswith(STORAGE_NAMESPACES)
+
+
+def _spool_to_file(file_obj: BinaryIO) -> str:
+    """Copy a stream to a named temporary file in chunks, returning its path"""
+    fd, temp_path = tempfile.mkstemp(prefix='photovault-upload-')
+    with os.fdopen(fd, 'wb') as out:
+        shutil.copyfileobj(file_obj, out, COPY_CHUNK_SIZE)
+    return temp_path
+
+
+class StorageBackend(ABC):
+    """Interface implemented by every storage backend"""
+
+    name = 'base'
+
+    @abstractmethod
+    def stat(self, path: str) -> Optional[ObjectInfo]:
+        ...
+
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    @abstractmethod
+    def open(self, path: str) -> BinaryIO:
+        ...
+
+    def read(self, path: str) -> bytes:
+        with self.open(path) as stream:
+            return stream.read()
+
+    @abstractmethod
+    def write(self, path: str, file_obj: BinaryIO, content_type: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, path: str) -> bool:
+        ...
+
+
+class LocalBackend(StorageBackend):
+    """
+    Files under a local root directory
+
+    App Storage paths map onto the root with their namespace stripped
+    ('users/42/a.jpg' -> <root>/42/a.jpg), matching where the local upload
+    fallback saves files. Other paths are used as given.
+    """
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, path: str) -> str:
+        if is_storage_path(path):
+            return os.path.join(self.root, path.split('/', 1)[1])
+        return path
+
+    def stat(self, path):
+        try:
+            st = os.stat(self.local_path(path))
+        except OSError:
+            return None
+        return ObjectInfo(
+            path=path,
+            size=st.st_size,
+            content_type=mimetypes.guess_type(path)[0],
+            etag=f'{st.st_mtime_ns:x}-{st.st_size:x}',
+            modified=datetime.utcfromtimestamp(st.st_mtime)
+        )
+
+    def open(self, path):
+        return open(self.local_path(path), 'rb')
+
+    def write(self, path, file_obj, content_type=None):
+        target = self.local_path(path)
+        os.makedirs(os.path.dirname(target) or '.', mode=0o755, exist_ok=True)
+        # Write beside the target and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target) or '.', prefix='.write-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(file_obj, out, COPY_CHUNK_SIZE)
+            os.replace(temp_path, target)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, path):
+        try:
+            os.remove(self.local_path(path))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class ReplitBackend(StorageBackend):
+    """
+    Replit App Storage (replit.object_storage)
+
+    Older client releases return Result objects with .error/.value instead of
+    raising; both styles are accepted.
+    """
+
+    name = 'replit'
+
+    def __init__(self, bucket: Optional[str] = None):
+        self.bucket = bucket
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # One client per process; it holds the pooled HTTP session
+        if self._client is None or self._client_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    from replit.object_storage import Client
+                    self._client = Client(bucket_id=self.bucket) if self.bucket else Client()
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @staticmethod
+    def _unwrap(result):
+        if hasattr(result, 'error'):
+            if result.error:
+                raise StorageError(str(result.error))
+            return result.value
+        return result
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        return type(error).__name__ in ('ObjectNotFoundError', 'NotFound') or 'not found' in str(error).lower()
+
+    def stat(self, path):
+        client = self.client
+        if hasattr(client, 'exists'):
+            found = self._unwrap(client.exists(path))
+        else:
+            found = any(obj.name == path for obj in self._unwrap(client.list(prefix=path)))
+        if not found:
+            return None
+        # App Storage only answers existence; size stays unknown
+        return ObjectInfo(path=path, content_type=mimetypes.guess_type(path)[0])
+
+    def open(self, path):
+        # Download straight to disk, so large objects never sit in memory
+        temp = tempfile.NamedTemporaryFile(prefix='photovault-download-')
+        try:
+            self._unwrap(self.client.download_to_filename(path, temp.name))
+        except Exception as e:
+            temp.close()
+            if self._is_not_found(e):
+                raise FileNotFoundError(path) from e
+            raise
+        temp.seek(0)
+        return temp
+
+    def read(self, path):
+        try:
+            return self._unwrap(self.client.download_as_bytes(path))
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(path) from e
+            raise
+
+    def write(self, path, file_obj, content_type=None):
+        if isinstance(file_obj, io.BytesIO):
+            self._unwrap(self.client.upload_from_bytes(path, file_obj.getvalue()))
+            return
+
+        source = getattr(file_obj, 'name', None)
+        if isinstance(source, str) and os.path.isfile(source):
+            if hasattr(file_obj, 'flush'):
+                file_obj.flush()
+            self._unwrap(self.client.upload_from_filename(path, source))
+            return
+
+        temp_path = _spool_to_file(file_obj)
+        try:
+            self._unwrap(self.client.upload_from_filename(path, temp_path))
+        finally:
+            os.remove(temp_path)
+
+    def delete(self, path):
+        try:
+            self._unwrap(self.client.delete(path))
+            return True
+        except Exception as e:
+            if self._is_not_found(e):
+                return False
+            raise
+
+
+class S3Backend(StorageBackend):
+    """
+    S3-compatible object store via boto3 (optional dependency)
+
+    Set endpoint_url to point at MinIO or another local stand-in.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 max_connections: int = 10):
+        try:
+            import boto3  # noqa: F401
+        except ImportError as e:
+            raise StorageError('boto3 is required for the s3 storage backend') from e
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.max_connections = max_connections
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 clients are thread-safe; one per process shares its connection pool
+        if self._client is None or self._client_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    import boto3
+                    from botocore.config import Config
+                    self._client = boto3.client(
+                        's3',
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        config=Config(max_pool_connections=self.max_connections, retries={'mode': 'standard'})
+                    )
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    def stat(self, path):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=path)
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return ObjectInfo(
+            path=path,
+            size=head.get('ContentLength'),
+            content_type=head.get('ContentType'),
+            etag=(head.get('ETag') or '').strip('"') or None,
+            modified=head.get('LastModified')
+        )
+
+    def open(self, path):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=path)['Body']
+        except Exception as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(path) from e
+            raise
+
+    def write(self, path, file_obj, content_type=None):
+        extra = {'ContentType': content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'}
+        # upload_fileobj switches to multipart for large bodies and reads in parts
+        self.client.upload_fileobj(file_obj, self.bucket, path, ExtraArgs=extra)
+
+    def delete(self, path):
+        self.client.delete_object(Bucket=self.bucket, Key=path)
+        return True
@@ -0,0 +1,247 @@
+"""
+Sync Service for PhotoVault
+Delta sync for mobile clients: what changed for a user since a server-issued cursor
+
+Changes are derived from Photo.updated_at and FamilyMember.updated_at plus
+SyncTombstone rows for deletions. ORM flush hooks keep both current:
+  - deleting a Photo / FamilyMember / FamilyVault writes a tombstone
+  - adding or deleting a VoiceMemo / PhotoComment bumps its photo's
+    updated_at, so count changes arrive as a photo update
+Bulk (query-level) deletes bypass the ORM and call record_tombstones() directly.
+
+Cursors are "<updated_at microseconds>.<photo id>" keyset positions. Pages
+within one sync advance exactly and carry a ".p" suffix: the position of a page
+in an old library can predate the tombstone retention window, and only the
+cursor a sync starts from is checked against it. The final cursor is pulled
+back by SYNC_CLOCK_SKEW_SECONDS so rows committed by slower concurrent
+transactions are picked up next time (clients apply changes idempotently).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import event, and_, or_, update, insert
+from sqlalchemy.orm import Session
+from photovault.models import (
+    Photo, VoiceMemo, PhotoComment, FamilyVault, FamilyMember, SyncTombstone
+)
+from photovault.extensions import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+DEFAULT_CLOCK_SKEW_SECONDS = 5
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 30
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# Suffix marking a cursor that continues a sync rather than starting one
+_PAGING_MARKER = 'p'
+
+
+def encode_cursor(updated_at: datetime, photo_id: int = 0, paging: bool = False) -> str:
+    delta = updated_at - _EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    cursor = f"{micros}.{photo_id}"
+    return f"{cursor}.{_PAGING_MARKER}" if paging else cursor
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int, bool]]:
+    """Return (updated_at, photo_id, paging) or None for a missing/malformed cursor"""
+    if not cursor:
+        return None
+    try:
+        parts = cursor.split('.')
+        if len(parts) > 3 or (len(parts) == 3 and parts[2] != _PAGING_MARKER):
+            return None
+        photo_id = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+        return _EPOCH + timedelta(microseconds=int(parts[0])), photo_id, len(parts) == 3
+    except (ValueError, OverflowError):
+        return None
+
+
+class SyncService:
+    """Service computing per-user change sets for delta sync"""
+
+    def __init__(self):
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def changes_since(self, user_id: int, cursor: Optional[str], limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """
+        Collect changes for a user since cursor
+
+        Args:
+            user_id: User to sync
+            cursor: Cursor from a previous response, or None for a full sync
+            limit: Maximum photos per page
+
+        Returns:
+            dict with 'full_sync', 'photos' (Photo rows), 'deleted_photo_ids',
+            'vault_memberships' (FamilyMember rows), 'removed_vault_ids',
+            'created_vaults' (FamilyVault rows), 'has_more' and 'cursor'
+        """
+        limit = max(1, min(MAX_PAGE_SIZE, limit))
+        sync_started = datetime.utcnow()
+        position = decode_cursor(cursor)
+
+        # A sync starting from a cursor older than the tombstone retention may
+        # have missed deletions, so it starts over; pages of a sync in progress
+        # are never restarted, however old the photos they have reached
+        retention = timedelta(days=self._retention_days())
+        full_sync = position is None or (not position[2] and position[0] < sync_started - retention)
+        if full_sync:
+            position = (_EPOCH, 0, False)
+        since, after_id, _ = position
+
+        # Keyset page ordered by (updated_at, id) on the raw column, so
+        # ix_photo_user_updated serves it (updated_at is never NULL, see the
+        # 20251019_photo_updated_not_null migration)
+        photos = Photo.query.filter(
+            Photo.user_id == user_id,
+            or_(Photo.updated_at > since, and_(Photo.updated_at == since, Photo.id > after_id))
+        ).order_by(Photo.updated_at, Photo.id).limit(limit + 1).all()
+
+        has_more = len(photos) > limit
+        photos = photos[:limit]
+
+        deleted_photo_ids, removed_vault_ids = [], []
+        memberships, created_vaults = [], []
+        if not full_sync:
+            tombstones = SyncTombstone.query.filter(
+                SyncTombstone.user_id == user_id, SyncTombstone.deleted_at > since
+            ).all()
+            deleted_photo_ids = sorted({t.entity_id for t in tombstones if t.entity_type == 'photo'})
+            removed_vault_ids = {t.entity_id for t in tombstones if t.entity_type in ('vault', 'vault_membership')}
+
+        membership_filter = [FamilyMember.user_id == user_id]
+        vault_filter = [FamilyVault.created_by == user_id]
+        if not full_sync:
+            membership_filter.append(db.func.coalesce(FamilyMember.updated_at, FamilyMember.joined_at) > since)
+            vault_filter.append(db.func.coalesce(FamilyVault.updated_at, FamilyVault.created_at) > since)
+        memberships = FamilyMember.query.filter(*membership_filter).all()
+        created_vaults = FamilyVault.query.filter(*vault_filter).all()
+        
+        # A membership re-added after removal wins over the older tombstone
+        active_vault_ids = {m.vault_id for m in memberships if m.status == 'active'}
+        removed_vault_ids = sorted(set(removed_vault_ids) - active_vault_ids)
+
+        if has_more:
+            last = photos[-1]
+            next_cursor = encode_cursor(last.updated_at, last.id, paging=True)
+        else:
+            next_cursor = encode_cursor(sync_started - timedelta(seconds=self._clock_skew_seconds()))
+
+        self._maybe_schedule_prune()
+
+        return {
+            'full_sync': full_sync,
+            'photos': photos,
+            'deleted_photo_ids': deleted_photo_ids,
+            'vault_memberships': memberships,
+            'removed_vault_ids': removed_vault_ids,
+            'created_vaults': created_vaults,
+            'has_more': has_more,
+            'cursor': next_cursor
+        }
+
+    def record_tombstones(self, entity_type: str, entity_ids: Iterable[int], user_ids: Iterable[int],
+                          connection=None) -> None:
+        """
+        Record deletions for sync (caller commits)
+
+        Args:
+            entity_type: 'photo', 'vault' or 'vault_membership'
+            entity_ids: Ids of the deleted entities
+            user_ids: Users who should see the deletion (one id per entity, or a single
+                id applied to all of them)
+            connection: Connection to write with (used from flush hooks)
+        """
+        entity_ids = list(entity_ids)
+        user_ids = list(user_ids)
+        if len(user_ids) == 1:
+            user_ids = user_ids * len(entity_ids)
+        now = datetime.utcnow()
+        rows = [
+            {'user_id': user_id, 'entity_type': entity_type, 'entity_id': entity_id, 'deleted_at': now}
+            for entity_id, user_id in zip(entity_ids, user_ids) if user_id is not None
+        ]
+        if not rows:
+            return
+        if connection is not None:
+            connection.execute(insert(SyncTombstone.__table__), rows)
+        else:
+            db.session.execute(insert(SyncTombstone.__table__), rows)
+
+    def prune_tombstones(self) -> int:
+        """Delete tombstones older than the retention window (clients that old get a full sync)"""
+        cutoff = datetime.utcnow() - timedelta(days=self._retention_days())
+        deleted = SyncTombstone.query.filter(SyncTombstone.deleted_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} sync tombstones older than {cutoff}")
+        return deleted
+
+    def _maybe_schedule_prune(self) -> None:
+        # At most hourly per process
+        with self._prune_lock:
+            if time.monotonic() - self._last_prune < 3600:
+                return
+            self._last_prune = time.monotonic()
+        from photovault.utils.background_jobs import background_jobs
+        background_jobs.submit(self.prune_tombstones)
+
+    def _clock_skew_seconds(self) -> int:
+        return int(current_app.config.get('SYNC_CLOCK_SKEW_SECONDS', DEFAULT_CLOCK_SKEW_SECONDS))
+
+    def _retention_days(self) -> int:
+        return int(current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', DEFAULT_TOMBSTONE_RETENTION_DAYS))
+
+
+# Global service instance
+sync_service = SyncService()
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_sync_changes(session, flush_context):
+    """Turn ORM deletes into tombstones and memo/comment changes into photo updates"""
+    touched_photo_ids = set()
+    photo_deletions: List[Tuple[int, int]] = []
+    membership_deletions: List[Tuple[int, int]] = []
+    vault_deletions: List[Tuple[int, int]] = []
+
+    for obj in session.new:
+        if isinstance(obj, (VoiceMemo, PhotoComment)) and obj.photo_id:
+            touched_photo_ids.add(obj.photo_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, (VoiceMemo, PhotoComment)) and obj.photo_id:
+            touched_photo_ids.add(obj.photo_id)
+        elif isinstance(obj, Photo):
+            photo_deletions.append((obj.id, obj.user_id))
+        elif isinstance(obj, FamilyMember):
+            membership_deletions.append((obj.vault_id, obj.user_id))
+        elif isinstance(obj, FamilyVault):
+            vault_deletions.append((obj.id, obj.created_by))
+
+    if not (touched_photo_ids or photo_deletions or membership_deletions or vault_deletions):
+        return
+
+    connection = session.connection()
+    if touched_photo_ids:
+        connection.execute(
+            update(Photo.__table__)
+            .where(Photo.__table__.c.id.in_(touched_photo_ids))
+            .values(updated_at=datetime.utcnow())
+        )
+    for entity_type, pairs in (('photo', photo_deletions),
+                               ('vault_membership', membership_deletions),
+                               ('vault', vault_deletions)):
+        if pairs:
+            sync_service.record_tombstones(entity_type, [p[0] for p in pairs], [p[1] for p in pairs],
+                                           connection=connection)
@@ -0,0 +1,130 @@
+"""
+Usage Service for PhotoVault
+Cached per-user plan limits and library counters used by dashboards and middleware
+
+Both lookups run on nearly every page load, so they are kept in the shared
+cache (see photovault.utils.cache) and invalidated after commit whenever
+a user's Photo or UserSubscription rows change. Query-level bulk writes
+bypass the hook and call usage_service.invalidate() themselves.
+"""
+
+import logging
+from typing import Dict
+from sqlalchemy import event, func, case
+from sqlalchemy.orm import Session
+from photovault.models import Photo, UserSubscription, SubscriptionPlan
+from photovault.extensions import db
+from photovault.utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Storage allowance for users without a plan
+FREE_STORAGE_LIMIT_MB = 100
+
+_plan_limits = cache.namespace('plan_limits', ttl=600)
+_photo_stats = cache.namespace('photo_stats', ttl=300)
+
+
+class UsageService:
+    """Service for cached plan limits and photo counters"""
+
+    def plan_limits(self, user_id: int) -> Dict:
+        """
+        Get a user's subscription state and plan limits
+
+        Args:
+            user_id: User to look up
+
+        Returns:
+            dict with 'has_active_subscription', 'plan_name', 'storage_gb'
+            (None without a plan), 'max_photos' and 'max_family_vaults'
+        """
+        return _plan_limits.get_or_set(user_id, lambda: self._load_plan_limits(user_id))
+
+    def storage_limit_mb(self, user_id: int) -> float:
+        """Storage allowance in MB, falling back to the free allowance"""
+        storage_gb = self.plan_limits(user_id)['storage_gb']
+        if storage_gb is None:
+            return FREE_STORAGE_LIMIT_MB
+        return storage_gb * 1024
+
+    def photo_stats(self, user_id: int) -> Dict:
+        """
+        Get a user's photo counters in one aggregate query
+
+        Returns:
+            dict with 'total_photos', 'edited_photos', 'original_photos'
+            and 'total_size_bytes'
+        """
+        return _photo_stats.get_or_set(user_id, lambda: self._load_photo_stats(user_id))
+
+    def invalidate(self, user_id: int) -> None:
+        _plan_limits.delete(user_id)
+        _photo_stats.delete(user_id)
+
+    def _load_plan_limits(self, user_id: int) -> Dict:
+        # Prefer the active subscription; otherwise report the most recent one's plan
+        row = db.session.query(UserSubscription.status, SubscriptionPlan).join(
+            SubscriptionPlan, UserSubscription.plan_id == SubscriptionPlan.id
+        ).filter(UserSubscription.user_id == user_id).order_by(
+            case((UserSubscription.status == 'active', 0), else_=1), UserSubscription.id.desc()
+        ).first()
+
+        if row is None:
+            return {'has_active_subscription': False, 'plan_name': None, 'storage_gb': None,
+                    'max_photos': None, 'max_family_vaults': 0}
+
+        status, plan = row
+        return {
+            'has_active_subscription': status == 'active',
+            'plan_name': plan.name,
+            'storage_gb': float(plan.storage_gb) if plan.storage_gb is not None else None,
+            'max_photos': plan.max_photos,
+            'max_family_vaults': plan.max_family_vaults or 0
+        }
+
+    def _load_photo_stats(self, user_id: int) -> Dict:
+        total, edited, size = db.session.query(
+            func.count(Photo.id),
+            func.count(Photo.edited_filename),
+            func.coalesce(func.sum(Photo.file_size), 0)
+        ).filter(Photo.user_id == user_id).one()
+        return {
+            'total_photos': total,
+            'edited_photos': edited,
+            'original_photos': total - edited,
+            'total_size_bytes': int(size)
+        }
+
+
+# Global service instance
+usage_service = UsageService()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_usage_changes(session, flush_context):
+    """Note users whose photos or subscriptions changed; invalidated once committed"""
+    pending = session.info.setdefault('usage_invalidate', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Photo, UserSubscription)) and obj.user_id:
+            pending.add(obj.user_id)
+        elif isinstance(obj, SubscriptionPlan):
+            pending.add('*')
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_usage(session):
+    # After commit, so a concurrent reader can't re-cache the pre-commit state
+    pending = session.info.pop('usage_invalidate', None)
+    if not pending:
+        return
+    if '*' in pending:
+        _plan_limits.clear()
+        pending.discard('*')
+    for user_id in pending:
+        usage_service.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_usage_changes(session):
+    session.info.pop('usage_invalidate', None)
@@ -0,0 +1,293 @@
+"""
+Voice Memo Service for PhotoVault
+Streaming memo uploads, range-capable playback and background analysis/transcoding
+
+Uploads are parsed straight off the request stream: each file part is written
+to a temporary file in the memo's final directory (so saving is a rename) and
+the byte limit is enforced as data arrives rather than after spooling.
+
+Playback uses send_file with conditional responses, so clients get ETag/304
+and Range/206 partial content - AVPlayer can seek without downloading the memo.
+
+After upload a background job decodes each memo once to record its true
+duration and a small waveform of peak levels (see photovault.utils.audio_analysis).
+When VOICE_MEMO_TRANSCODE is set ('aac' or 'opus') and ffmpeg is installed,
+new memos are re-encoded to a compact mono speech bitrate in a background job;
+the original is handed to the file tombstone reaper once the smaller file is in place.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+import tempfile
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Optional
+from flask import request, current_app, send_file
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from photovault.models import VoiceMemo, FileTombstone
+from photovault.extensions import db
+from photovault.utils.audio_analysis import analyze_audio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MEMO_SIZE = 25 * 1024 * 1024
+# Multipart boundaries and small form fields on top of the audio itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+AUDIO_MIMETYPES = {
+    '.m4a': 'audio/mp4',
+    '.mp4': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.webm': 'audio/webm',
+    '.ogg': 'audio/ogg',
+    '.opus': 'audio/ogg',
+}
+
+# codec -> (ffmpeg encoder, extension, mimetype)
+TRANSCODE_TARGETS = {
+    'aac': ('aac', '.m4a', 'audio/mp4'),  # Plays everywhere, including AVPlayer
+    'opus': ('libopus', '.ogg', 'audio/ogg'),  # Smaller; for web-only deployments
+}
+TRANSCODE_TIMEOUT = 120
+
+
+class _LimitedFile:
+    """Writable file that raises RequestEntityTooLarge once limit bytes are exceeded"""
+
+    def __init__(self, file, limit: int):
+        self._file = file
+        self.limit = limit
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        if self.written > self.limit:
+            raise RequestEntityTooLarge(f'Voice memo exceeds {self.limit // (1024 * 1024)} MB')
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+@dataclass
+class StreamedUpload:
+    """A parsed upload whose audio part already sits on disk"""
+    form: MultiDict
+    file: Optional[FileStorage]
+    temp_path: Optional[str]
+    size: int = 0
+
+    def save(self, path: str) -> None:
+        """Move the streamed file to its final path (same directory, so a rename)"""
+        self.file.stream.close()
+        os.replace(self.temp_path, path)
+        self.temp_path = None
+
+    def discard(self) -> None:
+        if self.temp_path:
+            if self.file is not None:
+                self.file.stream.close()
+            _remove(self.temp_path)
+            self.temp_path = None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class VoiceMemoService:
+    """Service for voice memo upload, playback and transcoding"""
+
+    def receive_upload(self, target_dir: str, field_name: str = 'audio') -> StreamedUpload:
+        """
+        Parse the current multipart request, streaming file parts into target_dir
+
+        Must run before anything touches request.form / request.files.
+
+        Args:
+            target_dir: Directory the memo will be saved in
+            field_name: Form field carrying the audio
+
+        Returns:
+            StreamedUpload; file is None when the field is missing
+
+        Raises:
+            RequestEntityTooLarge: The body exceeded VOICE_MEMO_MAX_SIZE
+        """
+        max_bytes = current_app.config.get('VOICE_MEMO_MAX_SIZE', DEFAULT_MAX_MEMO_SIZE)
+        os.makedirs(target_dir, exist_ok=True)
+        part_paths = []
+
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            part = tempfile.NamedTemporaryFile('wb+', dir=target_dir, prefix='.upload-',
+                                               suffix='.part', delete=False)
+            part_paths.append(part.name)
+            return _LimitedFile(part, max_bytes)
+
+        try:
+            _, form, files = parse_form_data(
+                request.environ, stream_factory=stream_factory,
+                max_content_length=max_bytes + FORM_OVERHEAD_BYTES, silent=False
+            )
+        except Exception:
+            for path in part_paths:
+                _remove(path)
+            raise
+
+        audio = files.get(field_name)
+        if audio is None or not audio.filename:
+            audio = None
+        temp_path = audio.stream.name if audio is not None else None
+
+        # Stray file fields are never kept
+        for storage in files.values():
+            if storage is not audio:
+                storage.stream.close()
+        for path in part_paths:
+            if path != temp_path:
+                _remove(path)
+
+        return StreamedUpload(form=form, file=audio, temp_path=temp_path,
+                              size=audio.stream.written if audio is not None else 0)
+
+    def mimetype_for(self, memo: VoiceMemo) -> str:
+        ext = os.path.splitext(memo.file_path or memo.filename or '')[1].lower()
+        if ext in AUDIO_MIMETYPES:
+            return AUDIO_MIMETYPES[ext]
+        if memo.mime_type:
+            return memo.mime_type.split(';')[0].strip()
+        return 'application/octet-stream'
+
+    def send_audio(self, memo: VoiceMemo):
+        """
+        Response for a memo's audio with ETag and Range support
+
+        Returns:
+            200 / 206 partial content / 304 / 416, as the request headers call for
+        """
+        return send_file(
+            memo.file_path,
+            mimetype=self.mimetype_for(memo),
+            as_attachment=False,
+            download_name=memo.original_name,
+            conditional=True,
+            etag=True
+        )
+
+    def schedule_processing(self, memo_id: int) -> None:
+        """Queue post-upload analysis (and transcoding, if configured) for a new memo"""
+        from photovault.utils.background_jobs import background_jobs
+        background_jobs.submit(self.process_new_memo, memo_id)
+
+    def process_new_memo(self, memo_id: int) -> None:
+        # Analyze first, from the original recording
+        self.analyze(memo_id)
+        if current_app.config.get('VOICE_MEMO_TRANSCODE'):
+            self.transcode(memo_id)
+
+    def analyze(self, memo_id: int) -> bool:
+        """
+        Decode a memo once to store its true duration and waveform peaks
+
+        The server-measured duration replaces the one the client sent.
+
+        Args:
+            memo_id: VoiceMemo to analyze
+
+        Returns:
+            True if anything was measured
+        """
+        memo = VoiceMemo.query.get(memo_id)
+        if not memo or not memo.file_path or not os.path.exists(memo.file_path):
+            return False
+
+        result = analyze_audio(memo.file_path)
+        memo.analyzed_at = datetime.utcnow()
+        if result:
+            memo.duration = round(result['duration'], 2)
+            if result['peaks']:
+                memo.waveform = bytes(result['peaks'])
+        db.session.commit()
+
+        if not result:
+            logger.warning(f"Could not analyze voice memo {memo_id} ({memo.file_path})")
+            return False
+        logger.info(f"Analyzed voice memo {memo_id}: {memo.duration}s, {len(result['peaks'])} waveform points")
+        return True
+
+    def transcode(self, memo_id: int) -> bool:
+        """
+        Re-encode a memo to a compact mono bitrate and swap it in if smaller
+
+        Args:
+            memo_id: VoiceMemo to transcode
+
+        Returns:
+            True if the memo now points at the transcoded file
+        """
+        codec = current_app.config.get('VOICE_MEMO_TRANSCODE')
+        if codec not in TRANSCODE_TARGETS:
+            logger.warning(f"Unknown VOICE_MEMO_TRANSCODE codec: {codec}")
+            return False
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            logger.warning("VOICE_MEMO_TRANSCODE is set but ffmpeg is not installed")
+            return False
+
+        memo = VoiceMemo.query.get(memo_id)
+        if not memo or not memo.file_path or not os.path.exists(memo.file_path):
+            return False
+
+        encoder, extension, mimetype = TRANSCODE_TARGETS[codec]
+        source = memo.file_path
+        if source.endswith(f'.{codec}{extension}'):
+            return False  # Already transcoded
+        target = f'{os.path.splitext(source)[0]}.{codec}{extension}'
+        bitrate = current_app.config.get('VOICE_MEMO_BITRATE', '32k')
+
+        try:
+            subprocess.run(
+                [ffmpeg, '-nostdin', '-y', '-loglevel', 'error', '-i', source,
+                 '-vn', '-ac', '1', '-c:a', encoder, '-b:a', bitrate, target],
+                check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            stderr = getattr(e, 'stderr', b'') or b''
+            logger.error(f"Transcoding voice memo {memo_id} failed: {e} {stderr.decode(errors='ignore')[:500]}")
+            _remove(target)
+            return False
+
+        new_size = os.path.getsize(target)
+        if new_size >= (memo.file_size or os.path.getsize(source)):
+            _remove(target)
+            return False
+
+        # The memo may have been deleted while ffmpeg ran
+        if db.session.query(VoiceMemo.id).filter_by(id=memo_id).first() is None:
+            _remove(target)
+            return False
+
+        memo.file_path = target
+        memo.filename = os.path.basename(target)
+        memo.file_size = new_size
+        memo.mime_type = mimetype
+        db.session.add(FileTombstone(path=source, user_id=memo.user_id, source='voice_memo', attempts=0))
+        db.session.commit()
+
+        from photovault.services.photo_deletion_service import photo_deletion_service
+        photo_deletion_service.schedule_reap()
+        logger.info(f"Transcoded voice memo {memo_id} to {codec} {bitrate}: {new_size} bytes")
+        return True
+
+
+# Global service instance
+voice_memo_service = VoiceMemoService()
@@ -10,7 +10,7 @@ All effects output MP4 videos compatible with web, iOS, and Android.
 
 import cv2
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageFilter
 import logging
 import os
 from typing import Tuple, Optional
@@ -404,23 +404,25 @@ class PhotoAnimator:
         speed: float = 1.0
     ) -> str:
         """
-        Create an animated GIF with various effects
+        Create an animation with various effects
         
         Args:
             input_path: Path to input image
-            output_path: Path for output GIF
+            output_path: Path for output animation; the extension picks the format
+                         (.gif, .webp, .png for APNG, .mp4)
             animation_type: Type of animation (kenburns, fadeinout, slideshow, parallax, vintage, living)
             duration: Duration in seconds
             speed: Speed multiplier
             
         Returns:
-            Path to created GIF
+            Path to created animation
         """
         try:
             from PIL import Image, ImageEnhance, ImageFilter
+            from photovault.utils.animation_output import encode_frames
             import math
             
-            logger.info(f"Creating {animation_type} GIF animation: duration={duration}s, speed={speed}x")
+            logger.info(f"Creating {animation_type} animation: duration={duration}s, speed={speed}x")
             
             # Load image
             img = Image.open(input_path)
@@ -431,7 +433,6 @@ class PhotoAnimator:
             fps = max(5, int(10 * speed))
             total_frames = max(10, int(duration * fps))
             
-            frames = []
             width, height = img.size
             
             # Generate frames based on animation type
@@ -450,12 +451,13 @@ class PhotoAnimator:
                 )
                 
                 if success:
-                    logger.info(f"✅ Living portrait GIF created: {output_path}")
+                    logger.info(f"✅ Living portrait created: {output_path}")
                     return output_path
                 else:
                     raise Exception("Failed to create living portrait animation")
-            else:
-                # Standard animations
+            
+            def render_frames():
+                # Standard animations, generated one at a time for the encoder
                 for i in range(total_frames):
                     progress = i / total_frames
                     
@@ -472,24 +474,15 @@ class PhotoAnimator:
                     else:
                         frame = img.copy()
                     
-                    frames.append(frame)
-            
-            # Save as animated GIF
-            frame_duration = int(1000 / fps)
-            frames[0].save(
-                output_path,
-                save_all=True,
-                append_images=frames[1:],
-                duration=frame_duration,
-                loop=0,
-                optimize=True
-            )
-            
-            logger.info(f"✅ Animated GIF created: {output_path}")
+                    yield frame
+            
+            encode_frames(render_frames(), output_path, fps)
+            
+            logger.info(f"✅ Animation created: {output_path}")
             return output_path
             
         except Exception as e:
-            logger.error(f"❌ GIF creation failed: {str(e)}")
+            logger.error(f"❌ Animation creation failed: {str(e)}")
             raise
     
     def _create_kenburns_frame(self, img: Image.Image, progress: float) -> Image.Image:
@@ -0,0 +1,247 @@
+"""
+PhotoVault Animation Output
+Encodes rendered animation frames as MP4, animated WebP, APNG or GIF
+
+Frames come from a generator and are encoded as they are produced:
+
+    mp4   H.264 through OpenCV's VideoWriter, written frame by frame
+    webp  animated WebP through Pillow
+    apng  animated PNG through Pillow
+    gif   palette GIF through Pillow - plays everywhere, so it is the fallback
+
+Pillow's multi-frame writers keep the frames they have consumed until the file
+is finished, so only MP4 runs in constant memory. MP4 and WebP are typically
+5-10x smaller than the equivalent GIF.
+
+Clients say what they can display; see choose_format(). OpenCV is only
+imported when an MP4 is probed for or written, so serving animations stays light.
+"""
+import os
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AnimationFormat:
+    name: str
+    extension: str
+    mimetype: str
+
+
+ANIMATION_FORMATS = {
+    'mp4': AnimationFormat('mp4', '.mp4', 'video/mp4'),
+    'webp': AnimationFormat('webp', '.webp', 'image/webp'),
+    'apng': AnimationFormat('apng', '.png', 'image/apng'),
+    'gif': AnimationFormat('gif', '.gif', 'image/gif'),
+}
+DEFAULT_FORMAT = 'gif'
+
+# Pillow save options per format
+WEBP_QUALITY = 80
+WEBP_METHOD = 4  # 0 (fast) .. 6 (small)
+APNG_COMPRESS_LEVEL = 3
+
+# H.264 first; OpenCV wheels built without it can usually still write MPEG-4 Part 2,
+# which browsers don't play, so it isn't offered
+H264_FOURCCS = ('avc1', 'H264', 'X264')
+
+_supported = None
+_h264_fourcc = None
+_supported_lock = threading.Lock()
+
+
+class AnimationEncodeError(Exception):
+    """Raised when frames can't be encoded in the requested format"""
+    pass
+
+
+def _probe_h264() -> Optional[str]:
+    """FourCC of a working H.264 encoder in this OpenCV build, or None"""
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'probe.mp4')
+        frame = np.zeros((16, 16, 3), dtype=np.uint8)
+        for fourcc in H264_FOURCCS:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 10, (16, 16))
+            try:
+                if writer.isOpened():
+                    writer.write(frame)
+                    return fourcc
+            finally:
+                writer.release()
+    return None
+
+
+def supported_formats() -> Tuple[str, ...]:
+    """
+    Formats this server can encode, probed once per process
+
+    Returns:
+        Format names in order of preference (smallest output first)
+    """
+    global _supported, _h264_fourcc
+    if _supported is None:
+        with _supported_lock:
+            if _supported is None:
+                available = []
+                _h264_fourcc = _probe_h264()
+                if _h264_fourcc:
+                    available.append('mp4')
+                # Pillow 11+ builds with WebP always write animations ('webp_anim'
+                # was deprecated, then removed in Pillow 12)
+                if features.check_module('webp'):
+                    available.append('webp')
+                available += ['apng', 'gif']
+                _supported = tuple(available)
+                logger.info(f"Animation formats available: {', '.join(_supported)}")
+    return _supported
+
+
+def choose_format(requested: Union[str, Sequence[str], None] = None, accept=None) -> AnimationFormat:
+    """
+    Pick the output format for a client
+
+    Args:
+        requested: Format name, or names the client can display in its order of
+                   preference (e.g. ['mp4', 'webp', 'gif'])
+        accept: (mimetype, quality) pairs, e.g. request.accept_mimetypes. Only
+                types listed explicitly count - a bare */* would otherwise pick
+                MP4 for clients that render animations in an <img>.
+
+    Returns:
+        The first requested format that can be encoded here, else the first
+        explicitly accepted one, else GIF
+    """
+    available = supported_formats()
+
+    if isinstance(requested, str):
+        requested = [requested]
+    for name in requested or ():
+        name = str(name).lower()
+        if name in available:
+            return ANIMATION_FORMATS[name]
+
+    accepted = {value.lower() for value, quality in (accept or ()) if quality > 0}
+    for name in available:
+        if ANIMATION_FORMATS[name].mimetype in accepted:
+            return ANIMATION_FORMATS[name]
+
+    return ANIMATION_FORMATS[DEFAULT_FORMAT]
+
+
+def format_for_path(path: str) -> AnimationFormat:
+    """Animation format implied by a file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    for animation_format in ANIMATION_FORMATS.values():
+        if animation_format.extension == extension:
+            return animation_format
+    raise AnimationEncodeError(f'Unsupported animation file type: {extension or path}')
+
+
+def _as_image(frame) -> Image.Image:
+    if isinstance(frame, Image.Image):
+        return frame
+    return Image.fromarray(frame)
+
+
+def _write_mp4(frames: Iterable, output_path: str, fps: float) -> int:
+    import cv2
+    import numpy as np
+
+    supported_formats()
+    fourcc = _h264_fourcc
+    if fourcc is None:
+        raise AnimationEncodeError('This OpenCV build has no H.264 encoder')
+
+    writer = None
+    count = 0
+    try:
+        for frame in frames:
+            if isinstance(frame, Image.Image):
+                frame = np.asarray(frame.convert('RGB'))
+            if writer is None:
+                # H.264 needs even dimensions
+                height, width = frame.shape[0] & ~1, frame.shape[1] & ~1
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+                if not writer.isOpened():
+                    raise AnimationEncodeError(f'Could not open video writer for {output_path}')
+            writer.write(cv2.cvtColor(np.ascontiguousarray(frame[:height, :width]), cv2.COLOR_RGB2BGR))
+            count += 1
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
+
+
+def _write_pillow(frames: Iterable, output_path: str, fps: float, animation_format: AnimationFormat) -> int:
+    frames = iter(frames)
+    try:
+        first = _as_image(next(frames))
+    except StopIteration:
+        raise AnimationEncodeError('No frames to encode')
+
+    count = 1
+
+    def remaining():
+        nonlocal count
+        for frame in frames:
+            count += 1
+            yield _as_image(frame)
+
+    options = {
+        'save_all': True,
+        'append_images': remaining(),
+        'duration': int(1000 / fps),  # milliseconds per frame
+        'loop': 0,
+    }
+    if animation_format.name == 'webp':
+        options.update(format='WEBP', quality=WEBP_QUALITY, method=WEBP_METHOD)
+    elif animation_format.name == 'apng':
+        options.update(format='PNG', compress_level=APNG_COMPRESS_LEVEL)
+    else:
+        options.update(format='GIF', optimize=False)
+
+    first.save(output_path, **options)
+    return count
+
+
+def encode_frames(frames: Iterable, output_path: str, fps: float,
+                  animation_format: Optional[AnimationFormat] = None) -> int:
+    """
+    Encode frames to an animation file as they are generated
+
+    Args:
+        frames: RGB uint8 arrays (H x W x 3) or PIL images, typically a generator
+        output_path: Destination file
+        fps: Frames per second
+        animation_format: Output format; defaults to the one output_path's extension implies
+
+    Returns:
+        Number of frames written
+
+    Raises:
+        AnimationEncodeError: The format can't be encoded here or there were no frames
+    """
+    animation_format = animation_format or format_for_path(output_path)
+    if animation_format.name == 'mp4':
+        count = _write_mp4(frames, output_path, fps)
+        if not count:
+            raise AnimationEncodeError('No frames to encode')
+    else:
+        count = _write_pillow(frames, output_path, fps, animation_format)
+
+    logger.info(f"Encoded {count} frames as {animation_format.name}: "
+                f"{os.path.getsize(output_path) / 1024:.0f} KB")
+    return count
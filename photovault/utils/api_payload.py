@@ -0,0 +1,52 @@
+"""
+PhotoVault API Payload Shaping
+Trims list payloads for the mobile API: null-field omission and ?fields= selection
+
+Clients treat a missing key the same as null, so dropping nulls is safe and
+typically removes a third of a photo record. ?fields=id,thumbnail_url,created_at
+narrows records further; 'id' is always kept so clients can key their lists.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+from flask import request
+
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def requested_fields(param: str = 'fields') -> Optional[Set[str]]:
+    """
+    Parse a comma-separated field list from the query string
+
+    Returns:
+        Set of field names, or None when the parameter is absent or empty
+    """
+    raw = request.args.get(param, '')
+    fields = {name.strip() for name in raw.split(',') if _FIELD_NAME.match(name.strip())}
+    if not fields:
+        return None
+    fields.add('id')
+    return fields
+
+
+def shape_record(record: Dict, fields: Optional[Set[str]] = None, omit_nulls: bool = True) -> Dict:
+    """
+    Select fields from a record and drop null values
+
+    Args:
+        record: Serialized record (top-level keys only are considered)
+        fields: Keys to keep, or None for all
+        omit_nulls: Drop keys whose value is None
+
+    Returns:
+        New dict with the selected keys
+    """
+    return {
+        key: value for key, value in record.items()
+        if (fields is None or key in fields) and not (omit_nulls and value is None)
+    }
+
+
+def shape_records(records: Iterable[Dict], fields: Optional[Set[str]] = None,
+                  omit_nulls: bool = True) -> List[Dict]:
+    """shape_record() applied to every record in a list"""
+    return [shape_record(record, fields, omit_nulls) for record in records]
@@ -0,0 +1,157 @@
+"""
+PhotoVault Audio Analysis
+Measures a voice memo's true duration and a compact waveform of peak levels
+
+Audio is decoded to 8 kHz mono PCM with ffmpeg when it is installed. WAV files
+are also readable with the standard library alone, and MP4/M4A durations can be
+read from the container header without decoding, so without ffmpeg the most
+common iOS format still gets an accurate duration (but no waveform).
+"""
+import os
+import shutil
+import struct
+import logging
+import subprocess
+import wave
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_SAMPLE_RATE = 8000
+WAVEFORM_POINTS = 200
+DECODE_TIMEOUT = 60
+
+
+def decode_pcm(path: str, sample_rate: int = ANALYSIS_SAMPLE_RATE) -> Optional[Tuple[np.ndarray, float]]:
+    """
+    Decode audio to mono int16 samples
+
+    Args:
+        path: Audio file
+        sample_rate: Output sample rate (approximate for the WAV fallback)
+
+    Returns:
+        (int16 samples, duration in seconds), or None if the file can't be decoded here
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        try:
+            result = subprocess.run(
+                [ffmpeg, '-nostdin', '-loglevel', 'error', '-i', path,
+                 '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-'],
+                check=True, capture_output=True, timeout=DECODE_TIMEOUT
+            )
+            samples = np.frombuffer(result.stdout, dtype='<i2')
+            return samples, len(samples) / sample_rate
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning(f"ffmpeg could not decode {path}: {e}")
+            return None
+
+    if path.lower().endswith('.wav'):
+        return _decode_wav(path, sample_rate)
+    return None
+
+
+def _decode_wav(path: str, sample_rate: int) -> Optional[Tuple[np.ndarray, float]]:
+    try:
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+    except (wave.Error, EOFError, OSError) as e:
+        logger.warning(f"Could not read WAV {path}: {e}")
+        return None
+
+    if channels > 1:
+        frames = frames[:len(frames) - len(frames) % channels].reshape(-1, channels).mean(axis=1)
+    duration = len(frames) / rate if rate else 0.0
+    # Peaks don't need exact resampling - plain decimation is enough
+    step = max(1, rate // sample_rate)
+    return frames[::step].astype(np.int16), duration
+
+
+def compute_peaks(samples: np.ndarray, points: int = WAVEFORM_POINTS) -> List[int]:
+    """
+    Downsample to per-bucket peak levels in 0..127 (fits int8)
+
+    Args:
+        samples: Mono int16 samples
+        points: Number of buckets
+
+    Returns:
+        Up to `points` peak values, scaled so the loudest bucket is 127
+    """
+    if samples is None or len(samples) == 0:
+        return []
+    points = min(points, len(samples))
+    magnitudes = np.abs(samples.astype(np.int32))
+    # Equal-sized buckets; the tail that doesn't fill a bucket is folded into the last one
+    bucket = len(magnitudes) // points
+    peaks = magnitudes[:bucket * points].reshape(points, bucket).max(axis=1)
+    if bucket * points < len(magnitudes):
+        peaks[-1] = max(peaks[-1], magnitudes[bucket * points:].max())
+    loudest = peaks.max()
+    if loudest == 0:
+        return [0] * points
+    return np.round(peaks * 127.0 / loudest).astype(np.int8).tolist()
+
+
+def mp4_duration(path: str) -> Optional[float]:
+    """Duration from an MP4/M4A 'mvhd' header, without decoding any audio"""
+    try:
+        with open(path, 'rb') as f:
+            return _find_mvhd_duration(f, os.path.getsize(path))
+    except (OSError, struct.error) as e:
+        logger.warning(f"Could not read MP4 header of {path}: {e}")
+        return None
+
+
+def _find_mvhd_duration(f, end: int) -> Optional[float]:
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, kind = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return None
+
+        if kind == b'moov':
+            return _find_mvhd_duration(f, start + size)
+        if kind == b'mvhd':
+            version = f.read(1)[0]
+            f.read(3)  # flags
+            if version == 1:
+                _, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+            else:
+                _, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+            return duration / timescale if timescale else None
+        f.seek(start + size)
+    return None
+
+
+def analyze_audio(path: str, points: int = WAVEFORM_POINTS) -> Optional[Dict]:
+    """
+    Measure duration and waveform peaks for an audio file
+
+    Returns:
+        dict with 'duration' (seconds) and 'peaks' (list, empty when the file
+        couldn't be decoded), or None if nothing could be determined
+    """
+    decoded = decode_pcm(path)
+    if decoded is not None and len(decoded[0]):
+        samples, duration = decoded
+        return {'duration': duration, 'peaks': compute_peaks(samples, points)}
+
+    if os.path.splitext(path)[1].lower() in ('.m4a', '.mp4', '.aac', '.mov'):
+        duration = mp4_duration(path)
+        if duration:
+            return {'duration': duration, 'peaks': []}
+    return None
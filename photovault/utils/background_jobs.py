@@ -0,0 +1,67 @@
+"""
+PhotoVault Background Jobs
+Small in-process job queue for work that should not hold up a request
+
+Jobs run on a shared thread pool inside a fresh application context, so they
+can use models and config just like a request handler. Anything a job needs
+from the database should be passed by id and re-queried inside the job.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+
+class BackgroundJobQueue:
+    """Thread-pool backed queue that runs callables inside an app context"""
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so forked gunicorn workers each get their own threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = int(current_app.config.get('BACKGROUND_JOB_WORKERS', DEFAULT_WORKERS))
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(1, workers), thread_name_prefix='photovault-job'
+                    )
+        return self._executor
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Queue func(*args, **kwargs) to run in the background
+
+        Args:
+            func: Callable to run; exceptions are logged, not raised
+            *args, **kwargs: Passed through to func
+
+        Returns:
+            Future for the job's result
+        """
+        app = current_app._get_current_object()
+        job_name = getattr(func, '__qualname__', repr(func))
+
+        def run():
+            from photovault.extensions import db
+            with app.app_context():
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    logger.error(f"Background job {job_name} failed: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+        return self._get_executor().submit(run)
+
+
+# Global instance
+background_jobs = BackgroundJobQueue()
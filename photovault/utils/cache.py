@@ -0,0 +1,429 @@
+"""
+PhotoVault Shared Cache
+Pluggable, namespaced TTL cache that can be shared between gunicorn workers
+
+Backends (CACHE_BACKEND):
+    memory  - in-process LRU; fastest, but each worker has its own copy
+    sqlite  - SQLite file in WAL mode; shared by every worker on the host with
+              no external service (default)
+    redis   - shared across hosts; needs the optional `redis` package and CACHE_URL
+
+Values are pickled, so every backend hands back an independent copy.
+Hit/miss/set counters are kept per namespace in each process; see cache.stats().
+
+Usage:
+    principals = cache.namespace('jwt_principal', ttl=60)
+    user = principals.get_or_set(user_id, lambda: load_user(user_id))
+    principals.delete(user_id)
+"""
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 10000
+
+_MISSING = object()
+
+
+class CacheBackend(ABC):
+    """Byte-level storage interface implemented by every backend"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        ...
+
+    @abstractmethod
+    def transact(self, key: str, func: Callable) -> Any:
+        """
+        Atomically read-modify-write one key, across processes for shared backends
+
+        Args:
+            key: Backend key
+            func: Called with the current bytes (or None); returns
+                (new bytes or None to leave the key unchanged, ttl, result)
+
+        Returns:
+            The result returned by func
+        """
+        ...
+
+
+class MemoryLRUBackend(CacheBackend):
+    """Per-process LRU with TTL"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def transact(self, key, func):
+        with self._lock:
+            entry = self._data.get(key)
+            raw = None
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                raw = entry[1]
+            new_raw, ttl, result = func(raw)
+            if new_raw is not None:
+                self._data[key] = (time.time() + ttl if ttl else None, new_raw)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+            return result
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite (WAL) file shared by all processes on the host, approximately LRU-evicted"""
+
+    # Reads only refresh accessed_at when it is older than this, to keep reads read-only
+    TOUCH_INTERVAL = 5.0
+    # Size is checked every N writes rather than on each one
+    EVICT_CHECK_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+        self._claim_file(path)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+                ' expires_at REAL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed_at)')
+
+    @staticmethod
+    def _claim_file(path: str) -> None:
+        """
+        Create the cache file private to this user, or refuse one we don't own
+
+        Values are unpickled on read, so anyone who can plant or write the file
+        (or its WAL sidecars) could run code in the app process.
+
+        Raises:
+            PermissionError: if the file is a symlink, owned by another user,
+                or writable by group/others
+        """
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        except FileExistsError:
+            pass
+        for candidate in (path, path + '-wal', path + '-shm'):
+            try:
+                st = os.lstat(candidate)
+            except FileNotFoundError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                raise PermissionError(f"{candidate} is not a regular file")
+            if hasattr(os, 'geteuid') and st.st_uid != os.geteuid():
+                raise PermissionError(f"{candidate} is owned by uid {st.st_uid}, not this process")
+            if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                raise PermissionError(f"{candidate} is writable by other users")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, re-opened after fork (gunicorn --preload)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires_at, accessed_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, now))
+            return None
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return bytes(value)
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, sqlite3.Binary(value), now + ttl if ttl else None, now)
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_CHECK_EVERY == 0:
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM cache').fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+                (excess,)
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        self._connect().execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (escaped + '%',))
+
+    def transact(self, key, func):
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, serialising concurrent updaters
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = conn.execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+            raw = None
+            if row is not None and (row[1] is None or row[1] > now):
+                raw = bytes(row[0])
+            new_raw, ttl, result = func(raw)
+            if new_raw is not None:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, sqlite3.Binary(new_raw), now + ttl if ttl else None, now)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+
+class RedisBackend(CacheBackend):
+    """Redis backend (eviction is left to Redis' maxmemory policy)"""
+
+    def __init__(self, url: str):
+        import redis  # Optional dependency - only needed when CACHE_BACKEND=redis
+        self._client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self._client.scan_iter(match=prefix + '*', count=500))
+        if keys:
+            self._client.delete(*keys)
+
+    def transact(self, key, func):
+        # Optimistic WATCH/MULTI, retried if another client wrote the key meanwhile
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    new_raw, ttl, result = func(pipe.get(key))
+                    pipe.multi()
+                    if new_raw is not None:
+                        pipe.set(key, new_raw, px=max(1, int(ttl * 1000)) if ttl else None)
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue
+
+
+class CacheNamespace:
+    """Keys and metrics scoped to one namespace of a SharedCache"""
+
+    def __init__(self, cache: 'SharedCache', name: str, ttl: Optional[float]):
+        self._cache = cache
+        self.name = name
+        self.ttl = ttl
+
+    def _key(self, key) -> str:
+        return f'{self._cache.key_prefix}{self.name}:{key}'
+
+    def get(self, key, default=None):
+        """Return the cached value, or default on a miss or backend error"""
+        try:
+            raw = self._cache.backend.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Cache get failed in {self.name}: {e}")
+            raw = None
+        if raw is None:
+            self._cache._count(self.name, 'misses')
+            return default
+        self._cache._count(self.name, 'hits')
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        try:
+            self._cache.backend.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                    ttl if ttl is not None else self.ttl)
+            self._cache._count(self.name, 'sets')
+        except Exception as e:
+            logger.warning(f"Cache set failed in {self.name}: {e}")
+
+    def delete(self, key) -> None:
+        try:
+            self._cache.backend.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Cache delete failed in {self.name}: {e}")
+
+    def clear(self) -> None:
+        """Drop every key in this namespace"""
+        try:
+            self._cache.backend.delete_prefix(f'{self._cache.key_prefix}{self.name}:')
+        except Exception as e:
+            logger.warning(f"Cache clear failed in {self.name}: {e}")
+
+    def update(self, key, func: Callable[[Any], tuple]):
+        """
+        Atomically read-modify-write key (errors propagate to the caller)
+
+        Args:
+            key: Key within the namespace
+            func: Called with the current value (or None); returns
+                (new value or None to leave it unchanged, ttl, result)
+
+        Returns:
+            The result returned by func
+        """
+        def apply(raw):
+            new_value, ttl, result = func(pickle.loads(raw) if raw is not None else None)
+            new_raw = pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL) if new_value is not None else None
+            return new_raw, ttl if ttl is not None else self.ttl, result
+
+        return self._cache.backend.transact(self._key(key), apply)
+
+    def get_or_set(self, key, factory: Callable[[], Any], ttl: Optional[float] = None):
+        """Return the cached value, computing and storing it with factory() on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+
+class SharedCache:
+    """Entry point: configured once per process by init_app(), then used via namespace()"""
+
+    def __init__(self):
+        self.backend: CacheBackend = MemoryLRUBackend()
+        self.backend_name = 'memory'
+        self.key_prefix = 'pv:'
+        self.default_ttl = DEFAULT_TTL
+        self._metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: {'hits': 0, 'misses': 0, 'sets': 0})
+        self._metrics_lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Select and build the backend from app config"""
+        backend_name = app.config.get('CACHE_BACKEND', 'sqlite')
+        max_entries = int(app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self.default_ttl = int(app.config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL))
+        self.key_prefix = app.config.get('CACHE_KEY_PREFIX', 'pv:')
+
+        try:
+            if backend_name == 'redis':
+                self.backend = RedisBackend(app.config['CACHE_URL'])
+            elif backend_name == 'sqlite':
+                # Not the shared temp dir: a file planted there would be unpickled
+                path = app.config.get('CACHE_SQLITE_PATH') or os.path.join(
+                    app.instance_path, 'photovault-cache.sqlite3'
+                )
+                self.backend = SQLiteBackend(path, max_entries)
+            else:
+                backend_name = 'memory'
+                self.backend = MemoryLRUBackend(max_entries)
+        except Exception as e:
+            logger.error(f"Cache backend '{backend_name}' unavailable ({e}) - using in-process LRU")
+            backend_name = 'memory'
+            self.backend = MemoryLRUBackend(max_entries)
+
+        self.backend_name = backend_name
+        logger.info(f"Shared cache using {backend_name} backend")
+
+    def namespace(self, name: str, ttl: Optional[float] = None) -> CacheNamespace:
+        return CacheNamespace(self, name, ttl if ttl is not None else self.default_ttl)
+
+    def _count(self, namespace: str, metric: str) -> None:
+        with self._metrics_lock:
+            self._metrics[namespace][metric] += 1
+
+    def stats(self) -> Dict:
+        """Per-namespace hit/miss/set counters for this process, plus backend info"""
+        with self._metrics_lock:
+            namespaces = {}
+            for name, counters in self._metrics.items():
+                lookups = counters['hits'] + counters['misses']
+                namespaces[name] = dict(counters, hit_rate=round(counters['hits'] / lookups, 3) if lookups else None)
+        return {
+            'backend': self.backend_name,
+            'pid': os.getpid(),
+            'evictions': getattr(self.backend, 'evictions', None),
+            'namespaces': namespaces
+        }
+
+
+# Global instance
+cache = SharedCache()
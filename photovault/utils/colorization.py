@@ -129,6 +129,42 @@ class PhotoColorizer:
         
         return sepia
     
+    def resolve_method(self, method='auto'):
+        """
+        The method colorize_array will actually use
+        
+        Args:
+            method: 'auto', 'dnn', or 'basic'
+            
+        Returns:
+            'dnn' or 'basic'
+        """
+        if method == 'auto':
+            return 'dnn' if self.initialized else 'basic'
+        if method == 'dnn':
+            if not self.initialized:
+                raise RuntimeError("DNN model not available, use 'basic' or 'auto' method")
+            return 'dnn'
+        if method == 'basic':
+            return 'basic'
+        raise ValueError(f"Unknown colorization method: {method}")
+    
+    def colorize_array(self, image_array, method='auto'):
+        """
+        Colorize an image already in memory
+        
+        Args:
+            image_array: numpy array of the image (BGR format)
+            method: 'auto', 'dnn', or 'basic'
+            
+        Returns:
+            tuple: (colorized BGR array, method_used)
+        """
+        method_used = self.resolve_method(method)
+        if method_used == 'dnn':
+            return self.colorize_dnn(image_array), method_used
+        return self.colorize_basic(image_array), method_used
+    
     def colorize_image(self, image_path, output_path=None, method='auto'):
         """
         Colorize a black and white photo
@@ -148,24 +184,7 @@ class PhotoColorizer:
             if image is None:
                 raise ValueError(f"Could not read image from {image_path}")
             
-            method_used = method
-            if method == 'auto':
-                if self.initialized:
-                    colorized = self.colorize_dnn(image)
-                    method_used = 'dnn'
-                else:
-                    colorized = self.colorize_basic(image)
-                    method_used = 'basic'
-            elif method == 'dnn':
-                if not self.initialized:
-                    raise RuntimeError("DNN model not available, use 'basic' or 'auto' method")
-                colorized = self.colorize_dnn(image)
-                method_used = 'dnn'
-            elif method == 'basic':
-                colorized = self.colorize_basic(image)
-                method_used = 'basic'
-            else:
-                raise ValueError(f"Unknown colorization method: {method}")
+            colorized, method_used = self.colorize_array(image, method)
             
             if output_path:
                 cv2.imwrite(output_path, colorized)
@@ -193,34 +212,133 @@ class PhotoColorizer:
             FileNotFoundError: If the image file cannot be read
             RuntimeError: If the image is corrupted or invalid
         """
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
+        return classify_color_mode(image_path) == COLOR_MODE_GRAYSCALE
+
+
+# Color mode classification values stored on Photo.color_mode
+COLOR_MODE_GRAYSCALE = 'grayscale'
+COLOR_MODE_SEPIA = 'sepia'
+COLOR_MODE_COLOR = 'color'
+MONOCHROME_COLOR_MODES = (COLOR_MODE_GRAYSCALE, COLOR_MODE_SEPIA)
+# Stored when no readable file was found, so the lazy backfill moves past the row
+COLOR_MODE_UNKNOWN = 'unknown'
+
+# Classification runs on a small proxy - color cast is a global property
+CLASSIFY_MAX_DIMENSION = 256
+GRAYSCALE_CHANNEL_DIFF_THRESHOLD = 30
+SEPIA_HUE_RANGE = (5, 35)  # OpenCV hue scale (0-180), orange/brown band
+SEPIA_HUE_STD_THRESHOLD = 8.0
+SEPIA_MIN_WARM_RATIO = 0.9
+
+
+def _load_classification_proxy(image_path):
+    """Decode a downsampled BGR proxy of an image for color analysis"""
+    # IMREAD_REDUCED_COLOR_4 lets libjpeg decode at 1/4 scale via DCT scaling,
+    # so a 20MP original never materializes at full resolution
+    image = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_4)
+    if image is None:
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    return _downsample_for_classification(image)
+
+
+def _decode_classification_proxy(data):
+    """Same as _load_classification_proxy, for encoded image bytes"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_COLOR_4)
+    if image is None:
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    return _downsample_for_classification(image)
+
+
+def _downsample_for_classification(image):
+    if image is None:
+        return None
+    
+    h, w = image.shape[:2]
+    scale = CLASSIFY_MAX_DIMENSION / float(max(h, w))
+    if scale < 1.0:
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return image
+
+
+def classify_color_mode(image_path):
+    """
+    Classify an image as grayscale, sepia or color
+    
+    Args:
+        image_path: Path to the image (original or thumbnail)
         
-        try:
-            image = cv2.imread(image_path)
-            if image is None:
-                raise RuntimeError(f"Failed to read image file (corrupted or invalid format): {image_path}")
-            
-            if len(image.shape) == 2:
-                return True
-            
-            b, g, r = cv2.split(image)
-            
-            diff_bg = cv2.absdiff(b, g)
-            diff_br = cv2.absdiff(b, r)
-            diff_gr = cv2.absdiff(g, r)
-            
-            max_diff = max(diff_bg.max(), diff_br.max(), diff_gr.max())
-            
-            # Use a more realistic threshold to account for compression artifacts
-            # and scanning imperfections in black and white photos
-            return bool(max_diff < 30)
-            
-        except (FileNotFoundError, RuntimeError):
-            raise
-        except Exception as e:
-            logger.error(f"Failed to check if image is grayscale: {e}")
-            raise RuntimeError(f"Error checking image color mode: {e}") from e
+    Returns:
+        str: One of COLOR_MODE_GRAYSCALE, COLOR_MODE_SEPIA, COLOR_MODE_COLOR
+        
+    Raises:
+        FileNotFoundError: If the image file cannot be read
+        RuntimeError: If the image is corrupted or invalid
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image file not found: {image_path}")
+    
+    try:
+        image = _load_classification_proxy(image_path)
+    except Exception as e:
+        logger.error(f"Failed to classify image color mode: {e}")
+        raise RuntimeError(f"Error checking image color mode: {e}") from e
+    if image is None:
+        raise RuntimeError(f"Failed to read image file (corrupted or invalid format): {image_path}")
+    return _classify_proxy(image)
+
+
+def classify_color_mode_data(data):
+    """
+    Classify encoded image bytes (e.g. read from App Storage) as grayscale, sepia or color
+    
+    Args:
+        data: Encoded image bytes
+        
+    Returns:
+        str: One of COLOR_MODE_GRAYSCALE, COLOR_MODE_SEPIA, COLOR_MODE_COLOR
+        
+    Raises:
+        RuntimeError: If the data is not a readable image
+    """
+    try:
+        image = _decode_classification_proxy(data)
+    except Exception as e:
+        logger.error(f"Failed to classify image color mode: {e}")
+        raise RuntimeError(f"Error checking image color mode: {e}") from e
+    if image is None:
+        raise RuntimeError("Failed to decode image data (corrupted or invalid format)")
+    return _classify_proxy(image)
+
+
+def _classify_proxy(image):
+    """Color mode of a downsampled BGR (or single channel) proxy"""
+    if len(image.shape) == 2:
+        return COLOR_MODE_GRAYSCALE
+
+    pixels = image.reshape(-1, 3).astype(np.int16)
+    channel_spread = pixels.max(axis=1) - pixels.min(axis=1)
+
+    # 99th percentile rather than max so a few compression artifacts or
+    # scanner dust specks don't flip a black and white photo to color
+    if np.percentile(channel_spread, 99) < GRAYSCALE_CHANNEL_DIFF_THRESHOLD:
+        return COLOR_MODE_GRAYSCALE
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hue = hsv[:, :, 0].ravel()
+    saturation = hsv[:, :, 1].ravel()
+
+    # Sepia: every tinted pixel shares one warm hue
+    tinted = saturation > 20
+    if not tinted.any():
+        return COLOR_MODE_GRAYSCALE
+    tinted_hue = hue[tinted].astype(np.float32)
+    warm_ratio = np.mean((tinted_hue >= SEPIA_HUE_RANGE[0]) & (tinted_hue <= SEPIA_HUE_RANGE[1]))
+    if warm_ratio >= SEPIA_MIN_WARM_RATIO and tinted_hue.std() < SEPIA_HUE_STD_THRESHOLD:
+        return COLOR_MODE_SEPIA
+
+    return COLOR_MODE_COLOR
 
 
 _colorizer_instance = None
@@ -0,0 +1,86 @@
+"""
+PhotoVault Response Compression
+Negotiates brotli or gzip for JSON and HTML responses
+
+Images, audio and file downloads are already compressed (or streamed) and are
+left untouched. Brotli is used when the optional `Brotli` package is installed
+and the client prefers it; gzip otherwise.
+"""
+import gzip
+import logging
+from typing import Optional
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html'}
+DEFAULT_MIN_SIZE = 500  # Bytes - smaller bodies don't win back the header overhead
+DEFAULT_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 5  # Close to gzip -6 in speed, noticeably smaller
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q-values
+
+    Returns:
+        The chosen encoding, or None if the client accepts neither
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding.strip()] = quality
+
+    candidates = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+    wildcard = weights.get('*', 0.0)
+    ranked = [(weights.get(coding, wildcard), -i, coding) for i, coding in enumerate(candidates)]
+    quality, _, coding = max(ranked)
+    return coding if quality > 0 else None
+
+
+def compress_body(data: bytes, encoding: str, app) -> bytes:
+    """Encode data with 'br' or 'gzip' at the configured level"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=app.config.get('COMPRESS_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+    return gzip.compress(data, compresslevel=app.config.get('COMPRESS_LEVEL', DEFAULT_LEVEL))
+
+
+def init_compression(app) -> None:
+    """Register the response compression hook on app"""
+
+    @app.after_request
+    def compress_response(response):
+        """Compress JSON/HTML bodies above COMPRESS_MIN_SIZE"""
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE):
+            return response
+
+        response.set_data(compress_body(data, encoding, app))
+        response.headers['Content-Encoding'] = encoding
+        return response
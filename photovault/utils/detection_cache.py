@@ -0,0 +1,168 @@
+"""
+PhotoVault Detection Cache
+Short-lived on-disk cache linking a preview-detection upload to the later extract call
+
+Entries live under UPLOAD_FOLDER so they are shared between gunicorn workers
+and can be promoted into a user's folder with a cheap rename.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import secrets
+import logging
+from typing import Dict, List, Optional
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 10 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+_META_FILENAME = 'meta.json'
+
+
+class DetectionCache:
+    """Disk-backed, TTL-expiring, size-capped store for detection previews"""
+
+    def _cache_dir(self) -> str:
+        cache_dir = current_app.config.get('DETECTION_CACHE_FOLDER') or os.path.join(
+            current_app.config.get('UPLOAD_FOLDER', 'uploads'), '.detection_cache'
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    def _ttl(self) -> int:
+        return int(current_app.config.get('DETECTION_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+    def _max_bytes(self) -> int:
+        return int(current_app.config.get('DETECTION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+    def _entry_dir(self, token: str) -> Optional[str]:
+        # Tokens are used as directory names - never accept anything path-like
+        if not token or not _TOKEN_PATTERN.match(token):
+            return None
+        return os.path.join(self._cache_dir(), token)
+
+    def create(self, user_id: int, file, original_filename: str) -> Dict:
+        """
+        Store an uploaded image in a new cache entry
+
+        Args:
+            user_id: Owner of the entry
+            file: FileStorage (or file-like) holding the uploaded image
+            original_filename: Client filename, kept for naming extracted photos
+
+        Returns:
+            dict: Entry with 'token' and 'image_path' (detections are added via save_detections)
+        """
+        self.purge()
+
+        token = secrets.token_urlsafe(24)
+        entry_dir = os.path.join(self._cache_dir(), token)
+        os.makedirs(entry_dir)
+
+        ext = os.path.splitext(original_filename or '')[1].lower() or '.jpg'
+        image_path = os.path.join(entry_dir, f'source{ext}')
+        if hasattr(file, 'save'):
+            file.save(image_path)
+        else:
+            with open(image_path, 'wb') as f:
+                shutil.copyfileobj(file, f)
+
+        entry = {
+            'token': token,
+            'user_id': user_id,
+            'original_filename': original_filename,
+            'image_path': image_path,
+            'created_at': time.time(),
+            'detections': []
+        }
+        self._write_meta(entry_dir, entry)
+        return entry
+
+    def save_detections(self, entry: Dict, detections: List[Dict]) -> None:
+        """Persist detection results for an entry created by create()"""
+        entry['detections'] = detections
+        self._write_meta(os.path.dirname(entry['image_path']), entry)
+
+    def get(self, token: str, user_id: int) -> Optional[Dict]:
+        """
+        Look up a live entry owned by user_id
+
+        Returns:
+            The entry dict, or None if missing, expired or owned by someone else
+        """
+        entry_dir = self._entry_dir(token)
+        if not entry_dir:
+            return None
+
+        try:
+            with open(os.path.join(entry_dir, _META_FILENAME)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('user_id') != user_id:
+            logger.warning(f"Detection token {token[:8]}... used by non-owner {user_id}")
+            return None
+
+        if time.time() - entry.get('created_at', 0) > self._ttl():
+            self.discard(token)
+            return None
+
+        if not os.path.exists(entry.get('image_path', '')):
+            self.discard(token)
+            return None
+
+        return entry
+
+    def discard(self, token: str) -> None:
+        """Remove an entry and whatever files remain in it"""
+        entry_dir = self._entry_dir(token)
+        if entry_dir:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def purge(self) -> None:
+        """Drop expired entries, then evict oldest entries until under the size cap"""
+        try:
+            cache_dir = self._cache_dir()
+            now = time.time()
+            ttl = self._ttl()
+            live = []
+
+            for name in os.listdir(cache_dir):
+                entry_dir = os.path.join(cache_dir, name)
+                try:
+                    mtime = os.path.getmtime(entry_dir)
+                    if now - mtime > ttl:
+                        shutil.rmtree(entry_dir, ignore_errors=True)
+                        continue
+                    size = sum(
+                        os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir)
+                    )
+                    live.append((mtime, size, entry_dir))
+                except OSError:
+                    continue  # Entry removed concurrently by another worker
+
+            total = sum(size for _, size, _ in live)
+            max_bytes = self._max_bytes()
+            for _, size, entry_dir in sorted(live):
+                if total <= max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+        except Exception as e:
+            logger.error(f"Detection cache purge failed: {e}")
+
+    def _write_meta(self, entry_dir: str, entry: Dict) -> None:
+        tmp_path = os.path.join(entry_dir, _META_FILENAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, os.path.join(entry_dir, _META_FILENAME))
+
+
+# Global instance
+detection_cache = DetectionCache()
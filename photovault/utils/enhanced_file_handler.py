@@ -10,6 +10,7 @@ from werkzeug.utils import secure_filename
 from PIL import Image
 import logging
 from photovault.services.app_storage_service import app_storage
+from photovault.services.storage_backends import LocalBackend, is_storage_path
 from photovault.utils.file_handler import validate_image_file, generate_unique_filename
 
 logger = logging.getLogger(__name__)
@@ -171,6 +172,13 @@ def delete_file_enhanced(file_path):
         logger.error(f'Error deleting file {file_path}: {str(e)}')
         return False
 
+def _local_backend():
+    """Local files, with App Storage paths mapped under UPLOAD_FOLDER"""
+    return LocalBackend(current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads'))
+
+def _uses_app_storage(file_path):
+    return is_storage_path(file_path) and app_storage.is_available()
+
 def get_image_info_enhanced(file_path):
     """
     Get comprehensive image information from App Storage or local files
@@ -182,34 +190,20 @@ def get_image_info_enhanced(file_path):
         dict: Image information or None if error
     """
     try:
-        # Check if it's an App Storage path and App Storage is available
-        if (file_path.startswith('users/') or file_path.startswith('uploads/')) and app_storage.is_available():
-            # Use App Storage
+        if _uses_app_storage(file_path):
             return app_storage.get_image_info(file_path)
-        else:
-            # Use local file system - treat App Storage paths as local paths when App Storage unavailable
-            if file_path.startswith('users/') or file_path.startswith('uploads/'):
-                # Convert App Storage path to local path by stripping the storage namespace
-                from flask import current_app
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-                # Strip the leading 'users/' or 'uploads/' prefix 
-                path_parts = file_path.split('/', 1)
-                if len(path_parts) > 1:
-                    local_relative_path = path_parts[1]  # e.g., '123/photo.jpg'
-                    local_path = os.path.join(upload_folder, local_relative_path)
-                    file_path = local_path
-                else:
-                    file_path = os.path.join(upload_folder, file_path)
-            
-            with Image.open(file_path) as image:
-                return {
-                    'width': image.width,
-                    'height': image.height,
-                    'format': image.format,
-                    'mode': image.mode,
-                    'size_bytes': os.path.getsize(file_path),
-                    'mime_type': mimetypes.guess_type(file_path)[0]
-                }
+        
+        # Treat App Storage paths as local paths when App Storage is unavailable
+        local_path = _local_backend().local_path(file_path)
+        with Image.open(local_path) as image:
+            return {
+                'width': image.width,
+                'height': image.height,
+                'format': image.format,
+                'mode': image.mode,
+                'size_bytes': os.path.getsize(local_path),
+                'mime_type': mimetypes.guess_type(local_path)[0]
+            }
                 
     except Exception as e:
         logger.error(f"Failed to get image info for {file_path}: {str(e)}")
@@ -219,6 +213,8 @@ def get_file_content(file_path):
     """
     Get file content from App Storage or local filesystem
     
+    Prefer open_file_stream() when the content is only passed on to a response.
+    
     Args:
         file_path: Path to file (App Storage path or local path)
         
@@ -226,68 +222,82 @@ def get_file_content(file_path):
         tuple: (success, file_bytes_or_error_message)
     """
     try:
-        # Check if it's an App Storage path and App Storage is available
-        if (file_path.startswith('users/') or file_path.startswith('uploads/')) and app_storage.is_available():
-            # Use App Storage
+        if _uses_app_storage(file_path):
             return app_storage.download_file(file_path)
-        else:
-            # Use local file system - treat App Storage paths as local paths when App Storage unavailable
-            if file_path.startswith('users/') or file_path.startswith('uploads/'):
-                # Convert App Storage path to local path by stripping the storage namespace
-                from flask import current_app
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-                # Strip the leading 'users/' or 'uploads/' prefix 
-                path_parts = file_path.split('/', 1)
-                if len(path_parts) > 1:
-                    local_relative_path = path_parts[1]  # e.g., '123/photo.jpg'
-                    local_path = os.path.join(upload_folder, local_relative_path)
-                    file_path = local_path
-                else:
-                    file_path = os.path.join(upload_folder, file_path)
-                
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                return True, content
-            else:
-                return False, f"File not found: {file_path}".encode()
+        
+        try:
+            return True, _local_backend().read(file_path)
+        except FileNotFoundError:
+            return False, f"File not found: {file_path}".encode()
                 
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {str(e)}")
         return False, str(e).encode()
 
-def file_exists_enhanced(file_path):
+def open_file_stream(file_path):
     """
-    Check if file exists in App Storage or local filesystem
+    Open a file from App Storage or local filesystem for streaming
+    
+    A single request replaces the exists-then-download pair.
     
     Args:
         file_path: Path to file (App Storage path or local path)
         
     Returns:
-        bool: True if file exists, False otherwise
+        Readable binary stream (the caller closes it), or None if not found
     """
+    if _uses_app_storage(file_path):
+        return app_storage.open_stream(file_path)
     try:
-        # Check if it's an App Storage path and App Storage is available
-        if (file_path.startswith('users/') or file_path.startswith('uploads/')) and app_storage.is_available():
-            # Use App Storage
-            return app_storage.file_exists(file_path)
-        else:
-            # Use local file system - treat App Storage paths as local paths when App Storage unavailable
-            if file_path.startswith('users/') or file_path.startswith('uploads/'):
-                # Convert App Storage path to local path by stripping the storage namespace
-                from flask import current_app
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
-                # Strip the leading 'users/' or 'uploads/' prefix 
-                path_parts = file_path.split('/', 1)
-                if len(path_parts) > 1:
-                    local_relative_path = path_parts[1]  # e.g., '123/photo.jpg'
-                    local_path = os.path.join(upload_folder, local_relative_path)
-                    return os.path.exists(local_path)
-                else:
-                    return os.path.exists(os.path.join(upload_folder, file_path))
-            else:
-                return os.path.exists(file_path)
-            
+        return _local_backend().open(file_path)
+    except OSError:
+        return None
+
+def stat_file_enhanced(file_path):
+    """
+    Get metadata for a file in App Storage or local filesystem without reading it
+    
+    Args:
+        file_path: Path to file (App Storage path or local path)
+        
+    Returns:
+        ObjectInfo, or None if the file doesn't exist
+    """
+    try:
+        if _uses_app_storage(file_path):
+            return app_storage.stat(file_path)
+        return _local_backend().stat(file_path)
     except Exception as e:
-        logger.error(f"Error checking file existence {file_path}: {str(e)}")
-        return False
\ No newline at end of file
+        logger.error(f"Error checking file {file_path}: {str(e)}")
+        return None
+
+def get_file_size_enhanced(file_path):
+    """
+    Get file size from App Storage or local filesystem
+    
+    Args:
+        file_path: Path to file (App Storage path or local path)
+        
+    Returns:
+        int: Size in bytes, or None if the file doesn't exist
+    """
+    info = stat_file_enhanced(file_path)
+    if info is None:
+        return None
+    if info.size is not None:
+        return info.size
+    # Backends without size metadata (Replit App Storage) need the object itself
+    success, content = get_file_content(file_path)
+    return len(content) if success else None
+
+def file_exists_enhanced(file_path):
+    """
+    Check if file exists in App Storage or local filesystem (metadata only)
+    
+    Args:
+        file_path: Path to file (App Storage path or local path)
+        
+    Returns:
+        bool: True if file exists, False otherwise
+    """
+    return stat_file_enhanced(file_path) is not None
@@ -2,17 +2,69 @@
 Facial Animation Utilities
 Creates living portrait animations using MediaPipe face detection
 and morphing techniques to add smiles and subtle movements.
+
+Portraits are rendered at a capped working resolution. The smile, blink and
+head-tilt flows are computed once per portrait as basis fields; each frame
+is a linear combination of them, fed to a single cv2.remap. Frames are
+generated lazily and handed straight to the encoder (see animation_output).
 """
 
 import cv2
 import numpy as np
-from PIL import Image
 import logging
-from typing import Tuple, Optional, List
+from typing import Iterator, Tuple, Optional, List
 import mediapipe as mp
+from photovault.utils.animation_output import encode_frames
 
 logger = logging.getLogger(__name__)
 
+# Longest side of rendered portraits, in pixels
+MAX_OUTPUT_DIMENSION = 720
+PORTRAIT_FPS = 15  # Lower FPS for GIF
+BLINK_INTERVAL_SECONDS = 2
+BLINK_FRAMES = 5
+# Weight of the head-tilt flow relative to the smile
+TILT_WEIGHT = 0.3
+
+
+def coordinate_grid(h: int, w: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Float32 (y, x) pixel coordinate grids, built once and shared by all flows"""
+    y_coords, x_coords = np.indices((h, w), dtype=np.float32)
+    return y_coords, x_coords
+
+
+def frame_weights(frame_num: int, total_frames: int, fps: int, movement_amount: float,
+                  blink_enabled: bool) -> Tuple[float, float, float]:
+    """
+    Per-frame animation curve
+
+    Returns:
+        (smile factor, head tilt angle in degrees, eye closure 0..1)
+    """
+    progress = frame_num / total_frames
+    
+    # Smooth transitions using sine wave
+    t = progress * 2 * np.pi
+    
+    # Smile animation (gradual smile that holds)
+    if progress < 0.3:
+        smile_factor = np.sin(progress / 0.3 * np.pi / 2)
+    else:
+        # Hold smile with subtle variation
+        smile_factor = 0.9 + 0.1 * np.sin(t * 2)
+    
+    # Head tilt/sway
+    tilt_angle = movement_amount * 3 * np.sin(t)
+    
+    # Blink every BLINK_INTERVAL_SECONDS
+    closure = 0.0
+    blink_frame = frame_num % (fps * BLINK_INTERVAL_SECONDS)
+    if blink_enabled and blink_frame < BLINK_FRAMES:
+        blink_progress = blink_frame / BLINK_FRAMES
+        closure = blink_progress * 2 if blink_progress < 0.5 else (1 - blink_progress) * 2
+    
+    return float(smile_factor), float(tilt_angle), float(closure)
+
 
 class FaceAnimator:
     """Handles facial animation effects using MediaPipe and morphing"""
@@ -69,7 +121,9 @@ class FaceAnimator:
         self,
         landmarks,
         image_shape: Tuple[int, int],
-        intensity: float = 0.3
+        intensity: float = 0.3,
+        grid: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        pixel_scale: float = 1.0
     ) -> np.ndarray:
         """
         Generate smile transformation map
@@ -78,6 +132,8 @@ class FaceAnimator:
             landmarks: MediaPipe face landmarks
             image_shape: (height, width) of image
             intensity: Smile intensity (0.0 to 1.0)
+            grid: Precomputed coordinate_grid(h, w)
+            pixel_scale: Working size / original size, so motion matches the full-size photo
             
         Returns:
             Flow map for morphing image to smile
@@ -104,7 +160,7 @@ class FaceAnimator:
         mouth_center_y = (ml_y + mr_y) // 2
         
         # Create radial smile effect around mouth
-        y_coords, x_coords = np.mgrid[0:h, 0:w]
+        y_coords, x_coords = grid if grid is not None else coordinate_grid(h, w)
         
         # Distance from mouth center
         dx = x_coords - mouth_center_x
@@ -115,14 +171,14 @@ class FaceAnimator:
         smile_radius = int(np.sqrt((mr_x - ml_x)**2 + (mr_y - ml_y)**2))
         
         # Gaussian falloff for natural transition
-        sigma = smile_radius * 0.6
+        sigma = max(smile_radius * 0.6, 1.0)
         influence = np.exp(-distance**2 / (2 * sigma**2))
         
         # Apply smile transformation
         # Lift corners up and slightly out
         angle_to_center = np.arctan2(dy, dx)
-        lift_amount = intensity * 15 * influence  # pixels to lift
-        spread_amount = intensity * 10 * influence  # pixels to spread
+        lift_amount = intensity * 15 * pixel_scale * influence  # pixels to lift
+        spread_amount = intensity * 10 * pixel_scale * influence  # pixels to spread
         
         # Vertical lift (mainly in mouth corner region)
         flow_y -= lift_amount * np.abs(np.cos(angle_to_center))
@@ -136,7 +192,9 @@ class FaceAnimator:
         self,
         landmarks,
         image_shape: Tuple[int, int],
-        closure: float = 0.7
+        closure: float = 0.7,
+        grid: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        pixel_scale: float = 1.0
     ) -> np.ndarray:
         """
         Generate eye blink transformation
@@ -145,6 +203,8 @@ class FaceAnimator:
             landmarks: MediaPipe face landmarks
             image_shape: (height, width) of image
             closure: Eye closure amount (0.0 = open, 1.0 = closed)
+            grid: Precomputed coordinate_grid(h, w)
+            pixel_scale: Working size / original size, so motion matches the full-size photo
             
         Returns:
             Flow map for eye blink effect
@@ -152,6 +212,7 @@ class FaceAnimator:
         h, w = image_shape
         flow_x = np.zeros((h, w), dtype=np.float32)
         flow_y = np.zeros((h, w), dtype=np.float32)
+        y_coords, x_coords = grid if grid is not None else coordinate_grid(h, w)
         
         # Process both eyes
         for eye_indices in [self.LEFT_EYE_INDICES, self.RIGHT_EYE_INDICES]:
@@ -168,18 +229,17 @@ class FaceAnimator:
             eye_center_y = sum(p[1] for p in eye_points) // len(eye_points)
             
             # Create eye blink effect
-            y_coords, x_coords = np.mgrid[0:h, 0:w]
             dx = x_coords - eye_center_x
             dy = y_coords - eye_center_y
             distance = np.sqrt(dx**2 + dy**2)
             
             # Eye radius
-            eye_radius = 20  # pixels
+            eye_radius = 20 * pixel_scale  # pixels
             sigma = eye_radius * 0.8
             influence = np.exp(-distance**2 / (2 * sigma**2))
             
             # Close eyelids (push pixels toward eye center vertically)
-            close_amount = closure * 12 * influence
+            close_amount = closure * 12 * pixel_scale * influence
             flow_y += close_amount * np.sign(dy)
         
         return np.stack([flow_x, flow_y], axis=-1)
@@ -187,7 +247,8 @@ class FaceAnimator:
     def create_head_tilt(
         self,
         image_shape: Tuple[int, int],
-        angle: float = 2.0
+        angle: float = 2.0,
+        grid: Optional[Tuple[np.ndarray, np.ndarray]] = None
     ) -> np.ndarray:
         """
         Generate subtle head tilt transformation
@@ -195,6 +256,7 @@ class FaceAnimator:
         Args:
             image_shape: (height, width) of image
             angle: Tilt angle in degrees (small values for subtle effect)
+            grid: Precomputed coordinate_grid(h, w)
             
         Returns:
             Flow map for head tilt
@@ -208,7 +270,7 @@ class FaceAnimator:
         sin_a = np.sin(angle_rad)
         
         # Generate coordinate grids
-        y_coords, x_coords = np.mgrid[0:h, 0:w]
+        y_coords, x_coords = grid if grid is not None else coordinate_grid(h, w)
         
         # Translate to origin
         x_centered = x_coords - center_x
@@ -227,7 +289,8 @@ class FaceAnimator:
     def apply_flow_warp(
         self,
         image: np.ndarray,
-        flow: np.ndarray
+        flow: np.ndarray,
+        grid: Optional[Tuple[np.ndarray, np.ndarray]] = None
     ) -> np.ndarray:
         """
         Apply optical flow warping to image
@@ -235,6 +298,7 @@ class FaceAnimator:
         Args:
             image: Input image
             flow: Flow map (H x W x 2)
+            grid: Precomputed coordinate_grid(h, w)
             
         Returns:
             Warped image
@@ -242,7 +306,7 @@ class FaceAnimator:
         h, w = image.shape[:2]
         
         # Create destination coordinates
-        y_coords, x_coords = np.mgrid[0:h, 0:w].astype(np.float32)
+        y_coords, x_coords = grid if grid is not None else coordinate_grid(h, w)
         
         # Apply flow
         map_x = x_coords + flow[:, :, 0]
@@ -266,18 +330,21 @@ class FaceAnimator:
         duration: int = 5,
         smile_intensity: float = 0.4,
         movement_amount: float = 0.3,
-        blink_enabled: bool = True
+        blink_enabled: bool = True,
+        max_dimension: int = MAX_OUTPUT_DIMENSION
     ) -> bool:
         """
         Create living portrait animation with smile and subtle movements
         
         Args:
             input_path: Path to input image
-            output_path: Path to save animated GIF
+            output_path: Path to save the animation; the extension picks the format
+                         (.gif, .webp, .png for APNG, .mp4)
             duration: Animation duration in seconds
             smile_intensity: Smile strength (0.0 to 1.0)
             movement_amount: Amount of head movement (0.0 to 1.0)
             blink_enabled: Enable eye blinking
+            max_dimension: Longest side of the output; larger photos are scaled down first
             
         Returns:
             True if successful, False otherwise
@@ -291,11 +358,14 @@ class FaceAnimator:
                 logger.error(f"Failed to read image: {input_path}")
                 return False
             
+            # Everything below runs at the working resolution
             h, w = img.shape[:2]
-            fps = 15  # Lower FPS for GIF
-            total_frames = duration * fps
+            scale = min(1.0, max_dimension / max(h, w))
+            if scale < 1.0:
+                img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                 interpolation=cv2.INTER_AREA)
             
-            # Detect face landmarks
+            # Detect face landmarks (normalized, so the working copy is enough)
             logger.info("🔍 Detecting facial landmarks...")
             landmarks = self.detect_face_landmarks(img)
             
@@ -305,69 +375,98 @@ class FaceAnimator:
             
             logger.info(f"✅ Face detected with {len(landmarks.landmark)} landmarks")
             
-            # Generate transformation maps
-            smile_flow = self.create_smile(landmarks, (h, w), smile_intensity)
-            
-            # Create animation frames
-            frames = []
-            
-            for frame_num in range(total_frames):
-                progress = frame_num / total_frames
-                
-                # Smooth transitions using sine wave
-                t = progress * 2 * np.pi
-                
-                # Smile animation (gradual smile that holds)
-                if progress < 0.3:
-                    # Gradually increase smile
-                    smile_factor = np.sin(progress / 0.3 * np.pi / 2)
-                else:
-                    # Hold smile with subtle variation
-                    smile_factor = 0.9 + 0.1 * np.sin(t * 2)
-                
-                current_smile_flow = smile_flow * smile_factor
-                
-                # Head tilt/sway
-                tilt_angle = movement_amount * 3 * np.sin(t)
-                tilt_flow = self.create_head_tilt((h, w), tilt_angle)
-                
-                # Combine flows
-                combined_flow = current_smile_flow + tilt_flow * 0.3
-                
-                # Apply transformation
-                frame = self.apply_flow_warp(img, combined_flow)
-                
-                # Add blink at specific intervals
-                if blink_enabled and frame_num % (fps * 2) < 5:  # Blink every 2 seconds
-                    blink_progress = (frame_num % (fps * 2)) / 5
-                    if blink_progress < 0.5:
-                        # Closing
-                        closure = blink_progress * 2
-                    else:
-                        # Opening
-                        closure = (1 - blink_progress) * 2
-                    
-                    blink_flow = self.create_blink(landmarks, (h, w), closure)
-                    frame = self.apply_flow_warp(frame, blink_flow)
-                
-                # Convert to RGB for PIL
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frames.append(Image.fromarray(frame_rgb))
-            
-            # Save as animated GIF
-            logger.info(f"💾 Saving animated GIF with {len(frames)} frames...")
-            frames[0].save(
-                output_path,
-                save_all=True,
-                append_images=frames[1:],
-                duration=int(1000 / fps),  # milliseconds per frame
-                loop=0,
-                optimize=False
+            total_frames = duration * PORTRAIT_FPS
+            frames = self.render_living_portrait(
+                img, landmarks, total_frames, PORTRAIT_FPS,
+                smile_intensity=smile_intensity,
+                movement_amount=movement_amount,
+                blink_enabled=blink_enabled,
+                pixel_scale=scale
             )
             
+            logger.info(f"💾 Encoding {total_frames} frames at {img.shape[1]}x{img.shape[0]}...")
+            encode_frames(frames, output_path, PORTRAIT_FPS)
+            
             logger.info(f"✅ Living portrait created: {output_path}")
             return True
             
         except Exception as e:
             logger.error(f"Error creating living portrait: {e}", exc_info=True)
             return False
+    
+    def render_living_portrait(
+        self,
+        img: np.ndarray,
+        landmarks,
+        total_frames: int,
+        fps: int = PORTRAIT_FPS,
+        smile_intensity: float = 0.4,
+        movement_amount: float = 0.3,
+        blink_enabled: bool = True,
+        pixel_scale: float = 1.0
+    ) -> Iterator[np.ndarray]:
+        """
+        Render living portrait frames one at a time
+        
+        Flows are built once as basis fields and combined linearly per frame:
+        the smile and blink scale with their weights, and the head tilt is the
+        exact rotation (cos a - 1) * centred + sin a * perpendicular. Each frame
+        is one remap into a reused buffer.
+        
+        Args:
+            img: BGR image at the output resolution
+            landmarks: MediaPipe face landmarks
+            total_frames: Number of frames
+            fps: Frame rate the blink schedule is timed against
+            smile_intensity: Smile strength (0.0 to 1.0)
+            movement_amount: Amount of head movement (0.0 to 1.0)
+            blink_enabled: Enable eye blinking
+            pixel_scale: Working size / original size
+            
+        Yields:
+            RGB frames (uint8, H x W x 3)
+        """
+        h, w = img.shape[:2]
+        grid = coordinate_grid(h, w)
+        grid_y, grid_x = grid
+        
+        smile = self.create_smile(landmarks, (h, w), smile_intensity, grid=grid, pixel_scale=pixel_scale)
+        smile_x, smile_y = np.ascontiguousarray(smile[..., 0]), np.ascontiguousarray(smile[..., 1])
+        del smile
+        
+        # The blink only moves pixels vertically
+        blink_y = None
+        if blink_enabled:
+            blink_y = np.ascontiguousarray(
+                self.create_blink(landmarks, (h, w), 1.0, grid=grid, pixel_scale=pixel_scale)[..., 1]
+            )
+        
+        centred_x = grid_x - np.float32(w // 2)
+        centred_y = grid_y - np.float32(h // 2)
+        
+        map_x = np.empty_like(grid_x)
+        map_y = np.empty_like(grid_y)
+        warped = np.empty_like(img)
+        
+        for frame_num in range(total_frames):
+            smile_factor, tilt_angle, closure = frame_weights(
+                frame_num, total_frames, fps, movement_amount, blink_enabled
+            )
+            angle = np.radians(tilt_angle)
+            cos_term = (np.cos(angle) - 1) * TILT_WEIGHT
+            sin_term = np.sin(angle) * TILT_WEIGHT
+            
+            # map = grid + smile + tilt (+ blink), accumulated in place
+            cv2.scaleAdd(smile_x, smile_factor, grid_x, map_x)
+            cv2.scaleAdd(centred_x, cos_term, map_x, map_x)
+            cv2.scaleAdd(centred_y, -sin_term, map_x, map_x)
+            
+            cv2.scaleAdd(smile_y, smile_factor, grid_y, map_y)
+            cv2.scaleAdd(centred_y, cos_term, map_y, map_y)
+            cv2.scaleAdd(centred_x, sin_term, map_y, map_y)
+            if closure and blink_y is not None:
+                cv2.scaleAdd(blink_y, closure, map_y, map_y)
+            
+            cv2.remap(img, map_x, map_y, interpolation=cv2.INTER_LINEAR,
+                      borderMode=cv2.BORDER_REPLICATE, dst=warped)
+            yield cv2.cvtColor(warped, cv2.COLOR_BGR2RGB)
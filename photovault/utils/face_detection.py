@@ -9,6 +9,7 @@ import numpy as np
 import logging
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
+from photovault.utils.lazy import LazyProxy
 
 logger = logging.getLogger(__name__)
 
@@ -289,7 +290,7 @@ layer {
         return self.opencv_available and (self.face_cascade is not None or self.dnn_net is not None)
 
 # Global instance
-face_detector = FaceDetector()
+face_detector = LazyProxy(FaceDetector)  # Models load on first use or warm_up()
 
 def detect_faces_in_photo(image_path: str) -> List[Dict]:
     """
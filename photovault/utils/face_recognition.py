@@ -11,6 +11,7 @@ import logging
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import json
+from photovault.utils.lazy import LazyProxy
 
 logger = logging.getLogger(__name__)
 
@@ -339,7 +340,7 @@ class FaceRecognizer:
         return self.opencv_available
 
 # Global instance
-face_recognizer = FaceRecognizer()
+face_recognizer = LazyProxy(FaceRecognizer)  # Encodings cache loads on first use or warm_up()
 
 def recognize_face_in_photo(image_path: str, face_box: Dict) -> Optional[Dict]:
     """
@@ -18,12 +18,13 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp', 'tiff'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 MAX_IMAGE_DIMENSION = 4096
 
-def validate_image_file(file):
+def validate_image_file(file, max_dimension=MAX_IMAGE_DIMENSION):
     """
     Validate uploaded image file
     
     Args:
         file: FileStorage object from Flask request
+        max_dimension: Maximum width/height in pixels (None to skip, e.g. for album scans)
         
     Returns:
         tuple: (bool, str) - (is_valid, error_message)
@@ -64,8 +65,8 @@ def validate_image_file(file):
             with Image.open(file) as image:
                 image.verify()  # Verify it's a valid image
                 width, height = image.size
-                if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
-                    return False, f"Image dimensions too large: {width}x{height} (max: {MAX_IMAGE_DIMENSION}px)"
+                if max_dimension and (width > max_dimension or height > max_dimension):
+                    return False, f"Image dimensions too large: {width}x{height} (max: {max_dimension}px)"
             file.seek(0)  # Reset file pointer again
             return True, "Valid image file"
         except Exception as e:
@@ -0,0 +1,166 @@
+"""
+PhotoVault HTTP Caching Policy
+Chooses Cache-Control per route/blueprint instead of stamping no-store on everything
+
+Resolution order for each response:
+    1. A policy set on the view with @cache_policy(...)
+    2. A policy set for the view's blueprint (BLUEPRINT_POLICIES)
+    3. Static files: immutable when fingerprinted, short public cache otherwise
+    4. A Cache-Control the view set itself (e.g. gallery's no-store file responses)
+    5. Defaults: no-store for non-GET, private + ETag revalidation for JSON,
+       private no-cache for everything else
+"""
+import os
+import re
+import hashlib
+import logging
+from functools import wraps
+from typing import Optional
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Policy names
+NO_STORE = 'no-store'
+PRIVATE_REVALIDATE = 'private-revalidate'
+IMMUTABLE = 'immutable'
+PRIVATE_IMMUTABLE = 'private-immutable'
+PUBLIC_SHORT = 'public-short'
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+PUBLIC_SHORT_MAX_AGE = 3600
+
+# Pages that carry credentials, payment state or admin data must never be stored
+BLUEPRINT_POLICIES = {
+    'auth': NO_STORE,
+    'billing': NO_STORE,
+    'admin': NO_STORE,
+    'admin_export': NO_STORE,
+    'superuser': NO_STORE,
+}
+
+# name.<8+ hex chars>.ext - already content-addressed
+_HASHED_FILENAME = re.compile(r'\.[0-9a-f]{8,}\.\w+$')
+
+_fingerprints = {}
+
+
+def cache_policy(policy: str):
+    """
+    Decorator pinning the caching policy of a single view
+
+    Usage:
+        @bp.route('/api/thing')
+        @cache_policy(NO_STORE)
+        def thing(): ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g.cache_policy = policy
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def static_fingerprint(static_folder: str, filename: str) -> Optional[str]:
+    """Short content hash of a static file, cached until its mtime changes"""
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:12]
+    _fingerprints[path] = (mtime, fingerprint)
+    return fingerprint
+
+
+def _apply_policy(response, policy: str, json_max_age: int) -> None:
+    # Replace whatever send_file or the view set
+    response.headers.pop('Pragma', None)
+    response.headers.pop('Expires', None)
+
+    if policy == NO_STORE:
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
+    elif policy == IMMUTABLE:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    elif policy == PRIVATE_IMMUTABLE:
+        # Never-changing files behind a login: only the user's own browser keeps them
+        response.headers['Cache-Control'] = f'private, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    elif policy == PUBLIC_SHORT:
+        response.headers['Cache-Control'] = f'public, max-age={PUBLIC_SHORT_MAX_AGE}'
+    elif response.mimetype == 'application/json' and json_max_age > 0:
+        response.headers['Cache-Control'] = f'private, max-age={json_max_age}, must-revalidate'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+
+
+def _static_policy(app) -> str:
+    filename = (request.view_args or {}).get('filename', '')
+    if _HASHED_FILENAME.search(filename):
+        return IMMUTABLE
+    version = request.args.get('v')
+    if version and version == static_fingerprint(app.static_folder, filename):
+        return IMMUTABLE
+    return PUBLIC_SHORT
+
+
+def _resolve_policy(app, response) -> Optional[str]:
+    policy = g.get('cache_policy')
+    if policy:
+        return policy
+
+    if request.blueprint in BLUEPRINT_POLICIES:
+        return BLUEPRINT_POLICIES[request.blueprint]
+
+    if request.endpoint == 'static':
+        return _static_policy(app)
+
+    if 'no-store' in response.headers.get('Cache-Control', ''):
+        return None  # The view deliberately opted out - leave its headers alone
+
+    if request.method not in ('GET', 'HEAD') or response.status_code >= 400:
+        return NO_STORE
+
+    return PRIVATE_REVALIDATE
+
+
+def init_http_caching(app) -> None:
+    """Register the caching policy hooks and static URL fingerprinting on app"""
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        # url_for('static', filename=...) -> /static/...?v=<content hash>
+        if endpoint == 'static' and 'filename' in values and 'v' not in values and app.static_folder:
+            fingerprint = static_fingerprint(app.static_folder, values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    @app.after_request
+    def apply_cache_policy(response):
+        """Set Cache-Control (and ETag revalidation for private GETs) per policy"""
+        policy = _resolve_policy(app, response)
+        if policy is None:
+            return response
+
+        _apply_policy(response, policy, int(app.config.get('JSON_CACHE_MAX_AGE', 0)))
+
+        # Private GETs revalidate cheaply: 304 when the client's copy is current
+        if (policy == PRIVATE_REVALIDATE and response.status_code == 200
+                and not response.direct_passthrough and not response.is_streamed):
+            if not response.get_etag()[0]:
+                response.add_etag(weak=True)
+            response.make_conditional(request)
+
+        return response
@@ -1,6 +1,14 @@
 """
 Image Enhancement Utilities for PhotoVault
 Provides auto-enhancement functions for digitizing old photographs
+
+With OpenCV the pipeline works on a single BGR buffer. Denoising and CLAHE run
+first. Auto-levels, brightness and contrast are then folded into one 256-entry
+lookup table, applied in place. Saturation and sharpness run strip by strip.
+Each step reproduces Pillow's ImageEnhance arithmetic (float32 blends,
+truncation, its RGB->L weights), so the result matches the former
+OpenCV -> PIL -> OpenCV chain pixel for pixel
+(scripts/check_enhancement_parity.py).
 """
 
 import numpy as np
@@ -22,6 +30,115 @@ except ImportError as e:
     OPENCV_AVAILABLE = False
     logger.warning(f"OpenCV not available - limited image enhancement features: {e}")
 
+# Per-pixel passes work on strips of about this many pixels, bounding temporaries
+STRIP_PIXELS = 1 << 20
+
+# Pillow's RGB -> L weights (16-bit fixed point), in BGR order
+LUMA_WEIGHTS_BGR = (7471, 38470, 19595)
+
+# ImageFilter.SMOOTH, divided by its scale in float32 as Pillow does
+SMOOTH_EDGE = np.float32(1) / np.float32(13)
+SMOOTH_CENTRE = np.float32(5) / np.float32(13)
+
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+
+def _strips(height: int, width: int):
+    """(top, bottom) row ranges covering an image in STRIP_PIXELS-sized pieces"""
+    rows = max(1, STRIP_PIXELS // max(width, 1))
+    for top in range(0, height, rows):
+        yield top, min(height, top + rows)
+
+
+def _luma(bgr: np.ndarray) -> np.ndarray:
+    """Image.convert('L') of a BGR array: (19595 R + 38470 G + 7471 B + 0x8000) >> 16"""
+    l = np.multiply(bgr[..., 0], LUMA_WEIGHTS_BGR[0], dtype=np.uint32)
+    l += np.multiply(bgr[..., 1], LUMA_WEIGHTS_BGR[1], dtype=np.uint32)
+    l += np.multiply(bgr[..., 2], LUMA_WEIGHTS_BGR[2], dtype=np.uint32)
+    l += 0x8000
+    l >>= 16
+    return l
+
+
+def _blend(degenerate, image: np.ndarray, factor: float) -> np.ndarray:
+    """Image.blend(degenerate, image, factor) as Pillow computes it: float32, clipped, truncated"""
+    degenerate = np.asarray(degenerate, dtype=np.float32)
+    out = np.subtract(image, degenerate, dtype=np.float32)
+    out *= np.float32(factor)
+    out += degenerate
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def _histogram_percentile(hist: np.ndarray, q: float) -> float:
+    """
+    np.percentile(img / 255.0, q) computed from a 256-bin histogram of img
+
+    Follows numpy's default 'linear' method step for step, so the result is
+    bit-identical without materializing (or sorting) a float copy of the image.
+    """
+    n = int(hist.sum())
+    virtual = (n - 1) * (q / 100)
+    if virtual >= n - 1:
+        previous = following = n - 1
+        gamma = 0.0
+    else:
+        previous = int(np.floor(virtual))
+        following = previous + 1
+        gamma = virtual - previous
+    cumulative = np.cumsum(hist)
+    a = int(np.searchsorted(cumulative, previous, side='right')) / 255.0
+    b = int(np.searchsorted(cumulative, following, side='right')) / 255.0
+    diff = b - a
+    if gamma >= 0.5:
+        return b - diff * (1 - gamma)
+    return a + diff * gamma
+
+
+def _apply_sharpness(img: np.ndarray, factor: float) -> None:
+    """
+    ImageEnhance.Sharpness in place: blend(img.filter(SMOOTH), img, factor)
+
+    Matches Pillow's 3x3 filter, including its summation order and +0.5
+    rounding offset; border rows and columns keep their values. Each weighted
+    term is a float32 lookup of the pixel value, and the three-tap sum of the
+    rows above and below is shared between neighbouring rows. Rows are
+    processed in strips, carrying the original row above each strip.
+    """
+    h, w = img.shape[:2]
+    if h < 3 or w < 3:
+        return
+    levels = np.arange(256, dtype=np.float32)
+    edge_terms = levels * SMOOTH_EDGE
+    centre_terms = levels * SMOOTH_CENTRE
+
+    above = img[0].copy()
+    for top, bottom in _strips(h, w):
+        first, last = max(top, 1), min(bottom, h - 1)
+        if first >= last:
+            continue
+        src = np.concatenate((above[None], img[first:last + 1]))
+        above = img[last - 1].copy()
+
+        edge = cv2.LUT(src, edge_terms)
+        # (left + centre) + right, with every tap weighted as an edge tap
+        taps = edge[:, :-2] + edge[:, 1:-1]
+        taps += edge[:, 2:]
+
+        # Pillow accumulates the row below first, then the row itself, then the row above
+        ss = np.float32(0.5) + taps[2:]
+        middle = edge[1:-1, :-2] + cv2.LUT(src[1:-1, 1:-1], centre_terms)
+        middle += edge[1:-1, 2:]
+        ss += middle
+        ss += taps[:-2]
+        np.clip(ss, 0, 255, out=ss)
+        del edge, taps, middle
+
+        smooth = src[1:-1].copy()
+        smooth[:, 1:-1] = ss
+        img[first:last] = _blend(smooth, src[1:-1], factor)
+
+
 class ImageEnhancer:
     """Advanced image enhancement for old photograph restoration"""
     
@@ -59,59 +176,82 @@ class ImageEnhancer:
         if settings:
             enhancement_settings.update(settings)
         
+        if output_path is None:
+            output_path = image_path
+        
         if OPENCV_AVAILABLE:
-            # Full OpenCV enhancement pipeline
+            # Full OpenCV enhancement pipeline on one BGR buffer
             img = cv2.imread(image_path)
             if img is None:
                 raise ValueError(f"Could not load image: {image_path}")
             
-            # Step 1: Denoise if enabled
-            if enhancement_settings.get('denoise', True):
-                img = self._apply_denoising(img)
-            
-            # Step 2: Apply CLAHE for contrast enhancement
-            if enhancement_settings.get('clahe_enabled', True):
-                img = self._apply_clahe(img)
+            img = self.enhance_image(img, enhancement_settings)
             
-            # Step 3: Auto-levels adjustment
-            if enhancement_settings.get('auto_levels', True):
-                img = self._apply_auto_levels(img)
-            
-            # Step 4: Convert to PIL for fine adjustments
-            pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        else:
-            # Fallback to PIL-only enhancement
-            logger.info("Using PIL-only enhancement (OpenCV not available)")
-            pil_img = Image.open(image_path)
-        
-        # Step 5: Apply PIL enhancements
-        pil_img = self._apply_pil_enhancements(pil_img, enhancement_settings)
-        
-        # Step 6: Save enhanced image
-        if output_path is None:
-            output_path = image_path
-        
-        if OPENCV_AVAILABLE:
-            # Convert back to BGR for OpenCV saving
-            final_cv_img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
             # Save with original quality
-            success = cv2.imwrite(output_path, final_cv_img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            success = cv2.imwrite(output_path, img, [cv2.IMWRITE_JPEG_QUALITY, 95])
             if not success:
                 raise IOError(f"Failed to save enhanced image: {output_path}")
         else:
-            # Use PIL for saving
+            # Fallback to PIL-only enhancement
+            logger.info("Using PIL-only enhancement (OpenCV not available)")
+            pil_img = Image.open(image_path)
+            pil_img = self._apply_pil_enhancements(pil_img, enhancement_settings)
             pil_img.save(output_path, 'JPEG', quality=95)
         
         logger.info(f"Auto-enhancement completed: {output_path}")
         return output_path, enhancement_settings
     
-    def _apply_denoising(self, img: np.ndarray) -> np.ndarray:
+    def enhance_image(self, img: np.ndarray, settings: Dict, scale: float = 1.0) -> np.ndarray:
+        """
+        Run the OpenCV enhancement pipeline on a BGR image
+        
+        Args:
+            img: BGR uint8 image (modified in place where possible)
+            settings: Enhancement settings
+            scale: Size of img relative to the original photo, for previews
+                   rendered on a downscaled proxy (pixel-sized filters shrink with it)
+            
+        Returns:
+            Enhanced BGR image
+        """
+        img, levels_lut = self.prepare_base(img, settings, scale)
+        
+        # Step 3: Auto-levels, brightness, contrast, saturation and sharpness
+        return self.apply_adjustments(img, levels_lut, settings)
+    
+    def prepare_base(self, img: np.ndarray, settings: Dict,
+                     scale: float = 1.0) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        The slider-independent part of enhance_image: denoise, CLAHE and the levels LUT
+        
+        Depends only on the denoise/clahe_enabled/auto_levels switches, so
+        previews can reuse the result while brightness, contrast, color or
+        sharpness change.
+        
+        Returns:
+            Tuple of (BGR image, auto-levels LUT or None)
+        """
+        # Step 1: Denoise if enabled (the only step that needs a second buffer)
+        if settings.get('denoise', True):
+            img = self._apply_denoising(img, scale)
+        
+        # Step 2: Apply CLAHE for contrast enhancement
+        if settings.get('clahe_enabled', True):
+            img = self._apply_clahe(img)
+        
+        levels_lut = self._auto_levels_lut(img) if settings.get('auto_levels', True) else None
+        return img, levels_lut
+    
+    def _apply_denoising(self, img: np.ndarray, scale: float = 1.0) -> np.ndarray:
         """Apply bilateral filtering to reduce noise while preserving edges"""
         if not OPENCV_AVAILABLE:
             return img
         try:
             # Bilateral filter - reduces noise while keeping edges sharp
-            return cv2.bilateralFilter(img, 9, 75, 75)
+            if scale >= 1.0:
+                return cv2.bilateralFilter(img, 9, 75, 75)
+            diameter = max(3, int(round(9 * scale)) | 1)
+            return cv2.bilateralFilter(img, diameter, 75, 75 * scale)
         except Exception as e:
             logger.warning(f"Denoising failed: {e}")
             return img
@@ -121,46 +261,106 @@ class ImageEnhancer:
         if not OPENCV_AVAILABLE:
             return img
         try:
-            # Convert to LAB color space
-            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
+            # Convert to LAB color space in place
+            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB, dst=img)
             
             # Apply CLAHE to the L channel only
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced_l = clahe.apply(l)
+            cv2.insertChannel(clahe.apply(cv2.extractChannel(lab, 0)), lab, 0)
             
-            # Merge channels back
-            enhanced_lab = cv2.merge([enhanced_l, a, b])
-            return cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
+            return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=lab)
         except Exception as e:
             logger.warning(f"CLAHE enhancement failed: {e}")
             return img
     
     def _apply_auto_levels(self, img: np.ndarray) -> np.ndarray:
         """Automatically adjust levels to improve dynamic range"""
+        lut = self._auto_levels_lut(img)
+        if lut is None:
+            return img
+        return cv2.LUT(img, lut, dst=img)
+    
+    def _auto_levels_lut(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Lookup table stretching levels between the 1st and 99th percentiles
+        
+        Percentiles come from a histogram rather than a float copy of the image.
+        
+        Returns:
+            uint8 LUT, or None if the image is too flat to stretch
+        """
         try:
-            # Convert to float for calculations
-            img_float = img.astype(np.float64) / 255.0
+            hist = np.zeros(256, dtype=np.int64)
+            for top, bottom in _strips(*img.shape[:2]):
+                strip = img[top:bottom]
+                # Per-strip counts stay far below float32's exact-integer limit
+                counts = cv2.calcHist([strip.reshape(bottom - top, -1)], [0], None, [256], [0, 256])
+                hist += counts.ravel().astype(np.int64)
             
             # Calculate percentile-based levels (ignore extreme 1% on each end)
-            low_perc = np.percentile(img_float, 1)
-            high_perc = np.percentile(img_float, 99)
+            low_perc = _histogram_percentile(hist, 1)
+            high_perc = _histogram_percentile(hist, 99)
             
             # Avoid division by zero
             if high_perc - low_perc < 0.01:
-                return img
+                return None
             
             # Stretch levels
-            img_stretched = (img_float - low_perc) / (high_perc - low_perc)
-            img_stretched = np.clip(img_stretched, 0, 1)
-            
-            return (img_stretched * 255).astype(np.uint8)
+            levels = np.arange(256, dtype=np.float64) / 255.0
+            stretched = np.clip((levels - low_perc) / (high_perc - low_perc), 0, 1)
+            return (stretched * 255).astype(np.uint8)
         except Exception as e:
             logger.warning(f"Auto-levels adjustment failed: {e}")
+            return None
+    
+    def apply_adjustments(self, img: np.ndarray, levels_lut: Optional[np.ndarray],
+                          settings: Dict) -> np.ndarray:
+        """
+        Levels, brightness, contrast, saturation and sharpness on a BGR image, in place
+        
+        Brightness and contrast are per-value blends, so together with the levels
+        they become one LUT (contrast's pivot is the mean L of the image it would
+        have seen). Saturation blends each pixel with its own L, and sharpness
+        with a 3x3 smoothed copy; both run strip by strip.
+        """
+        try:
+            lut = levels_lut if levels_lut is not None else IDENTITY_LUT
+            
+            # Brightness adjustment
+            if settings.get('brightness', 1.0) != 1.0:
+                lut = _blend(0, lut, settings['brightness'])
+            
+            # Contrast adjustment
+            if settings.get('contrast', 1.0) != 1.0:
+                lut = _blend(self._mean_luma(img, lut), lut, settings['contrast'])
+            
+            if lut is not IDENTITY_LUT:
+                cv2.LUT(img, lut, dst=img)
+            
+            # Color/Saturation adjustment
+            if settings.get('color', 1.0) != 1.0:
+                for top, bottom in _strips(*img.shape[:2]):
+                    strip = img[top:bottom]
+                    strip[...] = _blend(_luma(strip)[..., None], strip, settings['color'])
+            
+            # Sharpness adjustment
+            if settings.get('sharpness', 1.0) != 1.0:
+                _apply_sharpness(img, settings['sharpness'])
+            
+            return img
+        except Exception as e:
+            logger.warning(f"Enhancement adjustments failed: {e}")
             return img
     
+    def _mean_luma(self, img: np.ndarray, lut: np.ndarray) -> int:
+        """Rounded mean L of cv2.LUT(img, lut), as ImageEnhance.Contrast measures it"""
+        total = 0
+        for top, bottom in _strips(*img.shape[:2]):
+            total += int(_luma(cv2.LUT(img[top:bottom], lut)).sum(dtype=np.uint64))
+        return int(total / (img.shape[0] * img.shape[1]) + 0.5)
+    
     def _apply_pil_enhancements(self, pil_img: Image.Image, settings: Dict) -> Image.Image:
-        """Apply PIL-based enhancements for fine-tuning"""
+        """Apply PIL-based enhancements for fine-tuning (used when OpenCV is unavailable)"""
         try:
             # Brightness adjustment
             if settings.get('brightness', 1.0) != 1.0:
@@ -263,27 +463,7 @@ class ImageEnhancer:
         }
         
         try:
-            from PIL import ImageFilter
-            
-            # Load image
-            pil_img = Image.open(image_path)
-            
-            if method == 'unsharp':
-                # Unsharp mask - more control and better quality
-                percent = int(amount * 100)
-                sharpened = pil_img.filter(
-                    ImageFilter.UnsharpMask(
-                        radius=radius, 
-                        percent=percent, 
-                        threshold=threshold
-                    )
-                )
-            else:
-                # Basic sharpen filter
-                sharpened = pil_img.filter(ImageFilter.SHARPEN)
-                # Apply multiple times based on amount
-                for _ in range(int(amount)):
-                    sharpened = sharpened.filter(ImageFilter.SHARPEN)
+            sharpened = self.apply_sharpening(Image.open(image_path), radius, amount, threshold, method)
             
             # Save sharpened image
             if output_path is None:
@@ -298,6 +478,34 @@ class ImageEnhancer:
             logger.error(f"Error sharpening image: {e}")
             raise
     
+    def apply_sharpening(self, pil_img: Image.Image, radius: float = 2.0, amount: float = 1.5,
+                         threshold: int = 3, method: str = 'unsharp') -> Image.Image:
+        """
+        Sharpen a PIL image in memory (see sharpen_image for the parameters)
+        
+        Returns:
+            Sharpened PIL image
+        """
+        from PIL import ImageFilter
+        
+        if method == 'unsharp':
+            # Unsharp mask - more control and better quality
+            percent = int(amount * 100)
+            return pil_img.filter(
+                ImageFilter.UnsharpMask(
+                    radius=radius, 
+                    percent=percent, 
+                    threshold=threshold
+                )
+            )
+        
+        # Basic sharpen filter
+        sharpened = pil_img.filter(ImageFilter.SHARPEN)
+        # Apply multiple times based on amount
+        for _ in range(int(amount)):
+            sharpened = sharpened.filter(ImageFilter.SHARPEN)
+        return sharpened
+    
     def create_enhanced_copy(self, original_path: str, user_id: int, username: str) -> str:
         """Create an enhanced copy of the original image using username.enhanced.date.randomnumber format"""
         try:
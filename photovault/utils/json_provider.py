@@ -0,0 +1,53 @@
+"""
+PhotoVault JSON Provider
+Flask JSON provider backed by orjson, falling back to the stdlib encoder
+
+Output matches Flask's DefaultJSONProvider for the types this app returns:
+dates and datetimes still go through Flask's default hook (HTTP date format),
+keys are sorted when app.json.sort_keys is set, and pretty-printing in debug
+mode is left to the stdlib path.
+"""
+import logging
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+    logger.info("orjson not installed - using the standard library JSON encoder")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson fast paths for dumps/loads/response"""
+
+    def _orjson_option(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option())
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Callers passing stdlib options (indent, cls, ...) keep stdlib behaviour
+        if not ORJSON_AVAILABLE or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if not ORJSON_AVAILABLE or pretty:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
@@ -5,7 +5,111 @@ from functools import wraps
 from flask import request, jsonify, current_app, abort
 from flask_login import current_user as flask_current_user, login_required
 import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from photovault.extensions import db
 from photovault.models import User
+from photovault.utils.cache import cache
+
+# Authenticated users, shared across workers. Entries are dropped when the user
+# row changes, so the TTL only bounds how long an unused entry lingers
+_principals = cache.namespace('principal', ttl=300)
+
+# User columns kept in the shared cache: what most requests read, and no secrets
+PRINCIPAL_FIELDS = ('id', 'username', 'is_active', 'is_admin', 'is_superuser')
+
+
+class Principal:
+    """
+    The authenticated user, built from the cached fields
+
+    Reading any other attribute, or setting one, loads the User row once for
+    the request and delegates to it, so writes go to a session-attached instance.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, fields, user=None):
+        object.__setattr__(self, '_fields', fields)
+        object.__setattr__(self, '_user', user)
+
+    def get_id(self):
+        return str(self._fields['id'])
+
+    def _load(self):
+        if self._user is None:
+            user = db.session.get(User, self._fields['id'])
+            if user is None:
+                raise LookupError(f"User {self._fields['id']} no longer exists")
+            object.__setattr__(self, '_user', user)
+        return self._user
+
+    def __getattr__(self, name):
+        if self._user is None and name in self._fields:
+            return self._fields[name]
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (Principal, User)):
+            return self.get_id() == str(other.get_id())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(('user', self._fields['id']))
+
+    def __repr__(self):
+        return f"<User {self._fields['username']}>"
+
+
+def load_principal(user_id):
+    """
+    Load the authenticated user, via the shared principal cache
+
+    Args:
+        user_id: Id from the JWT payload or Flask-Login session
+
+    Returns:
+        Principal, or None if the user doesn't exist
+    """
+    user_id = int(user_id)
+    fields = _principals.get(user_id)
+    if isinstance(fields, dict):
+        return Principal(fields)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    fields = {name: getattr(user, name) for name in PRINCIPAL_FIELDS}
+    _principals.set(user_id, fields)
+    return Principal(fields, user)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_principal_changes(session, flush_context):
+    pending = session.info.setdefault('principal_invalidate', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id:
+            pending.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_principals(session):
+    for user_id in session.info.pop('principal_invalidate', ()):
+        _principals.delete(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_principal_changes(session):
+    session.info.pop('principal_invalidate', None)
+
 
 def token_required(f):
     """
@@ -28,7 +132,7 @@ def token_required(f):
         
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            current_user = load_principal(data['user_id'])
             if not current_user:
                 return jsonify({'error': 'User not found'}), 401
         except jwt.ExpiredSignatureError:
@@ -58,7 +162,7 @@ def hybrid_auth(f):
             try:
                 token = auth_header.split(" ")[1]
                 data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                authenticated_user = User.query.get(data['user_id'])
+                authenticated_user = load_principal(data['user_id'])
             except (IndexError, jwt.ExpiredSignatureError, jwt.InvalidTokenError, Exception) as e:
                 current_app.logger.debug(f"JWT auth failed, trying session: {str(e)}")
                 pass
@@ -0,0 +1,65 @@
+"""
+PhotoVault Lazy Singletons
+Defers construction of model-backed singletons until they are first used
+
+Importing a module that exposes a LazyProxy costs nothing; the wrapped object
+(Haar cascades, DNN weights, encodings cache, ...) is built on first attribute
+access, or ahead of time by warm_up().
+"""
+import threading
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class LazyProxy:
+    """Thread-safe proxy that builds its target on first attribute access"""
+
+    def __init__(self, factory: Callable[[], Any], name: str = None):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name or getattr(factory, '__name__', repr(factory)))
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _get_instance(self) -> Any:
+        instance = object.__getattribute__(self, '_instance')
+        if instance is None:
+            with object.__getattribute__(self, '_lock'):
+                instance = object.__getattribute__(self, '_instance')
+                if instance is None:
+                    logger.info(f"Initializing {object.__getattribute__(self, '_name')} on first use")
+                    instance = object.__getattribute__(self, '_factory')()
+                    object.__setattr__(self, '_instance', instance)
+        return instance
+
+    @property
+    def is_loaded(self) -> bool:
+        return object.__getattribute__(self, '_instance') is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._get_instance(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._get_instance(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyProxy {object.__getattribute__(self, '_name')} ({state})>"
+
+
+def warm_up() -> None:
+    """
+    Build the model-backed singletons now instead of on the first request
+
+    Safe to call from a background thread; requests that arrive first simply
+    wait on the same lock.
+    """
+    from photovault.utils.face_detection import face_detector
+    from photovault.utils.face_recognition import face_recognizer
+
+    for proxy in (face_detector, face_recognizer):
+        try:
+            proxy._get_instance()
+        except Exception as e:
+            logger.error(f"Warm-up failed for {proxy!r}: {e}")
@@ -5,7 +5,8 @@ Uses OpenCV to detect rectangular photos within larger images and extract them a
 import os
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from PIL import Image
 
@@ -20,6 +21,18 @@ except ImportError:
     OPENCV_AVAILABLE = False
     logger.warning("OpenCV not available - photo detection disabled")
 
+# Hard ceiling against decompression bombs - anything below this is handled
+# within the soft memory budget by working on a reduced pyramid level
+MAX_DETECTION_PIXELS = 400000000
+
+# cv2.imread flags that decode directly at reduced scale (libjpeg DCT scaling)
+_REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+} if OPENCV_AVAILABLE else {}
+
 class PhotoDetector:
     """Automatic detection and extraction of rectangular photos from images"""
     
@@ -31,11 +44,21 @@ class PhotoDetector:
         self.contour_area_threshold = 0.005  # Min contour area as fraction of image - very sensitive
         self.enable_perspective_correction = True  # Enable perspective transformation for tilted photos
         self.enable_edge_refinement = True  # Enable advanced edge refinement
+        self.detection_max_dimension = 1600  # Long side of the pyramid level used for contour finding
+        self.memory_budget_bytes = 512 * 1024 * 1024  # Soft cap for decoded BGR buffers (~170MP)
+        self.extraction_workers = min(8, os.cpu_count() or 2)  # Album pages usually hold 6-10 prints
         
     def detect_photos(self, image_path: str) -> List[Dict]:
         """
         Detect rectangular photos in an image
         
+        Contours are found on a downscaled pyramid level (at most
+        detection_max_dimension px on the long side) and the resulting
+        corners are refined with cornerSubPix in small windows of the
+        full-resolution image around each detected quad (or of the largest
+        level the memory budget allows, for scans over ~170MP). All returned
+        coordinates are in full-resolution pixel space.
+        
         Args:
             image_path: Path to the image file
             
@@ -51,24 +74,25 @@ class PhotoDetector:
             return []
             
         image = None
+        full_image = None
         try:
-            # Load image with memory management
-            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            full_size = self._get_image_size(image_path)
+            if full_size and full_size[0] * full_size[1] > MAX_DETECTION_PIXELS:
+                logger.error(f"Image too large for processing: {full_size[0]}x{full_size[1]} pixels. "
+                             f"Maximum supported: {MAX_DETECTION_PIXELS // 1000000}MP")
+                return []
+            
+            # Decode straight to the detection pyramid level
+            image, scale = self._load_pyramid_level(image_path, full_size, self.detection_max_dimension)
             if image is None:
                 logger.error(f"Could not load image: {image_path}")
                 return []
-                
-            logger.info(f"Starting photo detection on {image_path}")
             
-            # Check image size to prevent memory issues - reject instead of resize
             height, width = image.shape[:2]
-            if height * width > 25000000:  # ~25MP limit for detection
-                logger.error(f"Image too large for processing: {width}x{height} pixels. Maximum supported: 25MP")
-                return []
+            original_area = int(round(width * scale)) * int(round(height * scale))
             
-            # Get image dimensions
-            height, width = image.shape[:2]
-            original_area = width * height
+            logger.info(f"Starting photo detection on {image_path} "
+                        f"(working size {width}x{height}, scale {scale:.2f})")
             
             # Preprocess image for edge detection
             try:
@@ -86,6 +110,10 @@ class PhotoDetector:
             logger.info(f"📊 Found {len(contours)} contours to analyze")
             
             for i, contour in enumerate(contours):
+                # Map the contour back to full-resolution coordinates
+                if scale != 1.0:
+                    contour = np.round(contour.astype(np.float32) * scale).astype(np.int32)
+                
                 # Get bounding rectangle
                 x, y, w, h = cv2.boundingRect(contour)
                 area = w * h
@@ -123,6 +151,13 @@ class PhotoDetector:
                 detected_photos = detected_photos[:max_detections]
                 logger.info(f"Limited detections to {max_detections} highest confidence photos")
             
+            # Snap corners to the sharpest resolution the memory budget allows
+            if detected_photos and scale > 1.0:
+                image = None
+                full_image, refine_scale = self._load_within_budget(image_path, full_size)
+                if full_image is not None and refine_scale < scale:
+                    self._refine_corners(full_image, detected_photos, scale, refine_scale)
+            
             logger.info(f"Detected {len(detected_photos)} potential photos in {image_path}")
             return detected_photos
             
@@ -134,11 +169,161 @@ class PhotoDetector:
             return []
         finally:
             # Ensure memory cleanup
-            if 'image' in locals() and image is not None:
+            image = None
+            full_image = None
+    
+    def detections_from_corners(self, quads: List) -> List[Dict]:
+        """
+        Build detection dicts from caller-supplied corner quads (e.g. adjusted in the app)
+        
+        Args:
+            quads: List of quads, each four [x, y] points in full-resolution pixels
+            
+        Returns:
+            Detections in the same format as detect_photos, ready for extract_photos
+            
+        Raises:
+            ValueError: If a quad is not four numeric points
+        """
+        detections = []
+        for quad in quads[:10]:
+            corners = np.array(quad, dtype=np.float32)
+            if corners.shape != (4, 2) or not np.all(np.isfinite(corners)):
+                raise ValueError("each quad must be four [x, y] points")
+            
+            contour = np.round(corners).astype(np.int32).reshape(-1, 1, 2)
+            x, y, w, h = cv2.boundingRect(contour)
+            if w <= 0 or h <= 0:
+                raise ValueError("quad has no area")
+            
+            detections.append({
+                'x': int(x),
+                'y': int(y),
+                'width': int(w),
+                'height': int(h),
+                'area': int(w * h),
+                'confidence': 1.0,  # User-confirmed
+                'aspect_ratio': float(w / h),
+                'contour': contour.tolist(),
+                'corners': corners.tolist()
+            })
+        return detections
+    
+    def _get_image_size(self, image_path: str):
+        """Read (width, height) from the image header without decoding pixels"""
+        try:
+            with Image.open(image_path) as img:
+                return img.size
+        except Exception:
+            return None
+    
+    def _load_pyramid_level(self, image_path: str, full_size, max_dimension: int):
+        """
+        Decode an image at reduced resolution with the long side <= max_dimension
+        
+        JPEG decoding at 1/2, 1/4 or 1/8 scale is done by libjpeg's DCT scaling,
+        so large scans never materialize at full resolution here.
+        
+        Returns:
+            tuple: (image, scale) where scale maps image pixels to full-resolution pixels
+        """
+        factor = 1
+        if full_size:
+            long_side = max(full_size)
+            for candidate in (8, 4, 2):
+                if long_side / candidate >= max_dimension:
+                    factor = candidate
+                    break
+        
+        image = cv2.imread(image_path, _REDUCED_READ_FLAGS.get(factor, cv2.IMREAD_COLOR))
+        if image is None and factor != 1:
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None, 1.0
+        
+        height, width = image.shape[:2]
+        # Long side is used so EXIF rotation applied by imread doesn't matter
+        full_long_side = max(full_size) if full_size else max(height, width)
+        if max(height, width) > max_dimension:
+            ratio = max_dimension / float(max(height, width))
+            image = cv2.resize(image, (max(1, int(width * ratio)), max(1, int(height * ratio))),
+                               interpolation=cv2.INTER_AREA)
+        return image, full_long_side / float(max(image.shape[:2]))
+    
+    def _load_within_budget(self, image_path: str, full_size):
+        """
+        Decode the largest pyramid level that fits the soft memory budget
+        
+        Returns:
+            tuple: (image, scale) where scale maps image pixels to full-resolution pixels
+        """
+        factor = 1
+        if full_size:
+            for candidate in (1, 2, 4, 8):
+                level_bytes = (full_size[0] // candidate) * (full_size[1] // candidate) * 3
+                if level_bytes <= self.memory_budget_bytes:
+                    factor = candidate
+                    break
+            else:
+                factor = 8
+        
+        if factor > 1:
+            logger.info(f"Image exceeds detection memory budget, working at 1/{factor} resolution")
+        
+        image = cv2.imread(image_path, _REDUCED_READ_FLAGS.get(factor, cv2.IMREAD_COLOR))
+        if image is None:
+            return None, 1.0
+        
+        height, width = image.shape[:2]
+        scale = max(full_size) / float(max(height, width)) if full_size else 1.0
+        return image, scale
+    
+    def _refine_corners(self, image: np.ndarray, detected_photos: List[Dict],
+                        detection_scale: float, image_scale: float) -> None:
+        """
+        Refine coarse corners in place using small windows of a sharper image
+        
+        Each corner is searched coarse-to-fine with cv2.cornerSubPix: first in
+        a window wide enough to cover the error of the detection level (a few
+        of its pixels, i.e. tens of full-resolution pixels on a large scan),
+        then in a tight window around that estimate. Only those windows are
+        converted, so cost is independent of the image size.
+        
+        Args:
+            image: Image decoded at image_scale (1.0 = full resolution)
+            detected_photos: Detections in full-resolution coordinates
+            detection_scale: Scale the coarse corners were found at
+            image_scale: Scale of `image` relative to full resolution
+        """
+        height, width = image.shape[:2]
+        # Coarse radius covers the quantization and polygon-fit error of the detection level
+        coarse_radius = int(max(4, min(64, np.ceil(4 * detection_scale / image_scale))))
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+        
+        for photo in detected_photos:
+            refined = []
+            for cx, cy in photo['corners']:
+                px, py = cx / image_scale, cy / image_scale
+                qx, qy = px, py
                 try:
-                    del image
-                except:
-                    pass
+                    for radius in (coarse_radius, 4):
+                        x0, y0 = int(max(0, qx - 2 * radius)), int(max(0, qy - 2 * radius))
+                        x1, y1 = int(min(width, qx + 2 * radius + 1)), int(min(height, qy + 2 * radius + 1))
+                        if x1 - x0 <= 2 * radius + 1 or y1 - y0 <= 2 * radius + 1:
+                            break
+                        window = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+                        point = np.array([[[qx - x0, qy - y0]]], dtype=np.float32)
+                        cv2.cornerSubPix(window, point, (radius, radius), (-1, -1), criteria)
+                        qx, qy = float(point[0, 0, 0]) + x0, float(point[0, 0, 1]) + y0
+                except cv2.error:
+                    qx, qy = px, py
+                # Reject refinements that wandered off to unrelated texture
+                if abs(qx - px) <= coarse_radius and abs(qy - py) <= coarse_radius:
+                    refined.append([int(round(qx * image_scale)), int(round(qy * image_scale))])
+                else:
+                    refined.append([int(cx), int(cy)])
+            
+            photo['corners'] = refined
     
     def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better edge detection with enhanced algorithms"""
@@ -152,12 +337,6 @@ class PhotoDetector:
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         enhanced = clahe.apply(denoised)
         
-        # Apply adaptive threshold for better edge detection
-        adaptive = cv2.adaptiveThreshold(
-            enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
         # Apply Canny edge detection with improved parameters for better photo detection
         edges = cv2.Canny(enhanced, 40, 120, apertureSize=3, L2gradient=True)
         
@@ -341,108 +520,59 @@ class PhotoDetector:
             logger.warning(f"Edge refinement failed: {e}, returning original")
             return image
     
-    def extract_photos(self, image_path: str, output_dir: str, detected_photos: List[Dict]) -> List[Dict]:
+    def extract_photos(self, image_path: str, output_dir: str, detected_photos: List[Dict],
+                       thumbnail_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
         """
         Extract detected photos and save them as separate images
         
+        Detections are warped, refined and encoded concurrently - OpenCV releases
+        the GIL inside warpPerspective, bilateralFilter and imwrite, so album pages
+        with several prints scale across cores.
+        
         Args:
             image_path: Path to the original image
             output_dir: Directory to save extracted photos
             detected_photos: List of detected photo regions
+            thumbnail_size: Optional (width, height) bound; when given a JPEG thumbnail
+                is written next to each extracted photo from the in-memory crop
             
         Returns:
-            List of extracted photo information with file paths
+            List of extracted photo information with file paths, in detection order
         """
         if not OPENCV_AVAILABLE:
             return []
             
         image = None
         try:
-            # Load original image with memory management
-            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if image is None:
-                logger.error(f"Could not load image: {image_path}")
+            # Load at full resolution, or the largest level within the memory budget
+            full_size = self._get_image_size(image_path)
+            if full_size and full_size[0] * full_size[1] > MAX_DETECTION_PIXELS:
+                logger.error(f"Image too large for extraction: {full_size[0]}x{full_size[1]} pixels")
                 return []
             
-            # Check image size for extraction
-            height, width = image.shape[:2]
-            if height * width > 30000000:  # Limit for extraction (slightly higher)
-                logger.error(f"Image too large for extraction: {width}x{height} pixels")
+            image, scale = self._load_within_budget(image_path, full_size)
+            if image is None:
+                logger.error(f"Could not load image: {image_path}")
                 return []
                 
             # Create output directory if it doesn't exist
             os.makedirs(output_dir, exist_ok=True)
             
-            extracted_photos = []
             base_filename = os.path.splitext(os.path.basename(image_path))[0]
             
-            for i, photo in enumerate(detected_photos):
-                try:
-                    # Extract region with improved cropping
-                    x, y, w, h = photo['x'], photo['y'], photo['width'], photo['height']
-                    contour = np.array(photo.get('contour', []), dtype=np.int32)
-                    
-                    # Try perspective correction for cleaner crops
-                    extracted_region = None
-                    if self.enable_perspective_correction and len(contour) > 0:
-                        try:
-                            # Get the 4 corners of the photo
-                            corners = self._get_photo_corners(contour)
-                            
-                            # Apply perspective transformation for cleaner crop
-                            extracted_region = self._apply_perspective_transform(image, corners)
-                            logger.info(f"Applied perspective correction to photo {i+1}")
-                        except Exception as e:
-                            logger.warning(f"Perspective correction failed for photo {i+1}: {e}, using fallback")
-                            extracted_region = None
-                    
-                    # Fallback to traditional extraction if perspective correction failed
-                    if extracted_region is None:
-                        # Calculate adaptive padding based on photo size
-                        padding = max(5, int(min(w, h) * 0.02))  # 2% of smallest dimension
-                        x_start = max(0, x - padding)
-                        y_start = max(0, y - padding)
-                        x_end = min(image.shape[1], x + w + padding)
-                        y_end = min(image.shape[0], y + h + padding)
-                        
-                        # Extract the region
-                        extracted_region = image[y_start:y_end, x_start:x_end]
-                    
-                    # Apply edge cleanup if enabled
-                    if self.enable_edge_refinement and extracted_region is not None:
-                        extracted_region = self._refine_edges(extracted_region)
-                    
-                    # Generate filename
-                    output_filename = f"{base_filename}_photo_{i+1:02d}_conf{photo['confidence']:.2f}.jpg"
-                    output_path = os.path.join(output_dir, output_filename)
-                    
-                    # Save extracted photo with quality control
-                    success = cv2.imwrite(output_path, extracted_region, 
-                                        [cv2.IMWRITE_JPEG_QUALITY, 95])
-                    if not success:
-                        logger.error(f"Failed to save extracted photo: {output_path}")
-                        continue
-                    
-                    # Get final dimensions
-                    final_height, final_width = extracted_region.shape[:2]
-                    
-                    extracted_info = {
-                        'original_region': photo,
-                        'filename': output_filename,
-                        'file_path': output_path,
-                        'extracted_width': final_width,
-                        'extracted_height': final_height,
-                        'confidence': photo['confidence'],
-                        'perspective_corrected': self.enable_perspective_correction and len(contour) > 0
-                    }
-                    
-                    extracted_photos.append(extracted_info)
-                    logger.info(f"Extracted photo {i+1}: {output_filename}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to extract photo {i+1}: {e}")
-                    continue
+            if not detected_photos:
+                return []
+            
+            workers = max(1, min(self.extraction_workers, len(detected_photos)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photo-extract') as executor:
+                results = list(executor.map(
+                    lambda item: self._extract_single(
+                        image, scale, item[0], item[1], output_dir, base_filename, thumbnail_size
+                    ),
+                    enumerate(detected_photos)
+                ))
             
+            extracted_photos = [info for info in results if info is not None]
             logger.info(f"Successfully extracted {len(extracted_photos)} photos from {image_path}")
             return extracted_photos
             
@@ -459,6 +589,105 @@ class PhotoDetector:
                     del image
                 except:
                     pass
+    
+    def _extract_single(self, image: np.ndarray, scale: float, i: int, photo: Dict, output_dir: str,
+                        base_filename: str, thumbnail_size: Optional[Tuple[int, int]]) -> Optional[Dict]:
+        """
+        Warp, refine and encode one detection (runs on an extraction worker thread)
+        
+        Returns:
+            Extracted photo information, or None if this detection failed
+        """
+        try:
+            # Detections are in full-resolution coordinates
+            x, y, w, h = (int(round(photo[k] / scale)) for k in ('x', 'y', 'width', 'height'))
+            contour = np.array(photo.get('contour', []), dtype=np.float32) / scale
+            refined_corners = np.array(photo.get('corners', []), dtype=np.float32) / scale
+            
+            # Try perspective correction for cleaner crops
+            extracted_region = None
+            if self.enable_perspective_correction and len(contour) > 0:
+                try:
+                    # Prefer the corners refined during detection
+                    if refined_corners.shape == (4, 2):
+                        corners = refined_corners
+                    else:
+                        corners = self._get_photo_corners(contour.astype(np.int32))
+                    
+                    # Apply perspective transformation for cleaner crop
+                    extracted_region = self._apply_perspective_transform(image, corners)
+                    logger.info(f"Applied perspective correction to photo {i+1}")
+                except Exception as e:
+                    logger.warning(f"Perspective correction failed for photo {i+1}: {e}, using fallback")
+                    extracted_region = None
+            
+            # Fallback to traditional extraction if perspective correction failed
+            if extracted_region is None:
+                # Calculate adaptive padding based on photo size
+                padding = max(5, int(min(w, h) * 0.02))  # 2% of smallest dimension
+                x_start = max(0, x - padding)
+                y_start = max(0, y - padding)
+                x_end = min(image.shape[1], x + w + padding)
+                y_end = min(image.shape[0], y + h + padding)
+                
+                # Extract the region (copy so workers never share a view of the page)
+                extracted_region = image[y_start:y_end, x_start:x_end].copy()
+            
+            # Apply edge cleanup if enabled
+            if self.enable_edge_refinement and extracted_region is not None:
+                extracted_region = self._refine_edges(extracted_region)
+            
+            # Generate filename
+            output_filename = f"{base_filename}_photo_{i+1:02d}_conf{photo['confidence']:.2f}.jpg"
+            output_path = os.path.join(output_dir, output_filename)
+            
+            # Save extracted photo with quality control
+            success = cv2.imwrite(output_path, extracted_region, 
+                                [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if not success:
+                logger.error(f"Failed to save extracted photo: {output_path}")
+                return None
+            
+            # Get final dimensions
+            final_height, final_width = extracted_region.shape[:2]
+            
+            thumbnail_path = None
+            if thumbnail_size:
+                thumbnail_path = self._write_thumbnail(extracted_region, output_dir,
+                                                       output_filename, thumbnail_size)
+            
+            logger.info(f"Extracted photo {i+1}: {output_filename}")
+            return {
+                'original_region': photo,
+                'filename': output_filename,
+                'file_path': output_path,
+                'thumbnail_path': thumbnail_path,
+                'extracted_width': final_width,
+                'extracted_height': final_height,
+                'file_size': os.path.getsize(output_path),
+                'confidence': photo['confidence'],
+                'perspective_corrected': self.enable_perspective_correction and len(contour) > 0
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to extract photo {i+1}: {e}")
+            return None
+    
+    def _write_thumbnail(self, region: np.ndarray, output_dir: str, output_filename: str,
+                         thumbnail_size: Tuple[int, int]) -> Optional[str]:
+        """Downscale an extracted crop in memory and write it as thumb_<filename>"""
+        try:
+            h, w = region.shape[:2]
+            ratio = min(thumbnail_size[0] / w, thumbnail_size[1] / h, 1.0)
+            thumb = cv2.resize(region, (max(1, int(w * ratio)), max(1, int(h * ratio))),
+                               interpolation=cv2.INTER_AREA)
+            thumbnail_path = os.path.join(output_dir, f"thumb_{output_filename}")
+            if not cv2.imwrite(thumbnail_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 85]):
+                return None
+            return thumbnail_path
+        except Exception as e:
+            logger.warning(f"Thumbnail creation failed for {output_filename}: {e}")
+            return None
 
 # Global instance
 photo_detector = PhotoDetector()
@@ -467,6 +696,7 @@ def detect_photos_in_image(image_path: str) -> List[Dict]:
     """Convenience function for detecting photos in an image"""
     return photo_detector.detect_photos(image_path)
 
-def extract_detected_photos(image_path: str, output_dir: str, detected_photos: List[Dict]) -> List[Dict]:
+def extract_detected_photos(image_path: str, output_dir: str, detected_photos: List[Dict],
+                            thumbnail_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
     """Convenience function for extracting detected photos"""
-    return photo_detector.extract_photos(image_path, output_dir, detected_photos)
\ No newline at end of file
+    return photo_detector.extract_photos(image_path, output_dir, detected_photos, thumbnail_size)
\ No newline at end of file
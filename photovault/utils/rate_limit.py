@@ -0,0 +1,189 @@
+"""
+PhotoVault Rate Limiting
+GCRA (generic cell rate algorithm) limiter on the shared cache
+
+Each key stores one "theoretical arrival time" per limit, so memory is constant
+per key no matter how many requests it makes, and state is shared between
+workers through the cache backend. A limit of N requests per period allows a
+burst of N and then one request every period/N seconds.
+
+Endpoints opt in declaratively:
+
+    @upload_bp.route('/api/upload', methods=['POST'])
+    @rate_limit('upload')
+    @login_required
+    def upload_photos(): ...
+
+Limits are named policies (DEFAULT_LIMITS, overridable via the RATE_LIMITS
+config dict). Over-limit requests get 429 with a Retry-After header.
+"""
+import math
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+from flask import request, current_app, jsonify, flash, redirect, make_response
+from photovault.utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Policy name -> ((requests, period seconds), ...); every limit must allow the request
+DEFAULT_LIMITS: Dict[str, Tuple[Tuple[int, int], ...]] = {
+    'upload': ((20, 300), (100, 3600)),
+    'login': ((10, 60), (50, 3600)),
+    'ai': ((10, 60), (100, 3600)),
+    'processing': ((30, 60), (300, 3600)),
+    # Slider previews: cheap proxy renders, several per second while dragging
+    'preview': ((300, 60), (3000, 3600)),
+}
+
+# Methods limited when a policy doesn't name its own
+DEFAULT_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_buckets = cache.namespace('rate_limit')
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    retry_after: float = 0.0
+    limit: Optional[Tuple[int, int]] = None  # The limit that rejected the request
+
+
+def _gcra(tats: Optional[Sequence[float]], limits: Sequence[Tuple[int, int]], now: float):
+    """
+    Apply one request to the stored arrival times
+
+    Returns:
+        (new arrival times or None if rejected, ttl, RateLimitResult)
+    """
+    if not tats or len(tats) != len(limits):
+        tats = [now] * len(limits)
+
+    new_tats = []
+    retry_after, rejected_by = 0.0, None
+    for tat, (count, period) in zip(tats, limits):
+        new_tat = max(tat, now) + period / count
+        allow_at = new_tat - period
+        if allow_at > now and allow_at - now > retry_after:
+            retry_after, rejected_by = allow_at - now, (count, period)
+        new_tats.append(new_tat)
+
+    if rejected_by:
+        # Rejected requests don't consume capacity, so leave the state untouched
+        return None, None, RateLimitResult(False, retry_after, rejected_by)
+    return tuple(new_tats), max(new_tats) - now, RateLimitResult(True)
+
+
+class RateLimiter:
+    """Named GCRA policies checked against the shared cache"""
+
+    def limits_for(self, policy: str) -> Tuple[Tuple[int, int], ...]:
+        configured = current_app.config.get('RATE_LIMITS') or {}
+        return tuple(configured.get(policy) or DEFAULT_LIMITS[policy])
+
+    def hit(self, policy: str, key: str, limits: Optional[Sequence[Tuple[int, int]]] = None) -> RateLimitResult:
+        """
+        Count one request against policy for key
+
+        Args:
+            policy: Policy name (see DEFAULT_LIMITS)
+            key: Caller identity, e.g. 'user:42' or 'ip:203.0.113.7'
+            limits: Explicit limits instead of the configured ones
+
+        Returns:
+            RateLimitResult; fails open if the cache backend is unavailable
+        """
+        limits = tuple(limits) if limits is not None else self.limits_for(policy)
+        try:
+            return _buckets.update(f'{policy}:{key}', lambda tats: _gcra(tats, limits, time.time()))
+        except Exception as e:
+            logger.warning(f"Rate limit check failed for {policy}, allowing request: {e}")
+            return RateLimitResult(True)
+
+    def reset(self, policy: str, key: str) -> None:
+        _buckets.delete(f'{policy}:{key}')
+
+
+# Global instance
+limiter = RateLimiter()
+
+
+def rate_limit(policy: str, methods: Sequence[str] = DEFAULT_METHODS):
+    """
+    Mark a view as limited by a named policy (enforced by init_rate_limiting)
+
+    Place it below the route decorator; wraps-based auth decorators underneath
+    keep the marker visible.
+    """
+    if policy not in DEFAULT_LIMITS:
+        raise ValueError(f"Unknown rate limit policy: {policy}")
+
+    def decorator(f):
+        f._rate_limit = (policy, tuple(m.upper() for m in methods))
+        return f
+    return decorator
+
+
+def client_key() -> str:
+    """Identify the caller: session user, then JWT user, then client IP"""
+    from flask_login import current_user
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        import jwt
+        try:
+            data = jwt.decode(auth_header[7:], current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            return f"user:{data['user_id']}"
+        except Exception:
+            pass  # Invalid tokens are limited by IP; the view rejects them anyway
+
+    return f'ip:{client_ip()}'
+
+
+def client_ip() -> str:
+    """Client address, trusting RATE_LIMIT_TRUSTED_PROXIES X-Forwarded-For hops"""
+    trusted = current_app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 0)
+    route = request.access_route if trusted and request.headers.get('X-Forwarded-For') else []
+    if trusted and len(route) >= trusted:
+        return route[-trusted]
+    return request.remote_addr or 'unknown'
+
+
+def too_many_requests(result: RateLimitResult):
+    """429 response with Retry-After, as JSON for API callers and a flash for forms"""
+    retry_after = max(1, math.ceil(result.retry_after))
+    message = f'Too many requests. Please try again in {retry_after} seconds.'
+
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        flash(message, 'error')
+        response = redirect(request.referrer or request.url, code=303)
+    else:
+        response = make_response(jsonify({'success': False, 'error': message, 'retry_after': retry_after}), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_rate_limiting(app) -> None:
+    """Register the hook that enforces @rate_limit policies"""
+
+    @app.before_request
+    def enforce_rate_limits():
+        if not app.config.get('RATE_LIMIT_ENABLED', True):
+            return None
+        view = app.view_functions.get(request.endpoint)
+        marker = getattr(view, '_rate_limit', None)
+        if marker is None or request.method not in marker[1]:
+            return None
+
+        policy = marker[0]
+        key = client_key()
+        result = limiter.hit(policy, key)
+        if result.allowed:
+            return None
+
+        count, period = result.limit
+        logger.warning(f"Rate limit '{policy}' ({count}/{period}s) exceeded by {key} on {request.endpoint}")
+        return too_many_requests(result)
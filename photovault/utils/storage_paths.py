@@ -0,0 +1,332 @@
+"""
+PhotoVault Storage Paths
+Canonical (backend, key) locations for photo files
+
+Photo rows hold file paths in several historical shapes: App Storage object
+paths ('users/<id>/<name>'), absolute paths (some from another host's
+'/data/uploads/<id>/...'), paths relative to the user's upload folder, and
+thumbnails that were never recorded at all. Each is resolved once to a
+location stored on the row:
+
+    backend 'app'    key is the App Storage object path
+    backend 'local'  key is relative to UPLOAD_FOLDER (absolute if outside it)
+
+Rows are classified from the path being written, with no I/O, whenever a path
+column changes. Legacy rows are resolved by the one-time backfill
+(backfill_locations, run by scripts/backfill_storage_locations.py after the
+20251019_photo_location migration), which is the only code that probes
+storage. Serving, export and deletion read the stored location and go
+straight to the file.
+"""
+import os
+import logging
+import posixpath
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, BinaryIO
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from photovault.models import Photo
+from photovault.services.app_storage_service import app_storage
+from photovault.services.storage_backends import is_storage_path
+
+logger = logging.getLogger(__name__)
+
+BACKEND_APP = 'app'
+BACKEND_LOCAL = 'local'
+
+# variant -> (backend column, key column, path columns in order of preference)
+VARIANT_COLUMNS = {
+    'original': ('storage_backend', 'storage_key', ('file_path',)),
+    'thumbnail': ('thumbnail_backend', 'thumbnail_key', ('thumbnail_path',)),
+    'edited': ('edited_backend', 'edited_key', ('edited_path', 'edited_filename')),
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+BACKFILL_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class StorageLocation:
+    backend: str
+    key: str
+
+    @property
+    def filename(self) -> str:
+        return posixpath.basename(self.key)
+
+    def sibling(self, filename: str) -> 'StorageLocation':
+        """Location of another file in the same folder (e.g. a thumbnail beside its original)"""
+        return StorageLocation(self.backend, posixpath.join(posixpath.dirname(self.key), filename))
+
+
+def upload_root() -> str:
+    return os.path.abspath(current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads'))
+
+
+def _local(abs_path: str, root: str) -> StorageLocation:
+    abs_path = os.path.normpath(abs_path)
+    if abs_path.startswith(root + os.sep):
+        return StorageLocation(BACKEND_LOCAL, os.path.relpath(abs_path, root))
+    return StorageLocation(BACKEND_LOCAL, abs_path)
+
+
+def classify(path: Optional[str], user_id: Any) -> Optional[StorageLocation]:
+    """
+    Location a freshly written path refers to, without touching storage
+
+    Args:
+        path: Path as stored on the row
+        user_id: Owner; bare filenames are relative to their upload folder
+
+    Returns:
+        StorageLocation, or None for an empty path
+    """
+    if not path:
+        return None
+    if is_storage_path(path):
+        return StorageLocation(BACKEND_APP, path)
+
+    root = upload_root()
+    configured = current_app.config.get('UPLOAD_FOLDER', 'photovault/uploads')
+    if os.path.isabs(path) or path.startswith(configured.rstrip('/') + '/'):
+        return _local(os.path.abspath(path), root)
+    return _local(os.path.join(root, str(user_id), path), root)
+
+
+def _candidates(path: Optional[str], user_id: Any) -> Iterator[StorageLocation]:
+    """Every place a legacy path may point to, most likely first"""
+    if not path:
+        return
+    name = os.path.basename(path)
+
+    if is_storage_path(path):
+        if app_storage.is_available():
+            yield StorageLocation(BACKEND_APP, path)
+        # Saved while App Storage was unavailable: same layout under the upload folder
+        yield StorageLocation(BACKEND_LOCAL, path.split('/', 1)[1])
+    else:
+        yield classify(path, user_id)
+        parts = os.path.normpath(path).split(os.sep)
+        if os.path.isabs(path) and len(parts) >= 2:
+            # Absolute path from another deployment, e.g. /data/uploads/<id>/<name>
+            yield StorageLocation(BACKEND_LOCAL, os.path.join(parts[-2], parts[-1]))
+
+    yield StorageLocation(BACKEND_LOCAL, os.path.join(str(user_id), name))
+    yield StorageLocation(BACKEND_LOCAL, os.path.join('uploads', str(user_id), name))
+    if app_storage.is_available():
+        yield StorageLocation(BACKEND_APP, f'users/{user_id}/{name}')
+
+
+def _thumbnail_candidates(original: Optional[StorageLocation]) -> Iterator[StorageLocation]:
+    """Thumbnails that were generated but never recorded sit beside the original"""
+    if original is None:
+        return
+    stem, ext = posixpath.splitext(original.filename)
+    for suffix in dict.fromkeys((ext, '.jpg')):
+        yield original.sibling(f'{stem}_thumb{suffix}')
+
+
+def location_of(photo, variant: str = 'original') -> Optional[StorageLocation]:
+    """
+    Stored location of one of a photo's files
+
+    Works on Photo instances and on query rows carrying the same columns.
+    Rows the backfill couldn't resolve fall back to classify() - still no I/O.
+
+    Args:
+        photo: Photo (or row) with location and path columns
+        variant: 'original', 'thumbnail' or 'edited'
+
+    Returns:
+        StorageLocation, or None if the photo has no such file
+    """
+    backend_column, key_column, path_columns = VARIANT_COLUMNS[variant]
+    backend, key = getattr(photo, backend_column), getattr(photo, key_column)
+    if backend and key:
+        return StorageLocation(backend, key)
+    for column in path_columns:
+        path = getattr(photo, column)
+        if path:
+            return classify(path, photo.user_id)
+    return None
+
+
+def location_keys(user_id: Any, filename: str) -> List[str]:
+    """Keys a file served as /uploads/<user_id>/<filename> is stored under"""
+    return [f'users/{user_id}/{filename}',
+            os.path.join(str(user_id), filename),
+            os.path.join('uploads', str(user_id), filename)]
+
+
+def local_path(location: StorageLocation) -> str:
+    """Filesystem path of a local location"""
+    return os.path.join(upload_root(), location.key)
+
+
+def storage_path(location: StorageLocation) -> str:
+    """The path string other services take: App Storage object path or absolute local path"""
+    if location.backend == BACKEND_APP:
+        return location.key
+    return local_path(location)
+
+
+def exists(location: StorageLocation) -> bool:
+    if location.backend == BACKEND_APP:
+        return app_storage.file_exists(location.key)
+    return os.path.exists(local_path(location))
+
+
+def open_location(location: StorageLocation) -> Optional[BinaryIO]:
+    """
+    Open a stored file for streaming; the caller closes it
+
+    Returns:
+        Readable binary stream, or None if the file isn't there
+    """
+    if location.backend == BACKEND_APP:
+        return app_storage.open_stream(location.key)
+    try:
+        return open(local_path(location), 'rb')
+    except OSError:
+        return None
+
+
+def fetch_locations(locations: Dict[Any, StorageLocation], temp_dir: str) -> Dict[Any, Optional[str]]:
+    """
+    Local file paths for many stored files
+
+    Local files are used in place; App Storage files are downloaded into
+    temp_dir in parallel, streamed to disk.
+
+    Args:
+        locations: Mapping of caller's id -> location
+        temp_dir: Directory for downloaded copies
+
+    Returns:
+        Mapping of id -> local path, or None if the download failed
+    """
+    results, downloads = {}, {}
+    for item_id, location in locations.items():
+        if location.backend == BACKEND_APP:
+            downloads[item_id] = os.path.join(temp_dir, f'{len(downloads)}-{location.filename}')
+        else:
+            results[item_id] = local_path(location)
+
+    if downloads:
+        fetched = app_storage.download_many({locations[i].key: dest for i, dest in downloads.items()})
+        for item_id, dest in downloads.items():
+            results[item_id] = dest if fetched.get(locations[item_id].key) else None
+    return results
+
+
+def backfill_locations(connection, batch_size: int = BACKFILL_BATCH_SIZE, only_missing: bool = True) -> Dict[str, int]:
+    """
+    Resolve legacy photo paths by probing storage and store their locations
+
+    Runs on a plain connection, committing after each batch so no lock is
+    held for the whole scan. App Storage candidates for a batch are checked
+    in parallel.
+
+    Args:
+        connection: SQLAlchemy connection outside any explicit transaction
+        batch_size: Rows per batch
+        only_missing: Skip rows whose original already has a location
+
+    Returns:
+        dict with 'rows' examined, 'resolved' files and 'missing' files
+    """
+    location_columns = [name for backend, key, _ in VARIANT_COLUMNS.values() for name in (backend, key)]
+    photo = sa.table('photo', *[sa.column(name) for name in (
+        'id', 'user_id', 'file_path', 'thumbnail_path', 'edited_path', 'edited_filename', *location_columns
+    )])
+    update = photo.update().where(photo.c.id == sa.bindparam('row_id')).values(
+        {name: sa.bindparam(f'new_{name}') for name in location_columns}
+    )
+
+    counts = {'rows': 0, 'resolved': 0, 'missing': 0}
+    last_id = 0
+    while True:
+        query = sa.select(photo).where(photo.c.id > last_id).order_by(photo.c.id).limit(batch_size)
+        if only_missing:
+            query = query.where(photo.c.storage_key.is_(None))
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        candidates = {}
+        for row in rows:
+            edited_path = row.edited_path or row.edited_filename
+            candidates[row.id] = {
+                'original': list(dict.fromkeys(_candidates(row.file_path, row.user_id))),
+                'thumbnail': list(dict.fromkeys(_candidates(row.thumbnail_path, row.user_id))),
+                'edited': list(dict.fromkeys(_candidates(edited_path, row.user_id))),
+            }
+        remote = [loc.key for variants in candidates.values() for locs in variants.values()
+                  for loc in locs if loc.backend == BACKEND_APP]
+        remote_found = app_storage.stat_many(remote) if remote else {}
+
+        def found(location):
+            if location.backend == BACKEND_APP:
+                return remote_found.get(location.key) is not None
+            return os.path.exists(local_path(location))
+
+        params = []
+        for row in rows:
+            resolved = {}
+            for variant, locations in candidates[row.id].items():
+                recorded = bool(locations)
+                if variant == 'thumbnail' and not recorded:
+                    locations = list(_thumbnail_candidates(resolved.get('original')))
+                resolved[variant] = next((loc for loc in locations if found(loc)), None)
+                if resolved[variant] is not None:
+                    counts['resolved'] += 1
+                elif recorded:
+                    counts['missing'] += 1
+
+            values = {'row_id': row.id}
+            for variant, (backend_column, key_column, _) in VARIANT_COLUMNS.items():
+                location = resolved[variant]
+                values[f'new_{backend_column}'] = location.backend if location else None
+                values[f'new_{key_column}'] = location.key if location else None
+            params.append(values)
+
+        connection.execute(update, params)
+        connection.commit()
+        counts['rows'] += len(rows)
+        logger.info(f"Storage location backfill: {counts['rows']} photos examined")
+
+    return counts
+
+
+@event.listens_for(Photo, 'before_insert')
+def _locate_new_photo(mapper, connection, photo):
+    _record_locations(photo, {variant for variant, (_, key_column, _) in VARIANT_COLUMNS.items()
+                              if getattr(photo, key_column) is None})
+
+
+@event.listens_for(Photo, 'before_update')
+def _locate_updated_photo(mapper, connection, photo):
+    state = inspect(photo)
+    changed = set()
+    for variant, (_, key_column, path_columns) in VARIANT_COLUMNS.items():
+        # An explicitly assigned location wins over the path it came from
+        if state.attrs[key_column].history.has_changes():
+            continue
+        if any(state.attrs[column].history.has_changes() for column in path_columns):
+            changed.add(variant)
+    if changed:
+        _record_locations(photo, changed)
+
+
+def _record_locations(photo, variants) -> None:
+    if not has_app_context():
+        return
+    for variant in variants:
+        backend_column, key_column, path_columns = VARIANT_COLUMNS[variant]
+        path = next((getattr(photo, column) for column in path_columns if getattr(photo, column)), None)
+        location = classify(path, photo.user_id)
+        setattr(photo, backend_column, location.backend if location else None)
+        setattr(photo, key_column, location.key if location else None)
@@ -4,13 +4,11 @@ Centralized, comprehensive validation and security for all file uploads
 """
 import os
 import re
-import time
 import uuid
 import logging
 import mimetypes
 from datetime import datetime, timedelta
 from typing import Tuple, Dict, Optional, List
-from collections import defaultdict
 from flask import request, current_app, session
 from flask_login import current_user
 from werkzeug.utils import secure_filename
@@ -30,25 +28,20 @@ MAX_IMAGE_DIMENSION = 4096
 MIN_IMAGE_DIMENSION = 10
 THUMBNAIL_SIZE = (300, 300)
 
-# Rate limiting configuration
+# Rate limiting configuration (the 'upload' policy in photovault.utils.rate_limit)
 RATE_LIMIT_WINDOW = 300  # 5 minutes in seconds
 MAX_UPLOADS_PER_WINDOW = 20
 MAX_UPLOADS_PER_HOUR = 100
 
-# PRODUCTION WARNING: In-memory rate limiting storage
-# This will NOT work correctly in production with multiple processes/instances
-# TODO: Replace with Redis or database-backed rate limiting for production deployment
-# Recommended: Use Flask-Limiter with Redis backend for production
-_rate_limit_storage = defaultdict(list)
-_rate_limit_cleanup_last = time.time()
-
 class UploadSecurityError(Exception):
     """Custom exception for upload security violations"""
     pass
 
 class RateLimitExceeded(UploadSecurityError):
     """Rate limit exceeded exception"""
-    pass
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 def sanitize_input(value: str, max_length: int = 255) -> str:
     """
@@ -127,6 +120,8 @@ def check_rate_limit(user_id: str, endpoint: str = "upload") -> bool:
     """
     Check if user has exceeded rate limits for uploads
     
+    Uses the shared GCRA limiter, so limits hold across workers and restarts.
+    
     Args:
         user_id: User identifier
         endpoint: Endpoint identifier for separate rate limits
@@ -134,49 +129,18 @@ def check_rate_limit(user_id: str, endpoint: str = "upload") -> bool:
     Returns:
         True if within limits, raises RateLimitExceeded if exceeded
     """
-    global _rate_limit_cleanup_last
-    
-    # Clean up old entries periodically
-    current_time = time.time()
-    if current_time - _rate_limit_cleanup_last > 60:  # Clean every minute
-        _cleanup_rate_limit_storage()
-        _rate_limit_cleanup_last = current_time
-    
-    key = f"{user_id}:{endpoint}"
-    now = time.time()
-    
-    # Get user's upload timestamps
-    user_uploads = _rate_limit_storage[key]
-    
-    # Count uploads in current window (5 minutes)
-    recent_uploads = [ts for ts in user_uploads if now - ts < RATE_LIMIT_WINDOW]
-    
-    # Count uploads in current hour
-    hourly_uploads = [ts for ts in user_uploads if now - ts < 3600]
-    
-    if len(recent_uploads) >= MAX_UPLOADS_PER_WINDOW:
-        raise RateLimitExceeded(f"Too many uploads in the last {RATE_LIMIT_WINDOW//60} minutes. Limit: {MAX_UPLOADS_PER_WINDOW}")
-    
-    if len(hourly_uploads) >= MAX_UPLOADS_PER_HOUR:
-        raise RateLimitExceeded(f"Too many uploads in the last hour. Limit: {MAX_UPLOADS_PER_HOUR}")
-    
-    # Record this upload attempt
-    user_uploads.append(now)
-    _rate_limit_storage[key] = user_uploads
-    
-    return True
-
-def _cleanup_rate_limit_storage():
-    """Clean up old rate limit entries"""
-    cutoff_time = time.time() - 3600  # Keep last hour
-    
-    for key in list(_rate_limit_storage.keys()):
-        _rate_limit_storage[key] = [
-            ts for ts in _rate_limit_storage[key] 
-            if ts > cutoff_time
-        ]
-        if not _rate_limit_storage[key]:
-            del _rate_limit_storage[key]
+    from photovault.utils.rate_limit import limiter
+    
+    limits = ((MAX_UPLOADS_PER_WINDOW, RATE_LIMIT_WINDOW), (MAX_UPLOADS_PER_HOUR, 3600))
+    result = limiter.hit(endpoint, f"user:{user_id}", limits=limits)
+    if result.allowed:
+        return True
+    
+    count, period = result.limit
+    if period == RATE_LIMIT_WINDOW:
+        raise RateLimitExceeded(f"Too many uploads in the last {RATE_LIMIT_WINDOW//60} minutes. Limit: {count}",
+                                result.retry_after)
+    raise RateLimitExceeded(f"Too many uploads in the last hour. Limit: {count}", result.retry_after)
 
 def validate_image_file(file, check_dimensions: bool = True) -> Tuple[bool, str, Optional[Dict]]:
     """
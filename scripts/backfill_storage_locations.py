@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+PhotoVault storage location backfill
+
+Resolves every photo's file, thumbnail and edited paths to canonical
+(backend, key) locations by probing local storage and App Storage. Run it
+once after the 20251019_photo_location migration, which only adds the
+columns. Each batch is committed as it goes, so it can run against a live
+database and be interrupted. Safe to re-run: by default only photos without
+a location are examined.
+
+Usage:
+    python scripts/backfill_storage_locations.py [--all] [--batch-size 500]
+"""
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault import create_app  # noqa: E402
+from photovault.extensions import db  # noqa: E402
+from photovault.utils.storage_paths import backfill_locations, BACKFILL_BATCH_SIZE  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--all', action='store_true', help='re-resolve photos that already have a location')
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.connect() as connection:
+            counts = backfill_locations(connection, batch_size=args.batch_size, only_missing=not args.all)
+    print(f"Photos examined: {counts['rows']}")
+    print(f"Files resolved:  {counts['resolved']}")
+    print(f"Files missing:   {counts['missing']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
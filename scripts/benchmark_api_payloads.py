@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+PhotoVault mobile API payload benchmark
+
+Seeds an in-memory SQLite database with a synthetic library, calls the heavy
+mobile endpoints through the test client and reports, per endpoint:
+
+  - payload size before shaping (nulls kept), after null omission, and with
+    ?fields=id,thumbnail_url,created_at
+  - gzip / brotli encoded size of each payload
+  - serialization time with the stdlib encoder vs orjson
+
+Usage:
+    python scripts/benchmark_api_payloads.py [--photos 5000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import jwt  # noqa: E402
+
+from photovault import create_app  # noqa: E402
+from photovault.extensions import db  # noqa: E402
+from photovault.models import User, Photo, FamilyVault, FamilyMember, VaultPhoto  # noqa: E402
+from photovault.utils import json_provider  # noqa: E402
+from photovault.utils import compression  # noqa: E402
+import photovault.routes.mobile_api as mobile_api  # noqa: E402
+
+FIELDS_PARAM = 'id,thumbnail_url,created_at'
+
+
+def seed(photo_count, vault_photo_count):
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench-password')
+    db.session.add(user)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    photos = []
+    for i in range(photo_count):
+        sparse = random.random() < 0.8  # Most photos carry no annotations
+        photos.append(Photo(
+            user_id=user.id,
+            filename=f'bench.{i:06d}.jpg',
+            original_name=f'IMG_{i:06d}.jpg',
+            file_path=f'/tmp/bench/{i:06d}.jpg',
+            thumbnail_path=f'/tmp/bench/{i:06d}_thumb.jpg',
+            file_size=random.randint(200_000, 4_000_000),
+            width=3024, height=4032,
+            created_at=now - timedelta(minutes=i),
+            edited_filename=None if random.random() < 0.7 else f'bench.enhanced.{i:06d}.jpg',
+            date_text=None if sparse else 'Summer 1987',
+            location_text=None if sparse else "Grandma's house",
+            occasion=None if sparse else 'Birthday party',
+            color_mode=random.choice(['color', 'grayscale', 'sepia']),
+        ))
+    db.session.add_all(photos)
+
+    vault = FamilyVault(name='Bench vault', created_by=user.id, vault_code='BENCH001')
+    db.session.add(vault)
+    db.session.flush()
+    db.session.add(FamilyMember(vault_id=vault.id, user_id=user.id, role='admin', status='active'))
+    db.session.add_all([
+        VaultPhoto(vault_id=vault.id, photo_id=photo.id, shared_by=user.id)
+        for photo in photos[:vault_photo_count]
+    ])
+    db.session.commit()
+    return user, vault
+
+
+def timed_encode(encoder, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoder(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def measure(client, headers, url, repeat):
+    response = client.get(url, headers=headers)
+    if response.status_code != 200:
+        raise SystemExit(f"{url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    raw = response.get_data()
+    payload = json.loads(raw)
+
+    row = {
+        'bytes': len(raw),
+        'gzip': len(gzip.compress(raw, compresslevel=6)),
+        'br': len(compression.brotli.compress(raw, quality=5)) if compression.BROTLI_AVAILABLE else None,
+        'stdlib_ms': timed_encode(lambda p: json.dumps(p, separators=(',', ':'), sort_keys=True), payload, repeat),
+        'orjson_ms': None,
+    }
+    if json_provider.ORJSON_AVAILABLE:
+        option = json_provider.orjson.OPT_SORT_KEYS | json_provider.orjson.OPT_NON_STR_KEYS
+        row['orjson_ms'] = timed_encode(lambda p: json_provider.orjson.dumps(p, option=option), payload, repeat)
+    return row
+
+
+def fmt(value, suffix=''):
+    if value is None:
+        return 'n/a'
+    if isinstance(value, float):
+        return f'{value:.1f}{suffix}'
+    return f'{value:,}{suffix}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--photos', type=int, default=5000)
+    parser.add_argument('--vault-photos', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(1234)
+    app = create_app('testing')
+    # Measure raw payloads; encoding sizes are computed separately below
+    app.config['COMPRESS_MIN_SIZE'] = float('inf')
+
+    with app.app_context():
+        db.create_all()
+        user, vault = seed(args.photos, args.vault_photos)
+        token = jwt.encode({'user_id': user.id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+        headers = {'Authorization': f'Bearer {token}'}
+        client = app.test_client()
+
+        endpoints = {
+            'dashboard': '/api/dashboard',
+            'photos (limit=100)': '/api/photos?limit=100',
+            'vault detail': f'/api/family/vault/{vault.id}',
+        }
+
+        print(f"Library: {args.photos} photos, {args.vault_photos} in vault | "
+              f"orjson={'yes' if json_provider.ORJSON_AVAILABLE else 'no'} "
+              f"brotli={'yes' if compression.BROTLI_AVAILABLE else 'no'}")
+        print(f"{'endpoint':<20} {'variant':<12} {'bytes':>12} {'gzip':>10} {'br':>10} "
+              f"{'stdlib':>9} {'orjson':>9}")
+
+        shape_records = mobile_api.shape_records
+        for name, url in endpoints.items():
+            variants = []
+
+            # Pre-change payload shape: keep nulls, all fields
+            mobile_api.shape_records = lambda records, fields=None, omit_nulls=True: list(records)
+            try:
+                variants.append(('full', measure(client, headers, url, args.repeat)))
+            finally:
+                mobile_api.shape_records = shape_records
+
+            variants.append(('no-nulls', measure(client, headers, url, args.repeat)))
+            sep = '&' if '?' in url else '?'
+            variants.append(('fields', measure(client, headers, f'{url}{sep}fields={FIELDS_PARAM}', args.repeat)))
+
+            for variant, row in variants:
+                print(f"{name:<20} {variant:<12} {fmt(row['bytes']):>12} {fmt(row['gzip']):>10} "
+                      f"{fmt(row['br']):>10} {fmt(row['stdlib_ms'], 'ms'):>9} {fmt(row['orjson_ms'], 'ms'):>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+PhotoVault living-portrait benchmark
+
+Times a 5-second living portrait rendered from a synthetic 12MP photo and fails
+if it takes longer than the budget. Face detection is skipped (fixed synthetic
+landmarks) so only rendering and encoding are measured. With --baseline, the
+previous full-resolution renderer is timed on a few frames and extrapolated.
+
+Usage:
+    python scripts/benchmark_living_portrait.py [--width 4000] [--height 3000] [--budget-s 4] [--format gif] [--baseline]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault.utils.face_animator import FaceAnimator, PORTRAIT_FPS, frame_weights  # noqa: E402
+from photovault.utils.animation_output import ANIMATION_FORMATS  # noqa: E402
+
+DEFAULT_BUDGET_S = float(os.environ.get('LIVING_PORTRAIT_BUDGET_S', 4.0))
+DURATION = 5
+MESH_POINTS = 478
+
+
+def synthetic_photo(path, width, height):
+    """Gradient plus noise - enough texture that GIF encoding isn't trivially cheap"""
+    rng = np.random.default_rng(0)
+    y, x = np.indices((height, width), dtype=np.float32)
+    img = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    cv2.imwrite(path, np.clip(img, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+def synthetic_landmarks(animator):
+    """Face mesh with the mouth and eyes roughly where a centred portrait has them"""
+    points = [SimpleNamespace(x=0.5, y=0.5) for _ in range(MESH_POINTS)]
+    for index, (x, y) in {61: (0.44, 0.66), 291: (0.56, 0.66), 13: (0.5, 0.64), 14: (0.5, 0.68)}.items():
+        points[index] = SimpleNamespace(x=x, y=y)
+    for indices, centre_x in ((animator.LEFT_EYE_INDICES, 0.42), (animator.RIGHT_EYE_INDICES, 0.58)):
+        for i, index in enumerate(indices):
+            angle = 2 * np.pi * i / len(indices)
+            points[index] = SimpleNamespace(x=centre_x + 0.025 * np.cos(angle), y=0.45 + 0.008 * np.sin(angle))
+    return SimpleNamespace(landmark=points)
+
+
+def legacy_frame(animator, img, landmarks, smile_flow, frame_num, total_frames, movement_amount):
+    """One frame the way the previous renderer made it: full resolution, flows rebuilt, two warps"""
+    h, w = img.shape[:2]
+    smile_factor, tilt_angle, closure = frame_weights(frame_num, total_frames, PORTRAIT_FPS, movement_amount, True)
+    combined_flow = smile_flow * smile_factor + animator.create_head_tilt((h, w), tilt_angle) * 0.3
+    frame = animator.apply_flow_warp(img, combined_flow)
+    if closure:
+        frame = animator.apply_flow_warp(frame, animator.create_blink(landmarks, (h, w), closure))
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--budget-s', type=float, default=DEFAULT_BUDGET_S,
+                        help='maximum seconds per 5-second portrait')
+    parser.add_argument('--format', choices=sorted(ANIMATION_FORMATS), default='gif')
+    parser.add_argument('--baseline', action='store_true',
+                        help='also time the previous full-resolution renderer (extrapolated)')
+    parser.add_argument('--baseline-frames', type=int, default=6)
+    args = parser.parse_args()
+
+    animator = FaceAnimator()
+    landmarks = synthetic_landmarks(animator)
+    animator.detect_face_landmarks = lambda image: landmarks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'portrait.jpg')
+        synthetic_photo(source, args.width, args.height)
+        output = os.path.join(tmp, 'portrait' + ANIMATION_FORMATS[args.format].extension)
+
+        start = time.perf_counter()
+        if not animator.create_living_portrait(source, output, duration=DURATION):
+            print('Rendering failed')
+            return 1
+        elapsed = time.perf_counter() - start
+        print(f"{args.width}x{args.height} -> {DURATION}s portrait: {elapsed:.2f}s, "
+              f"{os.path.getsize(output) / 1024:.0f} KB {args.format}, peak RSS {peak_rss_mb():.0f} MB")
+
+        if args.baseline:
+            img = cv2.imread(source)
+            total_frames = DURATION * PORTRAIT_FPS
+            start = time.perf_counter()
+            smile_flow = animator.create_smile(landmarks, img.shape[:2], 0.4)
+            frames = [legacy_frame(animator, img, landmarks, smile_flow, n, total_frames, 0.3)
+                      for n in range(args.baseline_frames)]
+            per_frame = (time.perf_counter() - start) / len(frames)
+            print(f"previous renderer: ~{per_frame * total_frames:.1f}s render only "
+                  f"({per_frame * 1000:.0f} ms/frame x {total_frames}), "
+                  f"{frames[0].nbytes * total_frames / 1024 ** 2:.0f} MB of held frames")
+
+    if elapsed > args.budget_s:
+        print(f"FAIL: {elapsed:.2f}s exceeds the {args.budget_s:.2f}s budget")
+        return 1
+    print(f"OK: within the {args.budget_s:.2f}s budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
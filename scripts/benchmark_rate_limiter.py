@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+PhotoVault rate limiter microbenchmark
+
+Compares the per-check cost of the old per-process timestamp-list limiter with
+the GCRA limiter on each shared-cache backend, for a key that is already
+holding close to its hourly quota (the old limiter's worst case).
+
+Usage:
+    python scripts/benchmark_rate_limiter.py [--checks 20000] [--keys 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault.utils.cache import cache, MemoryLRUBackend, SQLiteBackend  # noqa: E402
+from photovault.utils.rate_limit import limiter  # noqa: E402
+
+# Generous enough that every check is allowed and does the full read-modify-write
+LIMITS = ((1_000_000, 300), (1_000_000, 3600))
+
+
+class TimestampListLimiter:
+    """The previous upload_security implementation, kept here as the baseline"""
+
+    def __init__(self):
+        self.storage = defaultdict(list)
+
+    def hit(self, key):
+        now = time.time()
+        uploads = self.storage[key]
+        recent = [ts for ts in uploads if now - ts < 300]
+        hourly = [ts for ts in uploads if now - ts < 3600]
+        if len(recent) >= LIMITS[0][0] or len(hourly) >= LIMITS[1][0]:
+            return False
+        uploads.append(now)
+        self.storage[key] = uploads
+        return True
+
+
+def run(label, hit, checks, keys, history):
+    start = time.perf_counter()
+    for i in range(checks):
+        hit(f'user:{i % keys}')
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / checks * 1e6:>9.2f} us/check   state/key: {history}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=100)
+    parser.add_argument('--history', type=int, default=100,
+                        help='timestamps already held per key by the old limiter')
+    args = parser.parse_args()
+
+    baseline = TimestampListLimiter()
+    now = time.time()
+    for k in range(args.keys):
+        baseline.storage[f'user:{k}'] = [now - i for i in range(args.history)]
+    run('timestamp lists (per process)', baseline.hit, args.checks, args.keys,
+        f'{args.history}+ floats, growing')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ('GCRA / memory LRU', MemoryLRUBackend()),
+            ('GCRA / SQLite WAL (shared)', SQLiteBackend(os.path.join(tmp, 'cache.sqlite3'))),
+        ]
+        for label, backend in backends:
+            cache.backend = backend
+            run(label, lambda key: limiter.hit('upload', key, limits=LIMITS), args.checks, args.keys,
+                f'{len(LIMITS)} floats, fixed')
+
+
+if __name__ == '__main__':
+    main()
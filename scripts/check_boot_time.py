@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+PhotoVault boot-time budget check
+
+Runs `python -X importtime` on create_app() in a fresh interpreter and fails
+if boot takes longer than the budget or if modules that should be deferred to
+first use (google-genai, openpyxl) are imported while booting.
+
+Usage:
+    python scripts/check_boot_time.py [--budget-ms 4000] [--top 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = int(os.environ.get('BOOT_TIME_BUDGET_MS', 4000))
+
+# Imported on first use only - seeing them at boot is a regression
+DEFERRED_MODULES = ('google.genai', 'openpyxl')
+
+BOOT_SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "from photovault import create_app; app = create_app(); "
+    "from photovault.utils.face_detection import face_detector; "
+    "from photovault.utils.face_recognition import face_recognizer; "
+    "print('BOOT_MS', (time.perf_counter() - t) * 1000); "
+    "print('MODELS_LOADED', face_detector.is_loaded or face_recognizer.is_loaded)"
+)
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_boot():
+    env = dict(os.environ, WARM_UP_MODELS='false')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SNIPPET],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(f"create_app() failed with exit code {result.returncode}")
+    return result.stdout, result.stderr
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative_us} for every import line"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    stdout, stderr = run_boot()
+    boot_ms = float(re.search(r'BOOT_MS ([\d.]+)', stdout).group(1))
+    models_loaded = 'MODELS_LOADED True' in stdout
+    modules = parse_importtime(stderr)
+
+    print(f"create_app() boot: {boot_ms:.0f} ms (budget {args.budget_ms} ms)")
+    print("Slowest imports (cumulative):")
+    for name, cumulative_us in sorted(modules.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if boot_ms > args.budget_ms:
+        failures.append(f"boot took {boot_ms:.0f} ms, over the {args.budget_ms} ms budget")
+    for deferred in DEFERRED_MODULES:
+        if deferred in modules:
+            failures.append(f"{deferred} is imported at boot - it should load on first use")
+    if models_loaded:
+        failures.append("face models were built at boot - they should load on first use or warm_up()")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+
+    print("OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
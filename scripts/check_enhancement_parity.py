@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+PhotoVault enhancement parity and performance check
+
+Runs the previous OpenCV -> PIL -> OpenCV enhancement chain and the fused
+pipeline in ImageEnhancer.enhance_image on the same images. It fails if any
+output pixel differs, if peak memory doesn't drop by --min-memory-gain, or if
+latency doesn't improve by --min-speedup. Each run happens in a fresh
+interpreter so peak RSS is measured per pipeline.
+
+The bilateral denoise and CLAHE are the same code in both pipelines and
+dominate end-to-end latency when denoising is on, so the default speedup
+requirement is only "no slower".
+
+Usage:
+    python scripts/check_enhancement_parity.py [--image scan.jpg ...] [--megapixels 20]
+        [--min-memory-gain 2] [--min-speedup 1]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault.utils.image_enhancement import ImageEnhancer  # noqa: E402
+
+# Default settings, plus the extremes detect_and_enhance_old_photo suggests
+SETTINGS = [
+    {},
+    {'brightness': 1.3, 'contrast': 1.2, 'sharpness': 1.2, 'color': 1.1},
+    {'brightness': 0.8, 'contrast': 1.5, 'sharpness': 1.2, 'color': 1.1, 'denoise': False},
+]
+
+
+class LegacyEnhancer(ImageEnhancer):
+    """The previous pipeline, kept here as the reference output"""
+
+    def enhance_image(self, img, settings):
+        if settings.get('denoise', True):
+            img = cv2.bilateralFilter(img, 9, 75, 75)
+        if settings.get('clahe_enabled', True):
+            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+            l, a, b = cv2.split(lab)
+            l = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(l)
+            img = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+        if settings.get('auto_levels', True):
+            img_float = img.astype(np.float64) / 255.0
+            low, high = np.percentile(img_float, 1), np.percentile(img_float, 99)
+            if high - low >= 0.01:
+                img = (np.clip((img_float - low) / (high - low), 0, 1) * 255).astype(np.uint8)
+            del img_float
+        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        for name, enhancer in (('brightness', ImageEnhance.Brightness), ('contrast', ImageEnhance.Contrast),
+                               ('color', ImageEnhance.Color), ('sharpness', ImageEnhance.Sharpness)):
+            if settings.get(name, 1.0) != 1.0:
+                pil_img = enhancer(pil_img).enhance(settings[name])
+        return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+
+
+def synthetic_scan(path, megapixels):
+    """A faded, noisy 3:2 'scan' - low contrast so levels and CLAHE have work to do"""
+    width = int((megapixels * 1e6 * 1.5) ** 0.5)
+    height = int(width / 1.5)
+    rng = np.random.default_rng(0)
+    y, x = np.ogrid[:height, :width]
+    base = 90 + 60 * np.sin(x / 97.0) * np.cos(y / 131.0)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    for channel, tint in enumerate((0.85, 1.0, 1.1)):
+        img[..., channel] = np.clip(base * tint + rng.normal(0, 9, (height, width)), 0, 255)
+    cv2.imwrite(path, img)
+
+
+def run_worker(pipeline, source, output, settings):
+    """Enhance one image in this process and report time and peak RSS"""
+    enhancer = LegacyEnhancer() if pipeline == 'legacy' else ImageEnhancer()
+    merged = {**enhancer.default_settings, **settings}
+    img = cv2.imread(source)
+    start = time.perf_counter()
+    result = enhancer.enhance_image(img, merged)
+    elapsed = time.perf_counter() - start
+    cv2.imwrite(output, result)
+    print(json.dumps({'seconds': elapsed,
+                      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run(pipeline, source, output, settings):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', pipeline,
+         '--source', source, '--output', output, '--settings', json.dumps(settings)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--image', action='append', default=[], help='image to test (repeatable)')
+    parser.add_argument('--megapixels', type=float, default=20, help='size of the synthetic scan')
+    parser.add_argument('--min-memory-gain', type=float, default=2.0,
+                        help='required legacy/fused ratio of peak RSS')
+    parser.add_argument('--min-speedup', type=float, default=1.0,
+                        help='required legacy/fused ratio of latency')
+    parser.add_argument('--worker', choices=('legacy', 'fused'), help=argparse.SUPPRESS)
+    parser.add_argument('--source', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--settings', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.source, args.output, json.loads(args.settings))
+        return 0
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        images = args.image
+        if not images:
+            images = [os.path.join(tmp, 'scan.png')]
+            synthetic_scan(images[0], args.megapixels)
+
+        for source in images:
+            for index, settings in enumerate(SETTINGS):
+                legacy_out = os.path.join(tmp, f'legacy-{index}.png')
+                fused_out = os.path.join(tmp, f'fused-{index}.png')
+                legacy = run('legacy', source, legacy_out, settings)
+                fused = run('fused', source, fused_out, settings)
+
+                expected, actual = cv2.imread(legacy_out), cv2.imread(fused_out)
+                differing = int(np.count_nonzero(expected != actual))
+                max_diff = int(np.abs(expected.astype(np.int16) - actual).max()) if differing else 0
+                speedup = legacy['seconds'] / fused['seconds']
+                memory_gain = legacy['peak_rss_mb'] / fused['peak_rss_mb']
+
+                print(f"{os.path.basename(source)} settings #{index}: "
+                      f"{legacy['seconds']:.2f}s / {legacy['peak_rss_mb']:.0f} MB -> "
+                      f"{fused['seconds']:.2f}s / {fused['peak_rss_mb']:.0f} MB "
+                      f"({speedup:.1f}x faster, {memory_gain:.1f}x less memory), "
+                      f"{differing} differing values (max {max_diff})")
+
+                if differing:
+                    print('  FAIL: output differs from the previous pipeline')
+                    failed = True
+                if memory_gain < args.min_memory_gain:
+                    print(f'  FAIL: memory gain below the required {args.min_memory_gain:.1f}x')
+                    failed = True
+                if speedup < args.min_speedup:
+                    print(f'  FAIL: speedup below the required {args.min_speedup:.1f}x')
+                    failed = True
+
+    print('FAIL' if failed else 'OK: identical output')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
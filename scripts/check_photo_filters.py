@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+PhotoVault gallery filter check
+
+Seeds an in-memory database with photos colorized by each method (plus
+uncolorized ones), then requests GET /api/photos with ?filter=dnn and
+?filter=ai. It fails unless both respond 200 with exactly the photos
+colorized by that method. The colorization filters also have to compile on
+the PostgreSQL dialect used in production, where enhancement_metadata is a
+generic JSON column.
+
+Usage:
+    python scripts/check_photo_filters.py
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import jwt
+from sqlalchemy.dialects import postgresql
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault import create_app  # noqa: E402
+from photovault.config import TestingConfig  # noqa: E402
+from photovault.extensions import db  # noqa: E402
+from photovault.models import User, Photo  # noqa: E402
+from photovault.services.color_mode_service import color_mode_service  # noqa: E402
+
+# filter query value -> enhancement_metadata colorization method
+FILTERS = {'dnn': 'dnn', 'ai': 'ai_guided_dnn'}
+
+
+def seed(user):
+    """Two photos per colorization method plus two without metadata; returns ids by method"""
+    expected = {}
+    for method in list(FILTERS.values()) + [None]:
+        for index in range(2):
+            photo = Photo(
+                user_id=user.id,
+                filename=f'{method or "plain"}_{index}.jpg',
+                original_name=f'{method or "plain"}_{index}.jpg',
+                file_path=f'/nonexistent/{method or "plain"}_{index}.jpg',
+                enhancement_metadata={'colorization': {'method': method}} if method else None
+            )
+            db.session.add(photo)
+            db.session.flush()
+            expected.setdefault(method, set()).add(photo.id)
+    db.session.commit()
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    failures = []
+    for method in FILTERS.values():
+        try:
+            str(color_mode_service.colorized_filter(method).compile(dialect=postgresql.dialect()))
+        except Exception as e:
+            failures.append(f"{method}: filter does not compile for PostgreSQL: {e}")
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='filtercheck', email='filtercheck@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        expected = seed(user)
+        token = jwt.encode({'user_id': user.id, 'exp': datetime.utcnow() + timedelta(minutes=5)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+
+        client = app.test_client()
+        for filter_type, method in FILTERS.items():
+            response = client.get(f'/api/photos?filter={filter_type}&limit=100',
+                                  headers={'Authorization': f'Bearer {token}'})
+            if response.status_code != 200:
+                failures.append(f"filter={filter_type}: HTTP {response.status_code}")
+                continue
+            got = {photo['id'] for photo in response.get_json()['photos']}
+            if got != expected[method]:
+                failures.append(f"filter={filter_type}: got {sorted(got)}, expected {sorted(expected[method])}")
+            else:
+                print(f"filter={filter_type}: {len(got)} photos OK")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+PhotoVault admin stats rollup refresh
+
+Recomputes the user_photo_stats rollup behind the admin dashboard and
+statistics pages in one GROUP BY over the photo table. The rollup is kept
+current after each commit; run this from a scheduled job (e.g. nightly) to
+correct drift from writes that bypassed the ORM. Pass --user to refresh
+specific users only.
+
+Usage:
+    python scripts/refresh_admin_stats.py [--user 12 --user 40]
+"""
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from photovault import create_app  # noqa: E402
+from photovault.services.admin_stats_service import admin_stats_service  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user', type=int, action='append', default=[], help='user id to refresh (repeatable)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.user:
+            admin_stats_service.refresh_users(args.user)
+            print(f"Refreshed admin stats for {len(set(args.user))} users")
+        else:
+            count = admin_stats_service.rebuild()
+            print(f"Rebuilt admin stats: {count} users with photos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())